@@ -6,11 +6,18 @@ from fastapi import FastAPI, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 
 from src.config.params import COMMON_CONFIG, TASK_CONFIG
+from src.routers.chat.utils import chat_cancel_listener, chat_client_pool
+from src.routers.evaluate.baseline import eval_baseline_registry
+from src.routers.evaluate.cache import eval_cache
+from src.routers.gateway.utils import gateway_router
+from src.routers.hw_info.collector import hw_info_collector
+from src.routers.infer_backend.pool import infer_backend_pool
 from src.routers.main import acceltune_api
 from src.schema.eval_tasks import EvalTaskInfo
 from src.schema.support_models import SupportModelInfo
 from src.thirdparty.redis.handler import redis_async
 from src.utils.logger import accel_logger
+from src.utils.tracing import trace_exporter
 from src.utils.utils import check_dataset_info_file, generate_uuid
 
 
@@ -62,10 +69,20 @@ async def lifespan(app: FastAPI):
     await check_dataset_info_file(
         file_path=f"{COMMON_CONFIG.data_path}/dataset_info.json"
     )
+    await infer_backend_pool.recover()
+    await eval_baseline_registry.recover()
+    await eval_cache.recover()
+    hw_info_collector.start()
+    trace_exporter.start()
 
     yield
 
+    await hw_info_collector.aclose()
+    await chat_cancel_listener.aclose()
+    await gateway_router.aclose()
+    await chat_client_pool.aclose()
     await redis_async.aclose()
+    await trace_exporter.aclose()
     accel_logger.info("End Service")
 
 
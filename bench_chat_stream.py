@@ -0,0 +1,108 @@
+"""Tokens-per-second benchmark for the chat stream formats.
+
+Runs the same chat against an OpenAI-compatible server through every stream
+format of `/chat/stream/start/` (per-token NDJSON, time-batched NDJSON and SSE
+passthrough) and reports client-side throughput. Start the stand-in backend
+first, then run from the repository root with the service environment loaded:
+
+    uvicorn fake_openai:app --port 8000
+    python bench_chat_stream.py --url http://127.0.0.1:8000 --concurrency 32
+
+Only the re-framing layer is measured, Redis does not have to be running.
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from src.routers.chat.utils import (
+    stream_chat_batched,
+    stream_chat_ndjson,
+    stream_chat_passthrough,
+)
+
+
+async def run_chat(
+    aclient: httpx.AsyncClient,
+    model_name: str,
+    stream_format: str,
+    batch_interval: float,
+) -> int:
+    cancel_event = asyncio.Event()
+    data = {
+        "model": model_name,
+        "messages": [{"role": "user", "content": "benchmark"}],
+        "stream": True,
+    }
+
+    async with aclient.stream("POST", "/v1/chat/completions", json=data) as response:
+        if stream_format == "sse":
+            chat_stream = stream_chat_passthrough(
+                response=response, request_id="bench", cancel_event=cancel_event
+            )
+        elif stream_format == "batched":
+            chat_stream = stream_chat_batched(
+                response=response,
+                request_id="bench",
+                cancel_event=cancel_event,
+                batch_interval=batch_interval,
+            )
+        else:
+            chat_stream = stream_chat_ndjson(
+                response=response, request_id="bench", cancel_event=cancel_event
+            )
+
+        frames = 0
+        async for _ in chat_stream:
+            frames += 1
+
+    return frames
+
+
+async def bench_format(args: argparse.Namespace, stream_format: str) -> None:
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(
+        base_url=args.url, limits=limits, timeout=None
+    ) as aclient:
+        start = time.perf_counter()
+        frames = await asyncio.gather(
+            *(
+                run_chat(
+                    aclient=aclient,
+                    model_name=args.model,
+                    stream_format=stream_format,
+                    batch_interval=args.batch_interval_ms / 1000,
+                )
+                for _ in range(args.requests)
+            )
+        )
+        elapsed = time.perf_counter() - start
+
+    tokens = args.requests * args.tokens
+    print(
+        f"{stream_format:>8}: {args.requests} chats, {tokens} tokens in {elapsed:.2f}s"
+        f" -> {tokens / elapsed:,.0f} tokens/s, {sum(frames)} frames"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--model", default="fake-model")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument(
+        "--tokens", type=int, default=256, help="FAKE_OPENAI_TOKENS of the server"
+    )
+    parser.add_argument("--batch-interval-ms", type=int, default=50)
+    parser.add_argument("--formats", nargs="+", default=["ndjson", "batched", "sse"])
+    args = parser.parse_args()
+
+    for stream_format in args.formats:
+        await bench_format(args=args, stream_format=stream_format)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
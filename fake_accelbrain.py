@@ -0,0 +1,155 @@
+"""Local stand-in for an AccelBrain device.
+
+Implements the parts of the AccelBrain model handler API that AccelTune calls
+during deploy, so the deploy flow can be exercised without an edge device:
+
+    uvicorn fake_accelbrain:app --host 0.0.0.0 --port 8090
+
+Set FAKE_ACCELBRAIN_FAIL_EVERY=N to answer every Nth chunk upload with 503,
+which makes the resumable upload retry and resume from the last ack offset.
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+from typing import Dict
+
+import orjson
+from fastapi import FastAPI, Request, Response, UploadFile, status
+from fastapi.responses import StreamingResponse
+
+STORAGE_PATH = os.getenv("FAKE_ACCELBRAIN_STORAGE", tempfile.mkdtemp())
+FAIL_EVERY = int(os.getenv("FAKE_ACCELBRAIN_FAIL_EVERY", "0"))
+
+app = FastAPI()
+sessions: Dict[str, dict] = dict()
+chunk_requests = {"count": 0}
+
+
+def ndjson_event(action: str, progress: float, detail: dict) -> bytes:
+    return (
+        orjson.dumps(
+            {
+                "status": status.HTTP_200_OK,
+                "message": {"action": action, "progress": progress, "detail": detail},
+            }
+        )
+        + b"\n"
+    )
+
+
+async def load_model_events(model_name: str):
+    for progress in (0.0, 0.5, 1.0):
+        yield ndjson_event(
+            action="Load model", progress=progress, detail={"model_name": model_name}
+        )
+
+
+@app.get("/model_handler/")
+async def alive():
+    return {"status": "alive"}
+
+
+@app.post("/model_handler/deploy/")
+async def deploy(request: Request):
+    form = await request.form()
+    model_file: UploadFile = form["model"]
+    with open(os.path.join(STORAGE_PATH, model_file.filename), "wb") as f:
+        shutil.copyfileobj(model_file.file, f)
+
+    return StreamingResponse(
+        load_model_events(model_name=form["model_name_on_ollama"]),
+        media_type="application/x-ndjson",
+    )
+
+
+@app.post("/model_handler/deploy/upload/")
+async def open_upload(manifest: dict):
+    upload_id = manifest["content_sha256"]
+    if upload_id not in sessions:
+        os.makedirs(os.path.join(STORAGE_PATH, upload_id), exist_ok=True)
+        sessions[upload_id] = {
+            "manifest": manifest,
+            "received": {file_info["name"]: 0 for file_info in manifest["files"]},
+        }
+
+    return {"upload_id": upload_id, "received": sessions[upload_id]["received"]}
+
+
+@app.get("/model_handler/deploy/upload/{upload_id}/")
+async def get_upload(upload_id: str):
+    if upload_id not in sessions:
+        return Response(status_code=status.HTTP_404_NOT_FOUND)
+
+    return {"upload_id": upload_id, "received": sessions[upload_id]["received"]}
+
+
+@app.put("/model_handler/deploy/upload/{upload_id}/{file_name}")
+async def upload_chunk(upload_id: str, file_name: str, request: Request):
+    chunk_requests["count"] += 1
+    if FAIL_EVERY and chunk_requests["count"] % FAIL_EVERY == 0:
+        return Response(status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    session = sessions.get(upload_id)
+    if session is None or file_name not in session["received"]:
+        return Response(status_code=status.HTTP_404_NOT_FOUND)
+
+    received = session["received"][file_name]
+    offset = int(request.headers["Upload-Offset"])
+    if offset != received:
+        return Response(
+            content=orjson.dumps({"offset": received}),
+            status_code=status.HTTP_409_CONFLICT,
+            media_type="application/json",
+        )
+
+    data = await request.body()
+    chunk_size = session["manifest"]["chunk_size"]
+    file_info = next(f for f in session["manifest"]["files"] if f["name"] == file_name)
+    expect_hash = file_info["chunks"][offset // chunk_size]
+    if hashlib.sha256(data).hexdigest() != request.headers["X-Chunk-Sha256"] or (
+        request.headers["X-Chunk-Sha256"] != expect_hash
+    ):
+        return Response(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    with open(os.path.join(STORAGE_PATH, upload_id, file_name), "ab") as f:
+        f.write(data)
+    session["received"][file_name] = received + len(data)
+
+    return {"offset": session["received"][file_name]}
+
+
+@app.post("/model_handler/deploy/upload/{upload_id}/commit/")
+async def commit_upload(upload_id: str, body: dict):
+    session = sessions.get(upload_id)
+    if session is None:
+        return Response(status_code=status.HTTP_404_NOT_FOUND)
+
+    for file_info in session["manifest"]["files"]:
+        file_hash = hashlib.sha256()
+        with open(os.path.join(STORAGE_PATH, upload_id, file_info["name"]), "rb") as f:
+            while data := f.read(1024 * 1024):
+                file_hash.update(data)
+
+        if file_hash.hexdigest() != file_info["sha256"]:
+            return Response(
+                content=orjson.dumps(
+                    {
+                        "status": status.HTTP_422_UNPROCESSABLE_ENTITY,
+                        "message": {
+                            "action": "Verify file",
+                            "progress": -1,
+                            "detail": {"error": f"{file_info['name']} hash mismatch"},
+                        },
+                    }
+                ),
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                media_type="application/json",
+            )
+
+    del sessions[upload_id]
+    return StreamingResponse(
+        load_model_events(model_name=body["model_name_on_ollama"]),
+        media_type="application/x-ndjson",
+    )
@@ -0,0 +1,216 @@
+"""Local stand-in for an OpenAI-compatible inference backend (vLLM / Ollama).
+
+Serves /v1/models, /v1/chat/completions and /v1/completions with canned
+tokens, so chat streaming, benchmarks and batch jobs can be exercised without
+a GPU:
+
+    uvicorn fake_openai:app --host 0.0.0.0 --port 8000
+
+FAKE_OPENAI_TOKENS sets how many tokens a completion produces (capped by the
+request's max_tokens), FAKE_OPENAI_DELAY_MS adds a delay per streamed token
+and FAKE_OPENAI_KEEPALIVE_EVERY=N sends an SSE comment line every N tokens.
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from typing import Union
+
+import orjson
+from fastapi import FastAPI, Request, Response, status
+from fastapi.responses import StreamingResponse
+
+MODEL_NAME = os.getenv("FAKE_OPENAI_MODEL", "fake-model")
+TOKENS = int(os.getenv("FAKE_OPENAI_TOKENS", "256"))
+DELAY_MS = float(os.getenv("FAKE_OPENAI_DELAY_MS", "0"))
+KEEPALIVE_EVERY = int(os.getenv("FAKE_OPENAI_KEEPALIVE_EVERY", "0"))
+
+app = FastAPI()
+
+
+def sse_event(data: dict) -> bytes:
+    return b"data: " + orjson.dumps(data) + b"\n\n"
+
+
+def completion_tokens(max_tokens: int) -> list:
+    return [f" tok{i}" for i in range(min(TOKENS, max_tokens))]
+
+
+def count_prompt_tokens(body: dict) -> int:
+    # whitespace words stand in for tokens
+    if "messages" in body:
+        return sum(len(str(m.get("content", "")).split()) for m in body["messages"])
+    prompt = body.get("prompt", "")
+    prompts = prompt if isinstance(prompt, list) else [prompt]
+    return sum(len(str(p).split()) for p in prompts)
+
+
+async def stream_completion(
+    completion_id: str,
+    object_name: str,
+    model: str,
+    tokens: list,
+    chat: bool,
+    usage: Union[dict, None] = None,
+):
+    created = int(time.time())
+    if chat:
+        yield sse_event(
+            {
+                "id": completion_id,
+                "object": object_name,
+                "created": created,
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "delta": {"role": "assistant", "content": ""},
+                        "finish_reason": None,
+                    }
+                ],
+            }
+        )
+
+    for idx, token in enumerate(tokens):
+        if DELAY_MS:
+            await asyncio.sleep(DELAY_MS / 1000)
+        if KEEPALIVE_EVERY and idx % KEEPALIVE_EVERY == 0:
+            yield b": keep-alive\n\n"
+
+        choice = (
+            {"index": 0, "delta": {"content": token}, "finish_reason": None}
+            if chat
+            else {"index": 0, "text": token, "finish_reason": None}
+        )
+        yield sse_event(
+            {
+                "id": completion_id,
+                "object": object_name,
+                "created": created,
+                "model": model,
+                "choices": [choice],
+            }
+        )
+
+    finish_reason = "length" if len(tokens) < TOKENS else "stop"
+    yield sse_event(
+        {
+            "id": completion_id,
+            "object": object_name,
+            "created": created,
+            "model": model,
+            "choices": [
+                (
+                    {"index": 0, "delta": {}, "finish_reason": finish_reason}
+                    if chat
+                    else {"index": 0, "text": "", "finish_reason": finish_reason}
+                )
+            ],
+        }
+    )
+    if usage is not None:
+        yield sse_event(
+            {
+                "id": completion_id,
+                "object": object_name,
+                "created": created,
+                "model": model,
+                "choices": [],
+                "usage": usage,
+            }
+        )
+    yield b"data: [DONE]\n\n"
+
+
+async def completion_response(request: Request, chat: bool) -> Response:
+    body = await request.json()
+    model = body.get("model", MODEL_NAME)
+    tokens = completion_tokens(max_tokens=body.get("max_tokens") or TOKENS)
+    completion_id = f"{'chatcmpl' if chat else 'cmpl'}-{uuid.uuid4().hex}"
+    prompt_tokens = count_prompt_tokens(body)
+
+    if body.get("stream"):
+        include_usage = (body.get("stream_options") or {}).get("include_usage")
+        return StreamingResponse(
+            stream_completion(
+                completion_id=completion_id,
+                object_name="chat.completion.chunk" if chat else "text_completion",
+                model=model,
+                tokens=tokens,
+                chat=chat,
+                usage=(
+                    {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": len(tokens),
+                        "total_tokens": prompt_tokens + len(tokens),
+                    }
+                    if include_usage
+                    else None
+                ),
+            ),
+            media_type="text/event-stream",
+        )
+
+    if DELAY_MS:
+        await asyncio.sleep(DELAY_MS * len(tokens) / 1000)
+
+    text = "".join(tokens)
+    finish_reason = "length" if len(tokens) < TOKENS else "stop"
+    # a list prompt on /v1/completions gets one choice per prompt
+    num_prompts = (
+        len(body["prompt"]) if not chat and isinstance(body.get("prompt"), list) else 1
+    )
+    choices = [
+        (
+            {
+                "index": idx,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": finish_reason,
+            }
+            if chat
+            else {"index": idx, "text": text, "finish_reason": finish_reason}
+        )
+        for idx in range(num_prompts)
+    ]
+    return Response(
+        content=orjson.dumps(
+            {
+                "id": completion_id,
+                "object": "chat.completion" if chat else "text_completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": choices,
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": len(tokens) * num_prompts,
+                    "total_tokens": prompt_tokens + len(tokens) * num_prompts,
+                },
+            }
+        ),
+        status_code=status.HTTP_200_OK,
+        media_type="application/json",
+    )
+
+
+@app.get("/health")
+async def health():
+    return Response(content="", status_code=status.HTTP_200_OK)
+
+
+@app.get("/v1/models")
+async def list_models():
+    return {
+        "object": "list",
+        "data": [{"id": MODEL_NAME, "object": "model", "owned_by": "fake"}],
+    }
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    return await completion_response(request=request, chat=True)
+
+
+@app.post("/v1/completions")
+async def completions(request: Request):
+    return await completion_response(request=request, chat=False)
@@ -0,0 +1,8 @@
+from pydantic import BaseModel
+
+
+class ChatConfig(BaseModel):
+    history_max_turns: int
+    history_max_tokens: int
+    reply_reserve_tokens: int
+    session_lock_ttl: int
@@ -4,3 +4,10 @@ from pydantic import BaseModel
 class EvalConfig(BaseModel):
     name: str
     tag: str
+    vllm_concurrency: int
+    ollama_concurrency: int
+    cache_max_gb: float
+    stream_maxlen: int
+    stream_ttl: int
+    stream_read_count: int
+    stream_interval: float
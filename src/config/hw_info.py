@@ -5,3 +5,5 @@ class HwInfoConfig(BaseModel):
     name: str
     tag: str
     container_name: str
+    history_size: int
+    usage_points: int
@@ -0,0 +1,7 @@
+from pydantic import BaseModel
+
+
+class InferPoolConfig(BaseModel):
+    gpu_memory_gb: float
+    max_backends: int
+    ready_timeout: int
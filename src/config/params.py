@@ -1,10 +1,12 @@
 import os
 
+from src.config.chat import ChatConfig
 from src.config.common import CommonConfig
 from src.config.docker_network import DockerNetworkConfig
 from src.config.eval import EvalConfig
 from src.config.finetune_tool import FineTuneToolConfig
 from src.config.hw_info import HwInfoConfig
+from src.config.infer_pool import InferPoolConfig
 from src.config.logger import LoggerConfig
 from src.config.main_service import MainServiceConfig
 from src.config.ollama import OllamaConfig
@@ -12,6 +14,7 @@ from src.config.quantize_service import QuantizeServiceConfig
 from src.config.redis import RedisConfig
 from src.config.status import StatusConfig
 from src.config.task import TaskConfig
+from src.config.trace import TraceConfig
 from src.config.vllm import VllmConfig
 
 PROJECT_NAME = os.getenv("PROJECT_NAME", "acceltune")
@@ -39,6 +42,15 @@ ACCELTUNE_SETTING = {
         "deploy": "DEPLOY",
         "support_model": "SUPPORT_MODEL",
         "eval_tasks": "EVAL_TASKS",
+        "batch_infer": "BATCH_INFER",
+        "infer_pool": "INFER_POOL",
+        "benchmark": "BENCHMARK",
+        "gateway": "GATEWAY",
+        "eval_cache": "EVAL_CACHE",
+        "infer_backend_events": "INFER_BACKEND_EVENTS",
+        "eval_result": "EVAL_RESULT",
+        "eval_baseline": "EVAL_BASELINE",
+        "usage": "USAGE",
     },
     "status": {
         "setup": "setup",
@@ -74,6 +86,10 @@ ACCELTUNE_SETTING = {
         "tag": os.getenv("VLLM_SERVICE_TAG"),
         "host": os.getenv("VLLM_SERVICE_HOST"),
         "port": os.getenv("VLLM_SERVICE_PORT"),
+        "max_loras": os.getenv("VLLM_MAX_LORAS", "8"),
+        "max_lora_rank": os.getenv("VLLM_MAX_LORA_RANK", "64"),
+        "max_model_len": os.getenv("VLLM_MAX_MODEL_LEN", "32768"),
+        "host_ports": os.getenv("VLLM_HOST_PORTS", ""),
     },
     "ollama": {
         "name": os.getenv("OLLAMA_SERVICE_NAME"),
@@ -81,14 +97,34 @@ ACCELTUNE_SETTING = {
         "host": os.getenv("OLLAMA_SERVICE_HOST"),
         "port": os.getenv("OLLAMA_SERVICE_PORT"),
     },
+    "infer_pool": {
+        "gpu_memory_gb": os.getenv("INFER_POOL_GPU_MEMORY_GB", "0"),
+        "max_backends": os.getenv("INFER_POOL_MAX_BACKENDS", "1"),
+        "ready_timeout": os.getenv("INFER_BACKEND_READY_TIMEOUT", "900"),
+    },
+    "chat": {
+        "history_max_turns": os.getenv("CHAT_HISTORY_MAX_TURNS", "50"),
+        "history_max_tokens": os.getenv("CHAT_HISTORY_MAX_TOKENS", "16384"),
+        "reply_reserve_tokens": os.getenv("CHAT_REPLY_RESERVE_TOKENS", "1024"),
+        "session_lock_ttl": os.getenv("CHAT_SESSION_LOCK_TTL", "120"),
+    },
     "eval": {
         "name": os.getenv("EVAL_TOOL_NAME"),
         "tag": os.getenv("EVAL_TOOL_TAG"),
+        "vllm_concurrency": os.getenv("EVAL_VLLM_CONCURRENCY", "32"),
+        "ollama_concurrency": os.getenv("EVAL_OLLAMA_CONCURRENCY", "4"),
+        "cache_max_gb": os.getenv("EVAL_CACHE_MAX_GB", "50"),
+        "stream_maxlen": os.getenv("EVAL_STREAM_MAXLEN", "200"),
+        "stream_ttl": os.getenv("EVAL_STREAM_TTL", "600"),
+        "stream_read_count": os.getenv("EVAL_STREAM_READ_COUNT", "200"),
+        "stream_interval": os.getenv("EVAL_STREAM_INTERVAL", "5"),
     },
     "hw_info": {
         "name": os.getenv("HWINFO_NAME"),
         "tag": os.getenv("HWINFO_TAG"),
         "container_name": os.getenv("HWINFO_CONTAINER_NAME"),
+        "history_size": os.getenv("HWINFO_HISTORY_SIZE", "3600"),
+        "usage_points": os.getenv("HWINFO_USAGE_POINTS", "240"),
     },
     "quantize_service": {
         "name": os.getenv("QUANTIZE_SERVICE_NAME"),
@@ -102,6 +138,15 @@ ACCELTUNE_SETTING = {
         "name": os.getenv("FINETUNE_TOOL_NAME"),
         "tag": os.getenv("FINETUNE_TOOL_TAG"),
     },
+    "trace": {
+        "enabled": os.getenv("TRACE_ENABLED", "true"),
+        "folder": os.getenv("TRACE_FOLDER", "/app/logs/trace"),
+        "file_limit": os.getenv("TRACE_FILE_LIMIT", "10485760"),
+        "file_count": os.getenv("TRACE_FILE_COUNT", "5"),
+        "max_traces": os.getenv("TRACE_MAX_TRACES", "200"),
+        "max_spans": os.getenv("TRACE_MAX_SPANS", "1000"),
+        "otlp_endpoint": os.getenv("TRACE_OTLP_ENDPOINT") or None,
+    },
 }
 
 COMMON_CONFIG = CommonConfig(**ACCELTUNE_SETTING["common"])
@@ -116,4 +161,7 @@ DOCKERNETWORK_CONFIG = DockerNetworkConfig(network_name=PROJECT_NAME)
 TASK_CONFIG = TaskConfig(**ACCELTUNE_SETTING["task"])
 MAINSERVICE_CONFIG = MainServiceConfig(**ACCELTUNE_SETTING["main_service"])
 OLLAMA_CONFIG = OllamaConfig(**ACCELTUNE_SETTING["ollama"])
+INFERPOOL_CONFIG = InferPoolConfig(**ACCELTUNE_SETTING["infer_pool"])
+CHAT_CONFIG = ChatConfig(**ACCELTUNE_SETTING["chat"])
 STATUS_CONFIG = StatusConfig(**ACCELTUNE_SETTING["status"])
+TRACE_CONFIG = TraceConfig(**ACCELTUNE_SETTING["trace"])
@@ -12,3 +12,12 @@ class TaskConfig(BaseModel):
     deploy: str
     support_model: str
     eval_tasks: str
+    batch_infer: str
+    infer_pool: str
+    benchmark: str
+    gateway: str
+    eval_cache: str
+    infer_backend_events: str
+    eval_result: str
+    eval_baseline: str
+    usage: str
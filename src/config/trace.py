@@ -0,0 +1,13 @@
+from typing import Union
+
+from pydantic import BaseModel
+
+
+class TraceConfig(BaseModel):
+    enabled: bool
+    folder: str
+    file_limit: int
+    file_count: int
+    max_traces: int
+    max_spans: int
+    otlp_endpoint: Union[str, None]
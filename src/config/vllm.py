@@ -6,3 +6,7 @@ class VllmConfig(BaseModel):
     tag: str
     host: str
     port: int
+    max_loras: int
+    max_lora_rank: int
+    max_model_len: int
+    host_ports: str
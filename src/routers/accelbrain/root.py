@@ -73,13 +73,10 @@ async def start_deploy_accelbrain(request_data: schema.PostDeploy):
                 model_name=request_data.deploy_name,
                 train_args=info["train_args"],
                 last_model_path=info["last_model_path"],
-                deploy_path=os.path.join(
-                    os.path.dirname(info["train_args"]["output_dir"]),
-                    "deploy",
-                    f"{deploy_unique_key}.zip",
-                ),
                 deploy_unique_key=deploy_unique_key,
                 accelbrain_url=accelbrain_device_info["url"],
+                resumable=request_data.resumable,
+                mirror_progress=request_data.mirror_progress,
             ),
             status_code=status.HTTP_200_OK,
             media_type="text/event-stream",
@@ -102,6 +99,93 @@ async def start_deploy_accelbrain(request_data: schema.PostDeploy):
         ) from None
 
 
+@router.post("/deploy/fleet/start/")
+async def start_fleet_deploy_accelbrain(request_data: schema.PostFleetDeploy):
+    validator.PostFleetDeploy(
+        deploy_name=request_data.deploy_name,
+        device_uuids=request_data.device_uuids,
+    )
+    error_handler = ResponseErrorHandler()
+
+    try:
+        devices_info = await redis_async.client.hmget(
+            TASK_CONFIG.accelbrain_device,
+            [str(device_uuid) for device_uuid in request_data.device_uuids],
+        )
+        devices_info = [orjson.loads(device_info) for device_info in devices_info]
+
+        info = await redis_async.client.hget(
+            TASK_CONFIG.train, request_data.deploy_name
+        )
+        info = orjson.loads(info)
+
+        await redis_async.client.hset(
+            TASK_CONFIG.deploy,
+            mapping={
+                f"{request_data.deploy_name}-{device_info['uuid']}": orjson.dumps(
+                    {
+                        "deploy_model": request_data.deploy_name,
+                        "deploy_device": device_info["name"],
+                        "deploy_url": device_info["url"],
+                        "status": STATUS_CONFIG.active,
+                    }
+                )
+                for device_info in devices_info
+            },
+        )
+
+    except Exception as e:
+        accel_logger.error(f"Database error: {e}")
+        error_handler.add(
+            type=error_handler.ERR_REDIS,
+            loc=[error_handler.LOC_DATABASE],
+            msg="Database error",
+            input={
+                "deploy_name": request_data.deploy_name,
+                "device_uuids": [str(uuid) for uuid in request_data.device_uuids],
+            },
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=error_handler.errors,
+        ) from None
+
+    try:
+        return StreamingResponse(
+            content=utils.fleet_deploy_to_accelbrain_service(
+                file_path=os.path.join(
+                    os.path.dirname(info["train_args"]["output_dir"]), "quantize"
+                ),
+                model_name=request_data.deploy_name,
+                train_args=info["train_args"],
+                last_model_path=info["last_model_path"],
+                devices_info=devices_info,
+                max_concurrency=request_data.max_concurrency,
+                max_upload_mbps=request_data.max_upload_mbps,
+                resumable=request_data.resumable,
+                mirror_progress=request_data.mirror_progress,
+            ),
+            status_code=status.HTTP_200_OK,
+            media_type="text/event-stream",
+        )
+
+    except Exception as e:
+        accel_logger.error(f"Unexpected error: {e}")
+        error_handler.add(
+            type=error_handler.ERR_INTERNAL,
+            loc=[error_handler.LOC_PROCESS],
+            msg="Unexpected error",
+            input={
+                "deploy_name": request_data.deploy_name,
+                "device_uuids": [str(uuid) for uuid in request_data.device_uuids],
+            },
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=error_handler.errors,
+        ) from None
+
+
 @router.get("/deploy/")
 async def get_deploy_status(
     deploy_name: Annotated[Union[str, None], Query()] = None,
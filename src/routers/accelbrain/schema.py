@@ -1,5 +1,5 @@
 import re
-from typing import Annotated, Union
+from typing import Annotated, List, Union
 from uuid import UUID
 
 from fastapi import status
@@ -12,6 +12,8 @@ from src.utils.error import ResponseErrorHandler
 class PostDeploy(BaseModel):
     deploy_name: str
     device_uuid: UUID
+    resumable: bool = False
+    mirror_progress: bool = False
 
     @model_validator(mode="after")
     def check(self: "PostDeploy") -> "PostDeploy":
@@ -42,6 +44,76 @@ class PostDeploy(BaseModel):
         return self
 
 
+class PostFleetDeploy(BaseModel):
+    deploy_name: str
+    device_uuids: List[UUID]
+    max_concurrency: int = 4
+    max_upload_mbps: Union[float, None] = None
+    resumable: bool = False
+    mirror_progress: bool = False
+
+    @model_validator(mode="after")
+    def check(self: "PostFleetDeploy") -> "PostFleetDeploy":
+        error_handler = ResponseErrorHandler()
+
+        if not re.fullmatch(r"[a-zA-Z0-9][a-zA-Z0-9_.-]+", self.deploy_name):
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'deploy_name' contain invalid characters",
+                input={"deploy_name": self.deploy_name},
+            )
+
+        if len(self.device_uuids) == 0:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'device_uuids' must not be empty",
+                input={"device_uuids": []},
+            )
+
+        if len(set(self.device_uuids)) != len(self.device_uuids):
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'device_uuids' must be unique",
+                input={"device_uuids": [str(uuid) for uuid in self.device_uuids]},
+            )
+
+        for device_uuid in self.device_uuids:
+            if device_uuid.version != 4:
+                error_handler.add(
+                    type=error_handler.ERR_VALIDATE,
+                    loc=[error_handler.LOC_BODY],
+                    msg="UUID version 4 expected",
+                    input={"device_uuid": str(device_uuid)},
+                )
+
+        if not 1 <= self.max_concurrency <= 32:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'max_concurrency' must be between 1 and 32",
+                input={"max_concurrency": self.max_concurrency},
+            )
+
+        if self.max_upload_mbps is not None and self.max_upload_mbps <= 0:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'max_upload_mbps' must be greater than 0",
+                input={"max_upload_mbps": self.max_upload_mbps},
+            )
+
+        if error_handler.errors != []:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=error_handler.errors,
+            )
+
+        return self
+
+
 class GetDeploy(BaseModel):
     deploy_name: Union[str, None]
     device_uuid: Union[UUID, None]
@@ -1,13 +1,14 @@
 import asyncio
 import hashlib
+import io
 import os
 import re
+import time
 import zipfile
 from collections.abc import AsyncGenerator
-from typing import Any, Literal, Tuple, Union
+from typing import IO, Any, List, Literal, Tuple, Union
 
 import aiofiles
-import aiofiles.os
 import httpx
 import orjson
 from fastapi import HTTPException, status
@@ -18,13 +19,23 @@ from src.config.params import (
     TASK_CONFIG,
 )
 from src.routers.accelbrain.error import AccelBrainError, AccelTuneError
+from src.routers.hw_info.usage import track_usage
 from src.routers.train.utils import export_data_process, write_yaml
 from src.thirdparty.docker.api_handler import remove_container, wait_for_container
 from src.thirdparty.redis.handler import redis_async
+from src.utils.manifest import (
+    MANIFEST_NAME,
+    list_artifact_files,
+    refresh_manifest,
+    write_manifest,
+)
+from src.utils.metrics import STAGE_DURATION
+from src.utils.progress import ProgressChannel
+from src.utils.tracing import TracingTransport, detached_span
 
 
 async def call_internal_merge_api(merge_name: str) -> str:
-    async with httpx.AsyncClient(timeout=None) as aclient:
+    async with httpx.AsyncClient(transport=TracingTransport(), timeout=None) as aclient:
         response = await aclient.post(
             f"http://127.0.0.1:{MAINSERVICE_CONFIG.port}/acceltune/merge/start/",
             json={"merge_name": merge_name},
@@ -34,9 +45,12 @@ async def call_internal_merge_api(merge_name: str) -> str:
     if response.status_code == status.HTTP_200_OK:
         transport = httpx.AsyncHTTPTransport(uds="/var/run/docker.sock")
         async with httpx.AsyncClient(transport=transport, timeout=None) as aclient:
-            container_info = await wait_for_container(
-                aclient=aclient, container_name=container_name
-            )
+            async with track_usage(
+                name=merge_name, job="merge", container_name_or_id=container_name
+            ):
+                container_info = await wait_for_container(
+                    aclient=aclient, container_name=container_name
+                )
             exit_status = container_info["StatusCode"]
             if exit_status == 0:
                 merge_status = STATUS_CONFIG.finish
@@ -67,26 +81,21 @@ def check_file_complete(path: str) -> bool:
     found_files = set()
     is_shard_model = False
 
-    with os.scandir(path) as entries:
-        for entry in entries:
-            if not entry.is_file():
-                continue
-            name = entry.name
-
-            if name in required_files:
-                found_files.add(name)
+    for name in list_artifact_files(path):
+        if name in required_files:
+            found_files.add(name)
 
-            if name == "model.safetensors":
-                is_shard_model = True
+        if name == "model.safetensors":
+            is_shard_model = True
 
-            match = shard_pattern.fullmatch(name)
-            if match:
-                idx = int(match.group(1))
-                total = int(match.group(2))
-                found_shards[idx] = total
+        match = shard_pattern.fullmatch(name)
+        if match:
+            idx = int(match.group(1))
+            total = int(match.group(2))
+            found_shards[idx] = total
 
-            if name == "model.safetensors.index.json":
-                found_files.add(name)
+        if name == "model.safetensors.index.json":
+            found_files.add(name)
 
     if not required_files.issubset(found_files):
         return False
@@ -145,6 +154,7 @@ async def check_merge_status(
                     merge_status = await call_internal_merge_api(merge_name=name)
                     if merge_status != STATUS_CONFIG.finish:
                         raise RuntimeError(f"merge {merge_status}")
+                    await asyncio.to_thread(write_manifest, merge_path)
                     await update_last_model_path(name=name, last_model_path=merge_path)
                 except HTTPException as e:
                     raise AccelTuneError(
@@ -179,7 +189,7 @@ async def check_merge_status(
 
 
 async def call_internal_quantize_api(quantize_name: str) -> None:
-    async with httpx.AsyncClient(timeout=None) as aclient:
+    async with httpx.AsyncClient(transport=TracingTransport(), timeout=None) as aclient:
         response = await aclient.post(
             f"http://127.0.0.1:{MAINSERVICE_CONFIG.port}/acceltune/quantize/start/",
             json={"quantize_name": quantize_name},
@@ -224,7 +234,7 @@ async def check_quantize_status(quantize_name: str):
 
 async def check_accelbrain_url(accelbrain_url: str) -> Tuple[str, int]:
     try:
-        async with httpx.AsyncClient() as aclient:
+        async with httpx.AsyncClient(transport=TracingTransport()) as aclient:
             response = await aclient.get(f"http://{accelbrain_url}/model_handler/")
 
             if response.status_code == status.HTTP_200_OK:
@@ -248,80 +258,100 @@ async def check_accelbrain_url(accelbrain_url: str) -> Tuple[str, int]:
         raise TimeoutError("Request timeout") from None  # default is set 5 seconds
 
 
-def calc_sha256(file_path: str, chunk_size: int = 65536) -> str:
-    sha256 = hashlib.sha256()
-    try:
-        with open(file_path, "rb") as f:
-            while chunk := f.read(chunk_size):
-                sha256.update(chunk)
-        return sha256.hexdigest()
-
-    except FileNotFoundError:
-        raise FileNotFoundError(f"{file_path} does not exists") from None
-
-    except Exception as e:
-        raise RuntimeError(e) from None
-
-
-def zip_folder_and_get_hash(path: str, zip_path: str) -> dict:
-    file_hashes = dict()
+class ZipStreamBuffer(io.RawIOBase):
+    def __init__(self) -> None:
+        self._buffer = bytearray()
 
-    try:
-        with zipfile.ZipFile(
-            file=zip_path, mode="w", compression=zipfile.ZIP_DEFLATED
-        ) as zipf:
-            for file in os.listdir(path):
-                file_path = os.path.join(path, file)
+    def writable(self) -> bool:
+        return True
 
-                file_hash = calc_sha256(file_path=file_path)
-                file_hashes[file] = file_hash
+    def write(self, data: bytes) -> int:
+        self._buffer.extend(data)
+        return len(data)
 
-                zipf.write(file_path, arcname=os.path.relpath(file_path, path))
+    def pop(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
 
-        zip_hash = calc_sha256(file_path=zip_path)
-        file_hashes[os.path.basename(zip_path)] = zip_hash
 
-        return file_hashes
+def get_compress_type(file_name: str) -> int:
+    # gguf weights are already quantized, deflate only burns cpu on them
+    if file_name.endswith(".gguf"):
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
 
-    except FileNotFoundError as e:
-        raise AccelTuneError(
-            status_code=status.HTTP_404_NOT_FOUND,
-            action="Zip folder",
-            progress=-1,
-            detail={"error": f"{e}"},
-        ) from None
 
-    except Exception as e:
-        raise AccelTuneError(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            action="Zip folder",
-            progress=-1,
-            detail={"error": f"{e}"},
-        ) from None
+def write_zip_chunk(zwriter: IO[bytes], file_hash: Any, data: bytes) -> None:
+    file_hash.update(data)
+    zwriter.write(data)
 
 
-async def async_file_generator(
-    file_path: str, deploy_unique_key: str, chunk_size: int = 50 * 1024 * 1024
+async def stream_zip_folder(
+    path: str,
+    deploy_unique_key: str,
+    file_hashes: dict,
+    progress: ProgressChannel,
+    chunk_size: int = 50 * 1024 * 1024,
 ) -> AsyncGenerator[bytes, None]:
     try:
-        async with aiofiles.open(file_path, "rb") as af:
-            await af.seek(0, 2)
-            file_size = await af.tell()
-            await af.seek(0)
+        with os.scandir(path) as it:
+            entries = sorted(
+                (
+                    entry
+                    for entry in it
+                    if entry.is_file() and entry.name != MANIFEST_NAME
+                ),
+                key=lambda e: e.name,
+            )
+        total_size = sum(entry.stat().st_size for entry in entries)
+
+        buffer = ZipStreamBuffer()
+        zip_hash = hashlib.sha256()
+        read_size = 0
+
+        # zipping is interleaved with the upload, compress_sec isolates its cost
+        with (
+            detached_span(
+                name="deploy zip", attributes={"zip.total_bytes": total_size}
+            ) as zip_span,
+            zipfile.ZipFile(file=buffer, mode="w") as zipf,
+        ):
+            compress_sec = 0.0
+            for entry in entries:
+                file_hash = hashlib.sha256()
+                zinfo = zipfile.ZipInfo.from_file(entry.path, arcname=entry.name)
+                zinfo.compress_type = get_compress_type(file_name=entry.name)
+
+                async with aiofiles.open(entry.path, "rb") as af:
+                    with zipf.open(zinfo, mode="w") as zwriter:
+                        while data := await af.read(chunk_size):
+                            compress_started = time.monotonic()
+                            await asyncio.to_thread(
+                                write_zip_chunk, zwriter, file_hash, data
+                            )
+                            compress_sec += time.monotonic() - compress_started
+                            if zip_span is not None:
+                                zip_span.set_attribute(
+                                    "zip.compress_sec", round(compress_sec, 3)
+                                )
+                            read_size += len(data)
+                            await progress.publish(round(read_size / total_size, 2))
 
-            uploaded_size = 0
-            while data := await af.read(chunk_size):
-                uploaded_size += len(data)
-                upload_progress = round((uploaded_size / file_size), 2)
+                            chunk = buffer.pop()
+                            zip_hash.update(chunk)
+                            yield chunk
 
-                try:
-                    await redis_async.client.rpush(
-                        f"{deploy_unique_key}-upload_progress", upload_progress
-                    )
-                except Exception as e:
-                    raise RuntimeError(f"Database error: {e}") from None
+                file_hashes[entry.name] = file_hash.hexdigest()
+
+        if total_size == 0:
+            await progress.publish(1.0)
+
+        chunk = buffer.pop()
+        zip_hash.update(chunk)
+        yield chunk
 
-                yield data
+        file_hashes[f"{deploy_unique_key}.zip"] = zip_hash.hexdigest()
 
     except FileNotFoundError as e:
         raise FileNotFoundError(f"{e}") from None
@@ -331,9 +361,14 @@ async def async_file_generator(
 
 
 async def generate_multi_part(
-    file_path: str, deploy_unique_key: str, model_name: str, boundary: bytes
+    folder_path: str,
+    deploy_unique_key: str,
+    model_name: str,
+    boundary: bytes,
+    progress: ProgressChannel,
 ) -> AsyncGenerator[bytes, None]:
-    file_name = os.path.basename(file_path)
+    file_name = f"{deploy_unique_key}.zip"
+    file_hashes = dict()
 
     try:
         yield b"--" + boundary + b"\r\n"
@@ -345,11 +380,20 @@ async def generate_multi_part(
         yield f'Content-Disposition: form-data; name="model"; filename="{file_name}"\r\n'.encode()
         yield b"Content-Type: application/zip\r\n\r\n"
 
-        async for chunk in async_file_generator(
-            file_path=file_path, deploy_unique_key=deploy_unique_key
+        async for chunk in stream_zip_folder(
+            path=folder_path,
+            deploy_unique_key=deploy_unique_key,
+            file_hashes=file_hashes,
+            progress=progress,
         ):
             yield chunk
 
+        # hashes are only known once the archive is streamed, send them as trailer
+        yield b"\r\n--" + boundary + b"\r\n"
+        yield b'Content-Disposition: form-data; name="manifest"\r\n'
+        yield b"Content-Type: application/json\r\n\r\n"
+        yield orjson.dumps(file_hashes)
+
         yield b"\r\n--" + boundary + b"--\r\n"
 
     except FileNotFoundError as e:
@@ -369,13 +413,60 @@ async def generate_multi_part(
         ) from None
 
 
+async def parse_accelbrain_response(
+    response: httpx.Response,
+) -> AsyncGenerator[bytes, None, None]:
+    if response.status_code == status.HTTP_200_OK:
+        async for chunk in response.aiter_lines():
+            if chunk:
+                receive_content = orjson.loads(chunk.strip())
+
+                if receive_content["status"] != status.HTTP_200_OK:
+                    raise AccelBrainError(
+                        status_code=receive_content["status"],
+                        action=receive_content["message"]["action"],
+                        progress=receive_content["message"]["progress"],
+                        detail=receive_content["message"]["detail"],
+                    )
+
+                accelbrain_info = {"AccelBrain": receive_content}
+                yield orjson.dumps(accelbrain_info)
+    else:
+        error_content = await response.aread()
+        raise AccelBrainError(
+            status_code=response.status_code,
+            action="AccelBrain process",
+            progress=-1,
+            detail={"error": error_content.decode()},
+        )
+
+
+async def throttle_stream(
+    gen: AsyncGenerator[bytes, None], bandwidth_limit: Union[int, None]
+) -> AsyncGenerator[bytes, None]:
+    if not bandwidth_limit:
+        async for chunk in gen:
+            yield chunk
+        return
+
+    loop = asyncio.get_running_loop()
+    throttle_start, throttle_size = loop.time(), 0
+    async for chunk in gen:
+        yield chunk
+        throttle_size += len(chunk)
+        wait_sec = throttle_size / bandwidth_limit - (loop.time() - throttle_start)
+        if wait_sec > 0:
+            await asyncio.sleep(wait_sec)
+
+
 async def call_accelbrain_deploy(
     file_path: str,
     model_name: str,
-    deploy_path: str,
     deploy_unique_key: str,
     accelbrain_url: str,
     boundary: bytes,
+    progress: ProgressChannel,
+    bandwidth_limit: Union[int, None] = None,
 ) -> AsyncGenerator[bytes, None, None]:
     yield (
         orjson.dumps(
@@ -391,101 +482,308 @@ async def call_accelbrain_deploy(
             }
         )
     )
-    os.makedirs(os.path.dirname(deploy_path), exist_ok=True)
-    await asyncio.to_thread(zip_folder_and_get_hash, file_path, deploy_path)
-
-    async with httpx.AsyncClient(timeout=None) as aclient:
+    async with httpx.AsyncClient(transport=TracingTransport(), timeout=None) as aclient:
         async with aclient.stream(
             "POST",
             f"http://{accelbrain_url}/model_handler/deploy/",
             headers={
                 "Content-Type": f"multipart/form-data; boundary={boundary.decode('ascii')}"
             },
-            content=generate_multi_part(
-                file_path=deploy_path,
-                deploy_unique_key=deploy_unique_key,
-                model_name=model_name,
-                boundary=boundary,
+            content=throttle_stream(
+                gen=generate_multi_part(
+                    folder_path=file_path,
+                    deploy_unique_key=deploy_unique_key,
+                    model_name=model_name,
+                    boundary=boundary,
+                    progress=progress,
+                ),
+                bandwidth_limit=bandwidth_limit,
             ),
         ) as response:
-            if response.status_code == status.HTTP_200_OK:
-                async for chunk in response.aiter_lines():
-                    if chunk:
-                        receive_content = orjson.loads(chunk.strip())
-
-                        if receive_content["status"] != status.HTTP_200_OK:
-                            raise AccelBrainError(
-                                status_code=receive_content["status"],
-                                action=receive_content["message"]["action"],
-                                progress=receive_content["message"]["progress"],
-                                detail=receive_content["message"]["detail"],
+            async for item in parse_accelbrain_response(response=response):
+                yield item
+
+
+class UploadOffsetMismatch(Exception):
+    def __init__(self, offset: int) -> None:
+        self.offset = offset
+        super().__init__(f"server expects offset {offset}")
+
+
+def build_upload_manifest(path: str, model_name: str, chunk_size: int) -> dict:
+    # hashes come from the artifact manifest, only changed files are re-read
+    artifact_manifest = refresh_manifest(path=path, chunk_size=chunk_size)
+    files = [
+        {
+            "name": name,
+            "size": file_info["size"],
+            "sha256": file_info["sha256"],
+            "chunks": file_info["chunks"][str(chunk_size)],
+        }
+        for name, file_info in sorted(artifact_manifest["files"].items())
+    ]
+
+    # same content always maps to the same upload session on AccelBrain side
+    content_hash = hashlib.sha256(
+        orjson.dumps([(f["name"], f["sha256"]) for f in files])
+    ).hexdigest()
+
+    return {
+        "model_name": model_name,
+        "chunk_size": chunk_size,
+        "content_sha256": content_hash,
+        "files": files,
+    }
+
+
+async def open_upload_session(
+    aclient: httpx.AsyncClient, accelbrain_url: str, manifest: dict
+) -> dict:
+    response = await aclient.post(
+        f"http://{accelbrain_url}/model_handler/deploy/upload/", json=manifest
+    )
+
+    if response.status_code in {status.HTTP_200_OK, status.HTTP_201_CREATED}:
+        return response.json()
+    elif response.status_code >= status.HTTP_500_INTERNAL_SERVER_ERROR:
+        raise httpx.NetworkError(f"{response.status_code}, {response.text}")
+    else:
+        raise AccelBrainError(
+            status_code=response.status_code,
+            action="Open upload session",
+            progress=-1,
+            detail={"error": response.text},
+        )
+
+
+async def upload_chunk(
+    aclient: httpx.AsyncClient,
+    accelbrain_url: str,
+    upload_id: str,
+    file_name: str,
+    offset: int,
+    data: bytes,
+) -> int:
+    response = await aclient.put(
+        f"http://{accelbrain_url}/model_handler/deploy/upload/{upload_id}/{file_name}",
+        content=data,
+        headers={
+            "Content-Type": "application/octet-stream",
+            "Upload-Offset": str(offset),
+            "X-Chunk-Sha256": hashlib.sha256(data).hexdigest(),
+        },
+    )
+
+    if response.status_code == status.HTTP_200_OK:
+        return response.json()["offset"]
+    elif response.status_code == status.HTTP_409_CONFLICT:
+        raise UploadOffsetMismatch(offset=response.json()["offset"])
+    elif response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY:
+        # checksum mismatch, the chunk got corrupted on the way, send it again
+        raise httpx.NetworkError(f"chunk checksum mismatch: {response.text}")
+    elif response.status_code >= status.HTTP_500_INTERNAL_SERVER_ERROR:
+        raise httpx.NetworkError(f"{response.status_code}, {response.text}")
+    else:
+        raise AccelBrainError(
+            status_code=response.status_code,
+            action="Upload chunk",
+            progress=-1,
+            detail={"error": response.text},
+        )
+
+
+async def resumable_upload(
+    aclient: httpx.AsyncClient,
+    accelbrain_url: str,
+    folder_path: str,
+    manifest: dict,
+    progress: ProgressChannel,
+    bandwidth_limit: Union[int, None] = None,
+    max_retries: int = 5,
+    retry_interval: float = 2.0,
+) -> str:
+    chunk_size = manifest["chunk_size"]
+    total_size = sum(file_info["size"] for file_info in manifest["files"])
+    retries = 0
+    loop = asyncio.get_running_loop()
+    throttle_start, throttle_size = loop.time(), 0
+
+    while True:
+        try:
+            session = await open_upload_session(
+                aclient=aclient, accelbrain_url=accelbrain_url, manifest=manifest
+            )
+            upload_id = session["upload_id"]
+            received: dict = session.get("received", dict())
+            uploaded_size = sum(received.values())
+
+            for file_info in manifest["files"]:
+                offset = received.get(file_info["name"], 0)
+                if offset >= file_info["size"]:
+                    continue
+
+                async with aiofiles.open(
+                    os.path.join(folder_path, file_info["name"]), "rb"
+                ) as af:
+                    await af.seek(offset)
+                    while data := await af.read(chunk_size):
+                        try:
+                            new_offset = await upload_chunk(
+                                aclient=aclient,
+                                accelbrain_url=accelbrain_url,
+                                upload_id=upload_id,
+                                file_name=file_info["name"],
+                                offset=offset,
+                                data=data,
                             )
+                        except UploadOffsetMismatch as e:
+                            uploaded_size += e.offset - offset
+                            offset = e.offset
+                            await af.seek(offset)
+                            continue
+
+                        uploaded_size += new_offset - offset
+                        throttle_size += new_offset - offset
+                        offset = new_offset
+                        retries = 0
+
+                        if bandwidth_limit:
+                            wait_sec = throttle_size / bandwidth_limit - (
+                                loop.time() - throttle_start
+                            )
+                            if wait_sec > 0:
+                                await asyncio.sleep(wait_sec)
 
-                        accelbrain_info = {"AccelBrain": receive_content}
-                        yield orjson.dumps(accelbrain_info)
-            else:
-                error_content = await response.aread()
-                raise AccelBrainError(
-                    status_code=response.status_code,
-                    action="AccelBrain process",
-                    progress=-1,
-                    detail={"error": error_content.decode()},
-                )
+                        await progress.publish(round(uploaded_size / total_size, 2))
 
+            # nothing left to send after a resume, still report completion
+            await progress.publish(1.0)
 
-async def monitor_progress(
-    deploy_unique_key: str, model_name: str
+            return upload_id
+
+        except (httpx.TransportError, httpx.TimeoutException):
+            retries += 1
+            if retries > max_retries:
+                raise
+            await asyncio.sleep(retry_interval * retries)
+
+
+async def call_accelbrain_resumable_deploy(
+    file_path: str,
+    model_name: str,
+    accelbrain_url: str,
+    progress: ProgressChannel,
+    manifest: Union[dict, None] = None,
+    bandwidth_limit: Union[int, None] = None,
+    chunk_size: int = 8 * 1024 * 1024,
 ) -> AsyncGenerator[bytes, None, None]:
+    yield (
+        orjson.dumps(
+            {
+                "AccelTune": {
+                    "status": status.HTTP_200_OK,
+                    "message": {
+                        "action": "Build upload manifest",
+                        "progress": 0.0,
+                        "detail": {"model_name": model_name},
+                    },
+                }
+            }
+        )
+    )
     try:
-        while True:
-            (
-                _,
-                upload_progress,
-            ) = await redis_async.client.blpop(f"{deploy_unique_key}-upload_progress")
-            yield (
-                orjson.dumps(
-                    {
-                        "AccelTune": {
-                            "status": status.HTTP_200_OK,
-                            "message": {
-                                "action": "Upload file",
-                                "progress": float(upload_progress),
-                                "detail": {"model_name": model_name},
-                            },
-                        }
-                    }
-                )
+        if manifest is None:
+            manifest = await asyncio.to_thread(
+                build_upload_manifest, file_path, model_name, chunk_size
             )
-
-            if upload_progress == "1.0":
-                break
-
-    except asyncio.CancelledError as e:
+    except FileNotFoundError as e:
         raise AccelTuneError(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            message="Async task cancelled",
-            action="Monitor progress",
+            status_code=status.HTTP_404_NOT_FOUND,
+            action="Build upload manifest",
             progress=-1,
             detail={"error": f"{e}"},
         ) from None
 
+    timeout = httpx.Timeout(60.0, connect=10.0)
+    async with httpx.AsyncClient(
+        transport=TracingTransport(), timeout=timeout
+    ) as aclient:
+        upload_id = await resumable_upload(
+            aclient=aclient,
+            accelbrain_url=accelbrain_url,
+            folder_path=file_path,
+            manifest=manifest,
+            progress=progress,
+            bandwidth_limit=bandwidth_limit,
+        )
+
+        # AccelBrain verifies and loads the model after commit, can take a while
+        async with aclient.stream(
+            "POST",
+            f"http://{accelbrain_url}/model_handler/deploy/upload/{upload_id}/commit/",
+            json={"model_name_on_ollama": model_name},
+            timeout=None,
+        ) as response:
+            async for item in parse_accelbrain_response(response=response):
+                yield item
+
+
+async def monitor_progress(
+    progress: ProgressChannel, model_name: str
+) -> AsyncGenerator[bytes, None, None]:
+    async for upload_progress in progress:
+        yield (
+            orjson.dumps(
+                {
+                    "AccelTune": {
+                        "status": status.HTTP_200_OK,
+                        "message": {
+                            "action": "Upload file",
+                            "progress": upload_progress,
+                            "detail": {"model_name": model_name},
+                        },
+                    }
+                }
+            )
+        )
+
+
+async def close_progress_on_exit(
+    gen: AsyncGenerator[Any, None], progress: ProgressChannel
+) -> AsyncGenerator[Any, None, None]:
+    try:
+        async for item in gen:
+            yield item
+    except BaseException as e:
+        await progress.close(error=e)
+        raise
+    finally:
+        await progress.close()
+
 
 async def merge_async_generators(
     *gens: AsyncGenerator[Any, None],
 ) -> AsyncGenerator[Any, None, None]:
     tasks = {asyncio.create_task(gen.__anext__()): gen for gen in gens}
 
-    while tasks:
-        done, _ = await asyncio.wait(tasks.keys(), return_when=asyncio.FIRST_COMPLETED)
-        for task in done:
-            gen = tasks.pop(task)
-            try:
-                item = task.result()
-            except StopAsyncIteration:
-                continue
-            else:
-                yield item
-                tasks[asyncio.create_task(gen.__anext__())] = gen
+    try:
+        while tasks:
+            done, _ = await asyncio.wait(
+                tasks.keys(), return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                gen = tasks.pop(task)
+                try:
+                    item = task.result()
+                except StopAsyncIteration:
+                    continue
+                else:
+                    yield item
+                    tasks[asyncio.create_task(gen.__anext__())] = gen
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
 
 
 async def update_deploy_status(key: str, new_status: str) -> Union[bytes, None]:
@@ -505,10 +803,75 @@ async def update_deploy_status(key: str, new_status: str) -> Union[bytes, None]:
         return orjson.dumps(acceltune_error.error_data)
 
 
-async def remove_zip_file(file_path: str) -> None:
-    is_exists = await aiofiles.os.path.exists(file_path)
-    if is_exists:
-        await aiofiles.os.remove(file_path)
+def to_deploy_error(e: BaseException) -> Union[AccelTuneError, AccelBrainError]:
+    if isinstance(e, (AccelTuneError, AccelBrainError)):
+        return e
+    elif isinstance(e, httpx.ConnectError):
+        return AccelTuneError(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            action="Connected to AccelBrain error",
+            progress=-1,
+            detail={"error": f"{e}"},
+        )
+    elif isinstance(e, httpx.TimeoutException):
+        return AccelTuneError(
+            status_code=status.HTTP_408_REQUEST_TIMEOUT,
+            action="Request timeout",
+            progress=-1,
+            detail={"error": f"{e}"},
+        )
+    elif isinstance(e, (KeyboardInterrupt, SystemExit)):
+        return AccelTuneError(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            action="KeyboardInterrupt or SystemExit",
+            progress=-1,
+            detail={"error": f"{e}"},
+        )
+    else:
+        return AccelTuneError(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            action="Unexpected error",
+            progress=-1,
+            detail={"error": f"{e}"},
+        )
+
+
+async def prepare_deploy_model(
+    model_name: str, train_args: dict, last_model_path: str
+) -> AsyncGenerator[bytes, None, None]:
+    yield (
+        orjson.dumps(
+            {
+                "AccelTune": {
+                    "status": status.HTTP_200_OK,
+                    "message": {
+                        "action": "Check file",
+                        "progress": 0.0,
+                        "detail": {"model_name": model_name},
+                    },
+                }
+            }
+        )
+    ) + b"\n"
+    await check_merge_status(
+        name=model_name, train_args=train_args, last_model_path=last_model_path
+    )
+
+    yield (
+        orjson.dumps(
+            {
+                "AccelTune": {
+                    "status": status.HTTP_200_OK,
+                    "message": {
+                        "action": "Start quantize",
+                        "progress": 0.0,
+                        "detail": {"model_name": model_name},
+                    },
+                }
+            }
+        )
+    ) + b"\n"
+    await check_quantize_status(quantize_name=model_name)
 
 
 async def deploy_to_accelbrain_service(
@@ -516,120 +879,207 @@ async def deploy_to_accelbrain_service(
     model_name: str,
     train_args: dict,
     last_model_path: str,
-    deploy_path: str,
     deploy_unique_key: str,
     accelbrain_url: str,
+    resumable: bool = False,
+    mirror_progress: bool = False,
 ) -> AsyncGenerator[str, None, None]:
-    try:
-        yield (
-            orjson.dumps(
-                {
-                    "AccelTune": {
-                        "status": status.HTTP_200_OK,
-                        "message": {
-                            "action": "Check file",
-                            "progress": 0.0,
-                            "detail": {"model_name": model_name},
-                        },
-                    }
-                }
-            )
-        ) + b"\n"
-        await check_merge_status(
-            name=model_name, train_args=train_args, last_model_path=last_model_path
-        )
+    progress = ProgressChannel(
+        mirror_key=f"{deploy_unique_key}-upload_progress_stream"
+        if mirror_progress
+        else None
+    )
 
-        yield (
-            orjson.dumps(
-                {
-                    "AccelTune": {
-                        "status": status.HTTP_200_OK,
-                        "message": {
-                            "action": "Start quantize",
-                            "progress": 0.0,
-                            "detail": {"model_name": model_name},
-                        },
-                    }
-                }
-            )
-        ) + b"\n"
-        await check_quantize_status(quantize_name=model_name)
+    try:
+        with detached_span(
+            name="deploy prepare", attributes={"model_name": model_name}
+        ):
+            async for item in prepare_deploy_model(
+                model_name=model_name,
+                train_args=train_args,
+                last_model_path=last_model_path,
+            ):
+                yield item
 
         monitor_progress_generator = monitor_progress(
-            deploy_unique_key=deploy_unique_key, model_name=model_name
-        )
-        accelbrain_deploy_generator = call_accelbrain_deploy(
-            file_path=file_path,
-            model_name=model_name,
-            deploy_path=deploy_path,
-            deploy_unique_key=deploy_unique_key,
-            accelbrain_url=accelbrain_url,
-            boundary=os.urandom(16).hex().encode("ascii"),
+            progress=progress, model_name=model_name
         )
+        if resumable:
+            accelbrain_deploy_generator = call_accelbrain_resumable_deploy(
+                file_path=file_path,
+                model_name=model_name,
+                accelbrain_url=accelbrain_url,
+                progress=progress,
+            )
+        else:
+            accelbrain_deploy_generator = call_accelbrain_deploy(
+                file_path=file_path,
+                model_name=model_name,
+                deploy_unique_key=deploy_unique_key,
+                accelbrain_url=accelbrain_url,
+                boundary=os.urandom(16).hex().encode("ascii"),
+                progress=progress,
+            )
 
-        async for item in merge_async_generators(
-            monitor_progress_generator, accelbrain_deploy_generator
+        upload_started = time.monotonic()
+        with detached_span(
+            name="deploy upload",
+            attributes={"model_name": model_name, "resumable": resumable},
         ):
-            if isinstance(item, bytes):
-                yield item + b"\n"
-            elif isinstance(item, str):
-                yield item + "\n"
+            async for item in merge_async_generators(
+                monitor_progress_generator,
+                close_progress_on_exit(
+                    gen=accelbrain_deploy_generator, progress=progress
+                ),
+            ):
+                if isinstance(item, bytes):
+                    yield item + b"\n"
+                elif isinstance(item, str):
+                    yield item + "\n"
 
+        STAGE_DURATION.observe(time.monotonic() - upload_started, stage="upload")
         target_model_status = STATUS_CONFIG.finish
 
-    except AccelTuneError as e:
+    except (Exception, KeyboardInterrupt, SystemExit) as e:
         target_model_status = STATUS_CONFIG.failed
-        yield str(e) + "\n"
+        yield str(to_deploy_error(e)) + "\n"
 
-    except AccelBrainError as e:
-        target_model_status = STATUS_CONFIG.failed
-        yield str(e) + "\n"
-
-    except httpx.ConnectError as e:
-        target_model_status = STATUS_CONFIG.failed
-        acceltune_error = AccelTuneError(
-            status_code=status.HTTP_502_BAD_GATEWAY,
-            action="Connected to AccelBrain error",
-            progress=-1,
-            detail={"error": f"{e}"},
+    finally:
+        await progress.close()
+        result = await update_deploy_status(
+            key=deploy_unique_key,
+            new_status=target_model_status,
         )
-        yield orjson.dumps(acceltune_error.error_data) + b"\n"
+        if result and isinstance(result, bytes):
+            yield result + b"\n"
 
-    except httpx.TimeoutException as e:
-        target_model_status = STATUS_CONFIG.failed
-        acceltune_error = AccelTuneError(
-            status_code=status.HTTP_408_REQUEST_TIMEOUT,
-            action="Request timeout",
-            progress=-1,
-            detail={"error": f"{e}"},
-        )
-        yield orjson.dumps(acceltune_error.error_data) + b"\n"
 
-    except (KeyboardInterrupt, SystemExit) as e:
-        target_model_status = STATUS_CONFIG.failed
-        acceltune_error = AccelTuneError(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            action="KeyboardInterrupt or SystemExit",
-            progress=-1,
-            detail={"error": f"{e}"},
-        )
-        yield orjson.dumps(acceltune_error.error_data) + b"\n"
+def tag_device_event(item: Union[bytes, str], device_info: dict) -> bytes:
+    event = orjson.loads(item)
+    event["device"] = {"uuid": device_info["uuid"], "name": device_info["name"]}
+    return orjson.dumps(event) + b"\n"
 
-    except Exception as e:
+
+async def deploy_to_accelbrain_device(
+    semaphore: asyncio.Semaphore,
+    file_path: str,
+    model_name: str,
+    manifest: Union[dict, None],
+    device_info: dict,
+    max_upload_mbps: Union[float, None],
+    resumable: bool = False,
+    mirror_progress: bool = False,
+) -> AsyncGenerator[bytes, None, None]:
+    deploy_unique_key = f"{model_name}-{device_info['uuid']}"
+    progress = ProgressChannel(
+        mirror_key=f"{deploy_unique_key}-upload_progress_stream"
+        if mirror_progress
+        else None
+    )
+    bandwidth_limit = (
+        int(max_upload_mbps * 1000 * 1000 / 8) if max_upload_mbps else None
+    )
+
+    try:
+        async with semaphore:
+            if resumable:
+                accelbrain_deploy_generator = call_accelbrain_resumable_deploy(
+                    file_path=file_path,
+                    model_name=model_name,
+                    accelbrain_url=device_info["url"],
+                    progress=progress,
+                    manifest=manifest,
+                    bandwidth_limit=bandwidth_limit,
+                )
+            else:
+                accelbrain_deploy_generator = call_accelbrain_deploy(
+                    file_path=file_path,
+                    model_name=model_name,
+                    deploy_unique_key=deploy_unique_key,
+                    accelbrain_url=device_info["url"],
+                    boundary=os.urandom(16).hex().encode("ascii"),
+                    progress=progress,
+                    bandwidth_limit=bandwidth_limit,
+                )
+
+            async for item in merge_async_generators(
+                monitor_progress(progress=progress, model_name=model_name),
+                close_progress_on_exit(
+                    gen=accelbrain_deploy_generator, progress=progress
+                ),
+            ):
+                yield tag_device_event(item=item, device_info=device_info)
+
+        target_model_status = STATUS_CONFIG.finish
+
+    except (Exception, KeyboardInterrupt, SystemExit) as e:
         target_model_status = STATUS_CONFIG.failed
-        acceltune_error = AccelTuneError(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            action="Unexpected error",
-            progress=-1,
-            detail={"error": f"{e}"},
-        )
-        yield orjson.dumps(acceltune_error.error_data) + b"\n"
+        yield tag_device_event(item=str(to_deploy_error(e)), device_info=device_info)
 
     finally:
-        await remove_zip_file(file_path=deploy_path)
+        await progress.close()
         result = await update_deploy_status(
             key=deploy_unique_key,
             new_status=target_model_status,
         )
         if result and isinstance(result, bytes):
-            yield result + b"\n"
+            yield tag_device_event(item=result, device_info=device_info)
+
+
+async def fleet_deploy_to_accelbrain_service(
+    file_path: str,
+    model_name: str,
+    train_args: dict,
+    last_model_path: str,
+    devices_info: List[dict],
+    max_concurrency: int,
+    max_upload_mbps: Union[float, None],
+    resumable: bool = False,
+    mirror_progress: bool = False,
+    chunk_size: int = 8 * 1024 * 1024,
+) -> AsyncGenerator[bytes, None, None]:
+    try:
+        async for item in prepare_deploy_model(
+            model_name=model_name,
+            train_args=train_args,
+            last_model_path=last_model_path,
+        ):
+            yield item
+
+        # merge, quantize and hashing happen once, every device reuses the manifest
+        manifest = (
+            await asyncio.to_thread(
+                build_upload_manifest, file_path, model_name, chunk_size
+            )
+            if resumable
+            else None
+        )
+
+    except (Exception, KeyboardInterrupt, SystemExit) as e:
+        yield str(to_deploy_error(e)) + "\n"
+        for device_info in devices_info:
+            result = await update_deploy_status(
+                key=f"{model_name}-{device_info['uuid']}",
+                new_status=STATUS_CONFIG.failed,
+            )
+            if result and isinstance(result, bytes):
+                yield result + b"\n"
+        return
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+    async for item in merge_async_generators(
+        *(
+            deploy_to_accelbrain_device(
+                semaphore=semaphore,
+                file_path=file_path,
+                model_name=model_name,
+                manifest=manifest,
+                device_info=device_info,
+                max_upload_mbps=max_upload_mbps,
+                resumable=resumable,
+                mirror_progress=mirror_progress,
+            )
+            for device_info in devices_info
+        )
+    ):
+        yield item
@@ -1,4 +1,4 @@
-from typing import Annotated, Dict, Union
+from typing import Annotated, Dict, List, Union
 from uuid import UUID
 
 import orjson
@@ -84,6 +84,80 @@ class PostDeploy(BaseModel):
         return self
 
 
+class PostFleetDeploy(BaseModel):
+    deploy_name: str
+    device_uuids: List[UUID]
+
+    @model_validator(mode="after")
+    def check(self: "PostFleetDeploy") -> "PostFleetDeploy":
+        error_handler = ResponseErrorHandler()
+
+        try:
+            if not redis_sync.client.hexists(TASK_CONFIG.train, self.deploy_name):
+                raise KeyError("deploy_name does not exists")
+
+            for device_uuid in self.device_uuids:
+                if not redis_sync.client.hexists(
+                    TASK_CONFIG.accelbrain_device, str(device_uuid)
+                ):
+                    raise KeyError(f"device_uuid {device_uuid} does not exists")
+
+                deploy_status = redis_sync.client.hget(
+                    TASK_CONFIG.deploy, f"{self.deploy_name}-{device_uuid}"
+                )
+                if deploy_status:
+                    if orjson.loads(deploy_status)["status"] == STATUS_CONFIG.active:
+                        raise ValueError(
+                            f"deploy_name is deploying to accelbrain_device {device_uuid}"
+                        )
+
+        except KeyError as e:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg=f"{e}",
+                input={
+                    "deploy_name": self.deploy_name,
+                    "device_uuids": [str(uuid) for uuid in self.device_uuids],
+                },
+            )
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=error_handler.errors,
+            ) from None
+
+        except ValueError as e:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg=f"{e}",
+                input={
+                    "deploy_name": self.deploy_name,
+                    "device_uuids": [str(uuid) for uuid in self.device_uuids],
+                },
+            )
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT, detail=error_handler.errors
+            ) from None
+
+        except Exception as e:
+            error_handler.add(
+                type=error_handler.ERR_REDIS,
+                loc=[error_handler.LOC_DATABASE],
+                msg=f"Unexpected error: {e}",
+                input={
+                    "deploy_name": self.deploy_name,
+                    "device_uuids": [str(uuid) for uuid in self.device_uuids],
+                },
+            )
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=error_handler.errors,
+            ) from None
+
+        return self
+
+
 class GetDeploy(BaseModel):
     deploy_name: Union[str, None]
     device_uuid: Union[UUID, None]
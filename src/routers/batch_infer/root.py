@@ -0,0 +1,258 @@
+import asyncio
+import json
+import os
+from typing import Annotated, Union
+
+import orjson
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    File,
+    Form,
+    HTTPException,
+    Query,
+    Response,
+    UploadFile,
+    status,
+)
+
+from src.config.params import STATUS_CONFIG, TASK_CONFIG
+from src.routers.batch_infer import schema, utils, validator
+from src.thirdparty.redis.handler import redis_async
+from src.utils.error import ResponseErrorHandler
+from src.utils.logger import accel_logger
+from src.utils.metrics import track_background_task
+from src.utils.utils import generate_uuid, get_current_time
+
+router = APIRouter(prefix="/batch-infer", tags=["Batch-Infer"])
+
+
+@router.post("/start/")
+async def start_batch_infer(
+    background_tasks: BackgroundTasks,
+    model_name: str = Form(...),
+    dataset_name: str = Form(None),
+    concurrency: int = Form(16),
+    max_tokens: int = Form(512),
+    temperature: float = Form(0.0),
+    max_retries: int = Form(2),
+    prompt_file: Union[UploadFile, None] = File(None),
+):
+    request_data = schema.PostStartBatchInfer(
+        model_name=model_name,
+        dataset_name=dataset_name,
+        prompt_file=prompt_file,
+        concurrency=concurrency,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        max_retries=max_retries,
+    )
+    validator.PostStartBatchInfer(
+        model_name=request_data.model_name, dataset_name=request_data.dataset_name
+    )
+    error_handler = ResponseErrorHandler()
+    request_input = request_data.model_dump(exclude={"prompt_file"})
+
+    try:
+        info = orjson.loads(
+            await redis_async.client.hget(TASK_CONFIG.train, request_data.model_name)
+        )
+        if request_data.dataset_name is not None:
+            dataset_info = orjson.loads(
+                await redis_async.client.hget(
+                    TASK_CONFIG.data, request_data.dataset_name
+                )
+            )
+
+    except Exception as e:
+        accel_logger.error(f"Database error: {e}")
+        error_handler.add(
+            type=error_handler.ERR_REDIS,
+            loc=[error_handler.LOC_DATABASE],
+            msg="Database error",
+            input=request_input,
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=error_handler.errors,
+        ) from None
+
+    try:
+        if request_data.dataset_name is not None:
+            prompts = await asyncio.to_thread(
+                utils.load_dataset_prompts, dataset_info["data_args"]
+            )
+        else:
+            prompts = utils.load_jsonl_prompts(
+                content=await request_data.prompt_file.read()
+            )
+
+        if not prompts:
+            raise ValueError("no prompt found")
+
+    except (TypeError, KeyError, ValueError) as e:
+        accel_logger.error(f"{e}")
+        error_handler.add(
+            type=error_handler.ERR_VALIDATE,
+            loc=[error_handler.LOC_FORM],
+            msg=f"{e}",
+            input=request_input,
+        )
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=error_handler.errors
+        ) from None
+
+    except Exception as e:
+        accel_logger.error(f"Unexpected error: {e}")
+        error_handler.add(
+            type=error_handler.ERR_INTERNAL,
+            loc=[error_handler.LOC_PROCESS],
+            msg=f"Unexpected error: {e}",
+            input=request_input,
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=error_handler.errors,
+        ) from None
+
+    job_id = generate_uuid()
+    output_dir = os.path.join(
+        os.path.dirname(info["train_args"]["output_dir"]), "batch_infer"
+    )
+    os.makedirs(output_dir, exist_ok=True)
+
+    try:
+        unix_time, _ = get_current_time()
+        job_info = {
+            "job_id": job_id,
+            "model_name": request_data.model_name,
+            "dataset_name": request_data.dataset_name,
+            "prompt_file": (
+                request_data.prompt_file.filename if request_data.prompt_file else None
+            ),
+            "status": STATUS_CONFIG.active,
+            "config": {
+                "concurrency": request_data.concurrency,
+                "max_tokens": request_data.max_tokens,
+                "temperature": request_data.temperature,
+                "max_retries": request_data.max_retries,
+            },
+            "output_path": os.path.join(output_dir, f"{job_id}.jsonl"),
+            "progress": {
+                "total": len(prompts),
+                "done": 0,
+                "failed": 0,
+                "percent": 0.0,
+            },
+            "metrics": None,
+            "error": None,
+            "created_time": unix_time,
+            "modified_time": None,
+        }
+        await redis_async.client.hset(
+            TASK_CONFIG.batch_infer, job_id, orjson.dumps(job_info)
+        )
+
+    except Exception as e:
+        accel_logger.error(f"Database error: {e}")
+        error_handler.add(
+            type=error_handler.ERR_REDIS,
+            loc=[error_handler.LOC_DATABASE],
+            msg="Database error",
+            input=request_input,
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=error_handler.errors,
+        ) from None
+
+    background_tasks.add_task(
+        track_background_task(utils.start_batch_infer_background_task),
+        job_id,
+        info["container"]["infer_backend"]["url"],
+        request_data.model_name,
+        prompts,
+        job_info["output_path"],
+        request_data.concurrency,
+        request_data.max_tokens,
+        request_data.temperature,
+        request_data.max_retries,
+    )
+
+    return Response(
+        content=json.dumps(job_info),
+        status_code=status.HTTP_200_OK,
+        media_type="application/json",
+    )
+
+
+@router.post("/stop/")
+async def stop_batch_infer(request_data: schema.PostStopBatchInfer):
+    validator.PostStopBatchInfer(job_id=request_data.job_id)
+    error_handler = ResponseErrorHandler()
+
+    try:
+        job_info = orjson.loads(
+            await redis_async.client.hget(TASK_CONFIG.batch_infer, request_data.job_id)
+        )
+        job_info["status"] = STATUS_CONFIG.stopped
+        job_info["modified_time"], _ = get_current_time()
+        await redis_async.client.hset(
+            TASK_CONFIG.batch_infer, request_data.job_id, orjson.dumps(job_info)
+        )
+
+    except Exception as e:
+        accel_logger.error(f"Database error: {e}")
+        error_handler.add(
+            type=error_handler.ERR_REDIS,
+            loc=[error_handler.LOC_DATABASE],
+            msg="Database error",
+            input=request_data.model_dump(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=error_handler.errors,
+        ) from None
+
+    return Response(
+        content=json.dumps(job_info),
+        status_code=status.HTTP_200_OK,
+        media_type="application/json",
+    )
+
+
+@router.get("/")
+async def get_batch_infer(job_id: Annotated[Union[str, None], Query()] = None):
+    query_data = schema.GetBatchInfer(job_id=job_id)
+    validator.GetBatchInfer(job_id=query_data.job_id)
+    error_handler = ResponseErrorHandler()
+
+    try:
+        if query_data.job_id is None:
+            jobs = await redis_async.client.hgetall(TASK_CONFIG.batch_infer)
+            job_info = [orjson.loads(job) for job in jobs.values()]
+        else:
+            job_info = orjson.loads(
+                await redis_async.client.hget(
+                    TASK_CONFIG.batch_infer, query_data.job_id
+                )
+            )
+
+    except Exception as e:
+        accel_logger.error(f"Database error: {e}")
+        error_handler.add(
+            type=error_handler.ERR_REDIS,
+            loc=[error_handler.LOC_DATABASE],
+            msg="Database error",
+            input=query_data.model_dump(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=error_handler.errors,
+        ) from None
+
+    return Response(
+        content=json.dumps(job_info),
+        status_code=status.HTTP_200_OK,
+        media_type="application/json",
+    )
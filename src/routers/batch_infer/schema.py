@@ -0,0 +1,138 @@
+import re
+from typing import Union
+
+from fastapi import HTTPException, UploadFile, status
+from pydantic import BaseModel, ConfigDict, model_validator
+
+from src.utils.error import ResponseErrorHandler
+
+
+class PostStartBatchInfer(BaseModel):
+    model_config = ConfigDict(
+        protected_namespaces=(), arbitrary_types_allowed=True
+    )  # solve can not start with "model_"
+    model_name: str
+    dataset_name: Union[str, None] = None
+    prompt_file: Union[UploadFile, None] = None
+    concurrency: int = 16
+    max_tokens: int = 512
+    temperature: float = 0.0
+    max_retries: int = 2
+
+    @model_validator(mode="after")
+    def check(self: "PostStartBatchInfer") -> "PostStartBatchInfer":
+        error_handler = ResponseErrorHandler()
+
+        if not re.fullmatch(r"[a-zA-Z0-9][a-zA-Z0-9_.-]+", self.model_name):
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_FORM],
+                msg="'model_name' contain invalid characters",
+                input={"model_name": self.model_name},
+            )
+
+        if (self.dataset_name is None) == (self.prompt_file is None):
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_FORM],
+                msg="exactly one of 'dataset_name' or 'prompt_file' must be given",
+                input={"dataset_name": self.dataset_name},
+            )
+
+        if self.prompt_file is not None and not self.prompt_file.filename.endswith(
+            ".jsonl"
+        ):
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_FORM],
+                msg="'prompt_file' must be a .jsonl file",
+                input={"prompt_file": self.prompt_file.filename},
+            )
+
+        if not 1 <= self.concurrency <= 256:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_FORM],
+                msg="'concurrency' must be between 1 and 256",
+                input={"concurrency": self.concurrency},
+            )
+
+        if self.max_tokens < 1:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_FORM],
+                msg="'max_tokens' must be greater than 0",
+                input={"max_tokens": self.max_tokens},
+            )
+
+        if not 0.0 <= self.temperature <= 2.0:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_FORM],
+                msg="'temperature' must be between 0 and 2",
+                input={"temperature": self.temperature},
+            )
+
+        if not 0 <= self.max_retries <= 10:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_FORM],
+                msg="'max_retries' must be between 0 and 10",
+                input={"max_retries": self.max_retries},
+            )
+
+        if error_handler.errors != []:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=error_handler.errors,
+            ) from None
+
+        return self
+
+
+class PostStopBatchInfer(BaseModel):
+    job_id: str
+
+    @model_validator(mode="after")
+    def check(self: "PostStopBatchInfer") -> "PostStopBatchInfer":
+        error_handler = ResponseErrorHandler()
+
+        if not re.fullmatch(r"[a-zA-Z0-9-]+", self.job_id):
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'job_id' contain invalid characters",
+                input={"job_id": self.job_id},
+            )
+
+        if error_handler.errors != []:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=error_handler.errors,
+            ) from None
+
+        return self
+
+
+class GetBatchInfer(BaseModel):
+    job_id: Union[str, None] = None
+
+    @model_validator(mode="after")
+    def check(self: "GetBatchInfer") -> "GetBatchInfer":
+        error_handler = ResponseErrorHandler()
+
+        if self.job_id is not None and not re.fullmatch(r"[a-zA-Z0-9-]+", self.job_id):
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_QUERY],
+                msg="'job_id' contain invalid characters",
+                input={"job_id": self.job_id},
+            )
+
+        if error_handler.errors != []:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=error_handler.errors,
+            ) from None
+
+        return self
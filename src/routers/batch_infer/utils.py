@@ -0,0 +1,382 @@
+import asyncio
+import time
+from typing import List, Tuple, Union
+
+import aiofiles
+import httpx
+import orjson
+from fastapi import status
+
+from src.config.params import STATUS_CONFIG, TASK_CONFIG
+from src.routers.infer_backend.pool import infer_backend_pool
+from src.thirdparty.redis.handler import redis_async
+from src.utils.logger import accel_logger
+from src.utils.utils import get_current_time
+
+REPORT_INTERVAL = 1.0
+RETRY_BACKOFF = 0.5
+RETRY_STATUS = {
+    status.HTTP_429_TOO_MANY_REQUESTS,
+    status.HTTP_502_BAD_GATEWAY,
+    status.HTTP_503_SERVICE_UNAVAILABLE,
+    status.HTTP_504_GATEWAY_TIMEOUT,
+}
+
+
+def alpaca_to_messages(row: dict, columns: dict) -> List[dict]:
+    messages = list()
+    if columns.get("system") and row.get(columns["system"]):
+        messages.append({"role": "system", "content": row[columns["system"]]})
+
+    if columns.get("history"):
+        for query, response in row.get(columns["history"]) or []:
+            messages.append({"role": "user", "content": query})
+            messages.append({"role": "assistant", "content": response})
+
+    content = row[columns.get("prompt", "instruction")]
+    if columns.get("query") and row.get(columns["query"]):
+        content = f"{content}\n{row[columns['query']]}"
+    messages.append({"role": "user", "content": content})
+
+    return messages
+
+
+def sharegpt_to_messages(row: dict, columns: dict, tags: dict) -> List[dict]:
+    role_map = {
+        tags.get("user_tag", "human"): "user",
+        tags.get("assistant_tag", "gpt"): "assistant",
+        tags.get("system_tag", "system"): "system",
+        tags.get("observation_tag", "observation"): "user",
+        tags.get("function_tag", "function_call"): "assistant",
+    }
+    role_tag = tags.get("role_tag", "from")
+    content_tag = tags.get("content_tag", "value")
+
+    messages = list()
+    if columns.get("system") and row.get(columns["system"]):
+        messages.append({"role": "system", "content": row[columns["system"]]})
+
+    for message in row[columns.get("messages", "conversations")]:
+        messages.append(
+            {"role": role_map[message[role_tag]], "content": message[content_tag]}
+        )
+
+    # prompt ends at the last user turn, the turns after it are the reference
+    while messages and messages[-1]["role"] == "assistant":
+        messages.pop()
+
+    return messages
+
+
+def sharegpt_reference(row: dict, columns: dict, tags: dict) -> Union[str, None]:
+    conversation = row[columns.get("messages", "conversations")]
+    assistant_tag = tags.get("assistant_tag", "gpt")
+    if conversation and conversation[-1][tags.get("role_tag", "from")] == assistant_tag:
+        return conversation[-1][tags.get("content_tag", "value")]
+    return None
+
+
+def load_dataset_prompts(data_args: dict) -> List[dict]:
+    with open(data_args["file_name"], "rb") as f:
+        rows = orjson.loads(f.read())
+
+    if data_args.get("num_samples"):
+        rows = rows[: data_args["num_samples"]]
+
+    columns = data_args.get("columns", dict())
+    tags = data_args.get("tags", dict())
+    prompts = list()
+    for index, row in enumerate(rows):
+        if data_args["formatting"] == "sharegpt":
+            messages = sharegpt_to_messages(row=row, columns=columns, tags=tags)
+            reference = sharegpt_reference(row=row, columns=columns, tags=tags)
+        else:
+            messages = alpaca_to_messages(row=row, columns=columns)
+            reference = row.get(columns.get("response", "output"))
+
+        if not messages:
+            raise ValueError(f"row {index} has no user message")
+        prompts.append({"index": index, "messages": messages, "reference": reference})
+
+    return prompts
+
+
+def load_jsonl_prompts(content: bytes) -> List[dict]:
+    prompts = list()
+    for line_no, line in enumerate(content.splitlines(), start=1):
+        if not line.strip():
+            continue
+
+        try:
+            row = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            raise ValueError(f"line {line_no} is not valid json") from None
+
+        if isinstance(row.get("messages"), list) and row["messages"]:
+            messages = row["messages"]
+        elif isinstance(row.get("prompt"), str):
+            messages = [{"role": "user", "content": row["prompt"]}]
+        else:
+            raise ValueError(f"line {line_no} must contain 'messages' or 'prompt'")
+
+        prompt = {"index": len(prompts), "messages": messages}
+        if "id" in row:
+            prompt["id"] = row["id"]
+        prompts.append(prompt)
+
+    return prompts
+
+
+def calc_percentile(sorted_values: List[float], percent: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(percent * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class BatchInferStats:
+    def __init__(self, total: int) -> None:
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.completion_tokens = 0
+        self.latencies: List[float] = list()
+        self.start_time = time.perf_counter()
+
+    def add(self, latency: float, completion_tokens: int, failed: bool) -> None:
+        self.done += 1
+        self.failed += int(failed)
+        self.completion_tokens += completion_tokens
+        self.latencies.append(latency)
+
+    def summary(self) -> dict:
+        elapsed = time.perf_counter() - self.start_time
+        latencies = sorted(self.latencies)
+        return {
+            "progress": {
+                "total": self.total,
+                "done": self.done,
+                "failed": self.failed,
+                "percent": round(self.done / self.total * 100, 2),
+            },
+            "metrics": {
+                "elapsed": round(elapsed, 3),
+                "requests_per_sec": round(self.done / elapsed, 3) if elapsed else 0.0,
+                "tokens_per_sec": (
+                    round(self.completion_tokens / elapsed, 3) if elapsed else 0.0
+                ),
+                "completion_tokens": self.completion_tokens,
+                "latency": {
+                    "mean": (
+                        round(sum(latencies) / len(latencies), 4) if latencies else 0.0
+                    ),
+                    "p50": round(calc_percentile(latencies, 0.5), 4),
+                    "p90": round(calc_percentile(latencies, 0.9), 4),
+                    "p99": round(calc_percentile(latencies, 0.99), 4),
+                },
+            },
+        }
+
+
+async def post_with_retries(
+    aclient: httpx.AsyncClient, url: str, data: dict, max_retries: int
+) -> dict:
+    for attempt in range(max_retries + 1):
+        try:
+            response = await aclient.post(url, json=data)
+            if response.status_code == status.HTTP_200_OK:
+                return response.json()
+            if response.status_code not in RETRY_STATUS or attempt == max_retries:
+                raise RuntimeError(f"Error: {response.status_code}, {response.text}")
+
+        except httpx.TransportError as e:
+            if attempt == max_retries:
+                raise RuntimeError(f"{type(e).__name__}: {e}") from None
+
+        await asyncio.sleep(RETRY_BACKOFF * 2**attempt)
+
+
+async def infer_item(
+    aclient: httpx.AsyncClient,
+    model_name: str,
+    item: dict,
+    max_tokens: int,
+    temperature: float,
+    max_retries: int,
+) -> Tuple[dict, float, bool]:
+    data = {
+        "model": model_name,
+        "messages": item["messages"],
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+    }
+    start = time.perf_counter()
+    try:
+        result = await post_with_retries(
+            aclient=aclient,
+            url="/v1/chat/completions",
+            data=data,
+            max_retries=max_retries,
+        )
+        choice = result["choices"][0]
+        output = {
+            "output": choice["message"]["content"],
+            "finish_reason": choice.get("finish_reason"),
+            "completion_tokens": (result.get("usage") or dict()).get(
+                "completion_tokens", 0
+            ),
+        }
+        failed = False
+    except Exception as e:
+        output = {"error": f"{e}"}
+        failed = True
+
+    return output, time.perf_counter() - start, failed
+
+
+def build_output_line(item: dict, result: dict, latency: float) -> bytes:
+    line = {"index": item["index"]}
+    if "id" in item:
+        line["id"] = item["id"]
+    line.update(result)
+    line["latency"] = round(latency, 4)
+    if item.get("reference") is not None:
+        line["reference"] = item["reference"]
+    return orjson.dumps(line) + b"\n"
+
+
+async def update_batch_infer_info(job_id: str, fields: dict) -> bool:
+    # returns False once the job has been stopped from the API
+    info = await redis_async.client.hget(TASK_CONFIG.batch_infer, job_id)
+    info = orjson.loads(info)
+    if info["status"] != STATUS_CONFIG.active:
+        return False
+
+    info.update(fields)
+    info["modified_time"], _ = get_current_time()
+    await redis_async.client.hset(TASK_CONFIG.batch_infer, job_id, orjson.dumps(info))
+    return True
+
+
+async def run_batch_infer(
+    job_id: str,
+    model_service: str,
+    model_name: str,
+    prompts: List[dict],
+    output_path: str,
+    concurrency: int,
+    max_tokens: int,
+    temperature: float,
+    max_retries: int,
+) -> dict:
+    queue: asyncio.Queue = asyncio.Queue()
+    for item in prompts:
+        queue.put_nowait(item)
+
+    stats = BatchInferStats(total=len(prompts))
+    lines: List[bytes] = list()
+
+    async def worker() -> None:
+        while not queue.empty():
+            item = queue.get_nowait()
+            # each prompt is its own chat request so the model's chat template
+            # is applied, the backend batches the concurrent requests itself
+            result, latency, failed = await infer_item(
+                aclient=aclient,
+                model_name=model_name,
+                item=item,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                max_retries=max_retries,
+            )
+            stats.add(
+                latency=latency,
+                completion_tokens=result.pop("completion_tokens", 0),
+                failed=failed,
+            )
+            lines.append(build_output_line(item=item, result=result, latency=latency))
+
+    async def flush(f) -> None:
+        if lines:
+            chunk = b"".join(lines)
+            lines.clear()
+            await f.write(chunk)
+
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+    timeout = httpx.Timeout(600, connect=10)
+    async with (
+        httpx.AsyncClient(
+            base_url=model_service, limits=limits, timeout=timeout
+        ) as aclient,
+        aiofiles.open(output_path, "wb") as f,
+    ):
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        try:
+            while True:
+                done, _ = await asyncio.wait(workers, timeout=REPORT_INTERVAL)
+                await flush(f)
+                if len(done) == len(workers):
+                    break
+
+                if not await update_batch_infer_info(
+                    job_id=job_id, fields=stats.summary()
+                ):
+                    accel_logger.info(f"Batch infer {job_id} stopped")
+                    break
+
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            await flush(f)
+
+    return stats.summary()
+
+
+async def start_batch_infer_background_task(
+    job_id: str,
+    model_service: str,
+    model_name: str,
+    prompts: List[dict],
+    output_path: str,
+    concurrency: int,
+    max_tokens: int,
+    temperature: float,
+    max_retries: int,
+) -> None:
+    fields = dict()
+    try:
+        async with infer_backend_pool.use(name=model_name):
+            fields = await run_batch_infer(
+                job_id=job_id,
+                model_service=model_service,
+                model_name=model_name,
+                prompts=prompts,
+                output_path=output_path,
+                concurrency=concurrency,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                max_retries=max_retries,
+            )
+        fields["status"] = STATUS_CONFIG.finish
+
+    except Exception as e:
+        accel_logger.error(f"Batch infer {job_id} failed: {e}")
+        fields.update({"status": STATUS_CONFIG.failed, "error": f"{e}"})
+
+    try:
+        info = orjson.loads(
+            await redis_async.client.hget(TASK_CONFIG.batch_infer, job_id)
+        )
+        if info["status"] == STATUS_CONFIG.stopped:
+            fields.pop("status", None)
+        info.update(fields)
+        info["modified_time"], _ = get_current_time()
+        await redis_async.client.hset(
+            TASK_CONFIG.batch_infer, job_id, orjson.dumps(info)
+        )
+
+    except Exception as e:
+        accel_logger.error(f"Database error: {e}")
@@ -0,0 +1,176 @@
+from typing import Union
+
+import orjson
+from fastapi import HTTPException, status
+from pydantic import BaseModel, ConfigDict, model_validator
+
+from src.config.params import STATUS_CONFIG, TASK_CONFIG
+from src.thirdparty.redis.handler import redis_sync
+from src.utils.error import ResponseErrorHandler
+
+
+class PostStartBatchInfer(BaseModel):
+    model_config = ConfigDict(
+        protected_namespaces=()
+    )  # solve can not start with "model_"
+    model_name: str
+    dataset_name: Union[str, None] = None
+
+    @model_validator(mode="after")
+    def check(self: "PostStartBatchInfer") -> "PostStartBatchInfer":
+        error_handler = ResponseErrorHandler()
+
+        try:
+            info = redis_sync.client.hget(TASK_CONFIG.train, self.model_name)
+            if not info:
+                raise KeyError("model_name does not exists")
+
+            infer_backend = orjson.loads(info)["container"]["infer_backend"]
+            if infer_backend["status"] != STATUS_CONFIG.active:
+                raise ValueError("model has not been loaded")
+
+            if self.dataset_name is not None:
+                dataset_info = redis_sync.client.hget(
+                    TASK_CONFIG.data, self.dataset_name
+                )
+                if not dataset_info:
+                    raise KeyError("dataset_name does not exists")
+
+                if "file_name" not in orjson.loads(dataset_info)["data_args"]:
+                    raise ValueError("only local dataset file can be used")
+
+        except KeyError as e:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_FORM],
+                msg=f"{e}",
+                input={
+                    "model_name": self.model_name,
+                    "dataset_name": self.dataset_name,
+                },
+            )
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail=error_handler.errors
+            ) from None
+
+        except ValueError as e:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_FORM],
+                msg=f"{e}",
+                input={
+                    "model_name": self.model_name,
+                    "dataset_name": self.dataset_name,
+                },
+            )
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT, detail=error_handler.errors
+            ) from None
+
+        except Exception as e:
+            error_handler.add(
+                type=error_handler.ERR_REDIS,
+                loc=[error_handler.LOC_DATABASE],
+                msg=f"Database error: {e}",
+                input={
+                    "model_name": self.model_name,
+                    "dataset_name": self.dataset_name,
+                },
+            )
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=error_handler.errors,
+            ) from None
+
+        return self
+
+
+class PostStopBatchInfer(BaseModel):
+    job_id: str
+
+    @model_validator(mode="after")
+    def check(self: "PostStopBatchInfer") -> "PostStopBatchInfer":
+        error_handler = ResponseErrorHandler()
+
+        try:
+            info = redis_sync.client.hget(TASK_CONFIG.batch_infer, self.job_id)
+            if not info:
+                raise KeyError("job_id does not exists")
+
+            if orjson.loads(info)["status"] != STATUS_CONFIG.active:
+                raise ValueError("batch infer job is not being executed")
+
+        except KeyError as e:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg=f"{e}",
+                input={"job_id": self.job_id},
+            )
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail=error_handler.errors
+            ) from None
+
+        except ValueError as e:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg=f"{e}",
+                input={"job_id": self.job_id},
+            )
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT, detail=error_handler.errors
+            ) from None
+
+        except Exception as e:
+            error_handler.add(
+                type=error_handler.ERR_REDIS,
+                loc=[error_handler.LOC_DATABASE],
+                msg=f"Database error: {e}",
+                input={"job_id": self.job_id},
+            )
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=error_handler.errors,
+            ) from None
+
+        return self
+
+
+class GetBatchInfer(BaseModel):
+    job_id: Union[str, None] = None
+
+    @model_validator(mode="after")
+    def check(self: "GetBatchInfer") -> "GetBatchInfer":
+        error_handler = ResponseErrorHandler()
+
+        try:
+            if self.job_id is not None and not redis_sync.client.hexists(
+                TASK_CONFIG.batch_infer, self.job_id
+            ):
+                raise KeyError("job_id does not exists")
+
+        except KeyError as e:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_QUERY],
+                msg=f"{e}",
+                input={"job_id": self.job_id},
+            )
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail=error_handler.errors
+            ) from None
+
+        except Exception as e:
+            error_handler.add(
+                type=error_handler.ERR_REDIS,
+                loc=[error_handler.LOC_DATABASE],
+                msg=f"Database error: {e}",
+                input={"job_id": self.job_id},
+            )
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=error_handler.errors,
+            ) from None
+
+        return self
@@ -0,0 +1,229 @@
+import asyncio
+import json
+import os
+from typing import Annotated, Union
+
+import orjson
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query, Response, status
+
+from src.config.params import STATUS_CONFIG, TASK_CONFIG
+from src.routers.batch_infer.utils import load_dataset_prompts
+from src.routers.benchmark import schema, utils, validator
+from src.thirdparty.redis.handler import redis_async
+from src.utils.error import ResponseErrorHandler
+from src.utils.logger import accel_logger
+from src.utils.metrics import track_background_task
+from src.utils.utils import generate_uuid, get_current_time
+
+router = APIRouter(prefix="/benchmark", tags=["Benchmark"])
+
+
+@router.post("/start/")
+async def start_benchmark(
+    background_tasks: BackgroundTasks, request_data: schema.PostStartBenchmark
+):
+    validator.PostStartBenchmark(
+        model_name=request_data.model_name, dataset_name=request_data.dataset_name
+    )
+    error_handler = ResponseErrorHandler()
+
+    try:
+        info = orjson.loads(
+            await redis_async.client.hget(TASK_CONFIG.train, request_data.model_name)
+        )
+        if request_data.dataset_name is not None:
+            dataset_info = orjson.loads(
+                await redis_async.client.hget(
+                    TASK_CONFIG.data, request_data.dataset_name
+                )
+            )
+
+    except Exception as e:
+        accel_logger.error(f"Database error: {e}")
+        error_handler.add(
+            type=error_handler.ERR_REDIS,
+            loc=[error_handler.LOC_DATABASE],
+            msg="Database error",
+            input=request_data.model_dump(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=error_handler.errors,
+        ) from None
+
+    prompts = None
+    if request_data.dataset_name is not None:
+        try:
+            prompts = await asyncio.to_thread(
+                load_dataset_prompts, dataset_info["data_args"]
+            )
+            if not prompts:
+                raise ValueError("no prompt found")
+
+        except (TypeError, KeyError, ValueError) as e:
+            accel_logger.error(f"{e}")
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg=f"{e}",
+                input=request_data.model_dump(),
+            )
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=error_handler.errors
+            ) from None
+
+        except Exception as e:
+            accel_logger.error(f"Unexpected error: {e}")
+            error_handler.add(
+                type=error_handler.ERR_INTERNAL,
+                loc=[error_handler.LOC_PROCESS],
+                msg=f"Unexpected error: {e}",
+                input=request_data.model_dump(),
+            )
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=error_handler.errors,
+            ) from None
+
+    job_id = generate_uuid()
+    infer_backend = info["container"]["infer_backend"]
+    config = request_data.model_dump(exclude={"model_name", "dataset_name"})
+
+    try:
+        unix_time, _ = get_current_time()
+        job_info = {
+            "job_id": job_id,
+            "model_name": request_data.model_name,
+            "dataset_name": request_data.dataset_name,
+            "status": STATUS_CONFIG.active,
+            "backend": {
+                "type": infer_backend["type"],
+                "id": infer_backend["id"],
+                "base": infer_backend.get("base"),
+            },
+            "config": config,
+            "result_path": os.path.join(
+                os.path.dirname(info["train_args"]["output_dir"]),
+                "benchmark",
+                f"{job_id}.json",
+            ),
+            "progress": {"elapsed": 0.0, "requests": 0, "failed": 0},
+            "metrics": None,
+            "error": None,
+            "created_time": unix_time,
+            "modified_time": None,
+        }
+        await redis_async.client.hset(
+            TASK_CONFIG.benchmark, job_id, orjson.dumps(job_info)
+        )
+
+    except Exception as e:
+        accel_logger.error(f"Database error: {e}")
+        error_handler.add(
+            type=error_handler.ERR_REDIS,
+            loc=[error_handler.LOC_DATABASE],
+            msg="Database error",
+            input=request_data.model_dump(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=error_handler.errors,
+        ) from None
+
+    background_tasks.add_task(
+        track_background_task(utils.start_benchmark_background_task),
+        job_id,
+        infer_backend["url"],
+        request_data.model_name,
+        prompts,
+        config,
+        infer_backend["type"] == "vllm",
+        job_info["result_path"],
+    )
+
+    return Response(
+        content=json.dumps(job_info),
+        status_code=status.HTTP_200_OK,
+        media_type="application/json",
+    )
+
+
+@router.post("/stop/")
+async def stop_benchmark(request_data: schema.PostStopBenchmark):
+    validator.PostStopBenchmark(job_id=request_data.job_id)
+    error_handler = ResponseErrorHandler()
+
+    try:
+        job_info = orjson.loads(
+            await redis_async.client.hget(TASK_CONFIG.benchmark, request_data.job_id)
+        )
+        job_info["status"] = STATUS_CONFIG.stopped
+        job_info["modified_time"], _ = get_current_time()
+        await redis_async.client.hset(
+            TASK_CONFIG.benchmark, request_data.job_id, orjson.dumps(job_info)
+        )
+
+    except Exception as e:
+        accel_logger.error(f"Database error: {e}")
+        error_handler.add(
+            type=error_handler.ERR_REDIS,
+            loc=[error_handler.LOC_DATABASE],
+            msg="Database error",
+            input=request_data.model_dump(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=error_handler.errors,
+        ) from None
+
+    return Response(
+        content=json.dumps(job_info),
+        status_code=status.HTTP_200_OK,
+        media_type="application/json",
+    )
+
+
+@router.get("/")
+async def get_benchmark(
+    job_id: Annotated[Union[str, None], Query()] = None,
+    model_name: Annotated[Union[str, None], Query()] = None,
+):
+    query_data = schema.GetBenchmark(job_id=job_id, model_name=model_name)
+    validator.GetBenchmark(job_id=query_data.job_id, model_name=query_data.model_name)
+    error_handler = ResponseErrorHandler()
+
+    try:
+        if query_data.job_id is not None:
+            job_info = orjson.loads(
+                await redis_async.client.hget(TASK_CONFIG.benchmark, query_data.job_id)
+            )
+        else:
+            # runs of one model sorted by time, ready for side by side comparison
+            jobs = await redis_async.client.hgetall(TASK_CONFIG.benchmark)
+            job_info = sorted(
+                (
+                    job
+                    for job in map(orjson.loads, jobs.values())
+                    if query_data.model_name in (None, job["model_name"])
+                ),
+                key=lambda job: job["created_time"],
+            )
+
+    except Exception as e:
+        accel_logger.error(f"Database error: {e}")
+        error_handler.add(
+            type=error_handler.ERR_REDIS,
+            loc=[error_handler.LOC_DATABASE],
+            msg="Database error",
+            input=query_data.model_dump(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=error_handler.errors,
+        ) from None
+
+    return Response(
+        content=json.dumps(job_info),
+        status_code=status.HTTP_200_OK,
+        media_type="application/json",
+    )
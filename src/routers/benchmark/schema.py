@@ -0,0 +1,170 @@
+import re
+from typing import Literal, Union
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel, ConfigDict, model_validator
+
+from src.utils.error import ResponseErrorHandler
+
+
+class LengthDistribution(BaseModel):
+    distribution: Literal["fixed", "uniform", "normal"] = "fixed"
+    mean: int = 256
+    std: float = 0.0
+    min: int = 1
+    max: int = 4096
+
+
+class PostStartBenchmark(BaseModel):
+    model_config = ConfigDict(
+        protected_namespaces=()
+    )  # solve can not start with "model_"
+    model_name: str
+    dataset_name: Union[str, None] = None
+    concurrency: int = 8
+    duration: int = 60
+    max_requests: Union[int, None] = None
+    prompt_tokens: LengthDistribution = LengthDistribution(mean=256)
+    completion_tokens: LengthDistribution = LengthDistribution(mean=128)
+    temperature: float = 0.0
+    request_timeout: int = 300
+
+    @model_validator(mode="after")
+    def check(self: "PostStartBenchmark") -> "PostStartBenchmark":
+        error_handler = ResponseErrorHandler()
+
+        if not re.fullmatch(r"[a-zA-Z0-9][a-zA-Z0-9_.-]+", self.model_name):
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'model_name' contain invalid characters",
+                input={"model_name": self.model_name},
+            )
+
+        if not 1 <= self.concurrency <= 256:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'concurrency' must be between 1 and 256",
+                input={"concurrency": self.concurrency},
+            )
+
+        if not 1 <= self.duration <= 3600:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'duration' must be between 1 and 3600 seconds",
+                input={"duration": self.duration},
+            )
+
+        if self.max_requests is not None and self.max_requests < 1:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'max_requests' must be greater than 0",
+                input={"max_requests": self.max_requests},
+            )
+
+        for field in ("prompt_tokens", "completion_tokens"):
+            length = getattr(self, field)
+            if not 1 <= length.min <= length.mean <= length.max:
+                error_handler.add(
+                    type=error_handler.ERR_VALIDATE,
+                    loc=[error_handler.LOC_BODY],
+                    msg=f"'{field}' must satisfy 1 <= min <= mean <= max",
+                    input={field: length.model_dump()},
+                )
+
+            if length.std < 0:
+                error_handler.add(
+                    type=error_handler.ERR_VALIDATE,
+                    loc=[error_handler.LOC_BODY],
+                    msg=f"'{field}.std' can not be negative",
+                    input={field: length.model_dump()},
+                )
+
+        if not 0.0 <= self.temperature <= 2.0:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'temperature' must be between 0 and 2",
+                input={"temperature": self.temperature},
+            )
+
+        if self.request_timeout <= 0:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'request_timeout' must larger than 0",
+                input={"request_timeout": self.request_timeout},
+            )
+
+        if error_handler.errors != []:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=error_handler.errors,
+            ) from None
+
+        return self
+
+
+class PostStopBenchmark(BaseModel):
+    job_id: str
+
+    @model_validator(mode="after")
+    def check(self: "PostStopBenchmark") -> "PostStopBenchmark":
+        error_handler = ResponseErrorHandler()
+
+        if not re.fullmatch(r"[a-zA-Z0-9-]+", self.job_id):
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'job_id' contain invalid characters",
+                input={"job_id": self.job_id},
+            )
+
+        if error_handler.errors != []:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=error_handler.errors,
+            ) from None
+
+        return self
+
+
+class GetBenchmark(BaseModel):
+    model_config = ConfigDict(
+        protected_namespaces=()
+    )  # solve can not start with "model_"
+    job_id: Union[str, None] = None
+    model_name: Union[str, None] = None
+
+    @model_validator(mode="after")
+    def check(self: "GetBenchmark") -> "GetBenchmark":
+        error_handler = ResponseErrorHandler()
+
+        if self.job_id is not None and not re.fullmatch(r"[a-zA-Z0-9-]+", self.job_id):
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_QUERY],
+                msg="'job_id' contain invalid characters",
+                input={"job_id": self.job_id},
+            )
+
+        if self.model_name is not None and not re.fullmatch(
+            r"[a-zA-Z0-9][a-zA-Z0-9_.-]+", self.model_name
+        ):
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_QUERY],
+                msg="'model_name' contain invalid characters",
+                input={"model_name": self.model_name},
+            )
+
+        if error_handler.errors != []:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=error_handler.errors,
+            ) from None
+
+        return self
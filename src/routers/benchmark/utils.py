@@ -0,0 +1,314 @@
+import asyncio
+import os
+import random
+import time
+from typing import List, Union
+
+import aiofiles
+import httpx
+import orjson
+
+from src.config.params import STATUS_CONFIG, TASK_CONFIG
+from src.routers.batch_infer.utils import calc_percentile
+from src.routers.infer_backend.pool import infer_backend_pool
+from src.thirdparty.redis.handler import redis_async
+from src.utils.logger import accel_logger
+from src.utils.utils import get_current_time
+
+REPORT_INTERVAL = 1.0
+PROMPT_WORDS = (
+    "the model answers a short question about data training inference memory "
+    "latency token batch cache server request stream layer weight system user"
+).split()
+
+
+def sample_length(distribution: dict, rng: random.Random) -> int:
+    if distribution["distribution"] == "uniform":
+        length = rng.randint(distribution["min"], distribution["max"])
+    elif distribution["distribution"] == "normal":
+        length = round(rng.gauss(distribution["mean"], distribution["std"]))
+    else:
+        length = distribution["mean"]
+    return max(distribution["min"], min(distribution["max"], length))
+
+
+def synthetic_prompt(num_tokens: int, rng: random.Random) -> List[dict]:
+    # roughly one token per word, random words keep prefix caching honest
+    words = [rng.choice(PROMPT_WORDS) for _ in range(num_tokens)]
+    return [{"role": "user", "content": " ".join(words)}]
+
+
+def summarize(values: List[float]) -> dict:
+    values = sorted(values)
+    return {
+        "mean": round(sum(values) / len(values), 4) if values else 0.0,
+        "p50": round(calc_percentile(values, 0.5), 4),
+        "p90": round(calc_percentile(values, 0.9), 4),
+        "p99": round(calc_percentile(values, 0.99), 4),
+    }
+
+
+class BenchmarkStats:
+    def __init__(self) -> None:
+        self.requests = 0
+        self.failed = 0
+        self.errors: dict = dict()
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.ttfts: List[float] = list()
+        self.itls: List[float] = list()
+        self.tpots: List[float] = list()
+        self.latencies: List[float] = list()
+        self.start_time = time.perf_counter()
+
+    def add(self, result: dict) -> None:
+        self.requests += 1
+        if "error" in result:
+            self.failed += 1
+            self.errors[result["error"]] = self.errors.get(result["error"], 0) + 1
+            return
+
+        self.prompt_tokens += result["prompt_tokens"]
+        self.completion_tokens += result["completion_tokens"]
+        self.latencies.append(result["latency"])
+        if result["ttft"] is not None:
+            self.ttfts.append(result["ttft"])
+        self.itls.extend(result["itls"])
+        if result["completion_tokens"] > 1 and result["ttft"] is not None:
+            self.tpots.append(
+                (result["latency"] - result["ttft"]) / (result["completion_tokens"] - 1)
+            )
+
+    def summary(self) -> dict:
+        elapsed = time.perf_counter() - self.start_time
+        return {
+            "progress": {
+                "elapsed": round(elapsed, 3),
+                "requests": self.requests,
+                "failed": self.failed,
+            },
+            "metrics": {
+                "error_rate": (
+                    round(self.failed / self.requests, 4) if self.requests else 0.0
+                ),
+                "requests_per_sec": (
+                    round(self.requests / elapsed, 3) if elapsed else 0.0
+                ),
+                "tokens_per_sec": (
+                    round(self.completion_tokens / elapsed, 3) if elapsed else 0.0
+                ),
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "ttft": summarize(self.ttfts),
+                "inter_token_latency": summarize(self.itls),
+                "time_per_output_token": summarize(self.tpots),
+                "latency": summarize(self.latencies),
+                "errors": dict(
+                    sorted(self.errors.items(), key=lambda item: -item[1])[:10]
+                ),
+            },
+        }
+
+
+async def stream_request(
+    aclient: httpx.AsyncClient,
+    model_name: str,
+    messages: List[dict],
+    max_tokens: int,
+    temperature: float,
+    ignore_eos: bool,
+) -> dict:
+    data = {
+        "model": model_name,
+        "messages": messages,
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "stream": True,
+        "stream_options": {"include_usage": True},
+    }
+    if ignore_eos:
+        # vLLM extension, keeps the response length on the requested distribution
+        data["ignore_eos"] = True
+
+    start = time.perf_counter()
+    ttft = None
+    last_token_time = None
+    itls = list()
+    chunks = 0
+    usage = dict()
+    try:
+        async with aclient.stream(
+            "POST", "/v1/chat/completions", json=data
+        ) as response:
+            if response.status_code != 200:
+                await response.aread()
+                return {"error": f"Error: {response.status_code}"}
+
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+
+                payload = line[len("data:") :].strip()
+                if payload == "[DONE]":
+                    break
+
+                chunk = orjson.loads(payload)
+                if chunk.get("usage"):
+                    usage = chunk["usage"]
+                if not chunk.get("choices") or not chunk["choices"][0].get(
+                    "delta", {}
+                ).get("content"):
+                    continue
+
+                now = time.perf_counter()
+                if ttft is None:
+                    ttft = now - start
+                else:
+                    itls.append(now - last_token_time)
+                last_token_time = now
+                chunks += 1
+
+    except Exception as e:
+        # transport errors and malformed payloads alike fail only this request,
+        # an exception here would end its worker and go uncounted
+        return {"error": f"{type(e).__name__}"}
+
+    return {
+        "ttft": ttft,
+        "itls": itls,
+        "latency": time.perf_counter() - start,
+        "prompt_tokens": usage.get("prompt_tokens") or 0,
+        # servers without usage in the stream send one token per chunk
+        "completion_tokens": usage.get("completion_tokens") or chunks,
+    }
+
+
+async def update_benchmark_info(job_id: str, fields: dict) -> bool:
+    # returns False once the benchmark has been stopped from the API
+    info = await redis_async.client.hget(TASK_CONFIG.benchmark, job_id)
+    info = orjson.loads(info)
+    if info["status"] != STATUS_CONFIG.active:
+        return False
+
+    info.update(fields)
+    info["modified_time"], _ = get_current_time()
+    await redis_async.client.hset(TASK_CONFIG.benchmark, job_id, orjson.dumps(info))
+    return True
+
+
+async def run_benchmark(
+    job_id: str,
+    model_service: str,
+    model_name: str,
+    prompts: Union[List[dict], None],
+    config: dict,
+    ignore_eos: bool,
+) -> dict:
+    rng = random.Random(job_id)
+    stats = BenchmarkStats()
+    deadline = stats.start_time + config["duration"]
+    issued = 0
+
+    def next_request() -> Union[dict, None]:
+        nonlocal issued
+        if time.perf_counter() >= deadline or (
+            config["max_requests"] is not None and issued >= config["max_requests"]
+        ):
+            return None
+
+        issued += 1
+        if prompts:
+            messages = rng.choice(prompts)["messages"]
+        else:
+            messages = synthetic_prompt(
+                num_tokens=sample_length(config["prompt_tokens"], rng), rng=rng
+            )
+        return {
+            "messages": messages,
+            "max_tokens": sample_length(config["completion_tokens"], rng),
+        }
+
+    async def worker() -> None:
+        while (request := next_request()) is not None:
+            stats.add(
+                await stream_request(
+                    aclient=aclient,
+                    model_name=model_name,
+                    messages=request["messages"],
+                    max_tokens=request["max_tokens"],
+                    temperature=config["temperature"],
+                    ignore_eos=ignore_eos,
+                )
+            )
+
+    concurrency = config["concurrency"]
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+    timeout = httpx.Timeout(config["request_timeout"], connect=10)
+    async with httpx.AsyncClient(
+        base_url=model_service, limits=limits, timeout=timeout
+    ) as aclient:
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        try:
+            while True:
+                done, _ = await asyncio.wait(workers, timeout=REPORT_INTERVAL)
+                if len(done) == len(workers):
+                    break
+
+                if not await update_benchmark_info(
+                    job_id=job_id, fields=stats.summary()
+                ):
+                    accel_logger.info(f"Benchmark {job_id} stopped")
+                    break
+
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    return stats.summary()
+
+
+async def start_benchmark_background_task(
+    job_id: str,
+    model_service: str,
+    model_name: str,
+    prompts: Union[List[dict], None],
+    config: dict,
+    ignore_eos: bool,
+    result_path: str,
+) -> None:
+    fields = dict()
+    try:
+        async with infer_backend_pool.use(name=model_name):
+            fields = await run_benchmark(
+                job_id=job_id,
+                model_service=model_service,
+                model_name=model_name,
+                prompts=prompts,
+                config=config,
+                ignore_eos=ignore_eos,
+            )
+        fields["status"] = STATUS_CONFIG.finish
+
+    except Exception as e:
+        accel_logger.error(f"Benchmark {job_id} failed: {e}")
+        fields.update({"status": STATUS_CONFIG.failed, "error": f"{e}"})
+
+    try:
+        info = orjson.loads(
+            await redis_async.client.hget(TASK_CONFIG.benchmark, job_id)
+        )
+        if info["status"] == STATUS_CONFIG.stopped:
+            fields.pop("status", None)
+        info.update(fields)
+        info["modified_time"], _ = get_current_time()
+        await redis_async.client.hset(TASK_CONFIG.benchmark, job_id, orjson.dumps(info))
+
+        os.makedirs(os.path.dirname(result_path), exist_ok=True)
+        async with aiofiles.open(result_path, "wb") as f:
+            await f.write(orjson.dumps(info, option=orjson.OPT_INDENT_2))
+
+    except Exception as e:
+        accel_logger.error(f"Benchmark {job_id} result not saved: {e}")
@@ -1,36 +1,82 @@
 import json
+from typing import Annotated, Union
 
-from fastapi import APIRouter, HTTPException, Response, status
+import orjson
+from fastapi import APIRouter, HTTPException, Query, Response, status
 from fastapi.responses import StreamingResponse
 
+from src.config.params import TASK_CONFIG
 from src.routers.chat import schema, utils, validator
 from src.thirdparty.redis.handler import redis_async
 from src.utils.error import ResponseErrorHandler
 from src.utils.logger import accel_logger
-from src.utils.utils import generate_uuid
+from src.utils.utils import generate_uuid, get_current_time
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
 
 
 @router.post("/stream/start/")
 async def start_chat(request_data: schema.PostStartChat):
+    validator.PostStartChat(session_id=request_data.session_id)
     error_handler = ResponseErrorHandler()
 
     try:
         request_id = generate_uuid()
-        await redis_async.client.hset("chat_requests", request_id, "processing")
 
-        return StreamingResponse(
-            utils.post_openai_chat(
+        if request_data.session_id is None:
+            chat_stream = utils.post_openai_chat(
                 request_id=request_id,
                 model_service=request_data.model_service,
                 model_name=request_data.chat_model_name,
-                messages=request_data.messages,
-            ),
+                messages=[
+                    {"role": "user", "content": msg} for msg in request_data.messages
+                ],
+                stream_format=request_data.stream_format,
+                batch_interval=request_data.batch_interval_ms / 1000,
+            )
+        else:
+            claimed = await utils.claim_session(
+                session_id=request_data.session_id, request_id=request_id
+            )
+            if not claimed:
+                raise ValueError("session_id is processing another request")
+
+            session = await redis_async.client.hget(
+                TASK_CONFIG.chat, request_data.session_id
+            )
+            session = orjson.loads(session)
+            session["request_id"] = request_id
+            await redis_async.client.hset(
+                TASK_CONFIG.chat, request_data.session_id, orjson.dumps(session)
+            )
+
+            chat_stream = utils.post_session_chat(
+                session=session,
+                request_id=request_id,
+                model_service=request_data.model_service or session["model_service"],
+                model_name=request_data.chat_model_name or session["chat_model_name"],
+                new_messages=request_data.messages,
+                stream_format=request_data.stream_format,
+                batch_interval=request_data.batch_interval_ms / 1000,
+            )
+
+        return StreamingResponse(
+            chat_stream,
             status_code=status.HTTP_200_OK,
             media_type="text/event-stream",
         )
 
+    except ValueError as e:
+        error_handler.add(
+            type=error_handler.ERR_VALIDATE,
+            loc=[error_handler.LOC_BODY],
+            msg=f"{e}",
+            input=request_data.model_dump(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail=error_handler.errors
+        ) from None
+
     except Exception as e:
         error_handler.add(
             type=error_handler.ERR_INTERNAL,
@@ -82,3 +128,110 @@ async def stop_chat(request_data: schema.PostStopChat):
         status_code=status.HTTP_200_OK,
         media_type="application/json",
     )
+
+
+@router.post("/session/")
+async def create_chat_session(request_data: schema.PostChatSession):
+    unix_time, _ = get_current_time()
+    error_handler = ResponseErrorHandler()
+
+    try:
+        session = {
+            "session_id": generate_uuid(),
+            "model_service": request_data.model_service,
+            "chat_model_name": request_data.chat_model_name,
+            "system_prompt": request_data.system_prompt,
+            "messages": list(),
+            "request_id": None,
+            "created_time": unix_time,
+            "modified_time": None,
+        }
+        await redis_async.client.hset(
+            TASK_CONFIG.chat, session["session_id"], orjson.dumps(session)
+        )
+
+    except Exception as e:
+        accel_logger.error(f"Database error: {e}")
+        error_handler.add(
+            type=error_handler.ERR_REDIS,
+            loc=[error_handler.LOC_DATABASE],
+            msg="Database error",
+            input=request_data.model_dump(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=error_handler.errors,
+        ) from None
+
+    return Response(
+        content=json.dumps([session]),
+        status_code=status.HTTP_200_OK,
+        media_type="application/json",
+    )
+
+
+@router.get("/session/")
+async def get_chat_session(
+    session_id: Annotated[Union[str, None], Query()] = None,
+):
+    query_data = schema.GetChatSession(session_id=session_id)
+    validator.GetChatSession(session_id=query_data.session_id)
+    error_handler = ResponseErrorHandler()
+
+    try:
+        if query_data.session_id is not None:
+            session = await redis_async.client.hget(
+                TASK_CONFIG.chat, query_data.session_id
+            )
+            sessions = [orjson.loads(session)]
+        else:
+            info = await redis_async.client.hgetall(TASK_CONFIG.chat)
+            sessions = [orjson.loads(value) for value in info.values()]
+
+    except Exception as e:
+        accel_logger.error(f"Database error: {e}")
+        error_handler.add(
+            type=error_handler.ERR_REDIS,
+            loc=[error_handler.LOC_DATABASE],
+            msg="Database error",
+            input=query_data.model_dump(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=error_handler.errors,
+        ) from None
+
+    return Response(
+        content=json.dumps(sessions),
+        status_code=status.HTTP_200_OK,
+        media_type="application/json",
+    )
+
+
+@router.delete("/session/")
+async def delete_chat_session(session_id: Annotated[str, Query(...)]):
+    query_data = schema.DelChatSession(session_id=session_id)
+    validator.DelChatSession(session_id=query_data.session_id)
+    error_handler = ResponseErrorHandler()
+
+    try:
+        await redis_async.client.hdel(TASK_CONFIG.chat, query_data.session_id)
+
+    except Exception as e:
+        accel_logger.error(f"Database error: {e}")
+        error_handler.add(
+            type=error_handler.ERR_REDIS,
+            loc=[error_handler.LOC_DATABASE],
+            msg="Database error",
+            input=query_data.model_dump(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=error_handler.errors,
+        ) from None
+
+    return Response(
+        content=json.dumps({"session_id": query_data.session_id}),
+        status_code=status.HTTP_200_OK,
+        media_type="application/json",
+    )
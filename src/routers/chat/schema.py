@@ -1,5 +1,5 @@
 import re
-from typing import List
+from typing import List, Literal, Union
 
 from fastapi import HTTPException, status
 from pydantic import BaseModel, ConfigDict, model_validator
@@ -11,15 +11,45 @@ class PostStartChat(BaseModel):
     model_config = ConfigDict(
         protected_namespaces=()
     )  # solve can not start with "model_"
-    model_service: str
-    chat_model_name: str
+    model_service: Union[str, None] = None
+    chat_model_name: Union[str, None] = None
     messages: List[str]
+    session_id: Union[str, None] = None
+    stream_format: Literal["ndjson", "batched", "sse"] = "ndjson"
+    batch_interval_ms: int = 50
 
     @model_validator(mode="after")
     def check(self: "PostStartChat") -> "PostStartChat":
         error_handler = ResponseErrorHandler()
 
-        if bool(re.search(r"[^a-zA-Z0-9_\-\:/]+", self.model_service)) is True:
+        if self.session_id is None and (
+            self.model_service is None or self.chat_model_name is None
+        ):
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'model_service' and 'chat_model_name' are required without 'session_id'",
+                input={
+                    "model_service": self.model_service,
+                    "chat_model_name": self.chat_model_name,
+                },
+            )
+
+        if self.session_id is not None and not re.match(
+            r"^[a-fA-F0-9]{8}-[a-fA-F0-9]{4}-[a-fA-F0-9]{4}-[a-fA-F0-9]{4}-[a-fA-F0-9]{12}$",
+            self.session_id,
+        ):
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'session_id' contain invalid characters",
+                input={"session_id": self.session_id},
+            )
+
+        if (
+            self.model_service is not None
+            and bool(re.search(r"[^a-zA-Z0-9_\-\:/]+", self.model_service)) is True
+        ):
             error_handler.add(
                 type=error_handler.ERR_VALIDATE,
                 loc=[error_handler.LOC_BODY],
@@ -27,7 +57,10 @@ class PostStartChat(BaseModel):
                 input={"model_service": self.model_service},
             )
 
-        if bool(re.search(r"[^a-zA-Z0-9_\-\:]+", self.chat_model_name)) is True:
+        if (
+            self.chat_model_name is not None
+            and bool(re.search(r"[^a-zA-Z0-9_\-\:]+", self.chat_model_name)) is True
+        ):
             error_handler.add(
                 type=error_handler.ERR_VALIDATE,
                 loc=[error_handler.LOC_BODY],
@@ -35,6 +68,14 @@ class PostStartChat(BaseModel):
                 input={"chat_model_name": self.chat_model_name},
             )
 
+        if not 1 <= self.batch_interval_ms <= 1000:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'batch_interval_ms' must be between 1 and 1000",
+                input={"batch_interval_ms": self.batch_interval_ms},
+            )
+
         if error_handler.errors != []:
             raise HTTPException(
                 status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
@@ -69,3 +110,94 @@ class PostStopChat(BaseModel):
             ) from None
 
         return self
+
+
+class PostChatSession(BaseModel):
+    model_config = ConfigDict(
+        protected_namespaces=()
+    )  # solve can not start with "model_"
+    model_service: str
+    chat_model_name: str
+    system_prompt: str = ""
+
+    @model_validator(mode="after")
+    def check(self: "PostChatSession") -> "PostChatSession":
+        error_handler = ResponseErrorHandler()
+
+        if bool(re.search(r"[^a-zA-Z0-9_\-\:/]+", self.model_service)) is True:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'model_service' container invalid characters",
+                input={"model_service": self.model_service},
+            )
+
+        if bool(re.search(r"[^a-zA-Z0-9_\-\:]+", self.chat_model_name)) is True:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'chat_model_name' container invalid characters",
+                input={"chat_model_name": self.chat_model_name},
+            )
+
+        if error_handler.errors != []:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=error_handler.errors,
+            ) from None
+
+        return self
+
+
+class GetChatSession(BaseModel):
+    session_id: Union[str, None] = None
+
+    @model_validator(mode="after")
+    def check(self: "GetChatSession") -> "GetChatSession":
+        error_handler = ResponseErrorHandler()
+
+        if self.session_id is not None and not re.match(
+            r"^[a-fA-F0-9]{8}-[a-fA-F0-9]{4}-[a-fA-F0-9]{4}-[a-fA-F0-9]{4}-[a-fA-F0-9]{12}$",
+            self.session_id,
+        ):
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_QUERY],
+                msg="'session_id' contain invalid characters",
+                input={"session_id": self.session_id},
+            )
+
+        if error_handler.errors != []:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=error_handler.errors,
+            ) from None
+
+        return self
+
+
+class DelChatSession(BaseModel):
+    session_id: str
+
+    @model_validator(mode="after")
+    def check(self: "DelChatSession") -> "DelChatSession":
+        error_handler = ResponseErrorHandler()
+
+        if not re.match(
+            r"^[a-fA-F0-9]{8}-[a-fA-F0-9]{4}-[a-fA-F0-9]{4}-[a-fA-F0-9]{4}-[a-fA-F0-9]{12}$",
+            self.session_id,
+        ):
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_QUERY],
+                msg="'session_id' contain invalid characters",
+                input={"session_id": self.session_id},
+            )
+
+        if error_handler.errors != []:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=error_handler.errors,
+            ) from None
+
+        return self
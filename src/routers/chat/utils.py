@@ -1,73 +1,533 @@
 import asyncio
-import json
+import re
+import time
 from collections.abc import AsyncGenerator
+from contextlib import aclosing
+from typing import Dict, List, Literal, Tuple, Union
 
 import httpx
+import orjson
 from fastapi import status
+from redis.exceptions import WatchError
 
+from src.config.params import CHAT_CONFIG, TASK_CONFIG
+from src.routers.infer_backend.pool import infer_backend_pool
 from src.thirdparty.redis.handler import redis_async
+from src.utils.logger import accel_logger
+from src.utils.metrics import observe_chat_stream
+from src.utils.tracing import create_untraced_task
+from src.utils.utils import get_current_time
 
 
-async def listen_request_status(request_id: str) -> bool:
-    sub = redis_async.client.pubsub()
-    await sub.subscribe("chat_requests")
+class ChatClientPool:
+    def __init__(
+        self, max_connections: int = 256, max_keepalive_connections: int = 64
+    ) -> None:
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+        )
+        self.clients: Dict[str, httpx.AsyncClient] = dict()
+        self.max_model_lens: Dict[Tuple[str, str], int] = dict()
 
-    async for message in sub.listen():
-        if message["type"] == "message":
-            req_id, request_status = message["data"].split(":")
-            if req_id == request_id and request_status == "cancelled":
-                return True
+    def get(self, model_service: str) -> httpx.AsyncClient:
+        aclient = self.clients.get(model_service)
+        if aclient is None or aclient.is_closed:
+            aclient = httpx.AsyncClient(
+                base_url=model_service, limits=self.limits, timeout=None
+            )
+            self.clients[model_service] = aclient
+        return aclient
+
+    async def get_max_model_len(
+        self, model_service: str, model_name: str
+    ) -> Union[int, None]:
+        """Context length the backend serves the model with, None when the
+        backend does not report it (ollama)."""
+        key = (model_service, model_name)
+        if key not in self.max_model_lens:
+            try:
+                response = await self.get(model_service=model_service).get(
+                    "/v1/models", timeout=5
+                )
+                response.raise_for_status()
+                for model in response.json().get("data", list()):
+                    if model.get("id") == model_name and model.get("max_model_len"):
+                        self.max_model_lens[key] = int(model["max_model_len"])
+            except Exception as e:
+                accel_logger.error(f"Failed to get max model len of {model_name}: {e}")
+                return None
+
+        return self.max_model_lens.get(key)
+
+    async def aclose(self) -> None:
+        clients, self.clients = self.clients, dict()
+        await asyncio.gather(
+            *(aclient.aclose() for aclient in clients.values()),
+            return_exceptions=True,
+        )
+
+
+chat_client_pool = ChatClientPool()
+
+
+class ChatCancelListener:
+    def __init__(self, channel: str = "chat_requests") -> None:
+        self.channel = channel
+        self.events: Dict[str, asyncio.Event] = dict()
+        self.task: Union[asyncio.Task, None] = None
+
+    def register(self, request_id: str) -> asyncio.Event:
+        if self.task is None or self.task.done():
+            self.task = create_untraced_task(self.listen())
+
+        event = asyncio.Event()
+        self.events[request_id] = event
+        return event
+
+    def unregister(self, request_id: str) -> None:
+        self.events.pop(request_id, None)
+
+    async def listen(self) -> None:
+        while True:
+            sub = redis_async.client.pubsub()
+            try:
+                await sub.subscribe(self.channel)
+                async for message in sub.listen():
+                    if message["type"] != "message":
+                        continue
+
+                    req_id, _, request_status = message["data"].rpartition(":")
+                    event = self.events.get(req_id)
+                    if event is not None and request_status == "cancelled":
+                        event.set()
+
+            except asyncio.CancelledError:
+                raise
+
+            except Exception as e:
+                accel_logger.error(f"Chat cancel listener error: {e}")
+                await asyncio.sleep(1)
+
+            finally:
+                await sub.aclose()
+
+    async def aclose(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+
+chat_cancel_listener = ChatCancelListener()
+
+
+SSE_DONE = b"[DONE]"
+MESSAGE_TOKEN_OVERHEAD = 8
+HISTORY_TRIM_RATIO = 0.75
+FINISH_REASON_PATTERN = re.compile(rb'"finish_reason":\s*"(\w+)"')
+
+
+async def iter_sse_data(response: httpx.Response) -> AsyncGenerator[bytes, None]:
+    # only `data:` fields matter, comments (keep-alive) and other fields are skipped
+    buffer = b""
+    async for chunk in response.aiter_bytes():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.startswith(b"data:"):
+                yield line[5:].strip()
+
+    if buffer.startswith(b"data:"):
+        yield buffer[5:].strip()
+
+
+def parse_chat_chunk(data: bytes) -> Tuple[str, Union[str, None]]:
+    choices = orjson.loads(data).get("choices") or [{}]
+    return (choices[0].get("delta") or {}).get("content") or "", choices[0].get(
+        "finish_reason"
+    )
+
+
+async def stream_chat_ndjson(
+    response: httpx.Response,
+    request_id: str,
+    cancel_event: asyncio.Event,
+    reply: Union[List[str], None] = None,
+) -> AsyncGenerator[bytes, None]:
+    reply = reply if reply is not None else list()
+    tokens, first_token_time = 0, None
+
+    try:
+        async for data in iter_sse_data(response=response):
+            if cancel_event.is_set() or data == SSE_DONE:
+                break
+
+            content, finish_reason = parse_chat_chunk(data=data)
+            if content:
+                tokens += 1
+                first_token_time = first_token_time or time.perf_counter()
+                reply.append(content)
+                yield orjson.dumps({"id": request_id, "content": content}) + b"\n"
+
+            if finish_reason is not None:
+                break
+
+    finally:
+        observe_chat_stream(
+            stream_format="ndjson", tokens=tokens, first_token_time=first_token_time
+        )
+
+
+async def stream_chat_batched(
+    response: httpx.Response,
+    request_id: str,
+    cancel_event: asyncio.Event,
+    batch_interval: float,
+    reply: Union[List[str], None] = None,
+) -> AsyncGenerator[bytes, None]:
+    # window is checked when a token arrives, a timer per token costs more than it saves
+    loop = asyncio.get_running_loop()
+    contents = list()
+    flush_at = loop.time() + batch_interval
+    tokens, first_token_time = 0, None
+
+    try:
+        async for data in iter_sse_data(response=response):
+            if cancel_event.is_set() or data == SSE_DONE:
+                break
+
+            content, finish_reason = parse_chat_chunk(data=data)
+            if content:
+                tokens += 1
+                first_token_time = first_token_time or time.perf_counter()
+                contents.append(content)
+                if reply is not None:
+                    reply.append(content)
+
+            if finish_reason is not None:
+                break
+
+            if contents and loop.time() >= flush_at:
+                yield (
+                    orjson.dumps({"id": request_id, "content": "".join(contents)})
+                    + b"\n"
+                )
+                contents.clear()
+                flush_at = loop.time() + batch_interval
+
+        if contents:
+            yield orjson.dumps({"id": request_id, "content": "".join(contents)}) + b"\n"
+
+    finally:
+        observe_chat_stream(
+            stream_format="batched", tokens=tokens, first_token_time=first_token_time
+        )
+
+
+async def stream_chat_passthrough(
+    response: httpx.Response,
+    request_id: str,
+    cancel_event: asyncio.Event,
+    reply: Union[List[str], None] = None,
+) -> AsyncGenerator[bytes, None]:
+    # upstream bytes go out as-is, only the chunk boundary tail is kept for sniffing
+    tail = b""
+    finish_reason = None
+    is_done = False
+    raw_chunks = list()
+    # one `data:` event per token, counted without parsing the chunk
+    events, first_token_time = 0, None
+
+    try:
+        async for chunk in response.aiter_bytes():
+            if cancel_event.is_set():
+                finish_reason = "cancelled"
+                break
+
+            events += chunk.count(b"data:")
+            first_token_time = first_token_time or time.perf_counter()
+            if reply is not None:
+                raw_chunks.append(chunk)
+            yield chunk
+
+            window = tail + chunk
+            if finish_reason is None and b"finish_reason" in window:
+                for match in FINISH_REASON_PATTERN.finditer(window):
+                    finish_reason = match.group(1).decode()
+            if SSE_DONE in window:
+                is_done = True
+                break
+            tail = window[-64:]
+
+        if not is_done:
+            yield b"data: " + SSE_DONE + b"\n\n"
+
+    finally:
+        # a client disconnect closes the generator at a yield, the turn and
+        # token counts still have to be recorded
+        observe_chat_stream(
+            stream_format="sse",
+            tokens=max(events - is_done, 0),
+            first_token_time=first_token_time,
+        )
+
+        # parsed once after the stream, not per token. A disconnect usually
+        # cuts the last event short, only events ended by a blank line count
+        if raw_chunks:
+            events_data, _, _ = b"".join(raw_chunks).rpartition(b"\n\n")
+            for line in events_data.split(b"\n"):
+                if not line.startswith(b"data:") or line[5:].strip() == SSE_DONE:
+                    continue
+                try:
+                    content, _ = parse_chat_chunk(data=line[5:].strip())
+                except orjson.JSONDecodeError:
+                    continue
+                if content:
+                    reply.append(content)
+
+        accel_logger.debug(f"chat {request_id} finished, reason: {finish_reason}")
 
 
 async def post_openai_chat(
     request_id: str,
     model_service: str,
     model_name: str,
-    messages: list,
-) -> AsyncGenerator[dict, None]:
-    data = {
-        "model": model_name,
-        "messages": [{"role": "user", "content": msg} for msg in messages],
-        "stream": True,
-    }
+    messages: List[dict],
+    stream_format: Literal["ndjson", "batched", "sse"] = "ndjson",
+    batch_interval: float = 0.05,
+    reply: Union[List[str], None] = None,
+) -> AsyncGenerator[bytes, None]:
+    data = {"model": model_name, "messages": messages, "stream": True}
+    cancel_event = chat_cancel_listener.register(request_id=request_id)
 
     try:
-        async with httpx.AsyncClient(timeout=None) as aclient:
-            async with aclient.stream(
-                "POST", f"{model_service}/v1/chat/completions", json=data
-            ) as response:
-                if response.status_code != status.HTTP_200_OK:
-                    await redis_async.client.hdel("chat_requests", request_id)
-                    raise RuntimeError(
-                        f"Error: {response.status_code}, {response.text}"
-                    ) from None
-
-                listen_task = asyncio.create_task(
-                    listen_request_status(request_id=request_id)
+        # marked here, not in the handler, so a client gone before the body
+        # starts leaves nothing behind
+        await redis_async.client.hset("chat_requests", request_id, "processing")
+        aclient = chat_client_pool.get(model_service=model_service)
+        async with (
+            infer_backend_pool.use(name=model_name),
+            aclient.stream("POST", "/v1/chat/completions", json=data) as response,
+        ):
+            if response.status_code != status.HTTP_200_OK:
+                error_content = await response.aread()
+                raise RuntimeError(
+                    f"Error: {response.status_code}, {error_content.decode()}"
+                ) from None
+
+            if stream_format == "sse":
+                chat_stream = stream_chat_passthrough(
+                    response=response,
+                    request_id=request_id,
+                    cancel_event=cancel_event,
+                    reply=reply,
+                )
+            elif stream_format == "batched":
+                chat_stream = stream_chat_batched(
+                    response=response,
+                    request_id=request_id,
+                    cancel_event=cancel_event,
+                    batch_interval=batch_interval,
+                    reply=reply,
                 )
+            else:
+                chat_stream = stream_chat_ndjson(
+                    response=response,
+                    request_id=request_id,
+                    cancel_event=cancel_event,
+                    reply=reply,
+                )
+
+            # closed here, not at garbage collection, so the reply is complete
+            # before the caller saves it
+            async with aclosing(chat_stream):
+                async for chunk in chat_stream:
+                    yield chunk
+
+    finally:
+        chat_cancel_listener.unregister(request_id=request_id)
+        await redis_async.client.hdel("chat_requests", request_id)
+
+
+def estimate_tokens(content: str) -> int:
+    # no tokenizer here, utf-8 bytes / 3 over-counts english and roughly
+    # matches cjk, plus the chat template overhead of a message
+    return len(content.encode("utf-8")) // 3 + MESSAGE_TOKEN_OVERHEAD
+
 
-                async for chunk in response.aiter_lines():
-                    if listen_task.done() and listen_task.result():
-                        break
+def get_history_start(
+    session: dict, new_messages: List[str], token_budget: int, max_turns: int
+) -> int:
+    """Index of the oldest session message still sent to the backend.
 
-                    if chunk:
-                        data_chunk = json.loads(chunk[6:])
+    Whole turns are dropped from the front once the history is over budget,
+    then down to HISTORY_TRIM_RATIO of it. The start is kept in the session,
+    so the prompt stays a stable prefix for the following turns and backend
+    prefix caching keeps hitting until the next trim."""
+    history = session["messages"]
+    history_start = min(session.get("history_start", 0), len(history))
+    turn_starts = [
+        index
+        for index in range(history_start, len(history))
+        if history[index]["role"] == "user"
+        and (index == history_start or history[index - 1]["role"] != "user")
+    ]
 
-                        if data_chunk["choices"][0]["finish_reason"] == "stop":
-                            break
+    fixed_tokens = sum(estimate_tokens(content=msg) for msg in new_messages)
+    if session["system_prompt"]:
+        fixed_tokens += estimate_tokens(content=session["system_prompt"])
+    suffix_tokens = [0] * (len(history) + 1)
+    for index in range(len(history) - 1, history_start - 1, -1):
+        suffix_tokens[index] = suffix_tokens[index + 1] + estimate_tokens(
+            content=history[index]["content"]
+        )
 
-                        yield (
-                            json.dumps(
-                                {
-                                    "id": request_id,
-                                    "content": data_chunk["choices"][0]["delta"][
-                                        "content"
-                                    ],
-                                }
-                            )
-                            + "\n"
-                        )
+    def fits(turn: int, ratio: float) -> bool:
+        start = turn_starts[turn] if turn < len(turn_starts) else len(history)
+        return (
+            len(turn_starts) - turn <= max_turns * ratio
+            and fixed_tokens + suffix_tokens[start] <= token_budget * ratio
+        )
+
+    if fits(turn=0, ratio=1.0):
+        return history_start
+
+    turn = 0
+    while turn < len(turn_starts) and not fits(turn=turn, ratio=HISTORY_TRIM_RATIO):
+        turn += 1
+    return turn_starts[turn] if turn < len(turn_starts) else len(history)
+
+
+def build_session_messages(
+    session: dict, new_messages: List[str], history_start: int = 0
+) -> List[dict]:
+    # history is append-only and serialized the same way every turn, so the
+    # prompt of turn N is a prefix of turn N+1 and backend prefix caching hits
+    messages = list()
+    if session["system_prompt"]:
+        messages.append({"role": "system", "content": session["system_prompt"]})
+    messages.extend(session["messages"][history_start:])
+    messages.extend({"role": "user", "content": msg} for msg in new_messages)
+    return messages
+
+
+async def save_session_turn(
+    session_id: str, new_messages: List[str], reply: List[str], history_start: int
+) -> None:
+    unix_time, _ = get_current_time()
+    session = await redis_async.client.hget(TASK_CONFIG.chat, session_id)
+    if session is None:
+        return
+
+    session = orjson.loads(session)
+    if reply:
+        session["messages"].extend(
+            {"role": "user", "content": msg} for msg in new_messages
+        )
+        session["messages"].append({"role": "assistant", "content": "".join(reply)})
+    session["history_start"] = history_start
+    session["request_id"] = None
+    session["modified_time"] = unix_time
+    await redis_async.client.hset(TASK_CONFIG.chat, session_id, orjson.dumps(session))
+
+
+def get_session_lock_key(session_id: str) -> str:
+    return f"session-lock:{session_id}"
+
+
+async def claim_session(session_id: str, request_id: str) -> bool:
+    # one turn per session at a time, the ttl frees a claim whose stream never
+    # ran, e.g. the client left before the response body started
+    return bool(
+        await redis_async.client.set(
+            get_session_lock_key(session_id=session_id),
+            request_id,
+            nx=True,
+            ex=CHAT_CONFIG.session_lock_ttl,
+        )
+    )
+
+
+async def release_session(session_id: str, request_id: str) -> None:
+    key = get_session_lock_key(session_id=session_id)
+    async with redis_async.client.pipeline(transaction=True) as pipe:
+        try:
+            await pipe.watch(key)
+            # an expired claim may have been taken by the next turn already
+            if await pipe.get(key) != request_id:
+                return
+            pipe.multi()
+            pipe.delete(key)
+            await pipe.execute()
+        except WatchError:
+            pass
+
+
+async def post_session_chat(
+    session: dict,
+    request_id: str,
+    model_service: str,
+    model_name: str,
+    new_messages: List[str],
+    stream_format: Literal["ndjson", "batched", "sse"] = "ndjson",
+    batch_interval: float = 0.05,
+) -> AsyncGenerator[bytes, None]:
+    reply = list()
+    max_model_len = await chat_client_pool.get_max_model_len(
+        model_service=model_service, model_name=model_name
+    )
+    token_budget = CHAT_CONFIG.history_max_tokens
+    if max_model_len is not None:
+        token_budget = min(
+            token_budget, max_model_len - CHAT_CONFIG.reply_reserve_tokens
+        )
+    history_start = get_history_start(
+        session=session,
+        new_messages=new_messages,
+        token_budget=token_budget,
+        max_turns=CHAT_CONFIG.history_max_turns,
+    )
+
+    chat_stream = post_openai_chat(
+        request_id=request_id,
+        model_service=model_service,
+        model_name=model_name,
+        messages=build_session_messages(
+            session=session, new_messages=new_messages, history_start=history_start
+        ),
+        stream_format=stream_format,
+        batch_interval=batch_interval,
+        reply=reply,
+    )
+
+    try:
+        async with aclosing(chat_stream):
+            refresh_time = time.monotonic()
+            async for chunk in chat_stream:
+                # the claim outlives its ttl as long as the stream runs
+                if time.monotonic() - refresh_time > CHAT_CONFIG.session_lock_ttl / 3:
+                    refresh_time = time.monotonic()
+                    await redis_async.client.expire(
+                        get_session_lock_key(session_id=session["session_id"]),
+                        CHAT_CONFIG.session_lock_ttl,
+                    )
+                yield chunk
 
     finally:
-        await redis_async.client.hdel("chat_requests", request_id)
-        listen_task.cancel()
+        try:
+            await save_session_turn(
+                session_id=session["session_id"],
+                new_messages=new_messages,
+                reply=reply,
+                history_start=history_start,
+            )
+        except Exception as e:
+            accel_logger.error(f"Failed to save chat session: {e}")
+
+        try:
+            await release_session(
+                session_id=session["session_id"], request_id=request_id
+            )
+        except Exception as e:
+            accel_logger.error(f"Failed to release chat session: {e}")
@@ -1,6 +1,10 @@
+from typing import Union
+
 from fastapi import HTTPException, status
 from pydantic import BaseModel, model_validator
 
+from src.config.params import TASK_CONFIG
+from src.routers.chat import utils
 from src.thirdparty.redis.handler import redis_sync
 from src.utils.error import ResponseErrorHandler
 
@@ -40,3 +44,138 @@ class PostStopChat(BaseModel):
             ) from None
 
         return self
+
+
+class PostStartChat(BaseModel):
+    session_id: Union[str, None]
+
+    @model_validator(mode="after")
+    def check(self: "PostStartChat") -> "PostStartChat":
+        error_handler = ResponseErrorHandler()
+
+        if self.session_id is None:
+            return self
+
+        try:
+            session = redis_sync.client.hget(TASK_CONFIG.chat, self.session_id)
+            if session is None:
+                raise KeyError("session_id does not exists")
+
+        except KeyError as e:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg=f"{e}",
+                input={"session_id": self.session_id},
+            )
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail=error_handler.errors
+            ) from None
+
+        except Exception:
+            error_handler.add(
+                type=error_handler.ERR_REDIS,
+                loc=[error_handler.LOC_DATABASE],
+                msg="Database error",
+                input={"session_id": self.session_id},
+            )
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=error_handler.errors,
+            ) from None
+
+        return self
+
+
+class GetChatSession(BaseModel):
+    session_id: Union[str, None]
+
+    @model_validator(mode="after")
+    def check(self: "GetChatSession") -> "GetChatSession":
+        error_handler = ResponseErrorHandler()
+
+        if self.session_id is None:
+            return self
+
+        try:
+            if not redis_sync.client.hexists(TASK_CONFIG.chat, self.session_id):
+                raise KeyError("session_id does not exists")
+
+        except KeyError as e:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_QUERY],
+                msg=f"{e}",
+                input={"session_id": self.session_id},
+            )
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail=error_handler.errors
+            ) from None
+
+        except Exception:
+            error_handler.add(
+                type=error_handler.ERR_REDIS,
+                loc=[error_handler.LOC_DATABASE],
+                msg="Database error",
+                input={"session_id": self.session_id},
+            )
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=error_handler.errors,
+            ) from None
+
+        return self
+
+
+class DelChatSession(BaseModel):
+    session_id: str
+
+    @model_validator(mode="after")
+    def check(self: "DelChatSession") -> "DelChatSession":
+        error_handler = ResponseErrorHandler()
+
+        try:
+            session = redis_sync.client.hget(TASK_CONFIG.chat, self.session_id)
+            if session is None:
+                raise KeyError("session_id does not exists")
+
+            if redis_sync.client.exists(
+                utils.get_session_lock_key(session_id=self.session_id)
+            ):
+                raise ValueError("session_id is processing another request")
+
+        except KeyError as e:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_QUERY],
+                msg=f"{e}",
+                input={"session_id": self.session_id},
+            )
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail=error_handler.errors
+            ) from None
+
+        except ValueError as e:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_QUERY],
+                msg=f"{e}",
+                input={"session_id": self.session_id},
+            )
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT, detail=error_handler.errors
+            ) from None
+
+        except Exception:
+            error_handler.add(
+                type=error_handler.ERR_REDIS,
+                loc=[error_handler.LOC_DATABASE],
+                msg="Database error",
+                input={"session_id": self.session_id},
+            )
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=error_handler.errors,
+            ) from None
+
+        return self
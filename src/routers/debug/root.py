@@ -0,0 +1,61 @@
+import json
+from typing import Annotated
+
+from fastapi import APIRouter, HTTPException, Query, Response, status
+from fastapi.responses import HTMLResponse
+
+from src.routers.debug import schema, utils
+from src.utils.error import ResponseErrorHandler
+from src.utils.logger import accel_logger
+from src.utils.tracing import trace_exporter
+
+router = APIRouter(prefix="/debug", tags=["Debug"])
+
+
+@router.get("/trace/{trace_id}")
+async def get_trace(trace_id: str, format: Annotated[str, Query()] = "html"):
+    query_data = schema.GetTrace(trace_id=trace_id, format=format)
+    error_handler = ResponseErrorHandler()
+
+    try:
+        trace = await trace_exporter.get_trace(trace_id=query_data.trace_id)
+
+    except KeyError as e:
+        error_handler.add(
+            type=error_handler.ERR_VALIDATE,
+            loc=[error_handler.LOC_QUERY],
+            msg=f"{e}",
+            input=query_data.model_dump(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=error_handler.errors
+        ) from None
+
+    except Exception as e:
+        accel_logger.error(f"{e}")
+        error_handler.add(
+            type=error_handler.ERR_INTERNAL,
+            loc=[error_handler.LOC_PROCESS],
+            msg="Unexpected error",
+            input=query_data.model_dump(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=error_handler.errors,
+        ) from None
+
+    if query_data.format == "json":
+        return Response(
+            content=json.dumps({"trace_id": query_data.trace_id, **trace}),
+            status_code=status.HTTP_200_OK,
+            media_type="application/json",
+        )
+
+    return HTMLResponse(
+        content=utils.render_waterfall(
+            trace_id=query_data.trace_id,
+            spans=trace["spans"],
+            dropped_spans=trace["dropped_spans"],
+        ),
+        status_code=status.HTTP_200_OK,
+    )
@@ -0,0 +1,39 @@
+import re
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel, model_validator
+
+from src.utils.error import ResponseErrorHandler
+
+
+class GetTrace(BaseModel):
+    trace_id: str
+    format: str = "html"
+
+    @model_validator(mode="after")
+    def check(self: "GetTrace") -> "GetTrace":
+        error_handler = ResponseErrorHandler()
+
+        if not re.fullmatch(r"[0-9a-f]{32}", self.trace_id):
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_QUERY],
+                msg="'trace_id' must be 32 lowercase hex characters",
+                input={"trace_id": self.trace_id},
+            )
+
+        if self.format not in ("html", "json"):
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_QUERY],
+                msg="'format' must be one of html, json",
+                input={"format": self.format},
+            )
+
+        if error_handler.errors != []:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=error_handler.errors,
+            )
+
+        return self
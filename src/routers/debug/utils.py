@@ -0,0 +1,72 @@
+import html
+from typing import Dict, List
+
+import orjson
+
+WATERFALL_STYLE = """
+body { font-family: monospace; font-size: 12px; margin: 16px; }
+.row { display: flex; align-items: center; height: 20px; }
+.row:hover { background: #f0f0f0; }
+.name { width: 40%; overflow: hidden; white-space: nowrap; text-overflow: ellipsis; }
+.track { position: relative; width: 50%; height: 14px; }
+.bar { position: absolute; height: 14px; min-width: 1px; background: #4a90d9; }
+.bar.server { background: #7b61c9; }
+.bar.client { background: #3fa37a; }
+.bar.error { background: #d9534f; }
+.duration { width: 10%; text-align: right; }
+"""
+
+
+def get_span_depths(spans: List[dict]) -> Dict[str, int]:
+    parents = {item["span_id"]: item["parent_id"] for item in spans}
+    depths: Dict[str, int] = dict()
+    for span_id in parents:
+        depth, parent_id, seen = 0, parents[span_id], {span_id}
+        # parents outside of this service (remote callers) are not in the trace
+        while parent_id in parents and parent_id not in seen:
+            seen.add(parent_id)
+            depth += 1
+            parent_id = parents[parent_id]
+        depths[span_id] = depth
+    return depths
+
+
+def render_waterfall(trace_id: str, spans: List[dict], dropped_spans: int = 0) -> str:
+    """Html waterfall of a trace, one bar per span placed on the trace timeline.
+    Spans still open when the trace was read are drawn up to the latest end."""
+    trace_start = min(item["start_time"] for item in spans)
+    trace_end = max(item["end_time"] or item["start_time"] for item in spans)
+    total = max(trace_end - trace_start, 1)
+    depths = get_span_depths(spans=spans)
+
+    rows = list()
+    for item in sorted(spans, key=lambda item: item["start_time"]):
+        end_time = item["end_time"] or trace_end
+        left = (item["start_time"] - trace_start) / total * 100
+        width = (end_time - item["start_time"]) / total * 100
+        duration_ms = (end_time - item["start_time"]) / 1e6
+
+        tooltip = orjson.dumps(
+            {"attributes": item["attributes"], "error": item["error"]},
+            option=orjson.OPT_INDENT_2,
+        ).decode()
+        classes = " ".join(["bar", item["kind"]] + (["error"] if item["error"] else []))
+        rows.append(
+            f'<div class="row" title="{html.escape(tooltip)}">'
+            f'<div class="name" style="padding-left: {depths[item["span_id"]] * 16}px">'
+            f"{html.escape(item['name'])}</div>"
+            f'<div class="track"><div class="{classes}" '
+            f'style="left: {left:.3f}%; width: {width:.3f}%"></div></div>'
+            f'<div class="duration">{duration_ms:.1f} ms'
+            f"{'' if item['end_time'] else ' (open)'}</div></div>"
+        )
+
+    return (
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+        f"<title>trace {html.escape(trace_id)}</title>"
+        f"<style>{WATERFALL_STYLE}</style></head><body>"
+        f"<h3>trace {html.escape(trace_id)}</h3>"
+        f"<p>{len(spans)} spans, {total / 1e6:.1f} ms"
+        f"{f', {dropped_spans} dropped' if dropped_spans else ''}</p>"
+        f"{''.join(rows)}</body></html>"
+    )
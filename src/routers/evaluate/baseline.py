@@ -0,0 +1,115 @@
+import asyncio
+import hashlib
+from typing import List, Union
+
+import orjson
+
+from src.config.params import EVAL_CONFIG, STATUS_CONFIG, TASK_CONFIG
+from src.thirdparty.redis.handler import redis_async
+from src.utils.utils import get_current_time
+
+
+class EvalBaselineRegistry:
+    """Base model eval runs shared by every fine-tune of that base model.
+
+    An entry is keyed by base model, task set and the eval settings that
+    change scores, so a baseline is computed once and then reused for every
+    comparison that matches it."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.lock = asyncio.Lock()
+
+    @staticmethod
+    def build_config(limit: Union[float, None]) -> dict:
+        return {"limit": limit, "eval_tool": EVAL_CONFIG.tag}
+
+    @staticmethod
+    def build_key(base_model: str, tasks: List[str], config: dict) -> str:
+        return hashlib.sha256(
+            orjson.dumps(
+                {"base_model": base_model, "tasks": sorted(set(tasks)), **config},
+                option=orjson.OPT_SORT_KEYS,
+            )
+        ).hexdigest()[:32]
+
+    async def get_entries(self) -> dict:
+        entries = await redis_async.client.hgetall(self.name)
+        return {key: orjson.loads(value) for key, value in entries.items()}
+
+    async def get_entry(self, key: str) -> Union[dict, None]:
+        entry = await redis_async.client.hget(self.name, key)
+        return orjson.loads(entry) if entry else None
+
+    async def save_entry(self, entry: dict) -> None:
+        await redis_async.client.hset(self.name, entry["key"], orjson.dumps(entry))
+
+    async def find(
+        self, base_model: str, tasks: List[str], limit: Union[float, None]
+    ) -> Union[dict, None]:
+        return await self.get_entry(
+            key=self.build_key(
+                base_model=base_model, tasks=tasks, config=self.build_config(limit)
+            )
+        )
+
+    async def request(
+        self, base_model: str, tasks: List[str], limit: Union[float, None]
+    ) -> tuple:
+        """Registry entry for the baseline and whether it still has to run.
+        Finished and running baselines are reused as they are."""
+        config = self.build_config(limit)
+        key = self.build_key(base_model=base_model, tasks=tasks, config=config)
+        async with self.lock:
+            entry = await self.get_entry(key=key)
+            if entry is not None and entry["status"] in {
+                STATUS_CONFIG.setup,
+                STATUS_CONFIG.active,
+                STATUS_CONFIG.finish,
+            }:
+                return entry, False
+
+            entry = {
+                "key": key,
+                "base_model": base_model,
+                "tasks": sorted(set(tasks)),
+                "config": config,
+                "eval_name": f"baseline-{key[:16]}",
+                "status": STATUS_CONFIG.setup,
+                "run_id": None,
+                "error": None,
+                "created_time": get_current_time()[0],
+                "finished_time": None,
+            }
+            await self.save_entry(entry=entry)
+            return entry, True
+
+    async def update(self, key: str, **fields) -> dict:
+        entry = await self.get_entry(key=key)
+        if entry is None:
+            raise KeyError("baseline does not exists")
+
+        entry.update(fields)
+        await self.save_entry(entry=entry)
+        return entry
+
+    async def recover(self) -> None:
+        # baselines interrupted by a restart have to be requested again
+        for entry in (await self.get_entries()).values():
+            if entry["status"] in {STATUS_CONFIG.setup, STATUS_CONFIG.active}:
+                entry["status"] = STATUS_CONFIG.failed
+                entry["error"] = "interrupted by a service restart"
+                await self.save_entry(entry=entry)
+
+    async def delete(self, key: str) -> dict:
+        entry = await self.get_entry(key=key)
+        if entry is None:
+            raise KeyError("baseline does not exists")
+        if entry["status"] in {STATUS_CONFIG.setup, STATUS_CONFIG.active}:
+            raise ValueError("baseline is being evaluated")
+
+        await redis_async.client.hdel(self.name, key)
+        return entry
+
+
+eval_baseline_registry = EvalBaselineRegistry(name=TASK_CONFIG.eval_baseline)
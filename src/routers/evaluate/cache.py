@@ -0,0 +1,202 @@
+import asyncio
+import hashlib
+import os
+import shutil
+from typing import List, Union
+
+import orjson
+
+from src.config.params import COMMON_CONFIG, EVAL_CONFIG, TASK_CONFIG
+from src.routers.train.utils import get_last_checkpoint
+from src.thirdparty.redis.handler import redis_async
+from src.utils.logger import accel_logger
+from src.utils.manifest import MANIFEST_NAME, load_manifest, refresh_manifest
+from src.utils.utils import get_current_time
+
+FINGERPRINT_CHUNK = 1 << 20
+GiB = 1024**3
+
+
+def get_eval_artifact_path(info: dict) -> Union[str, None]:
+    # adapters served on a shared base are evaluated straight from the checkpoint
+    if info["container"]["infer_backend"].get("base") or (
+        info["last_model_path"] is None
+        and info["train_args"].get("finetuning_type") == "lora"
+    ):
+        return get_last_checkpoint(info["train_args"]["output_dir"])
+    return info["last_model_path"]
+
+
+def artifact_fingerprint(path: str) -> str:
+    """Hash the per-file sha256 of the artifact manifest written after a
+    merge. Checkpoint dirs without one hash every file name and size plus the
+    head and tail of its content, without reading whole weight files."""
+    digest = hashlib.sha256()
+    if load_manifest(path) is not None:
+        manifest = refresh_manifest(path=path)
+        for name, file_info in sorted(manifest["files"].items()):
+            digest.update(f"{name}:{file_info['size']}:{file_info['sha256']}".encode())
+        return digest.hexdigest()
+
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            if name.startswith(MANIFEST_NAME):
+                continue
+            file_path = os.path.join(root, name)
+            size = os.path.getsize(file_path)
+            digest.update(f"{os.path.relpath(file_path, path)}:{size}".encode())
+            with open(file_path, "rb") as f:
+                if size <= 2 * FINGERPRINT_CHUNK:
+                    digest.update(f.read())
+                else:
+                    digest.update(f.read(FINGERPRINT_CHUNK))
+                    f.seek(-FINGERPRINT_CHUNK, os.SEEK_END)
+                    digest.update(f.read(FINGERPRINT_CHUNK))
+    return digest.hexdigest()
+
+
+def get_dir_size(path: str) -> int:
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                continue
+    return size
+
+
+class EvalCache:
+    """lm-eval request caches kept per model artifact and eval config.
+
+    lm-eval keys cached responses by request only, so every artifact and
+    config gets its own cache directory. An entry remembers which tasks ran to
+    completion against it; when all requested tasks did, the eval can run
+    from the cache without a loaded backend."""
+
+    def __init__(self, root_path: str, max_gb: float) -> None:
+        self.root_path = root_path
+        self.max_gb = max_gb
+        self.lock = asyncio.Lock()
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.root_path, key)
+
+    def use_cache_path(self, key: str) -> str:
+        # lm-eval appends _rank{n}.db to this prefix
+        return os.path.join(self.entry_path(key), "lm_cache")
+
+    @staticmethod
+    def build_key(artifact_hash: str, config: dict) -> str:
+        return hashlib.sha256(
+            orjson.dumps(
+                {"artifact": artifact_hash, **config}, option=orjson.OPT_SORT_KEYS
+            )
+        ).hexdigest()[:32]
+
+    async def get_entries(self) -> dict:
+        entries = await redis_async.client.hgetall(TASK_CONFIG.eval_cache)
+        return {key: orjson.loads(value) for key, value in entries.items()}
+
+    async def get_entry(self, key: str) -> Union[dict, None]:
+        entry = await redis_async.client.hget(TASK_CONFIG.eval_cache, key)
+        return orjson.loads(entry) if entry else None
+
+    async def save_entry(self, entry: dict) -> None:
+        await redis_async.client.hset(
+            TASK_CONFIG.eval_cache, entry["key"], orjson.dumps(entry)
+        )
+
+    @staticmethod
+    def is_warm(entry: Union[dict, None], tasks: List[str]) -> bool:
+        return entry is not None and all(task in entry["tasks"] for task in tasks)
+
+    async def acquire(self, artifact_hash: str, config: dict, model_name: str) -> dict:
+        key = self.build_key(artifact_hash=artifact_hash, config=config)
+        async with self.lock:
+            entry = await self.get_entry(key=key)
+            if entry is None:
+                entry = {
+                    "key": key,
+                    "artifact_hash": artifact_hash,
+                    "config": config,
+                    "tasks": dict(),
+                    "size_bytes": 0,
+                    "users": 0,
+                    "created_time": get_current_time()[0],
+                }
+            entry["model_name"] = model_name
+            entry["users"] += 1
+            entry["last_used"], _ = get_current_time()
+            await self.save_entry(entry=entry)
+
+        os.makedirs(self.entry_path(key), exist_ok=True)
+        return entry
+
+    async def release(self, key: str, finished_tasks: List[str]) -> None:
+        size = await asyncio.to_thread(get_dir_size, self.entry_path(key))
+        async with self.lock:
+            entry = await self.get_entry(key=key)
+            if entry is None:
+                return
+
+            finished_time, _ = get_current_time()
+            for task in finished_tasks:
+                entry["tasks"][task] = finished_time
+            entry["users"] = max(0, entry["users"] - 1)
+            entry["size_bytes"] = size
+            entry["last_used"] = finished_time
+            await self.save_entry(entry=entry)
+
+        await self.enforce_limit()
+
+    async def recover(self) -> None:
+        # the background tasks releasing entries do not survive a restart,
+        # users left over would pin their entries forever
+        async with self.lock:
+            for entry in (await self.get_entries()).values():
+                if entry["users"] > 0:
+                    entry["users"] = 0
+                    await self.save_entry(entry=entry)
+                    accel_logger.info(f"Recovered eval cache {entry['key']}")
+
+    async def evict(self, key: str) -> dict:
+        async with self.lock:
+            entry = await self.get_entry(key=key)
+            if entry is None:
+                raise KeyError("cache key does not exists")
+            if entry["users"] > 0:
+                raise ValueError("cache is used by a running eval")
+
+            await redis_async.client.hdel(TASK_CONFIG.eval_cache, key)
+
+        await asyncio.to_thread(shutil.rmtree, self.entry_path(key), ignore_errors=True)
+        accel_logger.info(f"Evicted eval cache {key}")
+        return entry
+
+    async def enforce_limit(self) -> None:
+        if self.max_gb <= 0:
+            return
+
+        entries = sorted(
+            (await self.get_entries()).values(), key=lambda entry: entry["last_used"]
+        )
+        used = sum(entry["size_bytes"] for entry in entries)
+        for entry in entries:
+            if used <= self.max_gb * GiB:
+                break
+            if entry["users"] > 0:
+                continue
+
+            try:
+                await self.evict(key=entry["key"])
+                used -= entry["size_bytes"]
+            except (KeyError, ValueError):
+                continue
+
+
+eval_cache = EvalCache(
+    root_path=os.path.join(COMMON_CONFIG.cache_path, "eval"),
+    max_gb=EVAL_CONFIG.cache_max_gb,
+)
@@ -1,6 +1,8 @@
+import asyncio
 import json
 import os
-from typing import Annotated
+import shutil
+from typing import Annotated, Union
 
 import orjson
 from fastapi import APIRouter, BackgroundTasks, HTTPException, Query, Response, status
@@ -9,13 +11,15 @@ from src.config.params import (
     COMMON_CONFIG,
     DOCKERNETWORK_CONFIG,
     EVAL_CONFIG,
+    INFERPOOL_CONFIG,
     STATUS_CONFIG,
     TASK_CONFIG,
 )
-from src.routers.evaluate import schema, utils, validator
+from src.routers.evaluate import baseline, cache, schema, store, utils, validator
 from src.thirdparty.redis.handler import redis_async
 from src.utils.error import ResponseErrorHandler
 from src.utils.logger import accel_logger
+from src.utils.metrics import track_background_task
 from src.utils.utils import assemble_image_name
 
 router = APIRouter(prefix="/eval", tags=["Evaluate"])
@@ -46,31 +50,92 @@ async def start_lm_eval(
         ) from None
 
     try:
-        cmd = [
-            "lm-eval",
-            "--model",
-            "local-completions",
-            "--task",
-            ",".join(request_data.tasks),
-            "--batch_size",
-            "auto",
-            "--output_path",
-            os.path.join(COMMON_CONFIG.save_path, request_data.eval_name, "evaluate"),
-            "--use_cache",
-            COMMON_CONFIG.cache_path,
-        ]
+        cache_entry = None
+        warm = False
+        artifact_path = cache.get_eval_artifact_path(info=info)
+        if artifact_path is not None and os.path.isdir(artifact_path):
+            artifact_hash = await asyncio.to_thread(
+                cache.artifact_fingerprint, artifact_path
+            )
+            cache_config = {
+                "base_model": info["train_args"]["base_model"],
+                "limit": request_data.limit,
+                "eval_tool": EVAL_CONFIG.tag,
+            }
+            warm = cache.EvalCache.is_warm(
+                entry=await cache.eval_cache.get_entry(
+                    key=cache.EvalCache.build_key(
+                        artifact_hash=artifact_hash, config=cache_config
+                    )
+                ),
+                tasks=request_data.tasks,
+            )
 
-        if any("humaneval" in task or "mbpp" in task for task in request_data.tasks):
-            cmd += ["--confirm_run_unsafe_code"]
+        if (
+            not warm
+            and info["container"]["infer_backend"]["status"] != STATUS_CONFIG.active
+        ):
+            raise ValueError("model has not been loaded")
 
-        model_args = (
-            f"model={request_data.eval_name},"
-            + f"base_url={request_data.model_service}/v1/completions,"
-            + "num_concurrent=1,"
-            + "max_retries=3,"
-            + f"tokenizer={info['train_args']['base_model']}"
+        if artifact_path is not None and os.path.isdir(artifact_path):
+            cache_entry = await cache.eval_cache.acquire(
+                artifact_hash=artifact_hash,
+                config=cache_config,
+                model_name=request_data.eval_name,
+            )
+
+    except ValueError as e:
+        accel_logger.error(f"{e}")
+        error_handler.add(
+            type=error_handler.ERR_VALIDATE,
+            loc=[error_handler.LOC_BODY],
+            msg=f"{e}",
+            input=request_data.model_dump(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail=error_handler.errors
+        ) from None
+
+    except Exception as e:
+        accel_logger.error(f"Unexpected error: {e}")
+        error_handler.add(
+            type=error_handler.ERR_INTERNAL,
+            loc=[error_handler.LOC_PROCESS],
+            msg="Unexpected error",
+            input=request_data.model_dump(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=error_handler.errors,
+        ) from None
+
+    concurrency = request_data.concurrency or utils.default_eval_concurrency(
+        infer_backend_type=info["container"]["infer_backend"]["type"]
+    )
+    eval_config = {
+        "concurrency": concurrency,
+        "max_retries": request_data.max_retries,
+        "timeout": request_data.timeout,
+        "limit": request_data.limit,
+    }
+
+    try:
+        cmd = utils.build_lm_eval_cmd(
+            eval_name=request_data.eval_name,
+            tasks=request_data.tasks,
+            model_service=request_data.model_service,
+            served_model_name=request_data.eval_name,
+            tokenizer=info["train_args"]["base_model"],
+            concurrency=concurrency,
+            max_retries=request_data.max_retries,
+            timeout=request_data.timeout,
+            limit=request_data.limit,
+            use_cache_path=(
+                cache.eval_cache.use_cache_path(cache_entry["key"])
+                if cache_entry is not None
+                else None
+            ),
         )
-        cmd += ["--model_args", model_args]
 
         eval_container = await utils.run_lm_eval(
             image_name=assemble_image_name(
@@ -85,6 +150,8 @@ async def start_lm_eval(
 
     except Exception as e:
         accel_logger.error(f"Unexpected error: {e}")
+        if cache_entry is not None:
+            await cache.eval_cache.release(key=cache_entry["key"], finished_tasks=[])
         error_handler.add(
             type=error_handler.ERR_INTERNAL,
             loc=[error_handler.LOC_PROCESS],
@@ -99,12 +166,21 @@ async def start_lm_eval(
     try:
         info["container"]["eval"]["status"] = STATUS_CONFIG.active
         info["container"]["eval"]["id"] = eval_container
+        info["container"]["eval"]["config"] = eval_config
+        info["container"]["eval"]["cache"] = {
+            "key": cache_entry["key"] if cache_entry is not None else None,
+            "warm": warm,
+        }
         await redis_async.client.hset(
             TASK_CONFIG.train, request_data.eval_name, orjson.dumps(info)
         )
 
     except Exception as e:
         accel_logger.error(f"Database error: {e}")
+        # nothing would track the started container, stop it and free the cache
+        await utils.stop_eval_background_task(container_name_or_id=eval_container)
+        if cache_entry is not None:
+            await cache.eval_cache.release(key=cache_entry["key"], finished_tasks=[])
         error_handler.add(
             type=error_handler.ERR_REDIS,
             loc=[error_handler.LOC_DATABASE],
@@ -117,10 +193,11 @@ async def start_lm_eval(
         ) from None
 
     background_tasks.add_task(
-        utils.start_eval_background_task,
+        track_background_task(utils.start_eval_background_task),
         request_data.eval_name,
         eval_container,
         request_data.tasks,
+        cache_entry["key"] if cache_entry is not None else None,
     )
 
     return Response(
@@ -160,7 +237,9 @@ async def stop_lm_eval(
             detail=error_handler.errors,
         ) from None
 
-    background_tasks.add_task(utils.stop_eval_background_task, stop_container)
+    background_tasks.add_task(
+        track_background_task(utils.stop_eval_background_task), stop_container
+    )
 
     return Response(
         content=json.dumps({"eval_name": request_data.eval_name}),
@@ -170,8 +249,11 @@ async def stop_lm_eval(
 
 
 @router.get("/result/")
-async def get_eval_result(eval_name: Annotated[str, Query(...)]):
-    query_data = schema.GetEvalResult(eval_name=eval_name)
+async def get_eval_result(
+    eval_name: Annotated[str, Query(...)],
+    run_id: Annotated[Union[str, None], Query()] = None,
+):
+    query_data = schema.GetEvalResult(eval_name=eval_name, run_id=run_id)
     validator.GetEvalResult(eval_name=query_data.eval_name)
     error_handler = ResponseErrorHandler()
 
@@ -193,7 +275,18 @@ async def get_eval_result(eval_name: Annotated[str, Query(...)]):
         ) from None
 
     try:
-        eval_result = await utils.get_eval_result(info=info)
+        eval_result = await utils.get_eval_result(info=info, run_id=query_data.run_id)
+
+    except KeyError as e:
+        error_handler.add(
+            type=error_handler.ERR_VALIDATE,
+            loc=[error_handler.LOC_QUERY],
+            msg=f"{e}",
+            input=query_data.model_dump(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=error_handler.errors
+        ) from None
 
     except Exception as e:
         accel_logger.error(f"{e}")
@@ -213,3 +306,451 @@ async def get_eval_result(eval_name: Annotated[str, Query(...)]):
         status_code=status.HTTP_200_OK,
         media_type="application/json",
     )
+
+
+@router.get("/result/runs/")
+async def get_eval_runs(eval_name: Annotated[str, Query(...)]):
+    query_data = schema.GetEvalResult(eval_name=eval_name)
+    validator.GetEvalResult(eval_name=query_data.eval_name)
+    error_handler = ResponseErrorHandler()
+
+    try:
+        runs = await store.eval_result_store.get_runs(eval_name=query_data.eval_name)
+
+    except Exception as e:
+        accel_logger.error(f"Database error: {e}")
+        error_handler.add(
+            type=error_handler.ERR_REDIS,
+            loc=[error_handler.LOC_DATABASE],
+            msg="Database error",
+            input=query_data.model_dump(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=error_handler.errors,
+        ) from None
+
+    return Response(
+        content=json.dumps(
+            [
+                {
+                    "run_id": run["run_id"],
+                    "finished_time": run["finished_time"],
+                    "config": run["config"],
+                    "num_results": len(run["task_info"]),
+                }
+                for run in runs
+            ]
+        ),
+        status_code=status.HTTP_200_OK,
+        media_type="application/json",
+    )
+
+
+@router.get("/metrics/")
+async def get_eval_metrics():
+    error_handler = ResponseErrorHandler()
+
+    try:
+        metrics = await store.eval_result_store.get_metrics()
+
+    except Exception as e:
+        accel_logger.error(f"Database error: {e}")
+        error_handler.add(
+            type=error_handler.ERR_REDIS,
+            loc=[error_handler.LOC_DATABASE],
+            msg="Database error",
+            input={},
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=error_handler.errors,
+        ) from None
+
+    return Response(
+        content=json.dumps(metrics),
+        status_code=status.HTTP_200_OK,
+        media_type="application/json",
+    )
+
+
+@router.get("/leaderboard/")
+async def get_eval_leaderboard(
+    task: Annotated[str, Query(...)],
+    metric: Annotated[str, Query(...)],
+    filter: Annotated[str, Query()] = "none",
+    n_shot: Annotated[Union[int, None], Query()] = None,
+    limit: Annotated[int, Query()] = 10,
+    base_model: Annotated[Union[str, None], Query()] = None,
+):
+    query_data = schema.GetEvalLeaderboard(
+        task=task,
+        metric=metric,
+        filter=filter,
+        n_shot=n_shot,
+        limit=limit,
+        base_model=base_model,
+    )
+    error_handler = ResponseErrorHandler()
+
+    try:
+        metric_key = await store.eval_result_store.resolve_metric_key(
+            task=query_data.task,
+            metric=query_data.metric,
+            filter=query_data.filter,
+            n_shot=query_data.n_shot,
+        )
+        board = await store.eval_result_store.leaderboard(
+            metric_key=metric_key,
+            limit=query_data.limit,
+            base_model=query_data.base_model,
+        )
+
+    except KeyError as e:
+        error_handler.add(
+            type=error_handler.ERR_VALIDATE,
+            loc=[error_handler.LOC_QUERY],
+            msg=f"{e}",
+            input=query_data.model_dump(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=error_handler.errors
+        ) from None
+
+    except ValueError as e:
+        error_handler.add(
+            type=error_handler.ERR_VALIDATE,
+            loc=[error_handler.LOC_QUERY],
+            msg=f"{e}",
+            input=query_data.model_dump(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail=error_handler.errors
+        ) from None
+
+    except Exception as e:
+        accel_logger.error(f"Database error: {e}")
+        error_handler.add(
+            type=error_handler.ERR_REDIS,
+            loc=[error_handler.LOC_DATABASE],
+            msg="Database error",
+            input=query_data.model_dump(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=error_handler.errors,
+        ) from None
+
+    return Response(
+        content=json.dumps({"metric_key": metric_key, "leaderboard": board}),
+        status_code=status.HTTP_200_OK,
+        media_type="application/json",
+    )
+
+
+@router.get("/compare/")
+async def get_eval_compare(
+    eval_name: Annotated[str, Query(...)],
+    reference: Annotated[Union[str, None], Query()] = None,
+):
+    query_data = schema.GetEvalCompare(eval_name=eval_name, reference=reference)
+    validator.GetEvalCompare(
+        eval_name=query_data.eval_name, reference=query_data.reference
+    )
+    error_handler = ResponseErrorHandler()
+
+    try:
+        run = await store.eval_result_store.get_latest_run(
+            eval_name=query_data.eval_name
+        )
+        if query_data.reference is not None:
+            reference_run = await store.eval_result_store.get_latest_run(
+                eval_name=query_data.reference
+            )
+        else:
+            # without a reference the fine-tune is compared with its base model
+            _, reference_run = await utils.get_baseline_run(run=run)
+            if reference_run is None:
+                raise KeyError("no finished baseline matches this eval")
+
+    except KeyError as e:
+        error_handler.add(
+            type=error_handler.ERR_VALIDATE,
+            loc=[error_handler.LOC_QUERY],
+            msg=f"{e}",
+            input=query_data.model_dump(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=error_handler.errors
+        ) from None
+
+    except Exception as e:
+        accel_logger.error(f"Database error: {e}")
+        error_handler.add(
+            type=error_handler.ERR_REDIS,
+            loc=[error_handler.LOC_DATABASE],
+            msg="Database error",
+            input=query_data.model_dump(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=error_handler.errors,
+        ) from None
+
+    return Response(
+        content=json.dumps(
+            {
+                "eval_name": query_data.eval_name,
+                "run_id": run["run_id"],
+                "reference": reference_run["eval_name"],
+                "reference_run_id": reference_run["run_id"],
+                "deltas": store.eval_result_store.compare(
+                    run=run, reference=reference_run
+                ),
+            }
+        ),
+        status_code=status.HTTP_200_OK,
+        media_type="application/json",
+    )
+
+
+@router.post("/baseline/")
+async def start_eval_baseline(
+    background_tasks: BackgroundTasks, request_data: schema.PostEvalBaseline
+):
+    validator.PostEvalBaseline(base_models=request_data.base_models)
+    error_handler = ResponseErrorHandler()
+
+    try:
+        base_models = request_data.base_models
+        if base_models is None:
+            base_models = [
+                orjson.loads(info)["name"]
+                for info in await redis_async.client.hvals(TASK_CONFIG.support_model)
+            ]
+
+        entries, queued = list(), list()
+        for base_model in dict.fromkeys(base_models):
+            entry, pending = await baseline.eval_baseline_registry.request(
+                base_model=base_model,
+                tasks=request_data.tasks,
+                limit=request_data.limit,
+            )
+            entries.append(entry)
+            if pending:
+                queued.append(entry)
+
+    except Exception as e:
+        accel_logger.error(f"Database error: {e}")
+        error_handler.add(
+            type=error_handler.ERR_REDIS,
+            loc=[error_handler.LOC_DATABASE],
+            msg="Database error",
+            input=request_data.model_dump(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=error_handler.errors,
+        ) from None
+
+    if queued:
+        background_tasks.add_task(
+            track_background_task(utils.run_baseline_background_task),
+            queued,
+            request_data.concurrency or EVAL_CONFIG.vllm_concurrency,
+            request_data.max_retries,
+            request_data.timeout,
+            request_data.ready_timeout or INFERPOOL_CONFIG.ready_timeout,
+        )
+
+    return Response(
+        content=json.dumps(entries),
+        status_code=status.HTTP_202_ACCEPTED if queued else status.HTTP_200_OK,
+        media_type="application/json",
+    )
+
+
+@router.get("/baseline/")
+async def get_eval_baseline(
+    base_model: Annotated[Union[str, None], Query()] = None,
+):
+    query_data = schema.GetEvalBaseline(base_model=base_model)
+    error_handler = ResponseErrorHandler()
+
+    try:
+        entries = sorted(
+            (
+                entry
+                for entry in (
+                    await baseline.eval_baseline_registry.get_entries()
+                ).values()
+                if query_data.base_model is None
+                or entry["base_model"] == query_data.base_model
+            ),
+            key=lambda entry: entry["created_time"],
+            reverse=True,
+        )
+
+    except Exception as e:
+        accel_logger.error(f"Database error: {e}")
+        error_handler.add(
+            type=error_handler.ERR_REDIS,
+            loc=[error_handler.LOC_DATABASE],
+            msg="Database error",
+            input=query_data.model_dump(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=error_handler.errors,
+        ) from None
+
+    return Response(
+        content=json.dumps(entries),
+        status_code=status.HTTP_200_OK,
+        media_type="application/json",
+    )
+
+
+@router.delete("/baseline/")
+async def delete_eval_baseline(key: Annotated[str, Query(...)]):
+    query_data = schema.DeleteEvalBaseline(key=key)
+    error_handler = ResponseErrorHandler()
+
+    try:
+        deleted = await baseline.eval_baseline_registry.delete(key=query_data.key)
+        await store.eval_result_store.delete(eval_name=deleted["eval_name"])
+        await asyncio.to_thread(
+            shutil.rmtree,
+            os.path.join(COMMON_CONFIG.save_path, deleted["eval_name"]),
+            ignore_errors=True,
+        )
+
+    except KeyError as e:
+        error_handler.add(
+            type=error_handler.ERR_VALIDATE,
+            loc=[error_handler.LOC_QUERY],
+            msg=f"{e}",
+            input=query_data.model_dump(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=error_handler.errors
+        ) from None
+
+    except ValueError as e:
+        error_handler.add(
+            type=error_handler.ERR_VALIDATE,
+            loc=[error_handler.LOC_QUERY],
+            msg=f"{e}",
+            input=query_data.model_dump(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail=error_handler.errors
+        ) from None
+
+    except Exception as e:
+        accel_logger.error(f"Unexpected error: {e}")
+        error_handler.add(
+            type=error_handler.ERR_INTERNAL,
+            loc=[error_handler.LOC_PROCESS],
+            msg=f"Unexpected error: {e}",
+            input=query_data.model_dump(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=error_handler.errors,
+        ) from None
+
+    return Response(
+        content=json.dumps(deleted),
+        status_code=status.HTTP_200_OK,
+        media_type="application/json",
+    )
+
+
+@router.get("/cache/")
+async def get_eval_cache():
+    error_handler = ResponseErrorHandler()
+
+    try:
+        entries = sorted(
+            (await cache.eval_cache.get_entries()).values(),
+            key=lambda entry: entry["last_used"],
+            reverse=True,
+        )
+
+    except Exception as e:
+        accel_logger.error(f"Database error: {e}")
+        error_handler.add(
+            type=error_handler.ERR_REDIS,
+            loc=[error_handler.LOC_DATABASE],
+            msg="Database error",
+            input={},
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=error_handler.errors,
+        ) from None
+
+    return Response(
+        content=json.dumps(
+            {
+                "max_gb": cache.eval_cache.max_gb,
+                "used_gb": round(
+                    sum(entry["size_bytes"] for entry in entries) / cache.GiB, 3
+                ),
+                "entries": entries,
+            }
+        ),
+        status_code=status.HTTP_200_OK,
+        media_type="application/json",
+    )
+
+
+@router.delete("/cache/")
+async def delete_eval_cache(key: Annotated[str, Query(...)]):
+    query_data = schema.DeleteEvalCache(key=key)
+    error_handler = ResponseErrorHandler()
+
+    try:
+        evicted = await cache.eval_cache.evict(key=query_data.key)
+
+    except KeyError as e:
+        error_handler.add(
+            type=error_handler.ERR_VALIDATE,
+            loc=[error_handler.LOC_QUERY],
+            msg=f"{e}",
+            input=query_data.model_dump(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=error_handler.errors
+        ) from None
+
+    except ValueError as e:
+        error_handler.add(
+            type=error_handler.ERR_VALIDATE,
+            loc=[error_handler.LOC_QUERY],
+            msg=f"{e}",
+            input=query_data.model_dump(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail=error_handler.errors
+        ) from None
+
+    except Exception as e:
+        accel_logger.error(f"Unexpected error: {e}")
+        error_handler.add(
+            type=error_handler.ERR_INTERNAL,
+            loc=[error_handler.LOC_PROCESS],
+            msg=f"Unexpected error: {e}",
+            input=query_data.model_dump(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=error_handler.errors,
+        ) from None
+
+    return Response(
+        content=json.dumps(evicted),
+        status_code=status.HTTP_200_OK,
+        media_type="application/json",
+    )
@@ -1,5 +1,5 @@
 import re
-from typing import List
+from typing import List, Union
 
 from fastapi import HTTPException, status
 from pydantic import BaseModel, ConfigDict, model_validator
@@ -14,6 +14,10 @@ class PostStartEval(BaseModel):
     eval_name: str
     tasks: List[str]
     model_service: str
+    concurrency: Union[int, None] = None
+    max_retries: int = 3
+    timeout: int = 300
+    limit: Union[float, None] = None
 
     @model_validator(mode="after")
     def check(self: "PostStartEval") -> "PostStartEval":
@@ -27,6 +31,41 @@ class PostStartEval(BaseModel):
                 input={"eval_name": self.eval_name},
             )
 
+        if self.concurrency is not None and not 1 <= self.concurrency <= 256:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'concurrency' must be between 1 and 256",
+                input={"concurrency": self.concurrency},
+            )
+
+        if not 0 <= self.max_retries <= 10:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'max_retries' must be between 0 and 10",
+                input={"max_retries": self.max_retries},
+            )
+
+        if self.timeout <= 0:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'timeout' must larger than 0",
+                input={"timeout": self.timeout},
+            )
+
+        # lm-eval reads a limit below 1 as a fraction of each task
+        if self.limit is not None and (
+            self.limit <= 0 or (self.limit >= 1 and not self.limit.is_integer())
+        ):
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'limit' must be a fraction below 1 or a whole number of samples",
+                input={"limit": self.limit},
+            )
+
         if error_handler.errors != []:
             raise HTTPException(
                 status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
@@ -62,6 +101,7 @@ class PostStopEval(BaseModel):
 
 class GetEvalResult(BaseModel):
     eval_name: str
+    run_id: Union[str, None] = None
 
     @model_validator(mode="after")
     def check(self: "GetEvalResult") -> "GetEvalResult":
@@ -82,3 +122,209 @@ class GetEvalResult(BaseModel):
             )
 
         return self
+
+
+class GetEvalLeaderboard(BaseModel):
+    task: str
+    metric: str
+    filter: str = "none"
+    n_shot: Union[int, None] = None
+    limit: int = 10
+    base_model: Union[str, None] = None
+
+    @model_validator(mode="after")
+    def check(self: "GetEvalLeaderboard") -> "GetEvalLeaderboard":
+        error_handler = ResponseErrorHandler()
+
+        for name in ("task", "metric", "filter"):
+            if "|" in getattr(self, name) or not getattr(self, name):
+                error_handler.add(
+                    type=error_handler.ERR_VALIDATE,
+                    loc=[error_handler.LOC_QUERY],
+                    msg=f"'{name}' contain invalid characters",
+                    input={name: getattr(self, name)},
+                )
+
+        if self.n_shot is not None and self.n_shot < 0:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_QUERY],
+                msg="'n_shot' must be greater than or equal to 0",
+                input={"n_shot": self.n_shot},
+            )
+
+        if not 1 <= self.limit <= 100:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_QUERY],
+                msg="'limit' must be between 1 and 100",
+                input={"limit": self.limit},
+            )
+
+        if error_handler.errors != []:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=error_handler.errors,
+            )
+
+        return self
+
+
+class GetEvalCompare(BaseModel):
+    eval_name: str
+    reference: Union[str, None] = None
+
+    @model_validator(mode="after")
+    def check(self: "GetEvalCompare") -> "GetEvalCompare":
+        error_handler = ResponseErrorHandler()
+
+        for name in ("eval_name", "reference"):
+            if getattr(self, name) is not None and not re.fullmatch(
+                r"[a-zA-Z0-9][a-zA-Z0-9_.-]+", getattr(self, name)
+            ):
+                error_handler.add(
+                    type=error_handler.ERR_VALIDATE,
+                    loc=[error_handler.LOC_QUERY],
+                    msg=f"'{name}' contain invalid characters",
+                    input={name: getattr(self, name)},
+                )
+
+        if error_handler.errors != []:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=error_handler.errors,
+            )
+
+        return self
+
+
+class DeleteEvalCache(BaseModel):
+    key: str
+
+    @model_validator(mode="after")
+    def check(self: "DeleteEvalCache") -> "DeleteEvalCache":
+        error_handler = ResponseErrorHandler()
+
+        if not re.fullmatch(r"[a-f0-9]{32}", self.key):
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_QUERY],
+                msg="'key' is not a valid cache key",
+                input={"key": self.key},
+            )
+
+        if error_handler.errors != []:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=error_handler.errors,
+            ) from None
+
+        return self
+
+
+class PostEvalBaseline(BaseModel):
+    base_models: Union[List[str], None] = None
+    tasks: List[str]
+    concurrency: Union[int, None] = None
+    max_retries: int = 3
+    timeout: int = 300
+    limit: Union[float, None] = None
+    ready_timeout: Union[int, None] = None
+
+    @model_validator(mode="after")
+    def check(self: "PostEvalBaseline") -> "PostEvalBaseline":
+        error_handler = ResponseErrorHandler()
+
+        if self.base_models is not None and len(self.base_models) == 0:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'base_models' can not be empty, omit it to use every supported model",
+                input={"base_models": self.base_models},
+            )
+
+        if len(self.tasks) == 0:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'tasks' can not be empty",
+                input={"tasks": self.tasks},
+            )
+
+        if self.concurrency is not None and not 1 <= self.concurrency <= 256:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'concurrency' must be between 1 and 256",
+                input={"concurrency": self.concurrency},
+            )
+
+        if not 0 <= self.max_retries <= 10:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'max_retries' must be between 0 and 10",
+                input={"max_retries": self.max_retries},
+            )
+
+        if self.timeout <= 0:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'timeout' must larger than 0",
+                input={"timeout": self.timeout},
+            )
+
+        if self.limit is not None and (
+            self.limit <= 0 or (self.limit >= 1 and not self.limit.is_integer())
+        ):
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'limit' must be a fraction below 1 or a whole number of samples",
+                input={"limit": self.limit},
+            )
+
+        if self.ready_timeout is not None and self.ready_timeout <= 0:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'ready_timeout' must larger than 0",
+                input={"ready_timeout": self.ready_timeout},
+            )
+
+        if error_handler.errors != []:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=error_handler.errors,
+            ) from None
+
+        return self
+
+
+class GetEvalBaseline(BaseModel):
+    base_model: Union[str, None] = None
+
+
+class DeleteEvalBaseline(BaseModel):
+    key: str
+
+    @model_validator(mode="after")
+    def check(self: "DeleteEvalBaseline") -> "DeleteEvalBaseline":
+        error_handler = ResponseErrorHandler()
+
+        if not re.fullmatch(r"[a-f0-9]{32}", self.key):
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_QUERY],
+                msg="'key' is not a valid baseline key",
+                input={"key": self.key},
+            )
+
+        if error_handler.errors != []:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=error_handler.errors,
+            ) from None
+
+        return self
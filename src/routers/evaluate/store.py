@@ -0,0 +1,306 @@
+import itertools
+import os
+from typing import Dict, List, Union
+
+import aiofiles
+import orjson
+
+from src.config.params import TASK_CONFIG
+from src.routers.evaluate import validator
+from src.thirdparty.redis.handler import redis_async
+from src.utils.utils import get_current_time
+
+RESULT_PAGE = 100
+
+
+def get_eval_result_path(root_path: str) -> Union[str, None]:
+    """Newest lm-eval results file under root_path, which keeps one
+    `results_{timestamp}.json` per run below a per-model directory."""
+    if not os.path.isdir(root_path):
+        return
+
+    files = list()
+    for root, _, names in os.walk(root_path):
+        for name in names:
+            if name.startswith("results") and name.endswith(".json"):
+                files.append(os.path.join(root, name))
+
+    if len(files) == 0:
+        return
+    else:
+        return max(files, key=os.path.getmtime)
+
+
+def to_float(value) -> Union[float, None]:
+    # lm-eval writes "N/A" for stderr it did not bootstrap
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_eval_results(data: dict) -> List[dict]:
+    eval_results: Dict[str, dict] = data["results"]
+    eval_configs: Dict[str, dict] = data["configs"]
+    higher_is_better: Dict[str, dict] = data.get("higher_is_better", {})
+
+    task_info = list()
+    for task, configs in eval_configs.items():
+        filter_list = configs.get("filter_list", [{"name": "none"}])
+        metric_list = configs.get("metric_list", [{"metric": "none"}])
+        for filter_config, metric_config in itertools.product(filter_list, metric_list):
+            metric = metric_config["metric"]
+            filter = filter_config["name"]
+            value = to_float(eval_results.get(task, {}).get(f"{metric},{filter}"))
+            if value is None:
+                continue
+
+            info = validator.TaskInfo(
+                name=configs["task"],
+                filter=filter,
+                n_shot=configs.get("num_fewshot") or 0,
+                metric=metric,
+                value=value,
+                stderr=to_float(eval_results[task].get(f"{metric}_stderr,{filter}")),
+            ).model_dump()
+            info["higher_is_better"] = higher_is_better.get(task, {}).get(
+                metric, metric_config.get("higher_is_better", True)
+            )
+            task_info.append(info)
+
+    return task_info
+
+
+class EvalResultStore:
+    """Eval results parsed once per run and indexed in redis.
+
+    Every run is kept under its own id, and the latest run of each eval gets
+    a score in one sorted set per task, metric, filter and n_shot, so
+    rankings and comparisons never go back to the lm-eval output files."""
+
+    def __init__(self, prefix: str) -> None:
+        self.prefix = prefix
+
+    @property
+    def metrics_key(self) -> str:
+        return f"{self.prefix}:metrics"
+
+    def runs_key(self, eval_name: str) -> str:
+        return f"{self.prefix}:runs:{eval_name}"
+
+    def score_key(self, metric_key: str) -> str:
+        return f"{self.prefix}:score:{metric_key}"
+
+    @staticmethod
+    def build_metric_key(task: str, metric: str, filter: str, n_shot: int) -> str:
+        return f"{task}|{metric}|{filter}|{n_shot}"
+
+    async def ingest(
+        self,
+        eval_name: str,
+        path: str,
+        base_model: str,
+        config: dict,
+        index: bool = True,
+    ) -> dict:
+        async with aiofiles.open(path) as f:
+            data = orjson.loads(await f.read())
+
+        finished_time, _ = get_current_time()
+        run = {
+            "run_id": f"{eval_name}:{os.path.splitext(os.path.basename(path))[0]}",
+            "eval_name": eval_name,
+            "base_model": base_model,
+            "config": config,
+            "path": path,
+            "finished_time": finished_time,
+            "task_info": parse_eval_results(data=data),
+        }
+
+        async with redis_async.client.pipeline(transaction=True) as pipe:
+            pipe.hset(self.prefix, run["run_id"], orjson.dumps(run))
+            pipe.zadd(self.runs_key(eval_name), {run["run_id"]: finished_time})
+            # baselines are kept out of the fine-tune rankings
+            for info in run["task_info"] if index else list():
+                metric_key = self.build_metric_key(
+                    task=info["name"],
+                    metric=info["metric"],
+                    filter=info["filter"],
+                    n_shot=info["n_shot"],
+                )
+                pipe.hset(
+                    self.metrics_key,
+                    metric_key,
+                    orjson.dumps(
+                        {
+                            "task": info["name"],
+                            "metric": info["metric"],
+                            "filter": info["filter"],
+                            "n_shot": info["n_shot"],
+                            "higher_is_better": info["higher_is_better"],
+                        }
+                    ),
+                )
+                pipe.zadd(self.score_key(metric_key), {eval_name: info["value"]})
+            await pipe.execute()
+
+        return run
+
+    async def get_run(self, run_id: str) -> Union[dict, None]:
+        run = await redis_async.client.hget(self.prefix, run_id)
+        return orjson.loads(run) if run else None
+
+    async def get_latest_run(self, eval_name: str) -> Union[dict, None]:
+        run_ids = await redis_async.client.zrevrange(self.runs_key(eval_name), 0, 0)
+        return await self.get_run(run_id=run_ids[0]) if run_ids else None
+
+    async def get_runs(self, eval_name: str) -> List[dict]:
+        run_ids = await redis_async.client.zrevrange(self.runs_key(eval_name), 0, -1)
+        if not run_ids:
+            return list()
+
+        runs = await redis_async.client.hmget(self.prefix, run_ids)
+        return [orjson.loads(run) for run in runs if run]
+
+    async def get_metrics(self) -> List[dict]:
+        metrics = await redis_async.client.hgetall(self.metrics_key)
+        return sorted(
+            (orjson.loads(value) for value in metrics.values()),
+            key=lambda metric: (metric["task"], metric["metric"], metric["n_shot"]),
+        )
+
+    async def get_metric(self, metric_key: str) -> Union[dict, None]:
+        metric = await redis_async.client.hget(self.metrics_key, metric_key)
+        return orjson.loads(metric) if metric else None
+
+    async def resolve_metric_key(
+        self, task: str, metric: str, filter: str, n_shot: Union[int, None]
+    ) -> str:
+        if n_shot is not None:
+            metric_key = self.build_metric_key(
+                task=task, metric=metric, filter=filter, n_shot=n_shot
+            )
+            if await self.get_metric(metric_key=metric_key) is None:
+                raise KeyError(f"no eval result for {metric_key}")
+            return metric_key
+
+        candidates = [
+            self.build_metric_key(
+                task=item["task"],
+                metric=item["metric"],
+                filter=item["filter"],
+                n_shot=item["n_shot"],
+            )
+            for item in await self.get_metrics()
+            if (item["task"], item["metric"], item["filter"]) == (task, metric, filter)
+        ]
+        if len(candidates) == 0:
+            raise KeyError(f"no eval result for {task}|{metric}|{filter}")
+        if len(candidates) > 1:
+            raise ValueError("results exist for several n_shot, specify 'n_shot'")
+        return candidates[0]
+
+    async def leaderboard(
+        self, metric_key: str, limit: int, base_model: Union[str, None] = None
+    ) -> List[dict]:
+        metric = await self.get_metric(metric_key=metric_key)
+        if metric is None:
+            return list()
+
+        zrange = (
+            redis_async.client.zrevrange
+            if metric["higher_is_better"]
+            else redis_async.client.zrange
+        )
+        board, start = list(), 0
+        while len(board) < limit:
+            members = await zrange(
+                self.score_key(metric_key), start, start + RESULT_PAGE - 1
+            )
+            if not members:
+                break
+            start += RESULT_PAGE
+
+            for eval_name in members:
+                run = await self.get_latest_run(eval_name=eval_name)
+                if run is None or (
+                    base_model is not None and run["base_model"] != base_model
+                ):
+                    continue
+
+                info = self.find_task_info(run=run, metric_key=metric_key)
+                if info is None:
+                    continue
+
+                board.append(
+                    {
+                        "rank": len(board) + 1,
+                        "eval_name": eval_name,
+                        "base_model": run["base_model"],
+                        "run_id": run["run_id"],
+                        "value": info["value"],
+                        "stderr": info["stderr"],
+                        "limit": run["config"].get("limit"),
+                    }
+                )
+                if len(board) == limit:
+                    break
+
+        return board
+
+    def find_task_info(self, run: dict, metric_key: str) -> Union[dict, None]:
+        for info in run["task_info"]:
+            if (
+                self.build_metric_key(
+                    task=info["name"],
+                    metric=info["metric"],
+                    filter=info["filter"],
+                    n_shot=info["n_shot"],
+                )
+                == metric_key
+            ):
+                return info
+
+    def compare(self, run: dict, reference: dict) -> List[dict]:
+        deltas = list()
+        for info in run["task_info"]:
+            reference_info = self.find_task_info(
+                run=reference,
+                metric_key=self.build_metric_key(
+                    task=info["name"],
+                    metric=info["metric"],
+                    filter=info["filter"],
+                    n_shot=info["n_shot"],
+                ),
+            )
+            if reference_info is None:
+                continue
+
+            delta = info["value"] - reference_info["value"]
+            deltas.append(
+                {
+                    "name": info["name"],
+                    "filter": info["filter"],
+                    "n_shot": info["n_shot"],
+                    "metric": info["metric"],
+                    "value": info["value"],
+                    "reference_value": reference_info["value"],
+                    "delta": delta,
+                    "improved": (delta > 0 if info["higher_is_better"] else delta < 0),
+                }
+            )
+        return deltas
+
+    async def delete(self, eval_name: str) -> None:
+        run_ids = await redis_async.client.zrange(self.runs_key(eval_name), 0, -1)
+        metric_keys = await redis_async.client.hkeys(self.metrics_key)
+        async with redis_async.client.pipeline(transaction=True) as pipe:
+            if run_ids:
+                pipe.hdel(self.prefix, *run_ids)
+            pipe.delete(self.runs_key(eval_name))
+            for metric_key in metric_keys:
+                pipe.zrem(self.score_key(metric_key), eval_name)
+            await pipe.execute()
+
+
+eval_result_store = EvalResultStore(prefix=TASK_CONFIG.eval_result)
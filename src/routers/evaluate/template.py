@@ -1,14 +1,20 @@
 import re
-from typing import Union
+import time
+from typing import Tuple, Union
 
 from pydantic import BaseModel
 
 
 class EvalLogTemplate(BaseModel):
     eval_progress: Union[float, None] = None
+    requests_remaining: Union[int, None] = None
+    eta_seconds: Union[float, None] = None
     current_task: Union[str, None] = None
     ori: Union[str, None] = None
 
+    # (monotonic time, done, total) when the current progress bar was first seen
+    _progress_start: Union[Tuple[float, int, int], None] = None
+
     _attach_patterns = {
         "eval_progress": {
             "pattern": re.compile(r"Requesting API:\s+\d+%\s(\d+)/(\d+)"),
@@ -29,6 +35,11 @@ class EvalLogTemplate(BaseModel):
     def set_first_task(self, first_task: str) -> None:
         self.current_task = first_task
 
+    def get_state(self) -> Tuple[Union[float, None], Union[str, None]]:
+        # eta and the raw line change on every tick, they are not part of it
+        progress = None if self.eval_progress is None else round(self.eval_progress, 2)
+        return progress, self.current_task
+
     def _get_eval_progress(
         self, parse_current_request: int, total_requests: int
     ) -> float:
@@ -37,11 +48,34 @@ class EvalLogTemplate(BaseModel):
         else:
             return 0.0
 
+    def _update_eta(self, done: int, total: int) -> None:
+        self.requests_remaining = total - done
+        now = time.monotonic()
+        if (
+            self._progress_start is None
+            or self._progress_start[2] != total
+            or self._progress_start[1] > done
+        ):
+            # a new progress bar starts with every request batch
+            self._progress_start = (now, done, total)
+            self.eta_seconds = None
+            return
+
+        start_time, start_done, _ = self._progress_start
+        finished = done - start_done
+        if finished > 0 and now > start_time:
+            self.eta_seconds = round(
+                self.requests_remaining * (now - start_time) / finished, 1
+            )
+
     def parse_eval_attach(self, stdout: str):
         for key, value in self._attach_patterns.items():
             match = self._attach_patterns[key]["pattern"].search(stdout)
             if match:
                 if key == "eval_progress":
+                    self._update_eta(
+                        done=int(match.group(1)), total=int(match.group(2))
+                    )
                     result = self._get_eval_progress(
                         parse_current_request=int(match.group(1)),
                         total_requests=int(match.group(2)),
@@ -1,13 +1,23 @@
-import itertools
 import os
-from typing import Dict, Union
+import time
+from typing import List, Union
 
-import aiofiles
 import httpx
 import orjson
 
-from src.config.params import COMMON_CONFIG, STATUS_CONFIG, TASK_CONFIG
+from src.config.params import (
+    COMMON_CONFIG,
+    DOCKERNETWORK_CONFIG,
+    EVAL_CONFIG,
+    STATUS_CONFIG,
+    TASK_CONFIG,
+)
 from src.routers.evaluate import template, validator
+from src.routers.evaluate.baseline import eval_baseline_registry
+from src.routers.evaluate.cache import eval_cache
+from src.routers.evaluate.store import eval_result_store, get_eval_result_path
+from src.routers.hw_info.usage import track_usage
+from src.routers.infer_backend.pool import ensure_base_backend, infer_backend_pool
 from src.thirdparty.docker.api_handler import (
     attach_container,
     create_container,
@@ -18,6 +28,62 @@ from src.thirdparty.docker.api_handler import (
 )
 from src.thirdparty.redis.handler import redis_async
 from src.utils.logger import accel_logger
+from src.utils.utils import assemble_image_name
+
+
+def default_eval_concurrency(infer_backend_type: Union[str, None]) -> int:
+    if infer_backend_type == "vllm":
+        return EVAL_CONFIG.vllm_concurrency
+    elif infer_backend_type == "ollama":
+        return EVAL_CONFIG.ollama_concurrency
+    else:
+        return 1
+
+
+def build_lm_eval_cmd(
+    eval_name: str,
+    tasks: List[str],
+    model_service: str,
+    served_model_name: str,
+    tokenizer: str,
+    concurrency: int,
+    max_retries: int,
+    timeout: int,
+    limit: Union[float, None] = None,
+    use_cache_path: Union[str, None] = None,
+) -> List[str]:
+    cmd = [
+        "lm-eval",
+        "--model",
+        "local-completions",
+        "--task",
+        ",".join(tasks),
+        "--batch_size",
+        "auto",
+        "--output_path",
+        os.path.join(COMMON_CONFIG.save_path, eval_name, "evaluate"),
+    ]
+
+    if use_cache_path is not None:
+        cmd += ["--use_cache", use_cache_path]
+
+    if any("humaneval" in task or "mbpp" in task for task in tasks):
+        cmd += ["--confirm_run_unsafe_code"]
+
+    if limit is not None:
+        cmd += ["--limit", f"{int(limit)}" if limit.is_integer() else f"{limit}"]
+
+    model_args = (
+        f"model={served_model_name},"
+        + f"base_url={model_service}/v1/completions,"
+        + f"num_concurrent={concurrency},"
+        + f"max_retries={max_retries},"
+        + f"timeout={timeout},"
+        + f"tokenizer={tokenizer}"
+    )
+    cmd += ["--model_args", model_args]
+
+    return cmd
 
 
 async def run_lm_eval(
@@ -33,6 +99,7 @@ async def run_lm_eval(
             "Binds": [
                 f"{COMMON_CONFIG.hf_home}:{COMMON_CONFIG.hf_home}:rw",
                 f"{COMMON_CONFIG.root_path}/saves/{eval_name}:{COMMON_CONFIG.save_path}/{eval_name}:rw",
+                f"{os.path.join(COMMON_CONFIG.root_path, os.path.relpath(COMMON_CONFIG.cache_path, COMMON_CONFIG.workspace_path))}:{COMMON_CONFIG.cache_path}:rw",
             ],
             "NetworkMode": docker_network_name,
         },
@@ -59,104 +126,143 @@ async def run_lm_eval(
         raise RuntimeError(f"{e}") from None
 
 
-def get_eval_result_path(root_path: str) -> Union[str, None]:
-    with os.scandir(root_path) as entries:
-        files = [
-            entry.path
-            for entry in entries
-            if entry.is_file() and entry.name.endswith(".json")
-        ]
-
-    if len(files) == 0:
-        return
-    else:
-        return files[0]
+async def publish_eval_log(stream: str, data: str, eval_status: str) -> None:
+    await redis_async.client.xadd(
+        stream,
+        {"data": data, "status": eval_status},
+        maxlen=EVAL_CONFIG.stream_maxlen,
+        approximate=True,
+    )
 
 
 async def start_eval_background_task(
-    eval_name: str, container_name_or_id: str, eval_tasks_list: list
+    eval_name: str,
+    container_name_or_id: str,
+    eval_tasks_list: list,
+    cache_key: Union[str, None] = None,
 ) -> None:
-    try:
-        transport = httpx.AsyncHTTPTransport(uds="/var/run/docker.sock")
-        async with httpx.AsyncClient(transport=transport, timeout=None) as aclient:
-            eval_log = template.EvalLogTemplate()
-            eval_log.set_first_task(first_task=eval_tasks_list[0])
-
-            async for log in attach_container(
-                aclient=aclient, container_name_or_id=container_name_or_id
-            ):
-                if not log:
-                    break
-
-                if "\r" in log:
-                    log_split = log.split("\r")[-1].strip()
-                elif log.strip():
-                    log_split = log.strip()
-
-                eval_log.parse_eval_attach(stdout=log_split.strip())
-                await redis_async.client.xadd(
-                    container_name_or_id,
-                    {
-                        "data": eval_log.model_dump_json(),
-                        "status": STATUS_CONFIG.active,
-                    },
+    # holds a pool reference so the backend under evaluation is not evicted
+    async with infer_backend_pool.use(name=eval_name):
+        try:
+            transport = httpx.AsyncHTTPTransport(uds="/var/run/docker.sock")
+            async with httpx.AsyncClient(transport=transport, timeout=None) as aclient:
+                async with track_usage(
+                    name=eval_name,
+                    job="eval",
+                    container_name_or_id=container_name_or_id,
+                ):
+                    eval_log = template.EvalLogTemplate()
+                    eval_log.set_first_task(first_task=eval_tasks_list[0])
+                    last_state, last_publish = None, 0.0
+
+                    async for log in attach_container(
+                        aclient=aclient, container_name_or_id=container_name_or_id
+                    ):
+                        if not log:
+                            break
+
+                        if "\r" in log:
+                            log_split = log.split("\r")[-1].strip()
+                        elif log.strip():
+                            log_split = log.strip()
+
+                        eval_log.parse_eval_attach(stdout=log_split.strip())
+                        # publish on a state change, the eta in between at most
+                        # once per interval
+                        state = eval_log.get_state()
+                        now = time.monotonic()
+                        if (
+                            state == last_state
+                            and now - last_publish < EVAL_CONFIG.stream_interval
+                        ):
+                            continue
+                        last_state, last_publish = state, now
+                        await publish_eval_log(
+                            stream=container_name_or_id,
+                            data=eval_log.model_dump_json(),
+                            eval_status=STATUS_CONFIG.active,
+                        )
+
+                    container_info = await wait_for_container(
+                        aclient=aclient, container_name=container_name_or_id
+                    )
+                exit_status = container_info["StatusCode"]
+                if exit_status == 0:
+                    eval_status = STATUS_CONFIG.finish
+                elif exit_status == 1:
+                    eval_status = STATUS_CONFIG.failed
+                else:
+                    eval_status = STATUS_CONFIG.stopped
+
+                await remove_container(
+                    aclient=aclient, container_name_or_id=container_name_or_id
                 )
 
-            container_info = await wait_for_container(
-                aclient=aclient, container_name=container_name_or_id
-            )
-            exit_status = container_info["StatusCode"]
-            if exit_status == 0:
-                eval_status = STATUS_CONFIG.finish
-            elif exit_status == 1:
-                eval_status = STATUS_CONFIG.failed
-            else:
-                eval_status = STATUS_CONFIG.stopped
-            await redis_async.client.xadd(
-                container_name_or_id, {"data": "", "status": eval_status}
-            )
-
-            await remove_container(
-                aclient=aclient, container_name_or_id=container_name_or_id
-            )
-
-            await redis_async.client.delete(container_name_or_id)
-
-    except ValueError as e:
-        eval_status = STATUS_CONFIG.failed
-        accel_logger.error(f"Docker error: {e}")
+        except ValueError as e:
+            eval_status = STATUS_CONFIG.failed
+            accel_logger.error(f"Docker error: {e}")
 
-    except RuntimeError as e:
-        eval_status = STATUS_CONFIG.failed
-        accel_logger.error(f"Docker error: {e}")
+        except RuntimeError as e:
+            eval_status = STATUS_CONFIG.failed
+            accel_logger.error(f"Docker error: {e}")
 
-    except Exception as e:
-        eval_status = STATUS_CONFIG.failed
-        accel_logger.error(f"Unexpected error: {e}")
-
-    finally:
-        try:
-            if eval_status in {STATUS_CONFIG.finish, STATUS_CONFIG.failed}:
-                info = await redis_async.client.hget(TASK_CONFIG.train, eval_name)
-                info = orjson.loads(info)
-
-                info["container"]["eval"]["status"] = eval_status
-                info["container"]["eval"]["id"] = None
-
-                eval_result_path = get_eval_result_path(
-                    root_path=os.path.join(
-                        os.path.dirname(info["train_args"]["output_dir"]),
-                        "evaluate",
-                        eval_name,
-                    )
+        except Exception as e:
+            eval_status = STATUS_CONFIG.failed
+            accel_logger.error(f"Unexpected error: {e}")
+
+        finally:
+            # the final state outlives the run briefly so late clients still see it
+            try:
+                await publish_eval_log(
+                    stream=container_name_or_id, data="", eval_status=eval_status
                 )
-                info["eval_result_path"] = eval_result_path
-
-                await redis_async.client.hset(
-                    TASK_CONFIG.train, eval_name, orjson.dumps(info)
+                await redis_async.client.expire(
+                    container_name_or_id, EVAL_CONFIG.stream_ttl
                 )
-        except Exception as e:
-            accel_logger.error(f"Database error: {e}")
+            except Exception as e:
+                accel_logger.error(f"Database error: {e}")
+
+            try:
+                if eval_status in {STATUS_CONFIG.finish, STATUS_CONFIG.failed}:
+                    info = await redis_async.client.hget(TASK_CONFIG.train, eval_name)
+                    info = orjson.loads(info)
+
+                    info["container"]["eval"]["status"] = eval_status
+                    info["container"]["eval"]["id"] = None
+
+                    eval_result_path = get_eval_result_path(
+                        root_path=os.path.join(
+                            os.path.dirname(info["train_args"]["output_dir"]),
+                            "evaluate",
+                            eval_name,
+                        )
+                    )
+                    info["eval_result_path"] = eval_result_path
+
+                    await redis_async.client.hset(
+                        TASK_CONFIG.train, eval_name, orjson.dumps(info)
+                    )
+            except Exception as e:
+                accel_logger.error(f"Database error: {e}")
+
+            if eval_status == STATUS_CONFIG.finish:
+                try:
+                    await ingest_eval_result(info=info, tasks=eval_tasks_list)
+                except Exception as e:
+                    accel_logger.error(f"Eval result store error: {e}")
+
+            if cache_key is not None:
+                try:
+                    await eval_cache.release(
+                        key=cache_key,
+                        finished_tasks=(
+                            eval_tasks_list
+                            if eval_status == STATUS_CONFIG.finish
+                            else []
+                        ),
+                    )
+                except Exception as e:
+                    accel_logger.error(f"Eval cache error: {e}")
 
 
 async def stop_eval_background_task(container_name_or_id: str) -> None:
@@ -174,42 +280,172 @@ async def stop_eval_background_task(container_name_or_id: str) -> None:
         accel_logger.error(f"{e}")
 
 
-async def eval_finish_event(path: str) -> validator.EvalResult:
-    output = validator.EvalResult()
-
-    if os.path.exists(path):
-        async with aiofiles.open(path) as f:
-            content = await f.read()
-        data = orjson.loads(content)
-        eval_results: Dict[str, dict] = data["results"]
-        eval_configs: Dict[str, dict] = data["configs"]
-
-        for task, configs in eval_configs.items():
-            filter_list = configs.get("filter_list", [{"name": "none"}])
-            metric_list = configs.get("metric_list", [{"metric": "none"}])
-            for filter_config, metric_config in itertools.product(
-                filter_list, metric_list
-            ):
-                metric = metric_config["metric"]
-                filter = filter_config["name"]
-                task_info = validator.TaskInfo(
-                    name=configs["task"],
-                    filter=filter,
-                    n_shot=configs["num_fewshot"],
-                    metric=metric,
-                    value=eval_results[task][f"{metric},{filter}"],
-                    stderr=eval_results[task][f"{metric}_stderr,{filter}"],
+async def ingest_eval_result(info: dict, tasks: list) -> Union[dict, None]:
+    if info["eval_result_path"] is None or not os.path.exists(info["eval_result_path"]):
+        return
+
+    return await eval_result_store.ingest(
+        eval_name=info["name"],
+        path=info["eval_result_path"],
+        base_model=info["train_args"]["base_model"],
+        config=dict(info["container"]["eval"].get("config") or {}, tasks=tasks),
+    )
+
+
+async def get_eval_result(info: dict, run_id: Union[str, None] = None) -> dict:
+    if run_id is not None:
+        run = await eval_result_store.get_run(run_id=run_id)
+    else:
+        run = await eval_result_store.get_latest_run(eval_name=info["name"])
+        if run is None and info["container"]["eval"]["status"] == STATUS_CONFIG.finish:
+            # results finished before the store existed are ingested on first read
+            run = await ingest_eval_result(info=info, tasks=[])
+
+    if run is None or run["eval_name"] != info["name"]:
+        raise KeyError("eval result does not exists")
+
+    eval_result = validator.EvalResult(task_info=run["task_info"])
+
+    return {
+        "run_id": run["run_id"],
+        "finished_time": run["finished_time"],
+        "config": run["config"],
+        **eval_result.model_dump(),
+        "baseline": await get_baseline_comparison(run=run),
+    }
+
+
+async def get_baseline_run(run: dict) -> tuple:
+    """Baseline entry matching the base model, tasks and limit of `run`, and
+    its stored run once the baseline has finished."""
+    if not run["config"].get("tasks"):
+        return None, None
+
+    entry = await eval_baseline_registry.find(
+        base_model=run["base_model"],
+        tasks=run["config"]["tasks"],
+        limit=run["config"].get("limit"),
+    )
+    if entry is None or entry["run_id"] is None:
+        return entry, None
+
+    return entry, await eval_result_store.get_run(run_id=entry["run_id"])
+
+
+async def get_baseline_comparison(run: dict) -> Union[dict, None]:
+    entry, baseline_run = await get_baseline_run(run=run)
+    if entry is None:
+        return None
+
+    return {
+        "key": entry["key"],
+        "base_model": entry["base_model"],
+        "status": entry["status"],
+        "run_id": entry["run_id"],
+        "deltas": (
+            eval_result_store.compare(run=run, reference=baseline_run)
+            if baseline_run is not None
+            else list()
+        ),
+    }
+
+
+async def run_baseline_eval(
+    entry: dict,
+    concurrency: int,
+    max_retries: int,
+    timeout: int,
+    ready_timeout: int,
+) -> None:
+    try:
+        base_entry = await ensure_base_backend(
+            base_model=entry["base_model"], ready_timeout=ready_timeout
+        )
+        async with infer_backend_pool.use(name=base_entry["name"]):
+            container_name_or_id = await run_lm_eval(
+                image_name=assemble_image_name(
+                    username=COMMON_CONFIG.username,
+                    repository=f"{COMMON_CONFIG.repository}-{EVAL_CONFIG.name}",
+                    tag=EVAL_CONFIG.tag,
+                ),
+                cmd=build_lm_eval_cmd(
+                    eval_name=entry["eval_name"],
+                    tasks=entry["tasks"],
+                    model_service=base_entry["url"],
+                    served_model_name=base_entry["name"],
+                    tokenizer=entry["base_model"],
+                    concurrency=concurrency,
+                    max_retries=max_retries,
+                    timeout=timeout,
+                    limit=entry["config"]["limit"],
+                ),
+                docker_network_name=DOCKERNETWORK_CONFIG.network_name,
+                eval_name=entry["eval_name"],
+            )
+            await eval_baseline_registry.update(
+                key=entry["key"], status=STATUS_CONFIG.active, id=container_name_or_id
+            )
+
+            transport = httpx.AsyncHTTPTransport(uds="/var/run/docker.sock")
+            async with httpx.AsyncClient(transport=transport, timeout=None) as aclient:
+                container_info = await wait_for_container(
+                    aclient=aclient, container_name=container_name_or_id
+                )
+                await remove_container(
+                    aclient=aclient, container_name_or_id=container_name_or_id
                 )
-                output.task_info.append(task_info)
 
-    validator.EvalResult.model_validate(output)
+        if container_info["StatusCode"] != 0:
+            raise RuntimeError(
+                f"lm-eval exited with status {container_info['StatusCode']}"
+            )
 
-    return output
+        eval_result_path = get_eval_result_path(
+            root_path=os.path.join(COMMON_CONFIG.save_path, entry["eval_name"])
+        )
+        if eval_result_path is None:
+            raise FileNotFoundError("can not found eval result")
+
+        run = await eval_result_store.ingest(
+            eval_name=entry["eval_name"],
+            path=eval_result_path,
+            base_model=entry["base_model"],
+            config=dict(entry["config"], tasks=entry["tasks"]),
+            index=False,
+        )
+        await eval_baseline_registry.update(
+            key=entry["key"],
+            status=STATUS_CONFIG.finish,
+            id=None,
+            run_id=run["run_id"],
+            error=None,
+            finished_time=run["finished_time"],
+        )
+        accel_logger.info(f"Finished baseline eval of {entry['base_model']}")
 
+    except Exception as e:
+        accel_logger.error(f"Baseline eval of {entry['base_model']} failed: {e}")
+        try:
+            await eval_baseline_registry.update(
+                key=entry["key"], status=STATUS_CONFIG.failed, id=None, error=f"{e}"
+            )
+        except Exception as e:
+            accel_logger.error(f"Database error: {e}")
 
-async def get_eval_result(info: dict) -> dict:
-    status = info["container"]["eval"]["status"]
-    if status == STATUS_CONFIG.finish:
-        eval_result = await eval_finish_event(path=info["eval_result_path"])
 
-    return eval_result.model_dump()
+async def run_baseline_background_task(
+    entries: List[dict],
+    concurrency: int,
+    max_retries: int,
+    timeout: int,
+    ready_timeout: int,
+) -> None:
+    # one base model at a time, each one is loaded through the pool
+    for entry in entries:
+        await run_baseline_eval(
+            entry=entry,
+            concurrency=concurrency,
+            max_retries=max_retries,
+            timeout=timeout,
+            ready_timeout=ready_timeout,
+        )
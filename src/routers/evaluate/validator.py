@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Union
 
 import orjson
 from fastapi import HTTPException, status
@@ -21,11 +21,10 @@ class PostStartEval(BaseModel):
             if not info:
                 raise KeyError("eval_name does not exists")
 
+            # a loaded backend is only needed when the eval cache is cold,
+            # which is checked when the eval starts
             info = orjson.loads(info)
 
-            if info["container"]["infer_backend"]["status"] != STATUS_CONFIG.active:
-                raise ValueError("model has not been loaded")
-
             if info["container"]["eval"]["status"] == STATUS_CONFIG.active:
                 raise ValueError("eval task is being executed")
 
@@ -124,7 +123,9 @@ class GetEvalResult(BaseModel):
                 raise KeyError("eval_name does not exists")
 
             eval_status = orjson.loads(info)["container"]["eval"]["status"]
-            if eval_status != STATUS_CONFIG.finish:
+            if eval_status != STATUS_CONFIG.finish and not redis_sync.client.exists(
+                f"{TASK_CONFIG.eval_result}:runs:{self.eval_name}"
+            ):
                 raise ValueError(f"can not get eval result, status is {eval_status}")
 
         except KeyError as e:
@@ -166,13 +167,100 @@ class GetEvalResult(BaseModel):
         return self
 
 
+class GetEvalCompare(BaseModel):
+    eval_name: str
+    reference: Union[str, None] = None
+
+    @model_validator(mode="after")
+    def check(self: "GetEvalCompare") -> "GetEvalCompare":
+        error_handler = ResponseErrorHandler()
+
+        try:
+            for name in (self.eval_name, self.reference):
+                if name is None:
+                    continue
+                if not redis_sync.client.exists(
+                    f"{TASK_CONFIG.eval_result}:runs:{name}"
+                ):
+                    raise KeyError(f"eval result of {name} does not exists")
+
+        except KeyError as e:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_QUERY],
+                msg=f"{e}",
+                input={"eval_name": self.eval_name, "reference": self.reference},
+            )
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=error_handler.errors,
+            ) from None
+
+        except Exception as e:
+            error_handler.add(
+                type=error_handler.ERR_REDIS,
+                loc=[error_handler.LOC_DATABASE],
+                msg=f"Database error: {e}",
+                input={"eval_name": self.eval_name, "reference": self.reference},
+            )
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=error_handler.errors,
+            ) from None
+
+        return self
+
+
+class PostEvalBaseline(BaseModel):
+    base_models: Union[List[str], None] = None
+
+    @model_validator(mode="after")
+    def check(self: "PostEvalBaseline") -> "PostEvalBaseline":
+        error_handler = ResponseErrorHandler()
+
+        try:
+            support_models = {
+                orjson.loads(info)["name"]
+                for info in redis_sync.client.hvals(TASK_CONFIG.support_model)
+            }
+            for base_model in self.base_models or list():
+                if base_model not in support_models:
+                    raise KeyError(f"base model {base_model} is not supported")
+
+        except KeyError as e:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg=f"{e}",
+                input={"base_models": self.base_models},
+            )
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=error_handler.errors,
+            ) from None
+
+        except Exception as e:
+            error_handler.add(
+                type=error_handler.ERR_REDIS,
+                loc=[error_handler.LOC_DATABASE],
+                msg=f"Database error: {e}",
+                input={"base_models": self.base_models},
+            )
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=error_handler.errors,
+            ) from None
+
+        return self
+
+
 class TaskInfo(BaseModel):
     name: str
     filter: str
     n_shot: int
     metric: str
     value: float
-    stderr: float
+    stderr: Union[float, None] = None
 
 
 class EvalResult(BaseModel):
@@ -0,0 +1,235 @@
+import json
+from typing import Annotated, Union
+
+import orjson
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from pydantic import ValidationError
+
+from src.config.params import INFERPOOL_CONFIG, STATUS_CONFIG, TASK_CONFIG
+from src.routers.gateway import schema, utils, validator
+from src.thirdparty.redis.handler import redis_async
+from src.utils.error import ResponseErrorHandler
+from src.utils.logger import accel_logger
+from src.utils.metrics import track_background_task
+from src.utils.utils import generate_uuid
+
+router = APIRouter(prefix="/gateway", tags=["Gateway"])
+
+
+async def proxy_completion(request: Request, path: str) -> Response:
+    error_handler = ResponseErrorHandler()
+    content = await request.body()
+
+    try:
+        request_data = schema.PostGatewayCompletion.model_validate(
+            orjson.loads(content)
+        )
+
+    except (orjson.JSONDecodeError, ValidationError) as e:
+        error_handler.add(
+            type=error_handler.ERR_VALIDATE,
+            loc=[error_handler.LOC_BODY],
+            msg=f"{e}",
+            input={},
+        )
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=error_handler.errors,
+        ) from None
+
+    validator.PostGatewayCompletion(model=request_data.model)
+
+    try:
+        return await utils.gateway_router.proxy(
+            model_name=request_data.model,
+            path=path,
+            content=content,
+            stream=request_data.stream,
+        )
+
+    except Exception as e:
+        accel_logger.error(f"Gateway error: {e}")
+        error_handler.add(
+            type=error_handler.ERR_INTERNAL,
+            loc=[error_handler.LOC_PROCESS],
+            msg=f"{e}",
+            input={"model": request_data.model},
+        )
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY, detail=error_handler.errors
+        ) from None
+
+
+@router.post("/v1/chat/completions")
+async def gateway_chat_completions(request: Request):
+    return await proxy_completion(request=request, path="/v1/chat/completions")
+
+
+@router.post("/v1/completions")
+async def gateway_completions(request: Request):
+    return await proxy_completion(request=request, path="/v1/completions")
+
+
+@router.get("/v1/models")
+async def gateway_models():
+    error_handler = ResponseErrorHandler()
+
+    try:
+        info = await redis_async.client.hgetall(TASK_CONFIG.train)
+        models = [
+            {"id": name, "object": "model", "owned_by": "acceltune"}
+            for name, value in info.items()
+            if orjson.loads(value)["container"]["infer_backend"]["status"]
+            == STATUS_CONFIG.active
+        ]
+
+    except Exception as e:
+        accel_logger.error(f"Database error: {e}")
+        error_handler.add(
+            type=error_handler.ERR_REDIS,
+            loc=[error_handler.LOC_DATABASE],
+            msg="Database error",
+            input={},
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=error_handler.errors,
+        ) from None
+
+    return Response(
+        content=json.dumps({"object": "list", "data": models}),
+        status_code=status.HTTP_200_OK,
+        media_type="application/json",
+    )
+
+
+@router.post("/scale/")
+async def scale_gateway(
+    background_tasks: BackgroundTasks, request_data: schema.PostGatewayScale
+):
+    validator.PostGatewayScale(model_name=request_data.model_name)
+    error_handler = ResponseErrorHandler()
+
+    try:
+        async with utils.gateway_router.lock:
+            record = await utils.gateway_router.get_record(
+                model_name=request_data.model_name
+            )
+            # the primary backend counts as the first replica
+            extra = request_data.replicas - 1
+            start, stop = list(), list()
+            if extra > len(record["replicas"]):
+                for _ in range(extra - len(record["replicas"])):
+                    replica = {
+                        "replica_id": generate_uuid(),
+                        "id": None,
+                        "url": None,
+                        "status": STATUS_CONFIG.setup,
+                    }
+                    record["replicas"].append(replica)
+                    start.append(replica["replica_id"])
+            else:
+                record["replicas"], stop = (
+                    record["replicas"][:extra],
+                    record["replicas"][extra:],
+                )
+            record["error"] = None
+            await utils.gateway_router.save_record(record=record)
+
+    except Exception as e:
+        accel_logger.error(f"Database error: {e}")
+        error_handler.add(
+            type=error_handler.ERR_REDIS,
+            loc=[error_handler.LOC_DATABASE],
+            msg=f"Database error: {e}",
+            input=request_data.model_dump(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=error_handler.errors,
+        ) from None
+
+    background_tasks.add_task(
+        track_background_task(utils.scale_replicas_background_task),
+        request_data.model_name,
+        start,
+        stop,
+        request_data.ready_timeout or INFERPOOL_CONFIG.ready_timeout,
+    )
+
+    return Response(
+        content=json.dumps(
+            {
+                "model_name": request_data.model_name,
+                "replicas": request_data.replicas,
+                "starting": len(start),
+                "stopping": len(stop),
+            }
+        ),
+        status_code=status.HTTP_200_OK,
+        media_type="application/json",
+    )
+
+
+@router.get("/")
+async def get_gateway(model_name: Annotated[Union[str, None], Query()] = None):
+    query_data = schema.GetGateway(model_name=model_name)
+    validator.GetGateway(model_name=query_data.model_name)
+    error_handler = ResponseErrorHandler()
+
+    try:
+        if query_data.model_name is not None:
+            model_names = [query_data.model_name]
+        else:
+            model_names = await redis_async.client.hkeys(TASK_CONFIG.gateway)
+
+        gateway_info = list()
+        for name in model_names:
+            replicas = await utils.gateway_router.get_replicas(model_name=name)
+            record = await utils.gateway_router.get_record(model_name=name)
+            gateway_info.append(
+                {
+                    "model_name": name,
+                    "error": record.get("error"),
+                    "replicas": [
+                        dict(
+                            replica,
+                            metrics=(
+                                utils.gateway_router.metrics(url=replica["url"])
+                                if replica["url"]
+                                else None
+                            ),
+                        )
+                        for replica in replicas
+                    ],
+                }
+            )
+
+    except Exception as e:
+        accel_logger.error(f"Database error: {e}")
+        error_handler.add(
+            type=error_handler.ERR_REDIS,
+            loc=[error_handler.LOC_DATABASE],
+            msg="Database error",
+            input=query_data.model_dump(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=error_handler.errors,
+        ) from None
+
+    return Response(
+        content=json.dumps(
+            gateway_info[0] if query_data.model_name is not None else gateway_info
+        ),
+        status_code=status.HTTP_200_OK,
+        media_type="application/json",
+    )
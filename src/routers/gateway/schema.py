@@ -0,0 +1,107 @@
+import re
+from typing import Union
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel, ConfigDict, model_validator
+
+from src.utils.error import ResponseErrorHandler
+
+
+class PostGatewayCompletion(BaseModel):
+    model_config = ConfigDict(extra="allow")
+    model: str
+    stream: bool = False
+
+    @model_validator(mode="after")
+    def check(self: "PostGatewayCompletion") -> "PostGatewayCompletion":
+        error_handler = ResponseErrorHandler()
+
+        if not re.fullmatch(r"[a-zA-Z0-9][a-zA-Z0-9_.-]+", self.model):
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'model' contain invalid characters",
+                input={"model": self.model},
+            )
+
+        if error_handler.errors != []:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=error_handler.errors,
+            )
+
+        return self
+
+
+class PostGatewayScale(BaseModel):
+    model_config = ConfigDict(
+        protected_namespaces=()
+    )  # solve can not start with "model_"
+    model_name: str
+    replicas: int
+    ready_timeout: Union[int, None] = None
+
+    @model_validator(mode="after")
+    def check(self: "PostGatewayScale") -> "PostGatewayScale":
+        error_handler = ResponseErrorHandler()
+
+        if not re.fullmatch(r"[a-zA-Z0-9][a-zA-Z0-9_.-]+", self.model_name):
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'model_name' contain invalid characters",
+                input={"model_name": self.model_name},
+            )
+
+        if not 1 <= self.replicas <= 16:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'replicas' must be between 1 and 16",
+                input={"replicas": self.replicas},
+            )
+
+        if self.ready_timeout is not None and self.ready_timeout <= 0:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'ready_timeout' must larger than 0",
+                input={"ready_timeout": self.ready_timeout},
+            )
+
+        if error_handler.errors != []:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=error_handler.errors,
+            )
+
+        return self
+
+
+class GetGateway(BaseModel):
+    model_config = ConfigDict(
+        protected_namespaces=()
+    )  # solve can not start with "model_"
+    model_name: Union[str, None] = None
+
+    @model_validator(mode="after")
+    def check(self: "GetGateway") -> "GetGateway":
+        error_handler = ResponseErrorHandler()
+
+        if self.model_name is not None and not re.fullmatch(
+            r"[a-zA-Z0-9][a-zA-Z0-9_.-]+", self.model_name
+        ):
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_QUERY],
+                msg="'model_name' contain invalid characters",
+                input={"model_name": self.model_name},
+            )
+
+        if error_handler.errors != []:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=error_handler.errors,
+            )
+
+        return self
@@ -0,0 +1,438 @@
+import asyncio
+import os
+import time
+from collections.abc import AsyncGenerator
+from contextlib import AsyncExitStack
+from typing import Dict, List, Tuple, Union
+
+import httpx
+import orjson
+from fastapi import Response, status
+from fastapi.responses import StreamingResponse
+
+from src.config.params import COMMON_CONFIG, STATUS_CONFIG, TASK_CONFIG
+from src.routers.chat.utils import chat_client_pool
+from src.routers.infer_backend.pool import estimate_memory_gb, infer_backend_pool
+from src.routers.infer_backend.profile import VllmLaunchOverrides, plan_vllm_launch
+from src.routers.infer_backend.utils import startup_vllm_service, stop_model_service
+from src.thirdparty.redis.handler import redis_async
+from src.utils.logger import accel_logger
+from src.utils.tracing import create_untraced_task
+
+EJECT_FAILURES = 3
+EJECT_SECONDS = 30.0
+HEALTH_INTERVAL = 5.0
+HEALTH_TIMEOUT = 2.0
+DRAIN_TIMEOUT = 60.0
+RETRY_STATUS = {status.HTTP_502_BAD_GATEWAY, status.HTTP_503_SERVICE_UNAVAILABLE}
+
+
+class GatewayRouter:
+    """Spreads OpenAI requests of one model over its replicas.
+
+    The replica that `/infer-backend/start/` loaded is always part of the set,
+    extra replicas started through `/gateway/scale/` are kept in the GATEWAY
+    hash. Per-replica counters live in this process only."""
+
+    def __init__(self) -> None:
+        self.stats: Dict[str, dict] = dict()
+        self.lock = asyncio.Lock()
+        self.cursor = 0
+        self.health_task: Union[asyncio.Task, None] = None
+
+    def replica_stats(self, url: str) -> dict:
+        stats = self.stats.get(url)
+        if stats is None:
+            stats = {
+                "outstanding": 0,
+                "requests": 0,
+                "failures": 0,
+                "consecutive_failures": 0,
+                "ejections": 0,
+                "ejected_until": 0.0,
+                "latency_total": 0.0,
+            }
+            self.stats[url] = stats
+        return stats
+
+    def is_ejected(self, url: str) -> bool:
+        return self.replica_stats(url)["ejected_until"] > time.monotonic()
+
+    async def get_record(self, model_name: str) -> dict:
+        record = await redis_async.client.hget(TASK_CONFIG.gateway, model_name)
+        if not record:
+            return {"model_name": model_name, "replicas": list()}
+        return orjson.loads(record)
+
+    async def save_record(self, record: dict) -> None:
+        if record["replicas"] or record.get("error"):
+            await redis_async.client.hset(
+                TASK_CONFIG.gateway, record["model_name"], orjson.dumps(record)
+            )
+        else:
+            await redis_async.client.hdel(TASK_CONFIG.gateway, record["model_name"])
+
+    async def get_replicas(self, model_name: str) -> List[dict]:
+        info = await redis_async.client.hget(TASK_CONFIG.train, model_name)
+        if not info:
+            return list()
+
+        infer_backend = orjson.loads(info)["container"]["infer_backend"]
+        if infer_backend["status"] != STATUS_CONFIG.active:
+            # extra replicas do not outlive the primary backend
+            await self.remove_replicas(model_name=model_name)
+            return list()
+
+        record = await self.get_record(model_name=model_name)
+        return [
+            {
+                "id": infer_backend["id"],
+                "url": infer_backend["url"],
+                "status": STATUS_CONFIG.active,
+                "primary": True,
+            }
+        ] + [dict(replica, primary=False) for replica in record["replicas"]]
+
+    def pick(self, replicas: List[dict], exclude: set) -> Union[dict, None]:
+        candidates = [
+            replica
+            for replica in replicas
+            if replica["status"] == STATUS_CONFIG.active
+            and replica["url"] not in exclude
+        ]
+        if not candidates:
+            return None
+
+        healthy = [
+            replica for replica in candidates if not self.is_ejected(replica["url"])
+        ]
+        if not healthy:
+            # fail open on the replica that comes back first
+            healthy = [
+                min(
+                    candidates,
+                    key=lambda replica: self.replica_stats(replica["url"])[
+                        "ejected_until"
+                    ],
+                )
+            ]
+
+        least = min(self.replica_stats(r["url"])["outstanding"] for r in healthy)
+        ties = [
+            replica
+            for replica in healthy
+            if self.replica_stats(replica["url"])["outstanding"] == least
+        ]
+        self.cursor += 1
+        return ties[self.cursor % len(ties)]
+
+    def begin(self, url: str) -> float:
+        stats = self.replica_stats(url)
+        stats["outstanding"] += 1
+        stats["requests"] += 1
+        return time.perf_counter()
+
+    def end(self, url: str, start: float, failed: bool) -> None:
+        stats = self.replica_stats(url)
+        stats["outstanding"] = max(0, stats["outstanding"] - 1)
+        stats["latency_total"] += time.perf_counter() - start
+        if not failed:
+            stats["consecutive_failures"] = 0
+            return
+
+        stats["failures"] += 1
+        stats["consecutive_failures"] += 1
+        if stats["consecutive_failures"] >= EJECT_FAILURES:
+            self.eject(url=url)
+
+    def eject(self, url: str) -> None:
+        stats = self.replica_stats(url)
+        if stats["ejected_until"] <= time.monotonic():
+            accel_logger.warning(f"Gateway ejected replica {url}")
+            stats["ejections"] += 1
+        stats["ejected_until"] = time.monotonic() + EJECT_SECONDS
+        stats["consecutive_failures"] = 0
+
+    def metrics(self, url: str) -> dict:
+        stats = self.replica_stats(url)
+        finished = stats["requests"] - stats["outstanding"]
+        return {
+            "outstanding": stats["outstanding"],
+            "requests": stats["requests"],
+            "failures": stats["failures"],
+            "ejections": stats["ejections"],
+            "ejected": self.is_ejected(url),
+            "latency_mean": (
+                round(stats["latency_total"] / finished, 4) if finished else 0.0
+            ),
+        }
+
+    def ensure_health_task(self) -> None:
+        if self.health_task is None or self.health_task.done():
+            self.health_task = create_untraced_task(self.health_loop())
+
+    async def health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(HEALTH_INTERVAL)
+            try:
+                await self.check_health()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                accel_logger.error(f"Gateway health check error: {e}")
+
+    async def get_known_urls(self) -> set:
+        urls = set()
+        for info in (await redis_async.client.hgetall(TASK_CONFIG.train)).values():
+            infer_backend = orjson.loads(info)["container"]["infer_backend"]
+            if infer_backend["status"] == STATUS_CONFIG.active:
+                urls.add(infer_backend["url"])
+        for record in (await redis_async.client.hgetall(TASK_CONFIG.gateway)).values():
+            urls.update(replica["url"] for replica in orjson.loads(record)["replicas"])
+        return urls
+
+    async def check_health(self) -> None:
+        known_urls = await self.get_known_urls()
+        for url in list(self.stats):
+            # counters of backends that are gone are dropped once idle
+            if url not in known_urls and self.stats[url]["outstanding"] == 0:
+                self.stats.pop(url)
+
+        urls = list(self.stats)
+        results = await asyncio.gather(
+            *(self.probe(url=url) for url in urls), return_exceptions=True
+        )
+        for url, healthy in zip(urls, results, strict=True):
+            if healthy is True:
+                # an ejected replica that answers again takes traffic right away
+                self.replica_stats(url)["ejected_until"] = 0.0
+            else:
+                self.eject(url=url)
+
+    async def probe(self, url: str) -> bool:
+        try:
+            response = await chat_client_pool.get(url).get(
+                "/health", timeout=HEALTH_TIMEOUT
+            )
+            return response.status_code == status.HTTP_200_OK
+        except httpx.HTTPError:
+            return False
+
+    async def send(
+        self, model_name: str, path: str, content: bytes
+    ) -> Tuple[httpx.Response, str, float]:
+        replicas = await self.get_replicas(model_name=model_name)
+        tried = set()
+        last_error = "no replica available"
+
+        while (replica := self.pick(replicas=replicas, exclude=tried)) is not None:
+            url = replica["url"]
+            tried.add(url)
+            aclient = chat_client_pool.get(url)
+            start = self.begin(url=url)
+            try:
+                response = await aclient.send(
+                    aclient.build_request(
+                        "POST",
+                        path,
+                        content=content,
+                        headers={"content-type": "application/json"},
+                    ),
+                    stream=True,
+                )
+            except httpx.TransportError as e:
+                self.end(url=url, start=start, failed=True)
+                last_error = f"{url}: {type(e).__name__}"
+                continue
+
+            if response.status_code in RETRY_STATUS:
+                await response.aclose()
+                self.end(url=url, start=start, failed=True)
+                last_error = f"{url}: {response.status_code}"
+                continue
+
+            return response, url, start
+
+        raise RuntimeError(last_error)
+
+    async def proxy(
+        self, model_name: str, path: str, content: bytes, stream: bool
+    ) -> Response:
+        self.ensure_health_task()
+        stack = AsyncExitStack()
+        await stack.enter_async_context(infer_backend_pool.use(name=model_name))
+        try:
+            response, url, start = await self.send(
+                model_name=model_name, path=path, content=content
+            )
+            if stream:
+                # the stream owns the pool reference from here on
+                streaming_response = StreamingResponse(
+                    self.passthrough(
+                        url=url, start=start, response=response, stack=stack
+                    ),
+                    status_code=response.status_code,
+                    media_type=response.headers.get(
+                        "content-type", "text/event-stream"
+                    ),
+                )
+                stack = None
+                return streaming_response
+
+            failed = False
+            try:
+                body = await response.aread()
+            except httpx.TransportError:
+                failed = True
+                raise
+            finally:
+                await response.aclose()
+                self.end(
+                    url=url,
+                    start=start,
+                    failed=failed or response.status_code >= 500,
+                )
+
+            return Response(
+                content=body,
+                status_code=response.status_code,
+                media_type=response.headers.get("content-type", "application/json"),
+            )
+
+        finally:
+            if stack is not None:
+                await stack.aclose()
+
+    async def passthrough(
+        self,
+        url: str,
+        start: float,
+        response: httpx.Response,
+        stack: AsyncExitStack,
+    ) -> AsyncGenerator[bytes, None]:
+        failed = response.status_code >= 500
+        try:
+            async for chunk in response.aiter_raw():
+                yield chunk
+        except httpx.TransportError as e:
+            failed = True
+            accel_logger.error(f"Gateway stream from {url} broke: {e}")
+        finally:
+            await response.aclose()
+            self.end(url=url, start=start, failed=failed)
+            await stack.aclose()
+
+    async def start_replica(
+        self, model_name: str, info: dict, replica_id: str, ready_timeout: int
+    ) -> None:
+        memory_gb = await asyncio.to_thread(estimate_memory_gb, info["last_model_path"])
+        primary_profile = info["container"]["infer_backend"].get("profile") or dict()
+        try:
+            # replicas answer the same requests, so they keep the primary context length
+            profile = await plan_vllm_launch(
+                model_path=info["last_model_path"],
+                gpu_memory_utilization=infer_backend_pool.gpu_memory_utilization(
+                    memory_gb=memory_gb
+                ),
+                overrides=VllmLaunchOverrides(
+                    max_model_len=primary_profile.get("max_model_len")
+                ),
+            )
+            model_service_info = await startup_vllm_service(
+                model_name=model_name,
+                local_safetensors_path=os.path.join(
+                    COMMON_CONFIG.root_path,
+                    os.path.relpath(
+                        info["last_model_path"], COMMON_CONFIG.workspace_path
+                    ),
+                ),
+                base_model=info["train_args"]["base_model"],
+                hf_home=COMMON_CONFIG.hf_home,
+                ready_timeout=ready_timeout,
+                **profile.launch_args(),
+            )
+            error = None
+        except Exception as e:
+            accel_logger.error(f"Gateway replica of {model_name} failed: {e}")
+            model_service_info = None
+            error = f"{e}"
+
+        async with self.lock:
+            record = await self.get_record(model_name=model_name)
+            replica = next(
+                (r for r in record["replicas"] if r["replica_id"] == replica_id), None
+            )
+            if replica is None or model_service_info is None:
+                # scaled down while starting, or the start failed
+                record["replicas"] = [
+                    r for r in record["replicas"] if r["replica_id"] != replica_id
+                ]
+                record["error"] = error
+            else:
+                replica["id"] = model_service_info["container_name"]
+                replica["url"] = model_service_info["vllm_service"]
+                replica["status"] = STATUS_CONFIG.active
+            await self.save_record(record=record)
+
+        if replica is None and model_service_info is not None:
+            await stop_model_service(
+                container_name=model_service_info["container_name"],
+                infer_backend_type="vllm",
+            )
+
+    async def stop_replica(self, replica: dict) -> None:
+        if replica["id"] is None:
+            return
+
+        # let in-flight requests finish before the container goes away
+        deadline = time.monotonic() + DRAIN_TIMEOUT
+        while (
+            self.replica_stats(replica["url"])["outstanding"] > 0
+            and time.monotonic() < deadline
+        ):
+            await asyncio.sleep(0.5)
+
+        try:
+            await stop_model_service(
+                container_name=replica["id"], infer_backend_type="vllm"
+            )
+        except Exception as e:
+            accel_logger.error(f"Gateway failed to stop {replica['id']}: {e}")
+        self.stats.pop(replica["url"], None)
+
+    async def remove_replicas(self, model_name: str) -> None:
+        async with self.lock:
+            record = await self.get_record(model_name=model_name)
+            record["replicas"], removed = list(), record["replicas"]
+            await self.save_record(record=record)
+
+        for replica in removed:
+            await self.stop_replica(replica=replica)
+
+    async def aclose(self) -> None:
+        if self.health_task is not None:
+            self.health_task.cancel()
+            await asyncio.gather(self.health_task, return_exceptions=True)
+            self.health_task = None
+
+
+gateway_router = GatewayRouter()
+
+
+async def scale_replicas_background_task(
+    model_name: str, start: List[str], stop: List[dict], ready_timeout: int
+) -> None:
+    info = orjson.loads(await redis_async.client.hget(TASK_CONFIG.train, model_name))
+    await asyncio.gather(
+        *(
+            gateway_router.start_replica(
+                model_name=model_name,
+                info=info,
+                replica_id=replica_id,
+                ready_timeout=ready_timeout,
+            )
+            for replica_id in start
+        ),
+        *(gateway_router.stop_replica(replica=replica) for replica in stop),
+        return_exceptions=True,
+    )
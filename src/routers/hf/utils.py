@@ -4,6 +4,8 @@ from typing import Union
 import httpx
 from fastapi import status
 
+from src.utils.tracing import TracingTransport
+
 
 def add_token(token: str) -> str:
     os.environ["HF_TOKEN"] = token
@@ -15,7 +17,7 @@ def get_token() -> Union[str, None]:
 
 
 async def call_hf_whoami(hf_token: str) -> dict:
-    async with httpx.AsyncClient() as aclient:
+    async with httpx.AsyncClient(transport=TracingTransport()) as aclient:
         response = await aclient.get(
             "https://huggingface.co/api/whoami-v2",
             headers={"Authorization": f"Bearer {hf_token}"},
@@ -0,0 +1,209 @@
+import asyncio
+import bisect
+import math
+import time
+from array import array
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, Dict, List, Union
+
+import httpx
+
+from src.config.params import HWINFO_CONFIG
+from src.routers.ws.schema import HwInfoTemplate
+from src.thirdparty.docker.api_handler import get_container_log
+from src.utils.logger import accel_logger
+from src.utils.tracing import create_untraced_task
+
+RECONNECT_SEC = 5
+GPU_FIELDS = (
+    "usage",
+    "used",
+    "total",
+    "temperature",
+    "gpu_utilization",
+    "vram_utilization",
+)
+
+
+def to_value(value: Union[float, str]) -> float:
+    return float(value) if isinstance(value, (int, float)) else math.nan
+
+
+def flatten_hw_info(hw_info: HwInfoTemplate) -> Dict[str, float]:
+    metrics = {
+        "cpu.usage": to_value(hw_info.cpu.usage),
+        "cpu.avg_temp": to_value(hw_info.cpu.avg_temp),
+        "memory.usage": to_value(hw_info.memory.usage),
+        "memory.used": to_value(hw_info.memory.used),
+        "memory.total": to_value(hw_info.memory.total),
+        "disk.usage": to_value(hw_info.disk.usage),
+        "disk.used": to_value(hw_info.disk.used),
+        "disk.total": to_value(hw_info.disk.total),
+    }
+    for index, gpu in enumerate(hw_info.gpus):
+        for field in GPU_FIELDS:
+            metrics[f"gpu{index}.{field}"] = to_value(getattr(gpu, field))
+    return metrics
+
+
+class RingBuffer:
+    """Fixed number of float samples, oldest overwritten first."""
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.values = array("d", [math.nan]) * size
+        self.end = 0
+        self.count = 0
+
+    def append(self, value: float) -> None:
+        self.values[self.end] = value
+        self.end = (self.end + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def tail(self, n: int) -> List[float]:
+        n = min(n, self.count)
+        start = (self.end - n) % self.size
+        if start + n <= self.size:
+            return self.values[start : start + n].tolist()
+        return (
+            self.values[start:].tolist()
+            + self.values[: (start + n) % self.size].tolist()
+        )
+
+
+def downsample(values: List[float], buckets: List[range]) -> List[Union[float, None]]:
+    output = list()
+    for bucket in buckets:
+        samples = [values[i] for i in bucket if not math.isnan(values[i])]
+        output.append(round(sum(samples) / len(samples), 3) if samples else None)
+    return output
+
+
+class HwInfoCollector:
+    """Single reader of the hwinfo container log for the whole service.
+
+    Every sample is parsed once, kept in a ring buffer per metric and pushed
+    to all subscribers, so websocket clients and history queries never open
+    docker log streams of their own."""
+
+    def __init__(self, container_name: str, history_size: int) -> None:
+        self.container_name = container_name
+        self.history_size = history_size
+        self.timestamps = RingBuffer(size=history_size)
+        self.metrics: Dict[str, RingBuffer] = dict()
+        self.latest: Union[HwInfoTemplate, None] = None
+        self.latest_time = 0.0
+        self.subscribers: set = set()
+        self.task: Union[asyncio.Task, None] = None
+
+    def start(self) -> None:
+        if self.task is None or self.task.done():
+            self.task = create_untraced_task(self.run())
+
+    async def aclose(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def run(self) -> None:
+        transport = httpx.AsyncHTTPTransport(uds="/var/run/docker.sock")
+        while True:
+            try:
+                async with httpx.AsyncClient(
+                    transport=transport, timeout=None
+                ) as aclient:
+                    async for log in get_container_log(
+                        aclient=aclient,
+                        container_name_or_id=self.container_name,
+                        tail=1,
+                    ):
+                        for log_split in log.splitlines():
+                            if log_split and log_split[0] in ("\x01", "\x02"):
+                                log_split = log_split[8:]
+                            if "INFO-" not in log_split:
+                                continue
+                            try:
+                                hw_info = HwInfoTemplate().parse_hwinfo_log(
+                                    stdout=log_split
+                                )
+                            except ValueError as e:
+                                accel_logger.error(f"hwInfo collector: {e}")
+                                continue
+                            self.add_sample(hw_info=hw_info)
+
+            except asyncio.CancelledError:
+                raise
+
+            except Exception as e:
+                accel_logger.error(f"hwInfo collector: {e}")
+
+            await asyncio.sleep(RECONNECT_SEC)
+
+    def add_sample(self, hw_info: HwInfoTemplate, timestamp: Union[float, None] = None):
+        timestamp = timestamp or time.time()
+        metrics = flatten_hw_info(hw_info=hw_info)
+        for name in metrics.keys() - self.metrics.keys():
+            # metrics showing up late are padded so all buffers stay aligned
+            self.metrics[name] = RingBuffer(size=self.history_size)
+            for _ in range(self.timestamps.count):
+                self.metrics[name].append(math.nan)
+
+        self.timestamps.append(timestamp)
+        for name, buffer in self.metrics.items():
+            buffer.append(metrics.get(name, math.nan))
+
+        self.latest, self.latest_time = hw_info, timestamp
+        sample = hw_info.model_dump()
+        for queue in self.subscribers:
+            # slow subscribers only get the newest sample
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(sample)
+
+    @asynccontextmanager
+    async def subscribe(self) -> AsyncGenerator[asyncio.Queue, None]:
+        self.start()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        if self.latest is not None:
+            queue.put_nowait(self.latest.model_dump())
+        self.subscribers.add(queue)
+        try:
+            yield queue
+        finally:
+            self.subscribers.discard(queue)
+
+    def get_latest(self, max_age: float) -> Union[HwInfoTemplate, None]:
+        if self.latest is None or time.time() - self.latest_time > max_age:
+            return None
+        return self.latest
+
+    def history(self, window: int, points: int) -> dict:
+        timestamps = self.timestamps.tail(self.timestamps.count)
+        start = bisect.bisect_left(timestamps, time.time() - window)
+        n = len(timestamps) - start
+
+        step = max(1, math.ceil(n / points))
+        buckets = [range(i, min(i + step, n)) for i in range(0, n, step)]
+        window_timestamps = timestamps[start:]
+
+        return {
+            "window": window,
+            "samples_per_point": step,
+            "timestamps": [
+                round(window_timestamps[bucket[-1]], 3) for bucket in buckets
+            ],
+            "metrics": {
+                name: downsample(values=buffer.tail(n), buckets=buckets)
+                for name, buffer in sorted(self.metrics.items())
+            },
+        }
+
+
+hw_info_collector = HwInfoCollector(
+    container_name=HWINFO_CONFIG.container_name,
+    history_size=HWINFO_CONFIG.history_size,
+)
@@ -0,0 +1,27 @@
+import json
+from typing import Annotated
+
+from fastapi import APIRouter, Query, Response, status
+
+from src.routers.hw_info import schema
+from src.routers.hw_info.collector import hw_info_collector
+
+router = APIRouter(prefix="/hwInfo", tags=["HwInfo"])
+
+
+@router.get("/history")
+async def get_hw_info_history(
+    window: Annotated[int, Query()] = 300, points: Annotated[int, Query()] = 120
+):
+    query_data = schema.GetHwInfoHistory(window=window, points=points)
+    hw_info_collector.start()
+
+    return Response(
+        content=json.dumps(
+            hw_info_collector.history(
+                window=query_data.window, points=query_data.points
+            )
+        ),
+        status_code=status.HTTP_200_OK,
+        media_type="application/json",
+    )
@@ -0,0 +1,37 @@
+from fastapi import HTTPException, status
+from pydantic import BaseModel, model_validator
+
+from src.utils.error import ResponseErrorHandler
+
+
+class GetHwInfoHistory(BaseModel):
+    window: int = 300
+    points: int = 120
+
+    @model_validator(mode="after")
+    def check(self: "GetHwInfoHistory") -> "GetHwInfoHistory":
+        error_handler = ResponseErrorHandler()
+
+        if self.window <= 0:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_QUERY],
+                msg="'window' must larger than 0",
+                input={"window": self.window},
+            )
+
+        if not 1 <= self.points <= 1000:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_QUERY],
+                msg="'points' must be between 1 and 1000",
+                input={"points": self.points},
+            )
+
+        if error_handler.errors != []:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=error_handler.errors,
+            )
+
+        return self
@@ -0,0 +1,266 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, List, Union
+
+import httpx
+import orjson
+
+from src.config.params import HWINFO_CONFIG, TASK_CONFIG
+from src.routers.hw_info.collector import hw_info_collector
+from src.routers.infer_backend.profile import to_gb
+from src.thirdparty.docker.api_handler import get_container_stats, inspect_container
+from src.thirdparty.redis.handler import redis_async
+from src.utils.logger import accel_logger
+from src.utils.metrics import STAGE_DURATION
+from src.utils.utils import get_current_time
+
+GiB = 1024**3
+GPU_SAMPLE_MAX_AGE = 30
+SERIES_FIELDS = ("cpu_percent", "memory_gb", "gpu_utilization", "vram_gb")
+
+
+def get_cpu_percent(stats: dict) -> Union[float, None]:
+    cpu_stats, precpu_stats = stats.get("cpu_stats", {}), stats.get("precpu_stats", {})
+    cpu_delta = cpu_stats.get("cpu_usage", {}).get("total_usage", 0) - precpu_stats.get(
+        "cpu_usage", {}
+    ).get("total_usage", 0)
+    system_delta = cpu_stats.get("system_cpu_usage", 0) - precpu_stats.get(
+        "system_cpu_usage", 0
+    )
+    if system_delta <= 0 or cpu_delta < 0:
+        return None
+
+    online_cpus = cpu_stats.get("online_cpus") or len(
+        cpu_stats.get("cpu_usage", {}).get("percpu_usage") or [None]
+    )
+    return cpu_delta / system_delta * online_cpus * 100
+
+
+def get_memory_gb(stats: dict) -> Union[float, None]:
+    memory_stats = stats.get("memory_stats", {})
+    if "usage" not in memory_stats:
+        return None
+
+    # page cache is reclaimable, docker stats leaves it out the same way
+    detail = memory_stats.get("stats", {})
+    cache = detail.get("inactive_file", detail.get("cache", 0))
+    return max(memory_stats["usage"] - cache, 0) / GiB
+
+
+def get_container_gpu_ids(container_info: dict) -> Union[List[int], None]:
+    """Gpu indices a container was given, None when it got every gpu."""
+    device_requests = container_info.get("HostConfig", {}).get("DeviceRequests") or []
+    gpu_ids = list()
+    for request in device_requests:
+        if request.get("Count") == -1:
+            return None
+        for device_id in request.get("DeviceIDs") or []:
+            if not f"{device_id}".isdigit():
+                return None
+            gpu_ids.append(int(device_id))
+    return gpu_ids
+
+
+class Metric:
+    def __init__(self) -> None:
+        self.peak: Union[float, None] = None
+        self.total = 0.0
+        self.count = 0
+
+    def add(self, value: Union[float, None]) -> None:
+        if value is None:
+            return
+        self.peak = value if self.peak is None else max(self.peak, value)
+        self.total += value
+        self.count += 1
+
+    def summary(self) -> dict:
+        return {
+            "peak": round(self.peak, 3) if self.peak is not None else None,
+            "avg": round(self.total / self.count, 3) if self.count else None,
+        }
+
+
+class UsageTracker:
+    """Resource usage of one job container, sampled from docker stats and the
+    hwinfo gpu readings while the job runs.
+
+    Peak and average are computed over every sample. The time series keeps at
+    most `max_points` points and halves its resolution whenever it fills up,
+    so long runs cost as much to store as short ones. Gpu readings are per
+    device, so jobs sharing a gpu see each other's load."""
+
+    def __init__(
+        self, name: str, job: str, container_name_or_id: str, max_points: int
+    ) -> None:
+        self.name = name
+        self.job = job
+        self.container_name_or_id = container_name_or_id
+        self.max_points = max_points
+
+        self.started_time, _ = get_current_time()
+        self.started = time.monotonic()
+        self.gpu_ids: Union[List[int], None] = list()
+        self.metrics = {field: Metric() for field in SERIES_FIELDS}
+        self.series: List[dict] = list()
+        self.stride = 1
+        self.pending: List[dict] = list()
+
+    def get_gpu_sample(self) -> tuple:
+        hw_info = hw_info_collector.get_latest(max_age=GPU_SAMPLE_MAX_AGE)
+        if hw_info is None or self.gpu_ids == []:
+            return None, None
+
+        gpus = [
+            gpu
+            for index, gpu in enumerate(hw_info.gpus)
+            if self.gpu_ids is None or index in self.gpu_ids
+        ]
+        utilization = [
+            gpu.gpu_utilization
+            for gpu in gpus
+            if isinstance(gpu.gpu_utilization, (int, float))
+        ]
+        vram = [to_gb(gpu.used) for gpu in gpus]
+        vram = [value for value in vram if value is not None]
+        return (
+            sum(utilization) / len(utilization) if utilization else None,
+            sum(vram) if vram else None,
+        )
+
+    def add_sample(self, stats: dict) -> None:
+        gpu_utilization, vram_gb = self.get_gpu_sample()
+        sample = {
+            "time": round(time.monotonic() - self.started, 1),
+            "cpu_percent": get_cpu_percent(stats=stats),
+            "memory_gb": get_memory_gb(stats=stats),
+            "gpu_utilization": gpu_utilization,
+            "vram_gb": vram_gb,
+        }
+        if sample["cpu_percent"] is None and sample["memory_gb"] is None:
+            return
+
+        for field in SERIES_FIELDS:
+            self.metrics[field].add(sample[field])
+
+        self.pending.append(sample)
+        if len(self.pending) < self.stride:
+            return
+
+        self.series.append(self.merge(samples=self.pending))
+        self.pending = list()
+        if len(self.series) >= self.max_points:
+            self.series = [
+                self.merge(samples=self.series[i : i + 2])
+                for i in range(0, len(self.series), 2)
+            ]
+            self.stride *= 2
+
+    @staticmethod
+    def merge(samples: List[dict]) -> dict:
+        point = {"time": samples[-1]["time"]}
+        for field in SERIES_FIELDS:
+            values = [sample[field] for sample in samples if sample[field] is not None]
+            point[field] = round(sum(values) / len(values), 3) if values else None
+        return point
+
+    async def run(self) -> None:
+        transport = httpx.AsyncHTTPTransport(uds="/var/run/docker.sock")
+        try:
+            async with httpx.AsyncClient(transport=transport, timeout=None) as aclient:
+                self.gpu_ids = get_container_gpu_ids(
+                    container_info=await inspect_container(
+                        aclient=aclient, container_name_or_id=self.container_name_or_id
+                    )
+                )
+                async for stats in get_container_stats(
+                    aclient=aclient, container_name_or_id=self.container_name_or_id
+                ):
+                    self.add_sample(stats=stats)
+
+        except asyncio.CancelledError:
+            raise
+
+        except Exception as e:
+            accel_logger.error(f"Usage of {self.container_name_or_id}: {e}")
+
+    def summary(self) -> dict:
+        wall_time_sec = time.monotonic() - self.started
+        gpu_count = (
+            len(self.gpu_ids)
+            if self.gpu_ids is not None
+            else len(hw_info_collector.latest.gpus if hw_info_collector.latest else [])
+        )
+        return {
+            "container": self.container_name_or_id,
+            "started_time": self.started_time,
+            "finished_time": get_current_time()[0],
+            "wall_time_sec": round(wall_time_sec, 1),
+            "gpu_ids": self.gpu_ids,
+            "gpu_hours": round(wall_time_sec / 3600 * gpu_count, 4),
+            **{field: self.metrics[field].summary() for field in SERIES_FIELDS},
+        }
+
+    def get_series(self) -> dict:
+        points = self.series + (
+            [self.merge(samples=self.pending)] if self.pending else []
+        )
+        return {"samples_per_point": self.stride, "points": points}
+
+
+def get_usage_key(name: str) -> str:
+    return f"{TASK_CONFIG.usage}:{name}"
+
+
+async def save_usage(tracker: UsageTracker) -> dict:
+    summary = tracker.summary()
+    await redis_async.client.hset(
+        get_usage_key(name=tracker.name),
+        tracker.job,
+        orjson.dumps(tracker.get_series()),
+    )
+
+    info = await redis_async.client.hget(TASK_CONFIG.train, tracker.name)
+    if info is None:
+        return summary
+
+    info = orjson.loads(info)
+    info.setdefault("usage", dict())[tracker.job] = summary
+    await redis_async.client.hset(TASK_CONFIG.train, tracker.name, orjson.dumps(info))
+    return summary
+
+
+async def get_usage_series(name: str) -> dict:
+    series = await redis_async.client.hgetall(get_usage_key(name=name))
+    return {job: orjson.loads(value) for job, value in series.items()}
+
+
+async def delete_usage(name: str) -> None:
+    await redis_async.client.delete(get_usage_key(name=name))
+
+
+@asynccontextmanager
+async def track_usage(
+    name: str, job: str, container_name_or_id: str
+) -> AsyncGenerator[UsageTracker, None]:
+    """Sample the container while the body runs, then write the job summary
+    into the TRAIN record of `name` under usage.{job}. The run time also goes
+    into the stage duration histogram of the job."""
+    tracker = UsageTracker(
+        name=name,
+        job=job,
+        container_name_or_id=container_name_or_id,
+        max_points=HWINFO_CONFIG.usage_points,
+    )
+    task = asyncio.create_task(tracker.run())
+    try:
+        yield tracker
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        STAGE_DURATION.observe(time.monotonic() - tracker.started, stage=job)
+        try:
+            await save_usage(tracker=tracker)
+        except Exception as e:
+            accel_logger.error(f"Database error: {e}")
@@ -0,0 +1,426 @@
+import asyncio
+import os
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+from typing import Dict, List, Union
+
+import orjson
+
+from src.config.params import (
+    COMMON_CONFIG,
+    INFERPOOL_CONFIG,
+    STATUS_CONFIG,
+    TASK_CONFIG,
+    VLLM_CONFIG,
+)
+from src.routers.infer_backend.profile import plan_vllm_launch, resolve_hf_model_path
+from src.routers.infer_backend.utils import (
+    get_lora_rank,
+    load_lora_adapter,
+    lora_base_name,
+    startup_vllm_lora_service,
+    stop_model_service,
+)
+from src.routers.train.utils import get_last_checkpoint
+from src.thirdparty.redis.handler import redis_async
+from src.utils.logger import accel_logger
+from src.utils.manifest import list_artifact_files
+from src.utils.utils import get_current_time
+
+WEIGHT_SUFFIXES = (".safetensors", ".bin", ".gguf")
+KV_CACHE_RATIO = 0.3  # headroom on top of the weights for kv cache and activations
+
+
+def estimate_memory_gb(model_path: str) -> float:
+    weights_size = sum(
+        os.path.getsize(os.path.join(model_path, name))
+        for name in list_artifact_files(model_path)
+        if name.endswith(WEIGHT_SUFFIXES)
+    )
+    return round(weights_size * (1 + KV_CACHE_RATIO) / 1024**3, 2)
+
+
+def estimate_hf_model_memory_gb(base_model: str, hf_home: str) -> float:
+    model_path = resolve_hf_model_path(base_model=base_model, hf_home=hf_home)
+    return estimate_memory_gb(model_path) if model_path else 0.0
+
+
+class InferBackendPool:
+    """Loaded infer backends kept warm, evicted least recently used first when
+    a new one does not fit in `max_backends` or `gpu_memory_gb` (0 disables a
+    limit). Backends with references held by chat, eval or batch jobs are never
+    evicted. LoRA adapters are entries with a `base`, their references count on
+    the base backend and they go with it when it is evicted. Entries live in
+    Redis, mutations are serialized in-process."""
+
+    def __init__(self, gpu_memory_gb: float, max_backends: int) -> None:
+        self.gpu_memory_gb = gpu_memory_gb
+        self.max_backends = max_backends
+        self.lock = asyncio.Lock()
+
+    async def get_entries(self) -> Dict[str, dict]:
+        entries = await redis_async.client.hgetall(TASK_CONFIG.infer_pool)
+        return {name: orjson.loads(entry) for name, entry in entries.items()}
+
+    async def get_entry(self, name: str) -> Union[dict, None]:
+        entry = await redis_async.client.hget(TASK_CONFIG.infer_pool, name)
+        return orjson.loads(entry) if entry else None
+
+    async def save_entry(self, entry: dict) -> None:
+        await redis_async.client.hset(
+            TASK_CONFIG.infer_pool, entry["name"], orjson.dumps(entry)
+        )
+
+    def gpu_memory_utilization(self, memory_gb: float) -> float:
+        # without a budget a backend owns the gpu, as before the pool existed
+        if not self.gpu_memory_gb:
+            return 0.95
+        return round(min(0.95, max(memory_gb / self.gpu_memory_gb, 0.05)), 2)
+
+    def is_over_limit(self, entries: List[dict]) -> bool:
+        entries = [entry for entry in entries if not entry.get("base")]
+        if self.max_backends and len(entries) > self.max_backends:
+            return True
+        if self.gpu_memory_gb and (
+            sum(entry["memory_gb"] for entry in entries) > self.gpu_memory_gb
+        ):
+            return True
+        return False
+
+    async def reserve(
+        self,
+        name: str,
+        memory_gb: float,
+        backend_type: str,
+        base_model: Union[str, None] = None,
+    ) -> List[dict]:
+        """Add `name` as a loading entry and return the idle entries that have
+        to be evicted to make room for it. Raises ValueError if it can not fit."""
+        if self.gpu_memory_gb and memory_gb > self.gpu_memory_gb:
+            raise ValueError(
+                f"model needs about {memory_gb} GB, pool budget is {self.gpu_memory_gb} GB"
+            )
+
+        async with self.lock:
+            entries = await self.get_entries()
+            if name in entries:
+                raise ValueError(f"{name} is being loaded")
+
+            unix_time, _ = get_current_time()
+            new_entry = {
+                "name": name,
+                "status": STATUS_CONFIG.setup,
+                "type": backend_type,
+                "url": None,
+                "id": None,
+                "memory_gb": memory_gb,
+                "refs": 0,
+                "last_used": unix_time,
+            }
+            if base_model is not None:
+                new_entry["base_model"] = base_model
+            remain = list(entries.values()) + [new_entry]
+            candidates = sorted(
+                (
+                    entry
+                    for entry in entries.values()
+                    if entry["refs"] == 0
+                    and entry["status"] == STATUS_CONFIG.active
+                    and not entry.get("base")
+                ),
+                key=lambda entry: entry["last_used"],
+            )
+
+            evicted = list()
+            while self.is_over_limit(entries=remain):
+                if not candidates:
+                    raise ValueError(
+                        "infer backend pool is full and every loaded backend is in use"
+                    )
+                entry = candidates.pop(0)
+                remain.remove(entry)
+                evicted.extend(
+                    adapter
+                    for adapter in entries.values()
+                    if adapter.get("base") == entry["name"]
+                )
+                evicted.append(entry)
+
+            for entry in evicted:
+                await redis_async.client.hdel(TASK_CONFIG.infer_pool, entry["name"])
+            await self.save_entry(entry=new_entry)
+
+        return evicted
+
+    async def activate(
+        self, name: str, url: str, container_name: str, backend_type: str
+    ) -> None:
+        async with self.lock:
+            entry = await self.get_entry(name=name)
+            if entry is None:
+                return
+
+            entry["status"] = STATUS_CONFIG.active
+            entry["url"] = url
+            entry["id"] = container_name
+            entry["type"] = backend_type
+            entry["last_used"], _ = get_current_time()
+            await self.save_entry(entry=entry)
+
+    async def discard(self, name: str) -> None:
+        async with self.lock:
+            await redis_async.client.hdel(TASK_CONFIG.infer_pool, name)
+
+    async def evict(self, entry: dict) -> None:
+        accel_logger.info(f"Evict infer backend {entry['name']}")
+        info = await redis_async.client.hget(TASK_CONFIG.train, entry["name"])
+        if info:
+            info = orjson.loads(info)
+            info["container"]["infer_backend"]["status"] = STATUS_CONFIG.stopped
+            info["container"]["infer_backend"]["url"] = None
+            info["container"]["infer_backend"]["id"] = None
+            info["container"]["infer_backend"]["base"] = None
+            await redis_async.client.hset(
+                TASK_CONFIG.train, entry["name"], orjson.dumps(info)
+            )
+
+        # adapters go away with the container of their base
+        if entry.get("base"):
+            return
+
+        await stop_model_service(
+            container_name=entry["id"], infer_backend_type=entry["type"]
+        )
+
+    async def touch(self, name: str) -> None:
+        async with self.lock:
+            entry = await self.resolve_entry(name=name)
+            if entry is not None:
+                entry["last_used"], _ = get_current_time()
+                await self.save_entry(entry=entry)
+
+    async def resolve_entry(self, name: str) -> Union[dict, None]:
+        entry = await self.get_entry(name=name)
+        if entry is not None and entry.get("base"):
+            return await self.get_entry(name=entry["base"])
+        return entry
+
+    async def acquire(self, name: str) -> bool:
+        async with self.lock:
+            entry = await self.resolve_entry(name=name)
+            if entry is None:
+                return False
+
+            entry["refs"] += 1
+            entry["last_used"], _ = get_current_time()
+            await self.save_entry(entry=entry)
+            return True
+
+    async def release(self, name: str) -> None:
+        async with self.lock:
+            entry = await self.resolve_entry(name=name)
+            if entry is None:
+                return
+
+            entry["refs"] = max(0, entry["refs"] - 1)
+            entry["last_used"], _ = get_current_time()
+            await self.save_entry(entry=entry)
+
+    async def find_lora_base(self, base_model: str) -> Union[dict, None]:
+        for entry in (await self.get_entries()).values():
+            if entry.get("base_model") == base_model:
+                return entry
+        return None
+
+    async def add_adapter(self, name: str, base: str) -> None:
+        async with self.lock:
+            base_entry = await self.get_entry(name=base)
+            if base_entry is None:
+                raise RuntimeError(f"base backend {base} has been evicted")
+
+            unix_time, _ = get_current_time()
+            await self.save_entry(
+                entry={
+                    "name": name,
+                    "status": STATUS_CONFIG.active,
+                    "type": base_entry["type"],
+                    "url": base_entry["url"],
+                    "id": base_entry["id"],
+                    "base": base,
+                    "memory_gb": 0.0,
+                    "refs": 0,
+                    "last_used": unix_time,
+                }
+            )
+
+    @asynccontextmanager
+    async def use(self, name: str) -> AsyncGenerator[None, None]:
+        # backends outside the pool (external model_service) are not tracked
+        try:
+            acquired = await self.acquire(name=name)
+        except Exception as e:
+            accel_logger.error(f"Infer backend pool error: {e}")
+            acquired = False
+
+        try:
+            yield
+        finally:
+            if acquired:
+                try:
+                    await self.release(name=name)
+                except Exception as e:
+                    accel_logger.error(f"Infer backend pool error: {e}")
+
+    async def recover(self) -> None:
+        """Drop references and interrupted loads left by the previous process,
+        and adopt backends that were started before the pool existed."""
+        async with self.lock:
+            entries = await self.get_entries()
+            active_bases = {
+                name
+                for name, entry in entries.items()
+                if entry["status"] == STATUS_CONFIG.active and not entry.get("base")
+            }
+            for name, entry in entries.items():
+                if entry["status"] != STATUS_CONFIG.active or (
+                    entry.get("base") and entry["base"] not in active_bases
+                ):
+                    await redis_async.client.hdel(TASK_CONFIG.infer_pool, name)
+                elif entry["refs"]:
+                    entry["refs"] = 0
+                    await self.save_entry(entry=entry)
+
+            train_infos = await redis_async.client.hgetall(TASK_CONFIG.train)
+            for name, info in train_infos.items():
+                info = orjson.loads(info)
+                infer_backend = info["container"]["infer_backend"]
+                if infer_backend["status"] == STATUS_CONFIG.setup:
+                    infer_backend["status"] = STATUS_CONFIG.failed
+                    infer_backend["error"] = "loading was interrupted by a restart"
+                    await redis_async.client.hset(
+                        TASK_CONFIG.train, name, orjson.dumps(info)
+                    )
+                    continue
+
+                if (
+                    name in entries
+                    or infer_backend["status"] != STATUS_CONFIG.active
+                    or infer_backend.get("base")
+                ):
+                    continue
+
+                try:
+                    memory_gb = await asyncio.to_thread(
+                        estimate_memory_gb, info["last_model_path"]
+                    )
+                except (OSError, TypeError):
+                    memory_gb = 0.0
+
+                unix_time, _ = get_current_time()
+                await self.save_entry(
+                    entry={
+                        "name": name,
+                        "status": STATUS_CONFIG.active,
+                        "type": infer_backend["type"],
+                        "url": infer_backend["url"],
+                        "id": infer_backend["id"],
+                        "memory_gb": memory_gb,
+                        "refs": 0,
+                        "last_used": unix_time,
+                    }
+                )
+
+
+infer_backend_pool = InferBackendPool(
+    gpu_memory_gb=INFERPOOL_CONFIG.gpu_memory_gb,
+    max_backends=INFERPOOL_CONFIG.max_backends,
+)
+
+
+async def ensure_base_backend(base_model: str, ready_timeout: int) -> dict:
+    """Pool entry of the shared backend serving `base_model`, started through
+    the pool if it is not loaded yet. The base model is served under its own
+    name, so it can be queried next to the adapters hot-loaded into it."""
+    base_entry = await infer_backend_pool.find_lora_base(base_model=base_model)
+    if base_entry is None:
+        base_name = lora_base_name(base_model=base_model)
+        memory_gb = await asyncio.to_thread(
+            estimate_hf_model_memory_gb, base_model, COMMON_CONFIG.hf_home
+        )
+        evicted = await infer_backend_pool.reserve(
+            name=base_name,
+            memory_gb=memory_gb,
+            backend_type="vllm",
+            base_model=base_model,
+        )
+
+        try:
+            for entry in evicted:
+                await infer_backend_pool.evict(entry=entry)
+
+            profile = await plan_vllm_launch(
+                model_path=await asyncio.to_thread(
+                    resolve_hf_model_path, base_model, COMMON_CONFIG.hf_home
+                ),
+                gpu_memory_utilization=infer_backend_pool.gpu_memory_utilization(
+                    memory_gb=memory_gb
+                ),
+            )
+            base_info = await startup_vllm_lora_service(
+                base_name=base_name,
+                base_model=base_model,
+                hf_home=COMMON_CONFIG.hf_home,
+                ready_timeout=ready_timeout,
+                **profile.launch_args(),
+            )
+        except Exception:
+            await infer_backend_pool.discard(name=base_name)
+            raise
+
+        await infer_backend_pool.activate(
+            name=base_name,
+            url=base_info["vllm_service"],
+            container_name=base_info["container_name"],
+            backend_type="vllm",
+        )
+        base_entry = await infer_backend_pool.get_entry(name=base_name)
+
+    elif base_entry["status"] != STATUS_CONFIG.active:
+        raise ValueError(f"base model {base_model} is being loaded")
+
+    return base_entry
+
+
+async def serve_lora_adapter(name: str, train_args: dict, ready_timeout: int) -> dict:
+    """Load the last LoRA checkpoint of `name` into the shared backend of its
+    base model, starting that backend through the pool if needed."""
+    adapter_path = get_last_checkpoint(train_args["output_dir"])
+    if adapter_path is None:
+        raise FileNotFoundError("can not found lora checkpoint")
+
+    lora_rank = await asyncio.to_thread(get_lora_rank, adapter_path)
+    if lora_rank > VLLM_CONFIG.max_lora_rank:
+        raise ValueError(
+            f"lora rank {lora_rank} is larger than max lora rank {VLLM_CONFIG.max_lora_rank}"
+        )
+
+    base_entry = await ensure_base_backend(
+        base_model=train_args["base_model"], ready_timeout=ready_timeout
+    )
+
+    await load_lora_adapter(
+        model_service=base_entry["url"],
+        lora_name=name,
+        lora_path=os.path.join(
+            COMMON_CONFIG.root_path,
+            os.path.relpath(adapter_path, COMMON_CONFIG.workspace_path),
+        ),
+    )
+    await infer_backend_pool.add_adapter(name=name, base=base_entry["name"])
+
+    return {
+        "vllm_service": base_entry["url"],
+        "container_name": base_entry["id"],
+        "model_name": name,
+        "base": base_entry["name"],
+    }
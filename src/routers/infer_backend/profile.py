@@ -0,0 +1,408 @@
+import asyncio
+import math
+import os
+from typing import List, Union
+
+import httpx
+import orjson
+from pydantic import BaseModel
+
+from src.config.params import HWINFO_CONFIG, VLLM_CONFIG
+from src.routers.hw_info.collector import hw_info_collector
+from src.routers.infer_backend.registry import (
+    get_reserved_gpu_memory,
+    list_backend_containers,
+)
+from src.routers.ws.schema import HwInfoTemplate
+from src.thirdparty.docker.api_handler import get_container_log
+from src.utils.logger import accel_logger
+
+GiB = 1024**3
+RUNTIME_OVERHEAD_GB = 1.5  # cuda context, activations and sampler buffers per gpu
+CUDA_GRAPH_GB = 1.0  # captured graphs are skipped in eager mode
+MIN_MODEL_LEN = 2048
+MODEL_LEN_ALIGN = 256
+TYPICAL_SEQ_TOKENS = 1024  # average live tokens per sequence when sizing the batch
+MIN_NUM_SEQS = 8
+MAX_NUM_SEQS = 256
+DTYPE_BYTES = {"float32": 4, "float16": 2, "bfloat16": 2, "float8": 1, "int8": 1}
+NO_PREFIX_CACHING_TYPES = {"mamba", "mamba2", "jamba", "falcon_mamba"}
+INVENTORY_MAX_AGE = 30  # collector samples older than this are not trusted
+
+
+class VllmLaunchOverrides(BaseModel):
+    tensor_parallel_size: Union[int, None] = None
+    gpu_memory_utilization: Union[float, None] = None
+    max_model_len: Union[int, None] = None
+    cpu_offload_gb: Union[int, None] = None
+    enforce_eager: Union[bool, None] = None
+    enable_prefix_caching: Union[bool, None] = None
+    max_num_seqs: Union[int, None] = None
+    gpu_ids: Union[List[int], None] = None
+
+
+class VllmLaunchProfile(BaseModel):
+    tensor_parallel_size: int = 1
+    gpu_memory_utilization: float = 0.95
+    max_model_len: int = 8192
+    cpu_offload_gb: int = 0
+    enforce_eager: bool = True
+    enable_prefix_caching: bool = True
+    max_num_seqs: int = MAX_NUM_SEQS
+    gpu_ids: Union[List[int], None] = None
+    reasons: List[str] = list()
+
+    def launch_args(self) -> dict:
+        return self.model_dump(exclude={"reasons"})
+
+
+def to_gb(value: Union[float, str]) -> Union[float, None]:
+    if not isinstance(value, (int, float)) or value <= 0:
+        return None
+    # no gpu has a terabyte of memory, larger readings are in MiB
+    return value / 1024 if value > 1024 else float(value)
+
+
+def parse_gpu_inventory(hw_info: HwInfoTemplate) -> List[dict]:
+    gpus = list()
+    for index, gpu in enumerate(hw_info.gpus):
+        total_gb = to_gb(gpu.total)
+        if total_gb is None:
+            continue
+        used_gb = to_gb(gpu.used) or 0.0
+        gpus.append(
+            {
+                "index": index,
+                "device": gpu.device,
+                "total_gb": round(total_gb, 2),
+                "free_gb": round(max(total_gb - used_gb, 0.0), 2),
+            }
+        )
+    return gpus
+
+
+async def get_gpu_inventory() -> List[dict]:
+    """Latest gpu readings of the hwinfo container, empty when it is not
+    running or reports no gpu memory."""
+    hw_info = hw_info_collector.get_latest(max_age=INVENTORY_MAX_AGE)
+    if hw_info is not None:
+        return parse_gpu_inventory(hw_info=hw_info)
+
+    transport = httpx.AsyncHTTPTransport(uds="/var/run/docker.sock")
+    hw_info = HwInfoTemplate()
+    try:
+        async with httpx.AsyncClient(transport=transport, timeout=10) as aclient:
+            async for log in get_container_log(
+                aclient=aclient,
+                container_name_or_id=HWINFO_CONFIG.container_name,
+                follow=False,
+                tail=1,
+            ):
+                for log_split in log.splitlines():
+                    if log_split and log_split[0] in ("\x01", "\x02"):
+                        log_split = log_split[8:]
+                    hw_info.parse_hwinfo_log(stdout=log_split)
+
+    except Exception as e:
+        accel_logger.error(f"Can not read gpu inventory: {e}")
+        return list()
+
+    return parse_gpu_inventory(hw_info=hw_info)
+
+
+def get_weights_gb(model_path: str) -> Union[float, None]:
+    with os.scandir(model_path) as it:
+        size = sum(
+            entry.stat().st_size
+            for entry in it
+            if entry.is_file() and entry.name.endswith((".safetensors", ".bin"))
+        )
+    return size / GiB if size else None
+
+
+def resolve_hf_model_path(base_model: str, hf_home: str) -> Union[str, None]:
+    if os.path.isdir(base_model):
+        return base_model
+
+    snapshots_path = os.path.join(
+        hf_home, "hub", f"models--{base_model.replace('/', '--')}", "snapshots"
+    )
+    if not os.path.isdir(snapshots_path):
+        return None
+
+    with os.scandir(snapshots_path) as it:
+        snapshots = sorted(
+            (entry for entry in it if entry.is_dir()),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+    return snapshots[-1].path if snapshots else None
+
+
+def load_model_config(model_path: str) -> dict:
+    with open(os.path.join(model_path, "config.json"), "rb") as f:
+        config = orjson.loads(f.read())
+    # multimodal models keep the language model settings in a sub config
+    return {**config, **config.get("text_config", dict())}
+
+
+def get_head_layout(model_config: dict) -> tuple:
+    hidden_size = model_config["hidden_size"]
+    num_heads = model_config.get("num_attention_heads", 1)
+    num_kv_heads = model_config.get("num_key_value_heads") or num_heads
+    head_dim = model_config.get("head_dim") or hidden_size // num_heads
+    return num_heads, num_kv_heads, head_dim
+
+
+def get_dtype_bytes(model_config: dict) -> float:
+    quantization = model_config.get("quantization_config") or dict()
+    if quantization.get("bits"):
+        return quantization["bits"] / 8
+    return DTYPE_BYTES.get(f"{model_config.get('torch_dtype', 'bfloat16')}", 2)
+
+
+def estimate_num_params(model_config: dict) -> int:
+    hidden_size = model_config["hidden_size"]
+    num_layers = model_config["num_hidden_layers"]
+    num_heads, num_kv_heads, head_dim = get_head_layout(model_config)
+    intermediate_size = model_config.get("intermediate_size") or 4 * hidden_size
+    num_experts = (
+        model_config.get("num_local_experts")
+        or model_config.get("n_routed_experts")
+        or model_config.get("num_experts")
+        or 1
+    )
+
+    attention = 2 * hidden_size * num_heads * head_dim
+    attention += 2 * hidden_size * num_kv_heads * head_dim
+    mlp = 3 * hidden_size * intermediate_size * num_experts
+    embeddings = model_config.get("vocab_size", 32000) * hidden_size
+    if not model_config.get("tie_word_embeddings", False):
+        embeddings *= 2
+    return num_layers * (attention + mlp) + embeddings
+
+
+def estimate_kv_bytes_per_token(model_config: dict) -> int:
+    _, num_kv_heads, head_dim = get_head_layout(model_config)
+    # key and value of every layer, cached in the 16 bit model dtype
+    return 2 * model_config["num_hidden_layers"] * num_kv_heads * head_dim * 2
+
+
+def get_valid_tp_sizes(model_config: dict, num_gpus: int) -> List[int]:
+    num_heads, num_kv_heads, _ = get_head_layout(model_config)
+    sizes = list()
+    size = 1
+    while size <= max(num_gpus, 1):
+        if num_heads % size == 0 and (
+            num_kv_heads % size == 0 or size % num_kv_heads == 0
+        ):
+            sizes.append(size)
+        size *= 2
+    return sizes
+
+
+def plan_vllm_profile(
+    model_config: dict,
+    gpus: List[dict],
+    gpu_memory_utilization: float = 0.95,
+    weights_gb: Union[float, None] = None,
+    max_model_len_cap: Union[int, None] = None,
+    overrides: Union[VllmLaunchOverrides, None] = None,
+) -> VllmLaunchProfile:
+    """Pick vllm launch settings for a model from its config.json and the gpu
+    inventory ({"index", "total_gb", "free_gb"} per gpu). Pure so it can be
+    checked without a gpu; any field set in `overrides` is kept as given and
+    the rest is planned around it."""
+    overrides = overrides or VllmLaunchOverrides()
+    reasons = list()
+    if overrides.gpu_ids:
+        gpus = [gpu for gpu in gpus if gpu["index"] in overrides.gpu_ids]
+
+    if weights_gb is None:
+        weights_gb = (
+            estimate_num_params(model_config) * get_dtype_bytes(model_config) / GiB
+        )
+    kv_gb_per_token = estimate_kv_bytes_per_token(model_config) / GiB
+    context_len = model_config.get("max_position_embeddings") or 8192
+    if max_model_len_cap:
+        context_len = min(context_len, max_model_len_cap)
+    min_model_len = overrides.max_model_len or min(MIN_MODEL_LEN, context_len)
+
+    utilization = overrides.gpu_memory_utilization or gpu_memory_utilization
+    if not gpus:
+        reasons.append("no gpu inventory, planned for one gpu of unknown size")
+        per_gpu_gb = None
+        candidates = [overrides.tensor_parallel_size or 1]
+    else:
+        tp_override = overrides.tensor_parallel_size
+        if tp_override and tp_override > len(gpus):
+            raise ValueError(
+                f"tensor parallel size {tp_override} is larger than the "
+                f"{len(gpus)} available gpu"
+            )
+        gpus = sorted(gpus, key=lambda gpu: gpu["free_gb"], reverse=True)
+        candidates = (
+            [overrides.tensor_parallel_size]
+            if overrides.tensor_parallel_size
+            else get_valid_tp_sizes(model_config, len(gpus))
+        )
+
+    tp_size, cpu_offload_gb, gpu_ids = candidates[-1], 0, overrides.gpu_ids
+    if gpus:
+        for size in candidates:
+            selected = gpus[:size]
+            total_gb = min(gpu["total_gb"] for gpu in selected)
+            free_gb = min(gpu["free_gb"] for gpu in selected)
+            # vllm refuses to start when its share exceeds the free memory
+            size_utilization = min(
+                utilization, math.floor(free_gb / total_gb * 100) / 100
+            )
+            per_gpu_gb = total_gb * size_utilization - RUNTIME_OVERHEAD_GB
+            needed_gb = (weights_gb + kv_gb_per_token * min_model_len) / size
+            if needed_gb <= per_gpu_gb:
+                tp_size, utilization = size, size_utilization
+                break
+        else:
+            # offloading only moves weights, the kv cache has to fit on the gpu
+            min_free_gb = RUNTIME_OVERHEAD_GB + kv_gb_per_token * min_model_len / size
+            if free_gb < min_free_gb:
+                raise ValueError(
+                    f"not enough free GPU memory, {free_gb} GB free on gpu "
+                    f"{[gpu['index'] for gpu in selected]}, at least "
+                    f"{min_free_gb:.1f} GB per gpu is needed"
+                )
+            tp_size, utilization = size, size_utilization
+            if overrides.cpu_offload_gb is None:
+                cpu_offload_gb = math.ceil(needed_gb - per_gpu_gb)
+                reasons.append(
+                    f"weights do not fit in {tp_size} gpu, offload {cpu_offload_gb} GB per gpu to cpu"
+                )
+        gpu_ids = [gpu["index"] for gpu in selected]
+        reasons.append(
+            f"tensor parallel {tp_size} for {weights_gb:.1f} GB of weights on gpu {gpu_ids}"
+        )
+        if utilization < (overrides.gpu_memory_utilization or gpu_memory_utilization):
+            reasons.append(
+                f"gpu memory utilization lowered to {utilization} of free memory"
+            )
+
+    if overrides.cpu_offload_gb is not None:
+        cpu_offload_gb = overrides.cpu_offload_gb
+
+    if per_gpu_gb is None:
+        kv_budget_gb = None
+    else:
+        kv_budget_gb = (per_gpu_gb + cpu_offload_gb) * tp_size - weights_gb
+    graph_headroom = (
+        kv_budget_gb is not None
+        and kv_budget_gb - CUDA_GRAPH_GB * tp_size
+        >= kv_gb_per_token * min(MIN_MODEL_LEN, context_len) * 2
+    )
+
+    if overrides.max_model_len:
+        max_model_len = overrides.max_model_len
+    elif kv_budget_gb is None:
+        max_model_len = min(context_len, 8192)
+    else:
+        capacity = int(max(kv_budget_gb, 0) / kv_gb_per_token)
+        max_model_len = min(context_len, capacity)
+        if max_model_len > MODEL_LEN_ALIGN:
+            max_model_len -= max_model_len % MODEL_LEN_ALIGN
+        max_model_len = max(max_model_len, min(MIN_MODEL_LEN, context_len))
+        if max_model_len < context_len:
+            reasons.append(
+                f"max model len capped to {max_model_len} by kv cache memory"
+            )
+
+    if overrides.enforce_eager is not None:
+        enforce_eager = overrides.enforce_eager
+    else:
+        # graphs need spare memory and do not pay off with offloaded weights
+        enforce_eager = cpu_offload_gb > 0 or not graph_headroom
+        if kv_budget_gb is None:
+            reasons.append("eager mode, gpu memory headroom is unknown")
+        elif enforce_eager:
+            reasons.append("eager mode, not enough memory headroom for cuda graphs")
+
+    if overrides.enable_prefix_caching is not None:
+        enable_prefix_caching = overrides.enable_prefix_caching
+    else:
+        enable_prefix_caching = (
+            model_config.get("model_type") not in NO_PREFIX_CACHING_TYPES
+        )
+
+    if overrides.max_num_seqs:
+        max_num_seqs = overrides.max_num_seqs
+    elif kv_budget_gb is None:
+        max_num_seqs = MAX_NUM_SEQS
+    else:
+        kv_budget_gb -= 0 if enforce_eager else CUDA_GRAPH_GB * tp_size
+        tokens = max(kv_budget_gb, 0) / kv_gb_per_token
+        max_num_seqs = 2 ** int(math.log2(max(tokens / TYPICAL_SEQ_TOKENS, 1)))
+        max_num_seqs = min(max(max_num_seqs, MIN_NUM_SEQS), MAX_NUM_SEQS)
+
+    return VllmLaunchProfile(
+        tensor_parallel_size=tp_size,
+        gpu_memory_utilization=utilization,
+        max_model_len=max_model_len,
+        cpu_offload_gb=cpu_offload_gb,
+        enforce_eager=enforce_eager,
+        enable_prefix_caching=enable_prefix_caching,
+        max_num_seqs=max_num_seqs,
+        gpu_ids=gpu_ids,
+        reasons=reasons,
+    )
+
+
+async def plan_vllm_launch(
+    model_path: Union[str, None],
+    gpu_memory_utilization: float,
+    overrides: Union[VllmLaunchOverrides, None] = None,
+) -> VllmLaunchProfile:
+    try:
+        if model_path is None:
+            raise FileNotFoundError("model is not downloaded")
+        model_config = await asyncio.to_thread(load_model_config, model_path)
+        weights_gb = await asyncio.to_thread(get_weights_gb, model_path)
+    except (OSError, ValueError, KeyError) as e:
+        accel_logger.error(f"Can not read model config of {model_path}: {e}")
+        return VllmLaunchProfile(
+            gpu_memory_utilization=gpu_memory_utilization,
+            reasons=["no model config, default profile"],
+        ).model_copy(
+            update={
+                key: value
+                for key, value in (overrides or VllmLaunchOverrides())
+                .model_dump()
+                .items()
+                if value is not None
+            }
+        )
+
+    gpus = await get_gpu_inventory()
+    try:
+        reserved = get_reserved_gpu_memory(
+            backends=await list_backend_containers(), gpus=gpus
+        )
+    except Exception as e:
+        accel_logger.error(f"Can not list infer backend containers: {e}")
+        reserved = dict()
+    # loading backends have claimed memory that hwinfo does not show yet
+    for gpu in gpus:
+        gpu["free_gb"] = round(
+            max(
+                min(gpu["free_gb"], gpu["total_gb"] - reserved.get(gpu["index"], 0.0)),
+                0.0,
+            ),
+            2,
+        )
+
+    profile = plan_vllm_profile(
+        model_config=model_config,
+        gpus=gpus,
+        gpu_memory_utilization=gpu_memory_utilization,
+        weights_gb=weights_gb,
+        max_model_len_cap=VLLM_CONFIG.max_model_len,
+        overrides=overrides,
+    )
+    accel_logger.info(f"vLLM launch profile for {model_path}: {profile.model_dump()}")
+    return profile
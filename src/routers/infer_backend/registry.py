@@ -0,0 +1,73 @@
+from typing import Dict, List, Union
+
+import httpx
+
+from src.thirdparty.docker.api_handler import list_containers
+
+BACKEND_LABEL = "acceltune.infer-backend"
+GPUS_LABEL = "acceltune.gpus"
+GPU_UTILIZATION_LABEL = "acceltune.gpu-memory-utilization"
+
+
+def parse_backend_container(container: dict) -> dict:
+    labels = container.get("Labels") or dict()
+    gpu_ids = labels.get(GPUS_LABEL)
+    gpu_memory_utilization = labels.get(GPU_UTILIZATION_LABEL)
+    return {
+        "container_name": container["Names"][0].lstrip("/"),
+        "model_name": labels[BACKEND_LABEL],
+        "image": container.get("Image"),
+        "state": container.get("State"),
+        "status": container.get("Status"),
+        "host_port": next(
+            (
+                port["PublicPort"]
+                for port in container.get("Ports") or list()
+                if "PublicPort" in port
+            ),
+            None,
+        ),
+        # no gpu ids means the container sees every gpu
+        "gpu_ids": [int(gpu_id) for gpu_id in gpu_ids.split(",")] if gpu_ids else None,
+        "gpu_memory_utilization": (
+            float(gpu_memory_utilization) if gpu_memory_utilization else None
+        ),
+    }
+
+
+async def list_backend_containers() -> List[dict]:
+    transport = httpx.AsyncHTTPTransport(uds="/var/run/docker.sock")
+    async with httpx.AsyncClient(transport=transport, timeout=10) as aclient:
+        containers = await list_containers(
+            aclient=aclient, filters={"label": [BACKEND_LABEL]}
+        )
+    return [parse_backend_container(container) for container in containers]
+
+
+def get_reserved_gpu_memory(backends: List[dict], gpus: List[dict]) -> Dict[int, float]:
+    """GPU memory in GB each gpu has promised to backend containers. A backend
+    claims its share while it is still loading, before hwinfo sees it."""
+    totals = {gpu["index"]: gpu["total_gb"] for gpu in gpus}
+    reserved = dict()
+    for backend in backends:
+        if not backend["gpu_ids"] or not backend["gpu_memory_utilization"]:
+            continue
+        for gpu_id in backend["gpu_ids"]:
+            if gpu_id in totals:
+                reserved[gpu_id] = reserved.get(gpu_id, 0.0) + round(
+                    totals[gpu_id] * backend["gpu_memory_utilization"], 2
+                )
+    return reserved
+
+
+def get_gpu_memory_gb(backend: dict, gpus: List[dict]) -> Union[float, None]:
+    totals = {gpu["index"]: gpu["total_gb"] for gpu in gpus}
+    if not backend["gpu_memory_utilization"] or not backend["gpu_ids"]:
+        return None
+    if any(gpu_id not in totals for gpu_id in backend["gpu_ids"]):
+        return None
+    return round(
+        sum(totals[gpu_id] for gpu_id in backend["gpu_ids"])
+        * backend["gpu_memory_utilization"],
+        2,
+    )
@@ -1,48 +1,90 @@
+import asyncio
 import json
-import os
 from typing import Annotated, Union
 
 import orjson
-from fastapi import APIRouter, HTTPException, Query, Response, status
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query, Response, status
 
-from src.config.params import COMMON_CONFIG, STATUS_CONFIG, TASK_CONFIG
-from src.routers.infer_backend import schema, utils, validator
+from src.config.params import INFERPOOL_CONFIG, STATUS_CONFIG, TASK_CONFIG
+from src.routers.gateway.utils import gateway_router
+from src.routers.infer_backend import schema, service, utils, validator
+from src.routers.infer_backend.pool import estimate_memory_gb, infer_backend_pool
+from src.routers.infer_backend.profile import get_gpu_inventory
+from src.routers.infer_backend.registry import (
+    get_gpu_memory_gb,
+    get_reserved_gpu_memory,
+    list_backend_containers,
+)
 from src.thirdparty.redis.handler import redis_async
 from src.utils.error import ResponseErrorHandler
 from src.utils.logger import accel_logger
+from src.utils.metrics import track_background_task
 
 router = APIRouter(prefix="/infer-backend", tags=["Infer-Backend"])
 
 
 @router.post("/start/")
 async def start_infer_backend(
+    background_tasks: BackgroundTasks,
     request_data: schema.PostInferBackendStart,
 ):
-    validator.PostInferBackendStart(model_name=request_data.model_name)
+    validator.PostInferBackendStart(
+        model_name=request_data.model_name, serving_mode=request_data.serving_mode
+    )
     error_handler = ResponseErrorHandler()
 
     try:
         info = await redis_async.client.hget(TASK_CONFIG.train, request_data.model_name)
         info = orjson.loads(info)
 
-        reload_info = await utils.check_merge_status_and_reload(
-            name=request_data.model_name,
-            train_args=info["train_args"],
-            last_model_path=info["last_model_path"],
-        )
-
-        service_type = "vllm"
-        model_service_info = await utils.startup_vllm_service(
-            model_name=request_data.model_name,
-            local_safetensors_path=os.path.join(
-                COMMON_CONFIG.root_path,
-                os.path.relpath(
-                    reload_info["last_model_path"], COMMON_CONFIG.workspace_path
+        # a loaded backend is reused as is
+        if info["container"]["infer_backend"]["status"] == STATUS_CONFIG.active:
+            await infer_backend_pool.touch(name=request_data.model_name)
+            return Response(
+                content=json.dumps(
+                    {
+                        "model_service_url": info["container"]["infer_backend"]["url"],
+                        "container_name": info["container"]["infer_backend"]["id"],
+                        "model_name": request_data.model_name,
+                    }
                 ),
-            ),
-            base_model=reload_info["train_args"]["base_model"],
-            hf_home=COMMON_CONFIG.hf_home,
+                status_code=status.HTTP_200_OK,
+                media_type="application/json",
+            )
+
+    except Exception as e:
+        accel_logger.error(f"Database error: {e}")
+        error_handler.add(
+            type=error_handler.ERR_REDIS,
+            loc=[error_handler.LOC_DATABASE],
+            msg=f"Database error: {e}",
+            input=request_data.model_dump(),
         )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=error_handler.errors,
+        ) from None
+
+    ready_timeout = request_data.ready_timeout or INFERPOOL_CONFIG.ready_timeout
+    memory_gb, evicted = 0.0, list()
+    try:
+        if request_data.serving_mode == "lora":
+            reload_info = info
+        else:
+            reload_info = await utils.check_merge_status_and_reload(
+                name=request_data.model_name,
+                train_args=info["train_args"],
+                last_model_path=info["last_model_path"],
+            )
+
+            memory_gb = await asyncio.to_thread(
+                estimate_memory_gb, reload_info["last_model_path"]
+            )
+            evicted = await infer_backend_pool.reserve(
+                name=request_data.model_name,
+                memory_gb=memory_gb,
+                backend_type="vllm",
+            )
 
     except FileNotFoundError as e:
         accel_logger.error(f"{e}")
@@ -56,6 +98,18 @@ async def start_infer_backend(
             status_code=status.HTTP_404_NOT_FOUND, detail=error_handler.errors
         ) from None
 
+    except ValueError as e:
+        accel_logger.error(f"{e}")
+        error_handler.add(
+            type=error_handler.ERR_VALIDATE,
+            loc=[error_handler.LOC_PROCESS],
+            msg=f"{e}",
+            input=request_data.model_dump(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail=error_handler.errors
+        ) from None
+
     except Exception as e:
         accel_logger.error(f"{e}")
         error_handler.add(
@@ -70,19 +124,12 @@ async def start_infer_backend(
         ) from None
 
     try:
-        reload_info["container"]["infer_backend"]["status"] = STATUS_CONFIG.active
-        reload_info["container"]["infer_backend"]["id"] = model_service_info[
-            "container_name"
-        ]
-        reload_info["container"]["infer_backend"]["url"] = model_service_info[
-            f"{service_type}_service"
-        ]
-        reload_info["container"]["infer_backend"]["type"] = service_type
-        await redis_async.client.hset(
-            TASK_CONFIG.train, request_data.model_name, orjson.dumps(reload_info)
+        await service.update_infer_backend(
+            model_name=request_data.model_name, status=STATUS_CONFIG.setup, error=None
         )
 
     except Exception as e:
+        await infer_backend_pool.discard(name=request_data.model_name)
         accel_logger.error(f"Database error: {e}")
         error_handler.add(
             type=error_handler.ERR_REDIS,
@@ -95,12 +142,73 @@ async def start_infer_backend(
             detail=error_handler.errors,
         ) from None
 
+    start_kwargs = {
+        "model_name": request_data.model_name,
+        "serving_mode": request_data.serving_mode,
+        "info": reload_info,
+        "ready_timeout": ready_timeout,
+        "memory_gb": memory_gb,
+        "evicted": evicted,
+        "overrides": request_data.launch_profile,
+    }
+    if not request_data.wait:
+        # readiness is published on the infer backend events channel
+        background_tasks.add_task(
+            track_background_task(service.start_infer_backend_background_task),
+            **start_kwargs,
+        )
+        return Response(
+            content=json.dumps(
+                {"model_name": request_data.model_name, "status": STATUS_CONFIG.setup}
+            ),
+            status_code=status.HTTP_202_ACCEPTED,
+            media_type="application/json",
+        )
+
+    try:
+        model_service_info = await service.start_infer_backend(**start_kwargs)
+
+    except FileNotFoundError as e:
+        error_handler.add(
+            type=error_handler.ERR_INTERNAL,
+            loc=[error_handler.LOC_PROCESS],
+            msg=f"{e}",
+            input=request_data.model_dump(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=error_handler.errors
+        ) from None
+
+    except ValueError as e:
+        error_handler.add(
+            type=error_handler.ERR_VALIDATE,
+            loc=[error_handler.LOC_PROCESS],
+            msg=f"{e}",
+            input=request_data.model_dump(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail=error_handler.errors
+        ) from None
+
+    except Exception as e:
+        error_handler.add(
+            type=error_handler.ERR_INTERNAL,
+            loc=[error_handler.LOC_PROCESS],
+            msg=f"{e}",
+            input=request_data.model_dump(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=error_handler.errors,
+        ) from None
+
     return Response(
         content=json.dumps(
             {
-                "model_service_url": model_service_info[f"{service_type}_service"],
+                "model_service_url": model_service_info["vllm_service"],
                 "container_name": model_service_info["container_name"],
                 "model_name": model_service_info["model_name"],
+                "launch_profile": model_service_info.get("profile"),
             }
         ),
         status_code=status.HTTP_200_OK,
@@ -110,6 +218,7 @@ async def start_infer_backend(
 
 @router.post("/stop/")
 async def stop_infer_backend(
+    background_tasks: BackgroundTasks,
     request_data: schema.PostInferBackendStop,
 ):
     validator.PostInferBackendStop(model_name=request_data.model_name)
@@ -119,12 +228,17 @@ async def stop_infer_backend(
         info = await redis_async.client.hget(TASK_CONFIG.train, request_data.model_name)
         info = orjson.loads(info)
         container_id = info["container"]["infer_backend"]["id"]
+        model_service = info["container"]["infer_backend"]["url"]
+        base_name = info["container"]["infer_backend"].get("base")
         info["container"]["infer_backend"]["status"] = "stopped"
         info["container"]["infer_backend"]["url"] = None
         info["container"]["infer_backend"]["id"] = None
+        info["container"]["infer_backend"]["base"] = None
+        info["container"]["infer_backend"]["profile"] = None
         await redis_async.client.hset(
             TASK_CONFIG.train, request_data.model_name, orjson.dumps(info)
         )
+        await infer_backend_pool.discard(name=request_data.model_name)
 
     except Exception as e:
         accel_logger.error(f"Database error: {e}")
@@ -140,10 +254,17 @@ async def stop_infer_backend(
         ) from None
 
     try:
-        stopped_container = await utils.stop_model_service(
-            container_name=container_id,
-            infer_backend_type=info["container"]["infer_backend"]["type"],
-        )
+        if base_name:
+            # only the adapter goes away, the base backend stays warm in the pool
+            await utils.unload_lora_adapter(
+                model_service=model_service, lora_name=request_data.model_name
+            )
+            stopped_container = None
+        else:
+            stopped_container = await utils.stop_model_service(
+                container_name=container_id,
+                infer_backend_type=info["container"]["infer_backend"]["type"],
+            )
 
     except Exception as e:
         accel_logger.error(f"Unexpected error: {e}")
@@ -158,6 +279,11 @@ async def stop_infer_backend(
             detail=error_handler.errors,
         ) from None
 
+    # extra gateway replicas go down with the primary backend
+    background_tasks.add_task(
+        track_background_task(gateway_router.remove_replicas), request_data.model_name
+    )
+
     return Response(
         content=json.dumps({"stopped_container": stopped_container}),
         status_code=status.HTTP_200_OK,
@@ -181,10 +307,15 @@ async def get_infer_backend(
             info = orjson.loads(info)
             infer_backend_info = {
                 "name": info["name"],
-                "loaded": True
-                if info["container"]["infer_backend"]["status"] == STATUS_CONFIG.active
-                else False,
+                "loaded": (
+                    True
+                    if info["container"]["infer_backend"]["status"]
+                    == STATUS_CONFIG.active
+                    else False
+                ),
                 "model_service_url": info["container"]["infer_backend"]["url"],
+                "base": info["container"]["infer_backend"].get("base"),
+                "launch_profile": info["container"]["infer_backend"].get("profile"),
             }
         else:
             info = await redis_async.client.hgetall(TASK_CONFIG.train)
@@ -194,6 +325,10 @@ async def get_infer_backend(
                     "loaded": value["container"]["infer_backend"]["status"]
                     == STATUS_CONFIG.active,
                     "model_service_url": value["container"]["infer_backend"]["url"],
+                    "base": value["container"]["infer_backend"].get("base"),
+                    "launch_profile": value["container"]["infer_backend"].get(
+                        "profile"
+                    ),
                 }
                 for v in info.values()
             ]
@@ -216,3 +351,118 @@ async def get_infer_backend(
         status_code=status.HTTP_200_OK,
         media_type="application/json",
     )
+
+
+@router.get("/pool/")
+async def get_infer_backend_pool():
+    error_handler = ResponseErrorHandler()
+
+    try:
+        entries = await infer_backend_pool.get_entries()
+        backends = sorted(
+            entries.values(), key=lambda entry: entry["last_used"], reverse=True
+        )
+
+    except Exception as e:
+        accel_logger.error(f"Database error: {e}")
+        error_handler.add(
+            type=error_handler.ERR_REDIS,
+            loc=[error_handler.LOC_DATABASE],
+            msg="Database error",
+            input={},
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=error_handler.errors,
+        ) from None
+
+    return Response(
+        content=json.dumps(
+            {
+                "gpu_memory_gb": infer_backend_pool.gpu_memory_gb,
+                "max_backends": infer_backend_pool.max_backends,
+                "used_memory_gb": round(
+                    sum(entry["memory_gb"] for entry in backends), 2
+                ),
+                "backends": backends,
+            }
+        ),
+        status_code=status.HTTP_200_OK,
+        media_type="application/json",
+    )
+
+
+@router.get("/backends/")
+async def get_infer_backend_registry():
+    error_handler = ResponseErrorHandler()
+
+    try:
+        containers = await list_backend_containers()
+
+    except Exception as e:
+        accel_logger.error(f"Docker error: {e}")
+        error_handler.add(
+            type=error_handler.ERR_INTERNAL,
+            loc=[error_handler.LOC_PROCESS],
+            msg=f"Docker error: {e}",
+            input={},
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=error_handler.errors,
+        ) from None
+
+    try:
+        entries = await infer_backend_pool.get_entries()
+
+    except Exception as e:
+        accel_logger.error(f"Database error: {e}")
+        error_handler.add(
+            type=error_handler.ERR_REDIS,
+            loc=[error_handler.LOC_DATABASE],
+            msg="Database error",
+            input={},
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=error_handler.errors,
+        ) from None
+
+    gpus = await get_gpu_inventory()
+    reserved = get_reserved_gpu_memory(backends=containers, gpus=gpus)
+    pool_entries = {
+        entry["id"]: entry for entry in entries.values() if not entry.get("base")
+    }
+    backends = list()
+    for container in containers:
+        # containers outside the pool are gateway replicas
+        entry = pool_entries.get(container["container_name"])
+        backends.append(
+            dict(
+                container,
+                pool_name=entry["name"] if entry else None,
+                pool_status=entry["status"] if entry else None,
+                memory_gb=entry["memory_gb"] if entry else None,
+                refs=entry["refs"] if entry else None,
+                adapters=[
+                    adapter["name"]
+                    for adapter in entries.values()
+                    if entry and adapter.get("base") == entry["name"]
+                ],
+                gpu_memory_gb=get_gpu_memory_gb(backend=container, gpus=gpus),
+            )
+        )
+
+    return Response(
+        content=json.dumps(
+            {
+                "gpus": [
+                    dict(gpu, reserved_gb=round(reserved.get(gpu["index"], 0.0), 2))
+                    for gpu in gpus
+                ],
+                "backends": backends,
+            }
+        ),
+        status_code=status.HTTP_200_OK,
+        media_type="application/json",
+    )
@@ -1,9 +1,10 @@
 import re
-from typing import Union
+from typing import Literal, Union
 
 from fastapi import HTTPException, status
 from pydantic import BaseModel, ConfigDict, model_validator
 
+from src.routers.infer_backend.profile import VllmLaunchOverrides
 from src.utils.error import ResponseErrorHandler
 
 
@@ -12,6 +13,10 @@ class PostInferBackendStart(BaseModel):
         protected_namespaces=()
     )  # solve can not start with "model_"
     model_name: str
+    serving_mode: Literal["merged", "lora"] = "merged"
+    ready_timeout: Union[int, None] = None
+    launch_profile: Union[VllmLaunchOverrides, None] = None
+    wait: bool = True
 
     @model_validator(mode="after")
     def check(self: "PostInferBackendStart") -> "PostInferBackendStart":
@@ -25,6 +30,17 @@ class PostInferBackendStart(BaseModel):
                 input={"model_name": self.model_name},
             )
 
+        if self.ready_timeout is not None and self.ready_timeout <= 0:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'ready_timeout' must larger than 0",
+                input={"ready_timeout": self.ready_timeout},
+            )
+
+        if self.launch_profile is not None:
+            self.check_launch_profile(error_handler=error_handler)
+
         if error_handler.errors != []:
             raise HTTPException(
                 status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
@@ -33,6 +49,68 @@ class PostInferBackendStart(BaseModel):
 
         return self
 
+    def check_launch_profile(self, error_handler: ResponseErrorHandler) -> None:
+        profile = self.launch_profile
+        if self.serving_mode == "lora":
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'launch_profile' only applies to merged serving, lora adapters share the base model backend",
+                input={"serving_mode": self.serving_mode},
+            )
+
+        if profile.tensor_parallel_size is not None and (
+            profile.tensor_parallel_size < 1
+            or profile.tensor_parallel_size & (profile.tensor_parallel_size - 1)
+        ):
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'tensor_parallel_size' must be a power of 2",
+                input={"tensor_parallel_size": profile.tensor_parallel_size},
+            )
+
+        if profile.gpu_memory_utilization is not None and not (
+            0 < profile.gpu_memory_utilization <= 1
+        ):
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'gpu_memory_utilization' must between 0 to 1",
+                input={"gpu_memory_utilization": profile.gpu_memory_utilization},
+            )
+
+        for key in ("max_model_len", "max_num_seqs"):
+            value = getattr(profile, key)
+            if value is not None and value <= 0:
+                error_handler.add(
+                    type=error_handler.ERR_VALIDATE,
+                    loc=[error_handler.LOC_BODY],
+                    msg=f"'{key}' must larger than 0",
+                    input={key: value},
+                )
+
+        if profile.gpu_ids is not None and (
+            not profile.gpu_ids
+            or any(gpu_id < 0 for gpu_id in profile.gpu_ids)
+            or len(set(profile.gpu_ids)) != len(profile.gpu_ids)
+            or len(profile.gpu_ids) < (profile.tensor_parallel_size or 1)
+        ):
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'gpu_ids' must be distinct gpu indexes, at least 'tensor_parallel_size' of them",
+                input={"gpu_ids": profile.gpu_ids},
+            )
+
+        if profile.cpu_offload_gb is not None and profile.cpu_offload_gb < 0:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'cpu_offload_gb' can not be negative",
+                input={"cpu_offload_gb": profile.cpu_offload_gb},
+            )
+
 
 class PostInferBackendStop(BaseModel):
     model_config = ConfigDict(
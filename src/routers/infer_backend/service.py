@@ -0,0 +1,183 @@
+import asyncio
+import os
+from typing import List, Union
+
+import orjson
+
+from src.config.params import COMMON_CONFIG, STATUS_CONFIG, TASK_CONFIG
+from src.routers.infer_backend.pool import infer_backend_pool, serve_lora_adapter
+from src.routers.infer_backend.profile import VllmLaunchOverrides, plan_vllm_launch
+from src.routers.infer_backend.utils import startup_vllm_service
+from src.thirdparty.redis.handler import redis_async
+from src.utils.logger import accel_logger
+
+
+def get_backend_event(model_name: str, infer_backend: dict) -> dict:
+    return {
+        "model_name": model_name,
+        "status": infer_backend["status"],
+        "model_service_url": infer_backend["url"],
+        "container_name": infer_backend["id"],
+        "error": infer_backend.get("error"),
+    }
+
+
+async def update_infer_backend(model_name: str, **fields) -> dict:
+    """Write `fields` into the infer_backend record of `model_name` and notify
+    subscribers waiting for it to be ready."""
+    info = orjson.loads(await redis_async.client.hget(TASK_CONFIG.train, model_name))
+    info["container"]["infer_backend"].update(fields)
+    await redis_async.client.hset(TASK_CONFIG.train, model_name, orjson.dumps(info))
+    await redis_async.client.publish(
+        TASK_CONFIG.infer_backend_events,
+        orjson.dumps(
+            get_backend_event(
+                model_name=model_name, infer_backend=info["container"]["infer_backend"]
+            )
+        ),
+    )
+    return info
+
+
+async def load_merged_backend(
+    model_name: str,
+    info: dict,
+    memory_gb: float,
+    evicted: List[dict],
+    ready_timeout: int,
+    overrides: Union[VllmLaunchOverrides, None] = None,
+) -> dict:
+    try:
+        for entry in evicted:
+            await infer_backend_pool.evict(entry=entry)
+
+        profile = await plan_vllm_launch(
+            model_path=info["last_model_path"],
+            gpu_memory_utilization=infer_backend_pool.gpu_memory_utilization(
+                memory_gb=memory_gb
+            ),
+            overrides=overrides,
+        )
+        model_service_info = await startup_vllm_service(
+            model_name=model_name,
+            local_safetensors_path=os.path.join(
+                COMMON_CONFIG.root_path,
+                os.path.relpath(info["last_model_path"], COMMON_CONFIG.workspace_path),
+            ),
+            base_model=info["train_args"]["base_model"],
+            hf_home=COMMON_CONFIG.hf_home,
+            ready_timeout=ready_timeout,
+            **profile.launch_args(),
+        )
+    except Exception:
+        await infer_backend_pool.discard(name=model_name)
+        raise
+
+    await infer_backend_pool.activate(
+        name=model_name,
+        url=model_service_info["vllm_service"],
+        container_name=model_service_info["container_name"],
+        backend_type="vllm",
+    )
+    model_service_info["profile"] = profile.model_dump()
+    return model_service_info
+
+
+async def start_infer_backend(
+    model_name: str,
+    serving_mode: str,
+    info: dict,
+    ready_timeout: int,
+    memory_gb: float = 0.0,
+    evicted: Union[List[dict], None] = None,
+    overrides: Union[VllmLaunchOverrides, None] = None,
+) -> dict:
+    """Load the backend of `model_name`, which the caller has marked as being
+    set up, then record it as active or failed. Either outcome is published on
+    the infer backend events channel."""
+    try:
+        if serving_mode == "lora":
+            # the adapter is hot-loaded into a backend shared by its base model
+            model_service_info = await serve_lora_adapter(
+                name=model_name,
+                train_args=info["train_args"],
+                ready_timeout=ready_timeout,
+            )
+        else:
+            model_service_info = await load_merged_backend(
+                model_name=model_name,
+                info=info,
+                memory_gb=memory_gb,
+                evicted=evicted or list(),
+                ready_timeout=ready_timeout,
+                overrides=overrides,
+            )
+
+    except Exception as e:
+        accel_logger.error(f"Failed to start infer backend of {model_name}: {e}")
+        await update_infer_backend(
+            model_name=model_name, status=STATUS_CONFIG.failed, error=f"{e}"
+        )
+        raise
+
+    await update_infer_backend(
+        model_name=model_name,
+        status=STATUS_CONFIG.active,
+        id=model_service_info["container_name"],
+        url=model_service_info["vllm_service"],
+        type="vllm",
+        base=model_service_info.get("base"),
+        profile=model_service_info.get("profile"),
+        error=None,
+    )
+    return model_service_info
+
+
+async def start_infer_backend_background_task(
+    model_name: str,
+    serving_mode: str,
+    info: dict,
+    ready_timeout: int,
+    memory_gb: float = 0.0,
+    evicted: Union[List[dict], None] = None,
+    overrides: Union[VllmLaunchOverrides, None] = None,
+) -> None:
+    try:
+        await start_infer_backend(
+            model_name=model_name,
+            serving_mode=serving_mode,
+            info=info,
+            ready_timeout=ready_timeout,
+            memory_gb=memory_gb,
+            evicted=evicted,
+            overrides=overrides,
+        )
+    except Exception:
+        # the failure is already recorded on the backend and published
+        return
+
+
+async def wait_infer_backend(model_name: str, timeout: float) -> dict:
+    """Block until the backend of `model_name` is no longer being set up and
+    return its status event."""
+    async with redis_async.client.pubsub() as pubsub:
+        # subscribe before reading the record so no transition is missed
+        await pubsub.subscribe(TASK_CONFIG.infer_backend_events)
+        info = await redis_async.client.hget(TASK_CONFIG.train, model_name)
+        if not info:
+            raise KeyError("model_name does not exists")
+
+        infer_backend = orjson.loads(info)["container"]["infer_backend"]
+        if infer_backend["status"] != STATUS_CONFIG.setup:
+            return get_backend_event(model_name=model_name, infer_backend=infer_backend)
+
+        async def listen() -> dict:
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                event = orjson.loads(message["data"])
+                if event["model_name"] == model_name:
+                    return event
+
+        # asyncio.timeout needs python 3.11, the service image runs 3.10
+        return await asyncio.wait_for(listen(), timeout=timeout)
@@ -1,6 +1,7 @@
+import asyncio
 import os
 import re
-from typing import Literal, Union
+from typing import List, Literal, Union
 
 import httpx
 import orjson
@@ -15,14 +16,25 @@ from src.config.params import (
     TASK_CONFIG,
     VLLM_CONFIG,
 )
+from src.routers.hw_info.usage import track_usage
+from src.routers.ollama.schema import PostStartOllama
+from src.routers.ollama.utils import start_ollama_service, stop_ollama_container
 from src.routers.train.utils import export_data_process, write_yaml
+from src.routers.vllm.schema import PostStartVLLM, PostStartVLLMLora
+from src.routers.vllm.utils import (
+    start_vllm_lora_service,
+    start_vllm_service,
+    stop_vllm_container,
+)
 from src.thirdparty.docker.api_handler import remove_container, wait_for_container
 from src.thirdparty.redis.handler import redis_async
+from src.utils.manifest import list_artifact_files, write_manifest
+from src.utils.tracing import TracingTransport
 from src.utils.utils import assemble_image_name
 
 
 async def call_internal_merge_api(merge_name: str) -> str:
-    async with httpx.AsyncClient(timeout=None) as aclient:
+    async with httpx.AsyncClient(transport=TracingTransport(), timeout=None) as aclient:
         response = await aclient.post(
             f"http://127.0.0.1:{MAINSERVICE_CONFIG.port}/acceltune/merge/start/",
             json={"merge_name": merge_name},
@@ -32,9 +44,12 @@ async def call_internal_merge_api(merge_name: str) -> str:
         if response.status_code == status.HTTP_200_OK:
             transport = httpx.AsyncHTTPTransport(uds="/var/run/docker.sock")
             async with httpx.AsyncClient(transport=transport, timeout=None) as aclient:
-                container_info = await wait_for_container(
-                    aclient=aclient, container_name=container_name
-                )
+                async with track_usage(
+                    name=merge_name, job="merge", container_name_or_id=container_name
+                ):
+                    container_info = await wait_for_container(
+                        aclient=aclient, container_name=container_name
+                    )
                 exit_status = container_info["StatusCode"]
                 if exit_status == 0:
                     merge_status = STATUS_CONFIG.finish
@@ -69,26 +84,21 @@ def check_file_complete(path: str) -> bool:
     found_files = set()
     is_shard_model = False
 
-    with os.scandir(path) as entries:
-        for entry in entries:
-            if not entry.is_file():
-                continue
-            name = entry.name
+    for name in list_artifact_files(path):
+        if name in required_files:
+            found_files.add(name)
 
-            if name in required_files:
-                found_files.add(name)
+        if name == "model.safetensors":
+            is_shard_model = True
 
-            if name == "model.safetensors":
-                is_shard_model = True
+        match = shard_pattern.fullmatch(name)
+        if match:
+            idx = int(match.group(1))
+            total = int(match.group(2))
+            found_shards[idx] = total
 
-            match = shard_pattern.fullmatch(name)
-            if match:
-                idx = int(match.group(1))
-                total = int(match.group(2))
-                found_shards[idx] = total
-
-            if name == "model.safetensors.index.json":
-                found_files.add(name)
+        if name == "model.safetensors.index.json":
+            found_files.add(name)
 
     if not required_files.issubset(found_files):
         return False
@@ -147,6 +157,7 @@ async def check_merge_status_and_reload(
                     merge_status = await call_internal_merge_api(merge_name=name)
                     if merge_status != STATUS_CONFIG.finish:
                         raise RuntimeError(f"merge {merge_status}")
+                    await asyncio.to_thread(write_manifest, merge_path)
                     await update_last_model_path(name=name, last_model_path=merge_path)
                 except HTTPException as e:
                     raise RuntimeError(e.detail[0]["msg"]) from None
@@ -169,69 +180,142 @@ async def startup_vllm_service(
     hf_home: str,
     gpu_memory_utilization: float = 0.95,
     max_model_len: int = 8192,
-    cpu_offload_gb: int = 110,
+    cpu_offload_gb: int = 0,
     tensor_parallel_size: int = 1,
+    enforce_eager: bool = True,
+    enable_prefix_caching: bool = True,
+    max_num_seqs: Union[int, None] = None,
+    gpu_ids: Union[List[int], None] = None,
+    ready_timeout: int = 900,
 ) -> dict:
-    async with httpx.AsyncClient(timeout=None) as aclient:
-        response = await aclient.post(
-            f"http://{MAINSERVICE_CONFIG.container_name}:{MAINSERVICE_CONFIG.port}/acceltune/vllm/start/safetensors/",
-            json={
-                "image_name": assemble_image_name(
-                    username=COMMON_CONFIG.username,
-                    repository=VLLM_CONFIG.name,
-                    tag=VLLM_CONFIG.tag,
-                ),
-                "service_port": VLLM_CONFIG.port,
-                "docker_network_name": DOCKERNETWORK_CONFIG.network_name,
-                "model_name": model_name,
-                "local_safetensors_path": local_safetensors_path,
-                "base_model": base_model,
-                "hf_home": hf_home,
-                "gpu_memory_utilization": gpu_memory_utilization,
-                "max_model_len": max_model_len,
-                "cpu_offload_gb": cpu_offload_gb,
-                "tensor_parallel_size": tensor_parallel_size,
-            },
+    return await start_vllm_service(
+        request_data=PostStartVLLM(
+            image_name=assemble_image_name(
+                username=COMMON_CONFIG.username,
+                repository=VLLM_CONFIG.name,
+                tag=VLLM_CONFIG.tag,
+            ),
+            service_port=VLLM_CONFIG.port,
+            docker_network_name=DOCKERNETWORK_CONFIG.network_name,
+            model_name=model_name,
+            local_safetensors_path=local_safetensors_path,
+            base_model=base_model,
+            hf_home=hf_home,
+            gpu_memory_utilization=gpu_memory_utilization,
+            max_model_len=max_model_len,
+            cpu_offload_gb=cpu_offload_gb,
+            tensor_parallel_size=tensor_parallel_size,
+            enforce_eager=enforce_eager,
+            enable_prefix_caching=enable_prefix_caching,
+            max_num_seqs=max_num_seqs,
+            gpu_ids=gpu_ids,
+            ready_timeout=ready_timeout,
         )
+    )
 
-        if response.status_code == status.HTTP_200_OK:
-            return response.json()
-        else:
-            raise RuntimeError(f"{response.json()['detail'][0]['msg']}") from None
 
-
-async def startup_ollama_service(local_gguf_path: str, model_name: str) -> dict:
-    async with httpx.AsyncClient(timeout=None) as aclient:
-        response = await aclient.post(
-            f"http://{MAINSERVICE_CONFIG.container_name}:{MAINSERVICE_CONFIG.port}/acceltune/ollama/start/",
-            json={
-                "image_name": assemble_image_name(
-                    username=COMMON_CONFIG.username,
-                    repository=OLLAMA_CONFIG.name,
-                    tag=OLLAMA_CONFIG.tag,
-                ),
-                "docker_network_name": DOCKERNETWORK_CONFIG.network_name,
-                "local_gguf_path": local_gguf_path,
-                "model_name": model_name,
-            },
+async def startup_ollama_service(
+    local_gguf_path: str, model_name: str, ready_timeout: int = 900
+) -> dict:
+    return await start_ollama_service(
+        request_data=PostStartOllama(
+            image_name=assemble_image_name(
+                username=COMMON_CONFIG.username,
+                repository=OLLAMA_CONFIG.name,
+                tag=OLLAMA_CONFIG.tag,
+            ),
+            docker_network_name=DOCKERNETWORK_CONFIG.network_name,
+            local_gguf_path=local_gguf_path,
+            model_name=model_name,
+            ready_timeout=ready_timeout,
         )
-
-        if response.status_code == status.HTTP_200_OK:
-            return response.json()
-        else:
-            raise RuntimeError(f"{response.json()}") from None
+    )
 
 
 async def stop_model_service(
     container_name: str, infer_backend_type: Literal["vllm", "ollama"]
 ) -> str:
-    async with httpx.AsyncClient(timeout=None) as aclient:
+    if infer_backend_type == "vllm":
+        return await stop_vllm_container(container_name_or_id=container_name)
+    return await stop_ollama_container(container_name_or_id=container_name)
+
+
+def lora_base_name(base_model: str) -> str:
+    # served model and container name of the shared base model backend
+    return "base-" + re.sub(r"[^a-zA-Z0-9_.-]+", "-", base_model.strip("/"))
+
+
+def get_lora_rank(adapter_path: str) -> int:
+    with open(os.path.join(adapter_path, "adapter_config.json"), "rb") as f:
+        return int(orjson.loads(f.read())["r"])
+
+
+async def startup_vllm_lora_service(
+    base_name: str,
+    base_model: str,
+    hf_home: str,
+    gpu_memory_utilization: float = 0.95,
+    max_model_len: int = 8192,
+    cpu_offload_gb: int = 0,
+    tensor_parallel_size: int = 1,
+    enforce_eager: bool = True,
+    enable_prefix_caching: bool = True,
+    max_num_seqs: Union[int, None] = None,
+    gpu_ids: Union[List[int], None] = None,
+    ready_timeout: int = 900,
+) -> dict:
+    return await start_vllm_lora_service(
+        request_data=PostStartVLLMLora(
+            image_name=assemble_image_name(
+                username=COMMON_CONFIG.username,
+                repository=VLLM_CONFIG.name,
+                tag=VLLM_CONFIG.tag,
+            ),
+            service_port=VLLM_CONFIG.port,
+            docker_network_name=DOCKERNETWORK_CONFIG.network_name,
+            model_name=base_name,
+            base_model=base_model,
+            adapters_path=os.path.join(
+                COMMON_CONFIG.root_path,
+                os.path.relpath(COMMON_CONFIG.save_path, COMMON_CONFIG.workspace_path),
+            ),
+            hf_home=hf_home,
+            gpu_memory_utilization=gpu_memory_utilization,
+            max_model_len=max_model_len,
+            cpu_offload_gb=cpu_offload_gb,
+            tensor_parallel_size=tensor_parallel_size,
+            enforce_eager=enforce_eager,
+            enable_prefix_caching=enable_prefix_caching,
+            max_num_seqs=max_num_seqs,
+            gpu_ids=gpu_ids,
+            max_loras=VLLM_CONFIG.max_loras,
+            max_lora_rank=VLLM_CONFIG.max_lora_rank,
+            ready_timeout=ready_timeout,
+        )
+    )
+
+
+async def load_lora_adapter(model_service: str, lora_name: str, lora_path: str) -> None:
+    async with httpx.AsyncClient(timeout=120) as aclient:
         response = await aclient.post(
-            f"http://{MAINSERVICE_CONFIG.container_name}:{MAINSERVICE_CONFIG.port}/acceltune/{infer_backend_type}/stop/",
-            json={f"{infer_backend_type}_container": container_name},
+            f"{model_service}/v1/load_lora_adapter",
+            json={"lora_name": lora_name, "lora_path": lora_path},
         )
 
         if response.status_code != status.HTTP_200_OK:
-            raise RuntimeError(f"{response.text}")
+            raise RuntimeError(f"load lora adapter failed: {response.text}")
+
+
+async def unload_lora_adapter(model_service: str, lora_name: str) -> None:
+    async with httpx.AsyncClient(timeout=60) as aclient:
+        response = await aclient.post(
+            f"{model_service}/v1/unload_lora_adapter",
+            json={"lora_name": lora_name},
+        )
 
-        return response.json()[f"{infer_backend_type}_container"]
+        # an adapter the backend does not know is already unloaded
+        if response.status_code not in {
+            status.HTTP_200_OK,
+            status.HTTP_404_NOT_FOUND,
+        }:
+            raise RuntimeError(f"unload lora adapter failed: {response.text}")
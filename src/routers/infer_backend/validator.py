@@ -5,6 +5,7 @@ from fastapi import HTTPException, status
 from pydantic import BaseModel, ConfigDict, model_validator
 
 from src.config.params import STATUS_CONFIG, TASK_CONFIG
+from src.routers.train.utils import get_last_checkpoint
 from src.thirdparty.redis.handler import redis_sync
 from src.utils.error import ResponseErrorHandler
 
@@ -14,6 +15,7 @@ class PostInferBackendStart(BaseModel):
         protected_namespaces=()
     )  # solve can not start with "model_"
     model_name: str
+    serving_mode: str = "merged"
 
     @model_validator(mode="after")
     def check(self: "PostInferBackendStart") -> "PostInferBackendStart":
@@ -26,10 +28,21 @@ class PostInferBackendStart(BaseModel):
                 raise KeyError("model_name does not exists")
 
             info = orjson.loads(info)
-            if info["container"]["infer_backend"]["status"] == STATUS_CONFIG.active:
-                raise ValueError("model_name has been loaded")
-            if info["last_model_path"] is None:
-                raise KeyError("can not found model file")
+            if info["container"]["infer_backend"]["status"] == STATUS_CONFIG.setup:
+                raise ValueError("model is being loaded")
+
+            if info["container"]["infer_backend"]["status"] != STATUS_CONFIG.active:
+                if self.serving_mode == "lora":
+                    if info["train_args"].get("finetuning_type") != "lora":
+                        raise ValueError(
+                            "serving_mode 'lora' requires a lora fine-tune"
+                        )
+
+                    if get_last_checkpoint(info["train_args"]["output_dir"]) is None:
+                        raise KeyError("can not found lora checkpoint")
+
+                elif info["last_model_path"] is None:
+                    raise KeyError("can not found model file")
 
         except KeyError as e:
             error_handler.add(
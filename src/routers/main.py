@@ -2,11 +2,16 @@ from fastapi import FastAPI, Response, status
 from fastapi.responses import PlainTextResponse
 
 import src.routers.accelbrain.root
+import src.routers.batch_infer.root
+import src.routers.benchmark.root
 import src.routers.chat.root
 import src.routers.data.root
+import src.routers.debug.root
 import src.routers.deepspeed.root
 import src.routers.evaluate.root
+import src.routers.gateway.root
 import src.routers.hf.root
+import src.routers.hw_info.root
 import src.routers.infer_backend.root
 import src.routers.info.root
 import src.routers.merge.root
@@ -15,8 +20,12 @@ import src.routers.quantize.root
 import src.routers.train.root
 import src.routers.vllm.root
 import src.routers.ws.root
+from src.utils.metrics import CONTENT_TYPE, MetricsMiddleware, render_metrics
+from src.utils.tracing import TracingMiddleware
 
 acceltune_api = FastAPI()
+acceltune_api.add_middleware(MetricsMiddleware)
+acceltune_api.add_middleware(TracingMiddleware)
 
 acceltune_api.include_router(src.routers.data.root.router)
 acceltune_api.include_router(src.routers.deepspeed.root.router)
@@ -32,8 +41,22 @@ acceltune_api.include_router(src.routers.infer_backend.root.router)
 acceltune_api.include_router(src.routers.hf.root.router)
 acceltune_api.include_router(src.routers.info.root.router)
 acceltune_api.include_router(src.routers.merge.root.router)
+acceltune_api.include_router(src.routers.batch_infer.root.router)
+acceltune_api.include_router(src.routers.benchmark.root.router)
+acceltune_api.include_router(src.routers.gateway.root.router)
+acceltune_api.include_router(src.routers.hw_info.root.router)
+acceltune_api.include_router(src.routers.debug.root.router)
 
 
 @acceltune_api.get("/health/", tags=["Health"], response_class=PlainTextResponse)
 def health_check():
     return Response(content="", status_code=status.HTTP_200_OK, media_type="text/plain")
+
+
+@acceltune_api.get("/metrics", tags=["Metrics"], response_class=PlainTextResponse)
+async def get_metrics():
+    return Response(
+        content=render_metrics(),
+        status_code=status.HTTP_200_OK,
+        media_type=CONTENT_TYPE,
+    )
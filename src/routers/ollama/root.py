@@ -2,7 +2,6 @@ import json
 
 from fastapi import APIRouter, HTTPException, Response, status
 
-from src.config.params import OLLAMA_CONFIG
 from src.routers.ollama import schema, utils
 from src.utils.error import ResponseErrorHandler
 from src.utils.logger import accel_logger
@@ -19,17 +18,7 @@ async def start_ollama(request_data: schema.PostStartOllama):
     error_handler = ResponseErrorHandler()
 
     try:
-        container_name = await utils.start_ollama_container(
-            image_name=request_data.image_name,
-            docker_network_name=request_data.docker_network_name,
-            model_name=request_data.model_name,
-            local_gguf_path=request_data.local_gguf_path,
-        )
-        await utils.run_ollama_model(
-            ollama_url=f"http://{container_name}:{OLLAMA_CONFIG.port}",
-            model_name=request_data.model_name,
-            local_gguf_file=f"{request_data.local_gguf_path}/{request_data.model_name}-full.gguf",
-        )
+        ollama_service = await utils.start_ollama_service(request_data=request_data)
 
     except Exception as e:
         accel_logger.error(f"Unexpected error: {e}")
@@ -45,13 +34,7 @@ async def start_ollama(request_data: schema.PostStartOllama):
         ) from None
 
     return Response(
-        content=json.dumps(
-            {
-                "ollama_service": f"http://{container_name}:{OLLAMA_CONFIG.port}",
-                "container_name": container_name,
-                "model_name": request_data.model_name,
-            }
-        ),
+        content=json.dumps(ollama_service),
         status_code=status.HTTP_200_OK,
         media_type="application/json",
     )
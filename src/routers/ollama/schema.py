@@ -14,6 +14,7 @@ class PostStartOllama(BaseModel):
     docker_network_name: str
     local_gguf_path: str
     model_name: str
+    ready_timeout: int = 900
 
     @model_validator(mode="after")
     def check(self: "PostStartOllama") -> "PostStartOllama":
@@ -27,6 +28,14 @@ class PostStartOllama(BaseModel):
                 input={"model_name": self.model_name},
             )
 
+        if self.ready_timeout <= 0:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'ready_timeout' must larger than 0",
+                input={"ready_timeout": self.ready_timeout},
+            )
+
         if error_handler.errors != []:
             raise HTTPException(
                 status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
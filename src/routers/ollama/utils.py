@@ -1,16 +1,19 @@
-import asyncio
 import json
-import time
 from typing import Literal
 
 import httpx
 from fastapi import status
 
+from src.config.params import OLLAMA_CONFIG
+from src.routers.infer_backend.registry import BACKEND_LABEL
+from src.routers.ollama import schema
 from src.thirdparty.docker.api_handler import (
     create_container,
     start_container,
     stop_container,
+    wait_container_ready,
 )
+from src.utils.logger import accel_logger
 
 
 async def start_ollama_container(
@@ -23,6 +26,7 @@ async def start_ollama_container(
     data = {
         "User": "root",
         "Image": image_name,
+        "Labels": {BACKEND_LABEL: model_name},
         "HostConfig": {
             "IpcMode": "host",
             "DeviceRequests": [
@@ -49,34 +53,23 @@ async def start_ollama_container(
         return started_container
 
 
-async def health_check(
-    aclient: httpx.AsyncClient,
-    health_check_url: str,
-    timeout: int = 30,
-    interval: int = 2,
-) -> bool:
-    start_time = time.time()
-
-    while time.time() - start_time < timeout:
-        try:
-            response = await aclient.get(health_check_url)
-            if response.status_code == 200:
-                return True
-
-        except httpx.RequestError:
-            pass
-
-        await asyncio.sleep(interval)
-
-    return False
-
-
 async def run_ollama_model(
-    ollama_url: str, model_name: str, local_gguf_file: str
+    ollama_url: str,
+    model_name: str,
+    local_gguf_file: str,
+    container_name: str,
+    ready_timeout: int,
 ) -> None:
-    async with httpx.AsyncClient() as aclient:
-        is_loaded = await health_check(aclient=aclient, health_check_url=ollama_url)
+    transport = httpx.AsyncHTTPTransport(uds="/var/run/docker.sock")
+    async with httpx.AsyncClient(transport=transport, timeout=None) as docker_aclient:
+        is_loaded = await wait_container_ready(
+            aclient=docker_aclient,
+            container_name=container_name,
+            health_check_url=ollama_url,
+            timeout=ready_timeout,
+        )
 
+    async with httpx.AsyncClient() as aclient:
         if is_loaded:
             async with aclient.stream(
                 "POST",
@@ -106,7 +99,42 @@ async def run_ollama_model(
             if response.status_code != status.HTTP_200_OK:
                 raise RuntimeError(f"{response.text}")
         else:
-            raise RuntimeError("model loading failed")
+            raise RuntimeError(f"model loading timed out after {ready_timeout}s")
+
+
+async def start_ollama_service(request_data: schema.PostStartOllama) -> dict:
+    """Start an ollama backend for a gguf model and return once the model is
+    created and loaded. Shared by the /ollama route and in-process callers."""
+    container_name = None
+    try:
+        container_name = await start_ollama_container(
+            image_name=request_data.image_name,
+            docker_network_name=request_data.docker_network_name,
+            model_name=request_data.model_name,
+            local_gguf_path=request_data.local_gguf_path,
+        )
+        await run_ollama_model(
+            ollama_url=f"http://{container_name}:{OLLAMA_CONFIG.port}",
+            model_name=request_data.model_name,
+            local_gguf_file=f"{request_data.local_gguf_path}/{request_data.model_name}-full.gguf",
+            container_name=container_name,
+            ready_timeout=request_data.ready_timeout,
+        )
+
+    except Exception:
+        if container_name is not None:
+            # a backend that never became ready must not keep holding the gpu
+            try:
+                await stop_ollama_container(container_name_or_id=container_name)
+            except Exception as stop_e:
+                accel_logger.error(f"Failed to stop {container_name}: {stop_e}")
+        raise
+
+    return {
+        "ollama_service": f"http://{container_name}:{OLLAMA_CONFIG.port}",
+        "container_name": container_name,
+        "model_name": request_data.model_name,
+    }
 
 
 async def stop_ollama_container(
@@ -15,6 +15,7 @@ from src.routers.quantize import schema, utils, validator
 from src.thirdparty.redis.handler import redis_async
 from src.utils.error import ResponseErrorHandler
 from src.utils.logger import accel_logger
+from src.utils.manifest import write_manifest
 
 router = APIRouter(prefix="/quantize", tags=["Quantize"])
 
@@ -42,6 +43,12 @@ async def start_quantize(request_data: schema.PostStartQuantize):
         await utils.merge_async_tasks(
             quantize_name=request_data.quantize_name, container_name=container_name
         )
+        await asyncio.to_thread(
+            write_manifest,
+            os.path.join(
+                COMMON_CONFIG.save_path, request_data.quantize_name, "quantize"
+            ),
+        )
         quantize_status = STATUS_CONFIG.finish
 
     except asyncio.CancelledError:
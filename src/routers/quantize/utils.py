@@ -10,12 +10,14 @@ import orjson
 from fastapi import status
 
 from src.config.params import COMMON_CONFIG, TASK_CONFIG
+from src.routers.hw_info.usage import track_usage
 from src.thirdparty.docker.api_handler import (
     remove_container,
     stop_container,
     wait_for_container,
 )
 from src.thirdparty.redis.handler import redis_async
+from src.utils.tracing import TracingTransport
 
 
 async def quantize_as_gguf(
@@ -30,7 +32,7 @@ async def quantize_as_gguf(
         "output_path": f"{os.path.join(COMMON_CONFIG.root_path, os.path.relpath(output_path, COMMON_CONFIG.workspace_path))}",
         "hf_ori": False,
     }
-    async with httpx.AsyncClient(timeout=None) as aclient:
+    async with httpx.AsyncClient(transport=TracingTransport(), timeout=None) as aclient:
         response = await aclient.post(quantize_service_url, json=data)
 
         if response.status_code != status.HTTP_200_OK:
@@ -49,12 +51,17 @@ async def update_quantize_info(quantize_name: str, container_name: str) -> None:
     await redis_async.client.hset(TASK_CONFIG.train, quantize_name, orjson.dumps(info))
 
 
-async def check_quantize_status(container_name_or_id: str) -> None:
+async def check_quantize_status(quantize_name: str, container_name_or_id: str) -> None:
     transport = httpx.AsyncHTTPTransport(uds="/var/run/docker.sock")
     async with httpx.AsyncClient(transport=transport, timeout=None) as aclient:
-        container_info = await wait_for_container(
-            aclient=aclient, container_name=container_name_or_id
-        )
+        async with track_usage(
+            name=quantize_name,
+            job="quantize",
+            container_name_or_id=container_name_or_id,
+        ):
+            container_info = await wait_for_container(
+                aclient=aclient, container_name=container_name_or_id
+            )
         exit_status = container_info["StatusCode"]
         if exit_status == 0:
             return
@@ -77,7 +84,11 @@ async def merge_async_tasks(quantize_name: str, container_name: str):
                 quantize_name=quantize_name, container_name=container_name
             )
         ),
-        asyncio.create_task(check_quantize_status(container_name_or_id=container_name)),
+        asyncio.create_task(
+            check_quantize_status(
+                quantize_name=quantize_name, container_name_or_id=container_name
+            )
+        ),
     ]
 
     done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
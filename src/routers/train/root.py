@@ -23,10 +23,13 @@ from src.config.params import (
     STATUS_CONFIG,
     TASK_CONFIG,
 )
+from src.routers.evaluate.store import eval_result_store
+from src.routers.hw_info.usage import delete_usage, get_usage_series
 from src.routers.train import schema, utils, validator
 from src.thirdparty.redis.handler import redis_async
 from src.utils.error import ResponseErrorHandler
 from src.utils.logger import accel_logger
+from src.utils.metrics import track_background_task
 from src.utils.utils import (
     assemble_image_name,
     generate_uuid,
@@ -115,7 +118,9 @@ async def start_train(
         ) from None
 
     background_tasks.add_task(
-        utils.start_train_background_task, request_data.train_name, container_name
+        track_background_task(utils.start_train_background_task),
+        request_data.train_name,
+        container_name,
     )
 
     return Response(
@@ -313,6 +318,43 @@ async def get_result(train_name: Annotated[str, Query(...)]):
     )
 
 
+@router.get("/usage/")
+async def get_usage(train_name: Annotated[str, Query(...)]):
+    query_data = schema.GetTrainUsage(train_name=train_name)
+    validator.GetTrainUsage(train_name=query_data.train_name)
+    error_handler = ResponseErrorHandler()
+
+    try:
+        info = await redis_async.client.hget(TASK_CONFIG.train, query_data.train_name)
+        usage = orjson.loads(info).get("usage", dict())
+        series = await get_usage_series(name=query_data.train_name)
+
+    except Exception as e:
+        accel_logger.error(f"Database error: {e}")
+        error_handler.add(
+            type=error_handler.ERR_REDIS,
+            loc=[error_handler.LOC_DATABASE],
+            msg="Database error",
+            input=query_data.model_dump(),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=error_handler.errors,
+        ) from None
+
+    return Response(
+        content=json.dumps(
+            {
+                "train_name": query_data.train_name,
+                "usage": usage,
+                "series": series,
+            }
+        ),
+        status_code=status.HTTP_200_OK,
+        media_type="application/json",
+    )
+
+
 @router.post("/")
 async def add_train(
     train_name: str = Form(None),
@@ -523,6 +565,7 @@ async def add_train(
             },
             "last_model_path": None,
             "eval_result_path": None,
+            "usage": dict(),
             "created_time": unix_time,
             "modified_time": None,
         }
@@ -858,10 +901,13 @@ async def modify_train(
         }
         info["last_model_path"] = None
         info["eval_result_path"] = None
+        info["usage"] = dict()
         info["modified_time"] = unix_time
         await redis_async.client.hset(
             TASK_CONFIG.train, request_data.train_name, orjson.dumps(info)
         )
+        await delete_usage(name=request_data.train_name)
+        await eval_result_store.delete(eval_name=request_data.train_name)
 
     except Exception as e:
         accel_logger.error(f"Database error: {e}")
@@ -895,6 +941,8 @@ async def delete_train(train_name: Annotated[str, Query(...)]):
         )
         del_info = orjson.loads(del_info)
         await redis_async.client.hdel(TASK_CONFIG.train, query_data.train_name)
+        await eval_result_store.delete(eval_name=query_data.train_name)
+        await delete_usage(name=query_data.train_name)
 
     except Exception as e:
         accel_logger.error(f"Database error: {e}")
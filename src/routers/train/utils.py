@@ -2,6 +2,7 @@ import asyncio
 import os
 import re
 import shutil
+import time
 from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
 from typing import Dict, List, Literal, Union
@@ -19,6 +20,7 @@ from src.config.params import (
     STATUS_CONFIG,
     TASK_CONFIG,
 )
+from src.routers.hw_info.usage import track_usage
 from src.routers.train import schema, validator
 from src.thirdparty.docker.api_handler import (
     create_container,
@@ -30,6 +32,8 @@ from src.thirdparty.docker.api_handler import (
 )
 from src.thirdparty.redis.handler import redis_async
 from src.utils.logger import accel_logger
+from src.utils.metrics import STAGE_DURATION
+from src.utils.tracing import TracingTransport
 
 
 def basemodel2dict(data) -> dict:
@@ -130,7 +134,7 @@ async def call_ds_api(
     name: str, ds_args: schema.DeepSpeedArgs, ds_file: Union[UploadFile, None] = None
 ) -> dict:
     base_url = f"http://127.0.0.1:{MAINSERVICE_CONFIG.port}/acceltune/deepspeed"
-    async with httpx.AsyncClient(timeout=None) as aclient:
+    async with httpx.AsyncClient(transport=TracingTransport(), timeout=None) as aclient:
         if ds_args.src == "default":
             payload = {
                 "json": {
@@ -217,7 +221,7 @@ async def record_train_log(
 
 
 async def call_internal_merge_api(merge_name: str) -> str:
-    async with httpx.AsyncClient(timeout=None) as aclient:
+    async with httpx.AsyncClient(transport=TracingTransport(), timeout=None) as aclient:
         response = await aclient.post(
             f"http://127.0.0.1:{MAINSERVICE_CONFIG.port}/acceltune/merge/start/",
             json={"merge_name": merge_name},
@@ -227,9 +231,12 @@ async def call_internal_merge_api(merge_name: str) -> str:
     if response.status_code == status.HTTP_200_OK:
         transport = httpx.AsyncHTTPTransport(uds="/var/run/docker.sock")
         async with httpx.AsyncClient(transport=transport, timeout=None) as aclient:
-            container_info = await wait_for_container(
-                aclient=aclient, container_name=container_name
-            )
+            async with track_usage(
+                name=merge_name, job="merge", container_name_or_id=container_name
+            ):
+                container_info = await wait_for_container(
+                    aclient=aclient, container_name=container_name
+                )
             exit_status = container_info["StatusCode"]
             if exit_status == 0:
                 merge_status = STATUS_CONFIG.finish
@@ -299,25 +306,44 @@ async def start_train_background_task(train_name: str, container_name_or_id: str
     try:
         transport = httpx.AsyncHTTPTransport(uds="/var/run/docker.sock")
         async with httpx.AsyncClient(transport=transport, timeout=None) as aclient:
-            # 2025.02.26 by Manny
-            async with record_train_log(
-                log_path=os.path.join(COMMON_CONFIG.save_path, train_name, "train.log")
-            ) as log_file:  # write all training log into file
-                async for log in get_container_log(
-                    aclient=aclient, container_name_or_id=container_name_or_id
-                ):
-                    for log_split in log.splitlines():
-                        if log_split == "":
-                            break
-                        elif log_split[0] in ("\x01", "\x02"):
-                            log_split = log_split[8:]
-
-                        log_file: aiofiles.threadpool.text.AsyncTextIndirectIOWrapper
-                        await log_file.write(f"{ANSI_ESCAPE.sub('', log_split)}\n")
-
-            container_info = await wait_for_container(
-                aclient=aclient, container_name=container_name_or_id
-            )
+            async with track_usage(
+                name=train_name, job="train", container_name_or_id=container_name_or_id
+            ):
+                tokenize_started = tokenize_finished = None
+                # 2025.02.26 by Manny
+                async with record_train_log(
+                    log_path=os.path.join(
+                        COMMON_CONFIG.save_path, train_name, "train.log"
+                    )
+                ) as log_file:  # write all training log into file
+                    async for log in get_container_log(
+                        aclient=aclient, container_name_or_id=container_name_or_id
+                    ):
+                        for log_split in log.splitlines():
+                            if log_split == "":
+                                break
+                            elif log_split[0] in ("\x01", "\x02"):
+                                log_split = log_split[8:]
+
+                            if "Running tokenizer on dataset" in log_split:
+                                tokenize_finished = time.monotonic()
+                                tokenize_started = tokenize_started or tokenize_finished
+
+                            log_file: (
+                                aiofiles.threadpool.text.AsyncTextIndirectIOWrapper
+                            )
+                            await log_file.write(f"{ANSI_ESCAPE.sub('', log_split)}\n")
+
+                # tokenizing runs inside the train container, its progress bar
+                # in the log is the only marker of when it starts and ends
+                if tokenize_started is not None:
+                    STAGE_DURATION.observe(
+                        tokenize_finished - tokenize_started, stage="tokenize"
+                    )
+
+                container_info = await wait_for_container(
+                    aclient=aclient, container_name=container_name_or_id
+                )
             exit_status = container_info["StatusCode"]
             if exit_status == 0:
                 train_status = STATUS_CONFIG.finish
@@ -380,6 +406,12 @@ async def start_train_background_task(train_name: str, container_name_or_id: str
                         info["container"]["train"]["status"] = STATUS_CONFIG.failed
                         accel_logger.error(f"Unexpected error: {e}")
 
+                # merge wrote its usage into the record in the meantime
+                latest_info = await redis_async.client.hget(
+                    TASK_CONFIG.train, train_name
+                )
+                info["usage"] = orjson.loads(latest_info).get("usage", dict())
+
                 await redis_async.client.hset(
                     TASK_CONFIG.train, train_name, orjson.dumps(info)
                 )
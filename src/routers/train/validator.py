@@ -412,6 +412,44 @@ class GetTrainResult(BaseModel):
         return self
 
 
+class GetTrainUsage(BaseModel):
+    train_name: str
+
+    @model_validator(mode="after")
+    def check(self: "GetTrainUsage") -> "GetTrainUsage":
+        error_handler = ResponseErrorHandler()
+
+        try:
+            info = redis_sync.client.hget(TASK_CONFIG.train, self.train_name)
+            if info is None:
+                raise KeyError("train_name does not exists")
+
+        except KeyError as e:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_QUERY],
+                msg=f"{e}",
+                input={"train_name": self.train_name},
+            )
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail=error_handler.errors
+            ) from None
+
+        except Exception as e:
+            error_handler.add(
+                type=error_handler.ERR_REDIS,
+                loc=[error_handler.LOC_DATABASE],
+                msg=f"Database error: {e}",
+                input={"train_name": self.train_name},
+            )
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=error_handler.errors,
+            ) from None
+
+        return self
+
+
 class LogHistory(BaseModel):
     epoch: float
     step: int
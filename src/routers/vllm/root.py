@@ -2,7 +2,6 @@ import json
 
 from fastapi import APIRouter, HTTPException, Response, status
 
-from src.config.params import VLLM_CONFIG
 from src.routers.vllm import schema, utils
 from src.utils.error import ResponseErrorHandler
 from src.utils.logger import accel_logger
@@ -15,37 +14,34 @@ async def start_vllm(request_data: schema.PostStartVLLM):
     error_handler = ResponseErrorHandler()
 
     try:
-        container_name = await utils.start_vllm_container(
-            image_name=request_data.image_name,
-            service_port=request_data.service_port,
-            docker_network_name=request_data.docker_network_name,
-            cmd=[
-                "--model",
-                request_data.local_safetensors_path,
-                "--gpu_memory_utilization",
-                f"{request_data.gpu_memory_utilization}",
-                "--max_model_len",
-                f"{request_data.max_model_len}",
-                "--tensor-parallel-size",
-                f"{request_data.tensor_parallel_size}",
-                "--enforce-eager",
-                "--tokenizer",
-                request_data.base_model,
-                "--cpu-offload-gb",
-                f"{request_data.cpu_offload_gb}",
-                "--served-model-name",
-                request_data.model_name,
-                "--port",
-                f"{request_data.service_port}",
-            ],
-            model_name=request_data.model_name,
-            local_safetensors_path=request_data.local_safetensors_path,
-            hf_home=request_data.hf_home,
-        )
+        vllm_service = await utils.start_vllm_service(request_data=request_data)
 
-        await utils.run_vllm_model(
-            vllm_url=f"http://{container_name}:{VLLM_CONFIG.port}"
+    except Exception as e:
+        accel_logger.error(f"Unexpected error: {e}")
+        error_handler.add(
+            type=error_handler.ERR_INTERNAL,
+            loc=[error_handler.LOC_PROCESS],
+            msg=f"{e}",
+            input=request_data.model_dump(),
         )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=error_handler.errors,
+        ) from None
+
+    return Response(
+        content=json.dumps(vllm_service),
+        status_code=status.HTTP_200_OK,
+        media_type="application/json",
+    )
+
+
+@router.post("/start/lora/")
+async def start_vllm_lora(request_data: schema.PostStartVLLMLora):
+    error_handler = ResponseErrorHandler()
+
+    try:
+        vllm_service = await utils.start_vllm_lora_service(request_data=request_data)
 
     except Exception as e:
         accel_logger.error(f"Unexpected error: {e}")
@@ -61,13 +57,7 @@ async def start_vllm(request_data: schema.PostStartVLLM):
         ) from None
 
     return Response(
-        content=json.dumps(
-            {
-                "vllm_service": f"http://{container_name}:{VLLM_CONFIG.port}",
-                "container_name": container_name,
-                "model_name": request_data.model_name,
-            }
-        ),
+        content=json.dumps(vllm_service),
         status_code=status.HTTP_200_OK,
         media_type="application/json",
     )
@@ -1,4 +1,5 @@
 import re
+from typing import List, Union
 
 from fastapi import HTTPException, status
 from pydantic import BaseModel, ConfigDict, model_validator
@@ -21,6 +22,11 @@ class PostStartVLLM(BaseModel):
     max_model_len: int = 8192
     cpu_offload_gb: int = 0
     tensor_parallel_size: int = 1
+    enforce_eager: bool = True
+    enable_prefix_caching: bool = True
+    max_num_seqs: Union[int, None] = None
+    gpu_ids: Union[List[int], None] = None
+    ready_timeout: int = 900
 
     @model_validator(mode="after")
     def check(self: "PostStartVLLM") -> "PostStartVLLM":
@@ -50,6 +56,128 @@ class PostStartVLLM(BaseModel):
                 input={"tensor_parallel_size": self.tensor_parallel_size},
             )
 
+        if self.gpu_ids is not None and (
+            any(gpu_id < 0 for gpu_id in self.gpu_ids)
+            or len(set(self.gpu_ids)) != len(self.gpu_ids)
+        ):
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'gpu_ids' must be distinct gpu indexes",
+                input={"gpu_ids": self.gpu_ids},
+            )
+
+        if self.max_num_seqs is not None and self.max_num_seqs <= 0:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'max_num_seqs' must larger than 0",
+                input={"max_num_seqs": self.max_num_seqs},
+            )
+
+        if self.ready_timeout <= 0:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'ready_timeout' must larger than 0",
+                input={"ready_timeout": self.ready_timeout},
+            )
+
+        if error_handler.errors != []:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=error_handler.errors,
+            )
+
+        return self
+
+
+class PostStartVLLMLora(BaseModel):
+    model_config = ConfigDict(
+        protected_namespaces=()
+    )  # solve can not start with "model_"
+    image_name: str
+    service_port: int
+    docker_network_name: str
+    model_name: str
+    base_model: str
+    adapters_path: str
+    hf_home: str
+    gpu_memory_utilization: float = 0.95
+    max_model_len: int = 8192
+    cpu_offload_gb: int = 0
+    tensor_parallel_size: int = 1
+    enforce_eager: bool = True
+    enable_prefix_caching: bool = True
+    max_num_seqs: Union[int, None] = None
+    gpu_ids: Union[List[int], None] = None
+    max_loras: int = 8
+    max_lora_rank: int = 64
+    ready_timeout: int = 900
+
+    @model_validator(mode="after")
+    def check(self: "PostStartVLLMLora") -> "PostStartVLLMLora":
+        error_handler = ResponseErrorHandler()
+
+        if not re.fullmatch(r"[a-zA-Z0-9][a-zA-Z0-9_.-]+", self.model_name):
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'model_name' contain invalid characters",
+                input={"model_name": self.model_name},
+            )
+
+        if 0 > self.gpu_memory_utilization or 1 < self.gpu_memory_utilization:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'gpu_memory_utilization' must between 0 to 1",
+                input={"gpu_memory_utilization": self.gpu_memory_utilization},
+            )
+
+        if self.max_loras < 1:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'max_loras' must larger than 0",
+                input={"max_loras": self.max_loras},
+            )
+
+        if self.max_lora_rank not in {8, 16, 32, 64, 128, 256}:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'max_lora_rank' must be one of 8, 16, 32, 64, 128, 256",
+                input={"max_lora_rank": self.max_lora_rank},
+            )
+
+        if self.gpu_ids is not None and (
+            any(gpu_id < 0 for gpu_id in self.gpu_ids)
+            or len(set(self.gpu_ids)) != len(self.gpu_ids)
+        ):
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'gpu_ids' must be distinct gpu indexes",
+                input={"gpu_ids": self.gpu_ids},
+            )
+
+        if self.max_num_seqs is not None and self.max_num_seqs <= 0:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'max_num_seqs' must larger than 0",
+                input={"max_num_seqs": self.max_num_seqs},
+            )
+
+        if self.ready_timeout <= 0:
+            error_handler.add(
+                type=error_handler.ERR_VALIDATE,
+                loc=[error_handler.LOC_BODY],
+                msg="'ready_timeout' must larger than 0",
+                input={"ready_timeout": self.ready_timeout},
+            )
+
         if error_handler.errors != []:
             raise HTTPException(
                 status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
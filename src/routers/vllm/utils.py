@@ -1,14 +1,65 @@
 import asyncio
-import time
-from typing import Literal
+from typing import List, Literal, Tuple, Union
 
 import httpx
 
+from src.config.params import VLLM_CONFIG
+from src.routers.infer_backend.registry import (
+    BACKEND_LABEL,
+    GPU_UTILIZATION_LABEL,
+    GPUS_LABEL,
+)
+from src.routers.vllm import schema
 from src.thirdparty.docker.api_handler import (
     create_container,
+    list_containers,
     start_container,
     stop_container,
+    wait_container_ready,
 )
+from src.utils.logger import accel_logger
+
+# held from picking a host port until the container publishing it has started
+host_port_lock = asyncio.Lock()
+
+
+def get_launch_flags(
+    enforce_eager: bool, enable_prefix_caching: bool, max_num_seqs: Union[int, None]
+) -> List[str]:
+    flags = list()
+    if enforce_eager:
+        flags.append("--enforce-eager")
+    if enable_prefix_caching:
+        flags.append("--enable-prefix-caching")
+    if max_num_seqs is not None:
+        flags.extend(["--max-num-seqs", f"{max_num_seqs}"])
+    return flags
+
+
+def parse_host_ports(host_ports: str) -> Union[range, None]:
+    if not host_ports.strip():
+        return None
+    start, _, end = host_ports.partition("-")
+    return range(int(start), int(end or start) + 1)
+
+
+async def allocate_host_port(aclient: httpx.AsyncClient) -> Union[int, None]:
+    """Lowest port of VLLM_HOST_PORTS not published by a running container,
+    None when backends are only reachable on the docker network."""
+    port_range = parse_host_ports(VLLM_CONFIG.host_ports)
+    if port_range is None:
+        return None
+
+    used_ports = {
+        port["PublicPort"]
+        for container in await list_containers(aclient=aclient)
+        for port in container.get("Ports") or list()
+        if "PublicPort" in port
+    }
+    for port in port_range:
+        if port not in used_ports:
+            return port
+    raise ValueError(f"no free host port left in {VLLM_CONFIG.host_ports}")
 
 
 async def start_vllm_container(
@@ -19,72 +70,169 @@ async def start_vllm_container(
     model_name: str,
     local_safetensors_path: str,
     hf_home: str,
-) -> str:
+    env: Union[List[str], None] = None,
+    gpu_ids: Union[List[int], None] = None,
+    gpu_memory_utilization: Union[float, None] = None,
+) -> Tuple[str, Union[int, None]]:
     transport = httpx.AsyncHTTPTransport(uds="/var/run/docker.sock")
+    device_request = {"Driver": "nvidia", "Capabilities": [["gpu"]]}
+    if gpu_ids:
+        device_request["DeviceIDs"] = [f"{gpu_id}" for gpu_id in gpu_ids]
+    else:
+        device_request["Count"] = -1
+
     data = {
         "User": "root",
         "Image": image_name,
+        "Labels": {
+            BACKEND_LABEL: model_name,
+            GPUS_LABEL: ",".join(f"{gpu_id}" for gpu_id in gpu_ids or list()),
+            GPU_UTILIZATION_LABEL: f"{gpu_memory_utilization or ''}",
+        },
         "HostConfig": {
             "IpcMode": "host",
-            "DeviceRequests": [
-                {"Driver": "nvidia", "Count": -1, "Capabilities": [["gpu"]]}
-            ],
+            "DeviceRequests": [device_request],
             "Binds": [
                 f"{hf_home}:{hf_home}:rw",
                 f"{local_safetensors_path}:{local_safetensors_path}:rw",
             ],
-            "PortBindings": {f"{service_port}/tcp": [{"HostPort": f"{service_port}"}]},
             "AutoRemove": True,
             "NetworkMode": docker_network_name,
         },
         "Cmd": cmd,
-        "Env": [f"HF_HOME={hf_home}"],
+        "Env": [f"HF_HOME={hf_home}"] + (env or []),
     }
 
     async with httpx.AsyncClient(transport=transport, timeout=None) as aclient:
-        container_name_or_id = await create_container(
-            aclient=aclient, name=f"vllm-{model_name}", data=data
-        )
+        async with host_port_lock:
+            host_port = await allocate_host_port(aclient=aclient)
+            if host_port is not None:
+                data["HostConfig"]["PortBindings"] = {
+                    f"{service_port}/tcp": [{"HostPort": f"{host_port}"}]
+                }
 
-        started_container = await start_container(
-            aclient=aclient, container_name_or_id=container_name_or_id
-        )
-
-        return started_container
+            container_name_or_id = await create_container(
+                aclient=aclient, name=f"vllm-{model_name}", data=data
+            )
 
+            started_container = await start_container(
+                aclient=aclient, container_name_or_id=container_name_or_id
+            )
 
-async def health_check(
-    aclient: httpx.AsyncClient,
-    health_check_url: str,
-    timeout: int = 30,
-    interval: int = 2,
-) -> bool:
-    start_time = time.time()
+        return started_container, host_port
 
-    while time.time() - start_time < timeout:
-        try:
-            response = await aclient.get(health_check_url)
-            if response.status_code == 200:
-                return True
 
-        except httpx.RequestError:
-            pass
+async def run_vllm_model(
+    vllm_url: str, container_name: str, ready_timeout: int
+) -> None:
+    transport = httpx.AsyncHTTPTransport(uds="/var/run/docker.sock")
+    async with httpx.AsyncClient(transport=transport, timeout=None) as aclient:
+        is_loaded = await wait_container_ready(
+            aclient=aclient,
+            container_name=container_name,
+            health_check_url=f"{vllm_url}/health",
+            timeout=ready_timeout,
+        )
 
-        await asyncio.sleep(interval)
+        if is_loaded:
+            return
+        else:
+            raise RuntimeError(f"model loading timed out after {ready_timeout}s")
 
-    return False
 
+async def launch_vllm_service(
+    request_data: Union[schema.PostStartVLLM, schema.PostStartVLLMLora],
+    cmd: List[str],
+    local_safetensors_path: str,
+    env: Union[List[str], None] = None,
+) -> dict:
+    container_name = None
+    try:
+        container_name, host_port = await start_vllm_container(
+            image_name=request_data.image_name,
+            service_port=request_data.service_port,
+            docker_network_name=request_data.docker_network_name,
+            cmd=cmd
+            + [
+                "--gpu_memory_utilization",
+                f"{request_data.gpu_memory_utilization}",
+                "--max_model_len",
+                f"{request_data.max_model_len}",
+                "--tensor-parallel-size",
+                f"{request_data.tensor_parallel_size}",
+                *get_launch_flags(
+                    enforce_eager=request_data.enforce_eager,
+                    enable_prefix_caching=request_data.enable_prefix_caching,
+                    max_num_seqs=request_data.max_num_seqs,
+                ),
+                "--cpu-offload-gb",
+                f"{request_data.cpu_offload_gb}",
+                "--served-model-name",
+                request_data.model_name,
+                "--port",
+                f"{request_data.service_port}",
+            ],
+            model_name=request_data.model_name,
+            local_safetensors_path=local_safetensors_path,
+            hf_home=request_data.hf_home,
+            env=env,
+            gpu_ids=request_data.gpu_ids,
+            gpu_memory_utilization=request_data.gpu_memory_utilization,
+        )
 
-async def run_vllm_model(vllm_url: str) -> None:
-    async with httpx.AsyncClient(timeout=None) as aclient:
-        is_loaded = await health_check(
-            aclient=aclient, health_check_url=f"{vllm_url}/health"
+        await run_vllm_model(
+            vllm_url=f"http://{container_name}:{VLLM_CONFIG.port}",
+            container_name=container_name,
+            ready_timeout=request_data.ready_timeout,
         )
 
-        if is_loaded:
-            return
-        else:
-            raise RuntimeError("model loading failed")
+    except Exception:
+        if container_name is not None:
+            # a backend that never became ready must not keep holding the gpu
+            try:
+                await stop_vllm_container(container_name_or_id=container_name)
+            except Exception as stop_e:
+                accel_logger.error(f"Failed to stop {container_name}: {stop_e}")
+        raise
+
+    return {
+        "vllm_service": f"http://{container_name}:{VLLM_CONFIG.port}",
+        "container_name": container_name,
+        "model_name": request_data.model_name,
+        "host_port": host_port,
+    }
+
+
+async def start_vllm_service(request_data: schema.PostStartVLLM) -> dict:
+    """Start a vllm backend serving merged safetensors and return once it is
+    ready. Shared by the /vllm route and in-process callers."""
+    return await launch_vllm_service(
+        request_data=request_data,
+        cmd=[
+            "--model",
+            request_data.local_safetensors_path,
+            "--tokenizer",
+            request_data.base_model,
+        ],
+        local_safetensors_path=request_data.local_safetensors_path,
+    )
+
+
+async def start_vllm_lora_service(request_data: schema.PostStartVLLMLora) -> dict:
+    return await launch_vllm_service(
+        request_data=request_data,
+        cmd=[
+            "--model",
+            request_data.base_model,
+            "--enable-lora",
+            "--max-loras",
+            f"{request_data.max_loras}",
+            "--max-lora-rank",
+            f"{request_data.max_lora_rank}",
+        ],
+        local_safetensors_path=request_data.adapters_path,
+        env=["VLLM_ALLOW_RUNTIME_LORA_UPDATING=True"],
+    )
 
 
 async def stop_vllm_container(
@@ -1,10 +1,14 @@
+import asyncio
+
 import httpx
 import orjson
 from fastapi import APIRouter, WebSocket
 from starlette.websockets import WebSocketDisconnect, WebSocketState
 from uvicorn.protocols.utils import ClientDisconnected
 
-from src.config.params import HWINFO_CONFIG, STATUS_CONFIG
+from src.config.params import EVAL_CONFIG, INFERPOOL_CONFIG, STATUS_CONFIG
+from src.routers.hw_info.collector import hw_info_collector
+from src.routers.infer_backend.service import wait_infer_backend
 from src.routers.ws import schema
 from src.thirdparty.docker.api_handler import get_container_log, wait_for_container
 from src.thirdparty.redis.handler import redis_async
@@ -87,19 +91,32 @@ async def eval_info_log(websocket: WebSocket, id: str):
         last_id = "0-0"
         while True:
             redis_response = await redis_async.client.xread(
-                streams={id: last_id}, count=10, block=5000
+                streams={id: last_id}, count=EVAL_CONFIG.stream_read_count, block=5000
             )
+            if not redis_response:
+                # the stream expired after its retention window
+                if last_id != "0-0" and not await redis_async.client.exists(id):
+                    return
+                continue
 
+            # every entry carries the full state, so only the newest one is sent
             for _, messages in redis_response:
-                for msg_id, data in messages:
-                    eval_log = data["data"]
-                    eval_status = data["status"]
-                    if eval_status == STATUS_CONFIG.active:
-                        await websocket.send_json({"evalLog": orjson.loads(eval_log)})
-                    else:
-                        await websocket.send_json({"evalLog": eval_status})
-                        return
-                    last_id = msg_id
+                last_id, data = messages[-1]
+                eval_status = data["status"]
+                if eval_status != STATUS_CONFIG.active:
+                    active = [
+                        data
+                        for _, data in messages
+                        if data["status"] == STATUS_CONFIG.active
+                    ]
+                    if active:
+                        await websocket.send_json(
+                            {"evalLog": orjson.loads(active[-1]["data"])}
+                        )
+                    await websocket.send_json({"evalLog": eval_status})
+                    return
+
+                await websocket.send_json({"evalLog": orjson.loads(data["data"])})
 
     except (WebSocketDisconnect, ClientDisconnected):
         accel_logger.info("evalLog: Client disconnected")
@@ -123,26 +140,11 @@ async def eval_info_log(websocket: WebSocket, id: str):
 @router.websocket("/hwInfo")
 async def hw_info_log(websocket: WebSocket):
     await websocket.accept()
-    transport = httpx.AsyncHTTPTransport(uds="/var/run/docker.sock")
 
     try:
-        async with httpx.AsyncClient(transport=transport, timeout=None) as aclient:
-            hw_info = schema.HwInfoTemplate()
-
-            async for log in get_container_log(
-                aclient=aclient,
-                container_name_or_id=HWINFO_CONFIG.container_name,
-                tail=1,
-            ):
-                for log_split in log.splitlines():
-                    if log_split == "":
-                        break
-                    elif log_split[0] in ("\x01", "\x02"):
-                        log_split = log_split[8:]
-
-                    hw_info.parse_hwinfo_log(stdout=log_split)
-
-                    await websocket.send_json(hw_info.model_dump())
+        async with hw_info_collector.subscribe() as samples:
+            while True:
+                await websocket.send_json(await samples.get())
 
     except (WebSocketDisconnect, ClientDisconnected):
         accel_logger.info("hwInfo: Client disconnected")
@@ -161,3 +163,33 @@ async def hw_info_log(websocket: WebSocket):
                 "hwInfo: WebSocket is still connected, automatically close"
             )
             await websocket.close()
+
+
+@router.websocket("/inferBackend/{model_name}")
+async def infer_backend_ready(websocket: WebSocket, model_name: str):
+    await websocket.accept()
+
+    try:
+        event = await wait_infer_backend(
+            model_name=model_name, timeout=INFERPOOL_CONFIG.ready_timeout
+        )
+        await websocket.send_json({"inferBackend": event})
+
+    except (WebSocketDisconnect, ClientDisconnected):
+        accel_logger.info("inferBackend: Client disconnected")
+
+    except KeyError as e:
+        accel_logger.error(f"inferBackend: {e}")
+        await websocket.send_json({"inferBackend": f"{e}"})
+
+    # not the builtin TimeoutError on python 3.10, which the service image runs
+    except asyncio.TimeoutError:  # noqa: UP041
+        await websocket.send_json({"inferBackend": "timed out waiting for backend"})
+
+    except Exception as e:
+        accel_logger.error(f"inferBackend: Unexpected error: {e}")
+        await websocket.send_json({"inferBackend": f"{e}"})
+
+    finally:
+        if websocket.client_state == WebSocketState.CONNECTED:
+            await websocket.close()
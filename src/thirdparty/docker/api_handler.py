@@ -1,15 +1,34 @@
+import asyncio
 import json
+import time
 from collections.abc import AsyncGenerator
 from typing import Literal, Union
 
 import httpx
 from fastapi import status
 
+from src.utils.metrics import observe_docker_operation
+from src.utils.tracing import inject_trace_env, trace_operation
 from src.utils.utils import generate_uuid
 
 
+def docker_operation(func):
+    # timed for /metrics and traced as a client span, both by function name
+    return observe_docker_operation(
+        trace_operation(
+            name=f"docker {func.__name__}",
+            attributes={"docker.operation": func.__name__},
+        )(func)
+    )
+
+
+@docker_operation
 async def create_container(aclient: httpx.AsyncClient, name: str, data: dict) -> str:
     container_name_or_id = f"{name}-{generate_uuid()}"
+    env = inject_trace_env(env=data.get("Env"))
+    if env is not None:
+        data = {**data, "Env": env}
+
     response = await aclient.post(
         "http://docker/containers/create",
         json=data,
@@ -26,6 +45,7 @@ async def create_container(aclient: httpx.AsyncClient, name: str, data: dict) ->
         raise RuntimeError(response.json()["message"])
 
 
+@docker_operation
 async def start_container(aclient: httpx.AsyncClient, container_name_or_id: str) -> str:
     response = await aclient.post(
         f"http://docker/containers/{container_name_or_id}/start"
@@ -41,6 +61,7 @@ async def start_container(aclient: httpx.AsyncClient, container_name_or_id: str)
         raise RuntimeError(response.json()["message"])
 
 
+@docker_operation
 async def stop_container(
     aclient: httpx.AsyncClient,
     container_name_or_id: str,
@@ -62,6 +83,7 @@ async def stop_container(
         raise RuntimeError(response.json()["message"])
 
 
+@docker_operation
 async def get_container_log(
     aclient: httpx.AsyncClient,
     container_name_or_id: str,
@@ -87,6 +109,7 @@ async def get_container_log(
             raise RuntimeError(error_msg["message"])
 
 
+@docker_operation
 async def get_container_info(aclient: httpx.AsyncClient, container_name: str) -> dict:
     params = {"all": True, "filters": json.dumps({"name": [container_name]})}
 
@@ -100,6 +123,104 @@ async def get_container_info(aclient: httpx.AsyncClient, container_name: str) ->
         raise RuntimeError(response.json()["message"])
 
 
+@docker_operation
+async def inspect_container(
+    aclient: httpx.AsyncClient, container_name_or_id: str
+) -> dict:
+    response = await aclient.get(
+        f"http://docker/containers/{container_name_or_id}/json"
+    )
+
+    if response.status_code == status.HTTP_200_OK:
+        return response.json()
+    elif response.status_code == status.HTTP_404_NOT_FOUND:
+        raise ValueError(response.json()["message"])
+    else:
+        raise RuntimeError(response.json()["message"])
+
+
+@docker_operation
+async def get_container_stats(
+    aclient: httpx.AsyncClient, container_name_or_id: str, stream: bool = True
+) -> AsyncGenerator[dict, None]:
+    async with aclient.stream(
+        "GET",
+        f"http://docker/containers/{container_name_or_id}/stats",
+        params={"stream": stream},
+    ) as response:
+        if response.status_code == status.HTTP_200_OK:
+            async for line in response.aiter_lines():
+                if line:
+                    yield json.loads(line)
+        elif response.status_code == status.HTTP_404_NOT_FOUND:
+            async for chunk in response.aiter_lines():
+                error_msg = json.loads(chunk)
+            raise ValueError(error_msg["message"])
+        else:
+            async for chunk in response.aiter_lines():
+                error_msg = json.loads(chunk)
+            raise RuntimeError(error_msg["message"])
+
+
+@docker_operation
+async def list_containers(
+    aclient: httpx.AsyncClient, filters: Union[dict, None] = None
+) -> list:
+    params = {"filters": json.dumps(filters)} if filters else None
+
+    response = await aclient.get("http://docker/containers/json", params=params)
+
+    if response.status_code == status.HTTP_200_OK:
+        return response.json()
+    elif response.status_code == status.HTTP_400_BAD_REQUEST:
+        raise ValueError(response.json()["message"])
+    else:
+        raise RuntimeError(response.json()["message"])
+
+
+async def wait_container_ready(
+    aclient: httpx.AsyncClient,
+    container_name: str,
+    health_check_url: str,
+    timeout: float,
+    initial_interval: float = 0.5,
+    max_interval: float = 10.0,
+    backoff: float = 1.5,
+) -> bool:
+    """Poll `health_check_url` until it answers 200 or `timeout` seconds pass.
+
+    The interval grows by `backoff` while nothing listens and drops back to
+    `initial_interval` once the server answers, since loading is close to done
+    then. A container that exits ends the wait early instead of at the deadline.
+    """
+    deadline = time.monotonic() + timeout
+    interval = initial_interval
+
+    async with httpx.AsyncClient(timeout=10) as service_aclient:
+        while True:
+            try:
+                response = await service_aclient.get(health_check_url)
+                if response.status_code == status.HTTP_200_OK:
+                    return True
+                interval = initial_interval
+            except httpx.RequestError:
+                pass
+
+            container_info = await get_container_info(
+                aclient=aclient, container_name=container_name
+            )
+            if container_info.get("State") not in {"created", "running"}:
+                raise RuntimeError(f"container {container_name} exited")
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+
+            await asyncio.sleep(min(interval, remaining))
+            interval = min(interval * backoff, max_interval)
+
+
+@docker_operation
 async def wait_for_container(aclient: httpx.AsyncClient, container_name: str) -> dict:
     response = await aclient.post(f"http://docker/containers/{container_name}/wait")
 
@@ -114,6 +235,7 @@ async def wait_for_container(aclient: httpx.AsyncClient, container_name: str) ->
         raise RuntimeError(response.json()["message"])
 
 
+@docker_operation
 async def remove_container(
     aclient: httpx.AsyncClient, container_name_or_id: str
 ) -> None:
@@ -131,6 +253,7 @@ async def remove_container(
         raise RuntimeError(response.json()["message"])
 
 
+@docker_operation
 async def attach_container(
     aclient: httpx.AsyncClient,
     container_name_or_id: str,
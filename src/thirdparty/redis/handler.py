@@ -1,6 +1,75 @@
+import time
+
 import redis as sync_redis
 import redis.asyncio as async_redis
 from src.config.params import REDIS_CONFIG
+from src.utils.metrics import observe_redis_command
+from src.utils.tracing import span
+
+
+def redis_span(command: str):
+    return span(
+        name=f"redis {command}",
+        kind="client",
+        attributes={"db.system": "redis", "db.operation": command},
+    )
+
+
+class InstrumentedPipeline(async_redis.client.Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        start = time.perf_counter()
+        with redis_span(command="PIPELINE"):
+            request = tuple(args for args, _ in self.command_stack)
+            try:
+                response = await super().execute(raise_on_error=raise_on_error)
+            except Exception:
+                observe_redis_command(
+                    command="PIPELINE", start=start, request=request, failed=True
+                )
+                raise
+            observe_redis_command(
+                command="PIPELINE", start=start, request=request, response=response
+            )
+            return response
+
+
+class InstrumentedAsyncRedis(async_redis.Redis):
+    async def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        with redis_span(command=args[0]):
+            try:
+                response = await super().execute_command(*args, **options)
+            except Exception:
+                observe_redis_command(
+                    command=args[0], start=start, request=args[1:], failed=True
+                )
+                raise
+            observe_redis_command(
+                command=args[0], start=start, request=args[1:], response=response
+            )
+            return response
+
+    def pipeline(self, transaction: bool = True, shard_hint=None):
+        return InstrumentedPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
+
+
+class InstrumentedSyncRedis(sync_redis.Redis):
+    def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        with redis_span(command=args[0]):
+            try:
+                response = super().execute_command(*args, **options)
+            except Exception:
+                observe_redis_command(
+                    command=args[0], start=start, request=args[1:], failed=True
+                )
+                raise
+            observe_redis_command(
+                command=args[0], start=start, request=args[1:], response=response
+            )
+            return response
 
 
 class redis_py_async:
@@ -11,7 +80,7 @@ class redis_py_async:
             password=REDIS_CONFIG.password,
             decode_responses=True,
         )
-        self.client = async_redis.Redis.from_pool(self.pool)
+        self.client = InstrumentedAsyncRedis.from_pool(self.pool)
 
     async def aclose(self):
         await self.client.aclose()
@@ -41,7 +110,7 @@ class redis_py_sync:
             password=REDIS_CONFIG.password,
             decode_responses=True,
         )
-        self.client = sync_redis.Redis.from_pool(self.pool)
+        self.client = InstrumentedSyncRedis.from_pool(self.pool)
 
     def close(self):
         self.client.close()
@@ -0,0 +1,150 @@
+import hashlib
+import mmap
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Set, Tuple, Union
+
+import orjson
+
+from src.utils.logger import accel_logger
+from src.utils.utils import get_current_time
+
+MANIFEST_NAME = ".acceltune_manifest.json"
+HASH_WORKERS = min(4, os.cpu_count() or 1)
+
+
+def hash_file(
+    file_path: str, chunk_size: Union[int, None] = None
+) -> Tuple[str, List[str]]:
+    # mmap lets hashlib release the GIL on large slices, no python-level read loop
+    file_hash = hashlib.sha256()
+    chunk_hashes = list()
+
+    with open(file_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return file_hash.hexdigest(), chunk_hashes
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                if chunk_size is None:
+                    file_hash.update(view)
+                else:
+                    for start in range(0, len(view), chunk_size):
+                        chunk = view[start : start + chunk_size]
+                        file_hash.update(chunk)
+                        chunk_hashes.append(hashlib.sha256(chunk).hexdigest())
+                        chunk.release()
+            finally:
+                view.release()
+
+    return file_hash.hexdigest(), chunk_hashes
+
+
+def scan_files(path: str) -> Dict[str, os.stat_result]:
+    with os.scandir(path) as it:
+        return {
+            entry.name: entry.stat()
+            for entry in it
+            if entry.is_file() and entry.name != MANIFEST_NAME
+        }
+
+
+def is_stat_match(file_info: dict, stat: os.stat_result) -> bool:
+    return (
+        file_info["size"] == stat.st_size and file_info["mtime_ns"] == stat.st_mtime_ns
+    )
+
+
+def load_manifest(path: str) -> Union[dict, None]:
+    try:
+        with open(os.path.join(path, MANIFEST_NAME), "rb") as f:
+            return orjson.loads(f.read())
+    except (FileNotFoundError, orjson.JSONDecodeError):
+        return None
+
+
+def save_manifest(path: str, manifest: dict) -> None:
+    tmp_path = os.path.join(path, f"{MANIFEST_NAME}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(orjson.dumps(manifest, option=orjson.OPT_INDENT_2))
+    os.replace(tmp_path, os.path.join(path, MANIFEST_NAME))
+
+
+def refresh_manifest(path: str, chunk_size: Union[int, None] = None) -> dict:
+    """Bring the manifest of `path` up to date, hashing only files whose size or
+    mtime differ from the recorded entry. With `chunk_size`, per-chunk hashes
+    for that size are recorded as well."""
+    manifest = load_manifest(path) or {"files": dict()}
+    files_stat = scan_files(path)
+    chunk_key = str(chunk_size) if chunk_size is not None else None
+
+    stale = list()
+    for name, stat in files_stat.items():
+        file_info = manifest["files"].get(name)
+        if (
+            file_info is None
+            or not is_stat_match(file_info=file_info, stat=stat)
+            or (chunk_key is not None and chunk_key not in file_info.get("chunks", {}))
+        ):
+            stale.append(name)
+
+    removed = set(manifest["files"]) - set(files_stat)
+    if not stale and not removed:
+        return manifest
+
+    with ThreadPoolExecutor(max_workers=HASH_WORKERS) as executor:
+        results = executor.map(
+            lambda name: hash_file(os.path.join(path, name), chunk_size), stale
+        )
+        for name, (file_hash, chunk_hashes) in zip(stale, results, strict=True):
+            file_info = manifest["files"].get(name)
+            if file_info is None or not is_stat_match(
+                file_info=file_info, stat=files_stat[name]
+            ):
+                file_info = {
+                    "size": files_stat[name].st_size,
+                    "mtime_ns": files_stat[name].st_mtime_ns,
+                    "sha256": file_hash,
+                    "chunks": dict(),
+                }
+            if chunk_key is not None:
+                file_info["chunks"][chunk_key] = chunk_hashes
+            manifest["files"][name] = file_info
+
+    for name in removed:
+        manifest["files"].pop(name)
+
+    manifest["updated_time"], _ = get_current_time()
+    try:
+        save_manifest(path=path, manifest=manifest)
+    except OSError as e:
+        accel_logger.error(f"Failed to write manifest in {path}, {e}")
+
+    return manifest
+
+
+def write_manifest(path: str) -> dict:
+    try:
+        return refresh_manifest(path=path)
+    except Exception as e:
+        accel_logger.error(f"Failed to build manifest in {path}, {e}")
+        return {"files": dict()}
+
+
+def list_artifact_files(path: str) -> Set[str]:
+    # stat only the recorded files, fall back to a directory scan if any changed
+    manifest = load_manifest(path)
+    if manifest is not None:
+        try:
+            if all(
+                is_stat_match(
+                    file_info=file_info, stat=os.stat(os.path.join(path, name))
+                )
+                for name, file_info in manifest["files"].items()
+            ):
+                return set(manifest["files"])
+        except FileNotFoundError:
+            pass
+
+    return set(scan_files(path))
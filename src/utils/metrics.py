@@ -0,0 +1,473 @@
+import asyncio
+import bisect
+import functools
+import inspect
+import math
+import time
+from collections import Counter as TaskCounter
+from collections.abc import AsyncGenerator
+from typing import Callable, List, Tuple, Union
+
+from src.utils.tracing import trace_background_task
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+STAGE_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200, 14400, 43200)
+RATE_BUCKETS = (1, 5, 10, 20, 30, 50, 75, 100, 150, 200, 300, 500)
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+
+class Metric:
+    """One metric family, its samples kept per label value tuple.
+
+    Updates are a dict lookup and an add on the event loop, the text
+    exposition is only built when /metrics is scraped."""
+
+    type = "untyped"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.values: dict = dict()
+        registry.append(self)
+
+    def get_key(self, labels: dict) -> tuple:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def format_labels(self, key: tuple, extra: Union[dict, None] = None) -> str:
+        pairs = list(zip(self.labelnames, key, strict=True)) + list(
+            (extra or dict()).items()
+        )
+        if not pairs:
+            return ""
+        return (
+            "{"
+            + ",".join(f'{name}="{escape_label(value)}"' for name, value in pairs)
+            + "}"
+        )
+
+    def collect(self) -> dict:
+        return dict(self.values)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{self.format_labels(key)} {format_value(value)}"
+            for key, value in self.collect().items()
+        ]
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+            *self.samples(),
+        ]
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self.get_key(labels)
+        self.values[key] = self.values.get(key, 0.0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        collector: Union[Callable[[], dict], None] = None,
+    ) -> None:
+        super().__init__(name=name, documentation=documentation, labelnames=labelnames)
+        self.collector = collector
+
+    def set(self, value: float, **labels) -> None:
+        self.values[self.get_key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self.get_key(labels)
+        self.values[key] = self.values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def collect(self) -> dict:
+        # computed gauges are read at scrape time instead of tracked on every change
+        return self.collector() if self.collector is not None else dict(self.values)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name=name, documentation=documentation, labelnames=labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self.get_key(labels)
+        state = self.values.get(key)
+        if state is None:
+            # one count per bucket plus +Inf, then the sum
+            state = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    def samples(self) -> List[str]:
+        lines = list()
+        for key, state in self.collect().items():
+            cumulative = 0
+            for bound, count in zip(
+                self.buckets + (math.inf,), state[:-1], strict=True
+            ):
+                cumulative += count
+                labels = self.format_labels(key, {"le": format_value(bound)})
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{self.format_labels(key)} {state[-1]!r}")
+            lines.append(f"{self.name}_count{self.format_labels(key)} {cumulative}")
+        return lines
+
+
+registry: List[Metric] = list()
+
+
+def render_metrics() -> str:
+    return "\n".join(metric.render() for metric in registry) + "\n"
+
+
+def count_asyncio_tasks() -> dict:
+    tasks = TaskCounter(
+        getattr(task.get_coro(), "__qualname__", "unknown")
+        for task in asyncio.all_tasks()
+    )
+    return {(name,): count for name, count in tasks.items()}
+
+
+HTTP_REQUEST_DURATION = Histogram(
+    "acceltune_http_request_duration_seconds",
+    "Time until the last response byte is sent.",
+    ("router", "handler", "method", "status"),
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "acceltune_http_requests_in_progress",
+    "Requests being handled.",
+)
+REDIS_COMMAND_DURATION = Histogram(
+    "acceltune_redis_command_duration_seconds",
+    "Redis round trip time, a pipeline counts as one round trip.",
+    ("command",),
+)
+REDIS_PAYLOAD_BYTES = Histogram(
+    "acceltune_redis_payload_bytes",
+    "Size of redis command arguments and replies.",
+    ("command", "direction"),
+    buckets=SIZE_BUCKETS,
+)
+REDIS_ERRORS = Counter(
+    "acceltune_redis_errors_total",
+    "Redis commands that raised.",
+    ("command",),
+)
+DOCKER_API_DURATION = Histogram(
+    "acceltune_docker_api_duration_seconds",
+    "Docker engine API latency, streaming calls are timed until the first chunk.",
+    ("operation",),
+    buckets=LATENCY_BUCKETS + (300, 1800, 3600),
+)
+DOCKER_API_ERRORS = Counter(
+    "acceltune_docker_api_errors_total",
+    "Docker engine API calls that raised.",
+    ("operation",),
+)
+BACKGROUND_TASKS_IN_PROGRESS = Gauge(
+    "acceltune_background_tasks_in_progress",
+    "Request background tasks still running.",
+    ("task",),
+)
+BACKGROUND_TASKS = Counter(
+    "acceltune_background_tasks_total",
+    "Request background tasks finished.",
+    ("task", "outcome"),
+)
+ASYNCIO_TASKS = Gauge(
+    "acceltune_asyncio_tasks",
+    "Pending asyncio tasks by coroutine.",
+    ("coroutine",),
+    collector=count_asyncio_tasks,
+)
+WEBSOCKET_CONNECTIONS = Gauge(
+    "acceltune_websocket_connections",
+    "Open websocket connections.",
+    ("handler",),
+)
+WEBSOCKET_MESSAGES = Counter(
+    "acceltune_websocket_messages_total",
+    "Websocket messages, rate() of it gives messages per second.",
+    ("handler", "direction"),
+)
+CHAT_TOKENS = Counter(
+    "acceltune_chat_tokens_total",
+    "Streamed chat tokens, rate() of it gives tokens per second.",
+    ("stream_format",),
+)
+CHAT_TOKENS_PER_SECOND = Histogram(
+    "acceltune_chat_tokens_per_second",
+    "Decode speed of a chat reply from its first to its last token.",
+    ("stream_format",),
+    buckets=RATE_BUCKETS,
+)
+STAGE_DURATION = Histogram(
+    "acceltune_stage_duration_seconds",
+    "Duration of a pipeline stage.",
+    ("stage",),
+    buckets=STAGE_BUCKETS,
+)
+
+
+def get_payload_size(value) -> int:
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(
+            get_payload_size(key) + get_payload_size(item)
+            for key, item in value.items()
+        )
+    if isinstance(value, (list, tuple, set)):
+        return sum(get_payload_size(item) for item in value)
+    if value is None:
+        return 0
+    return len(str(value))
+
+
+def observe_redis_command(
+    command: str, start: float, request: tuple, response=None, failed: bool = False
+) -> None:
+    REDIS_COMMAND_DURATION.observe(time.perf_counter() - start, command=command)
+    REDIS_PAYLOAD_BYTES.observe(
+        get_payload_size(request), command=command, direction="request"
+    )
+    if failed:
+        REDIS_ERRORS.inc(command=command)
+    else:
+        REDIS_PAYLOAD_BYTES.observe(
+            get_payload_size(response), command=command, direction="response"
+        )
+
+
+def observe_chat_stream(
+    stream_format: str, tokens: int, first_token_time: Union[float, None]
+) -> None:
+    if tokens == 0:
+        return
+
+    CHAT_TOKENS.inc(tokens, stream_format=stream_format)
+    elapsed = time.perf_counter() - first_token_time
+    # the first token only marks the start, the rate is over the ones after it
+    if tokens > 1 and elapsed > 0:
+        CHAT_TOKENS_PER_SECOND.observe(
+            (tokens - 1) / elapsed, stream_format=stream_format
+        )
+
+
+def observe_docker_operation(func: Callable) -> Callable:
+    """Time a docker api handler, by its function name."""
+    operation = func.__name__
+
+    if not inspect.isasyncgenfunction(func):
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                DOCKER_API_ERRORS.inc(operation=operation)
+                raise
+            finally:
+                DOCKER_API_DURATION.observe(
+                    time.perf_counter() - start, operation=operation
+                )
+
+        return wrapper
+
+    @functools.wraps(func)
+    async def stream_wrapper(*args, **kwargs) -> AsyncGenerator:
+        start = time.perf_counter()
+        observed = False
+        try:
+            async for item in func(*args, **kwargs):
+                if not observed:
+                    observed = True
+                    DOCKER_API_DURATION.observe(
+                        time.perf_counter() - start, operation=operation
+                    )
+                yield item
+        except Exception:
+            DOCKER_API_ERRORS.inc(operation=operation)
+            raise
+        finally:
+            if not observed:
+                DOCKER_API_DURATION.observe(
+                    time.perf_counter() - start, operation=operation
+                )
+
+    return stream_wrapper
+
+
+def track_background_task(func: Callable) -> Callable:
+    """Wrap a function handed to BackgroundTasks so it shows up in the
+    background task gauge and counter, and runs in a trace of its own."""
+    task = func.__name__
+    func = trace_background_task(func)
+
+    if asyncio.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            BACKGROUND_TASKS_IN_PROGRESS.inc(task=task)
+            outcome = "failed"
+            try:
+                result = await func(*args, **kwargs)
+                outcome = "finish"
+                return result
+            finally:
+                BACKGROUND_TASKS_IN_PROGRESS.dec(task=task)
+                BACKGROUND_TASKS.inc(task=task, outcome=outcome)
+
+        return wrapper
+
+    @functools.wraps(func)
+    def sync_wrapper(*args, **kwargs):
+        BACKGROUND_TASKS_IN_PROGRESS.inc(task=task)
+        outcome = "failed"
+        try:
+            result = func(*args, **kwargs)
+            outcome = "finish"
+            return result
+        finally:
+            BACKGROUND_TASKS_IN_PROGRESS.dec(task=task)
+            BACKGROUND_TASKS.inc(task=task, outcome=outcome)
+
+    return sync_wrapper
+
+
+@functools.cache
+def get_endpoint_labels(endpoint: Callable) -> Tuple[str, str]:
+    # src.routers.train.root -> train
+    module = getattr(endpoint, "__module__", "") or ""
+    parts = module.split(".")
+    router = (
+        parts[2] if module.startswith("src.routers.") and len(parts) > 2 else module
+    )
+    return router or "unknown", getattr(endpoint, "__name__", "unknown")
+
+
+def get_scope_labels(scope: dict) -> Tuple[str, str]:
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched", "unmatched"
+    return get_endpoint_labels(endpoint)
+
+
+class MetricsMiddleware:
+    """Plain ASGI middleware, so streaming responses pass through untouched.
+
+    Request latency is taken when the last body chunk goes out, work queued
+    in BackgroundTasks runs after that and is not part of it."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "http":
+            await self.handle_http(scope=scope, receive=receive, send=send)
+        elif scope["type"] == "websocket":
+            await self.handle_websocket(scope=scope, receive=receive, send=send)
+        else:
+            await self.app(scope, receive, send)
+
+    async def handle_http(self, scope, receive, send) -> None:
+        start = time.perf_counter()
+        status_code = 500
+        observed = False
+
+        def observe() -> None:
+            nonlocal observed
+            observed = True
+            router, handler = get_scope_labels(scope=scope)
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - start,
+                router=router,
+                handler=handler,
+                method=scope["method"],
+                status=status_code,
+            )
+
+        async def send_wrapper(message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+            if (
+                message["type"] == "http.response.body"
+                and not message.get("more_body", False)
+                and not observed
+            ):
+                observe()
+
+        HTTP_REQUESTS_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUESTS_IN_PROGRESS.dec()
+            if not observed:
+                observe()
+
+    async def handle_websocket(self, scope, receive, send) -> None:
+        accepted = False
+        handler = None
+
+        async def receive_wrapper():
+            message = await receive()
+            if message["type"] == "websocket.receive":
+                WEBSOCKET_MESSAGES.inc(handler=handler, direction="received")
+            return message
+
+        async def send_wrapper(message) -> None:
+            nonlocal accepted, handler
+            if message["type"] == "websocket.accept" and not accepted:
+                accepted = True
+                handler = get_scope_labels(scope=scope)[1]
+                WEBSOCKET_CONNECTIONS.inc(handler=handler)
+            elif message["type"] == "websocket.send":
+                WEBSOCKET_MESSAGES.inc(handler=handler, direction="sent")
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            if accepted:
+                WEBSOCKET_CONNECTIONS.dec(handler=handler)
@@ -0,0 +1,90 @@
+import asyncio
+import time
+from collections.abc import AsyncGenerator
+from typing import Union
+
+from src.thirdparty.redis.handler import redis_async
+from src.utils.logger import accel_logger
+
+
+class ProgressChannel:
+    """Throttled progress updates from one producer to one in-process consumer,
+    optionally mirrored to a Redis Stream for other observers."""
+
+    _END = object()
+
+    def __init__(
+        self,
+        min_step: float = 0.01,
+        min_interval: float = 0.5,
+        mirror_key: Union[str, None] = None,
+        mirror_maxlen: int = 100,
+        mirror_ttl: int = 600,
+    ) -> None:
+        self.min_step = min_step
+        self.min_interval = min_interval
+        self.mirror_key = mirror_key
+        self.mirror_maxlen = mirror_maxlen
+        self.mirror_ttl = mirror_ttl
+
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.closed = False
+        self.last_progress: Union[float, None] = None
+        self.last_time = 0.0
+
+    async def publish(self, progress: float) -> None:
+        if self.closed:
+            return
+
+        now = time.monotonic()
+        if (
+            progress < 1.0
+            and self.last_progress is not None
+            and progress - self.last_progress < self.min_step
+            and now - self.last_time < self.min_interval
+        ):
+            return
+        if progress == self.last_progress:
+            return
+
+        self.last_progress, self.last_time = progress, now
+        self.queue.put_nowait(progress)
+        await self._mirror({"progress": progress})
+
+    async def close(self, error: Union[BaseException, None] = None) -> None:
+        if self.closed:
+            return
+
+        self.closed = True
+        self.queue.put_nowait(self._END)
+        await self._mirror(
+            {"status": "failed", "error": f"{error}"}
+            if error is not None
+            else {"status": "finish"}
+        )
+        if self.mirror_key:
+            try:
+                await redis_async.client.expire(self.mirror_key, self.mirror_ttl)
+            except Exception as e:
+                accel_logger.error(f"Progress mirror error: {e}")
+
+    async def _mirror(self, fields: dict) -> None:
+        if not self.mirror_key:
+            return
+
+        try:
+            await redis_async.client.xadd(
+                self.mirror_key,
+                {key: str(value) for key, value in fields.items()},
+                maxlen=self.mirror_maxlen,
+                approximate=True,
+            )
+        except Exception as e:
+            accel_logger.error(f"Progress mirror error: {e}")
+
+    async def __aiter__(self) -> AsyncGenerator[float, None]:
+        while True:
+            progress = await self.queue.get()
+            if progress is self._END:
+                break
+            yield progress
@@ -0,0 +1,563 @@
+import asyncio
+import contextvars
+import functools
+import inspect
+import logging
+import os
+import secrets
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Any, Callable, Coroutine, Dict, Generator, List, Union
+
+import httpx
+import orjson
+
+from src.config.params import TRACE_CONFIG
+from src.utils.logger import accel_logger
+
+FLUSH_SEC = 1
+TRACE_FILE_NAME = "spans.jsonl"
+TRACEPARENT_HEADER = "traceparent"
+UNTRACED_PATHS = ("/metrics", "/health/", "/debug/")
+OTLP_SPAN_KIND = {"internal": 1, "server": 2, "client": 3}
+
+
+class Span:
+    __slots__ = (
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "name",
+        "kind",
+        "start_time",
+        "end_time",
+        "attributes",
+        "error",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: Union[str, None],
+        kind: str = "internal",
+        attributes: Union[dict, None] = None,
+    ) -> None:
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_time = time.time_ns()
+        self.end_time: Union[int, None] = None
+        self.attributes = attributes or dict()
+        self.error: Union[str, None] = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def record_error(self, e: BaseException) -> None:
+        self.error = f"{type(e).__name__}: {e}"
+
+    def end(self) -> None:
+        if self.end_time is None:
+            self.end_time = time.time_ns()
+            trace_exporter.add(span=self.to_dict())
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+current_span: ContextVar[Union[Span, None]] = ContextVar("current_span", default=None)
+
+
+def parse_traceparent(value: Union[str, None]) -> Union[tuple, None]:
+    # version-trace_id-parent_id-flags, as in the w3c trace context header
+    parts = (value or "").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    return parts[1], parts[2]
+
+
+def start_span(
+    name: str,
+    kind: str = "internal",
+    attributes: Union[dict, None] = None,
+    traceparent: Union[str, None] = None,
+    new_trace: bool = False,
+) -> Union[Span, None]:
+    """New span under the current one, or under `traceparent` when given.
+
+    Only server spans and `new_trace` may start a trace, everything else is
+    dropped outside of one so background loops do not produce endless root
+    traces. Spans past TRACE_MAX_SPANS in one trace are dropped too."""
+    if not TRACE_CONFIG.enabled:
+        return None
+
+    parent = current_span.get()
+    remote = parse_traceparent(traceparent)
+    if new_trace:
+        trace_id, parent_id = secrets.token_hex(16), None
+    elif remote is not None:
+        trace_id, parent_id = remote
+    elif parent is not None:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+    elif kind == "server":
+        trace_id, parent_id = secrets.token_hex(16), None
+    else:
+        return None
+
+    if not trace_exporter.reserve(trace_id=trace_id):
+        return None
+
+    return Span(
+        name=name,
+        trace_id=trace_id,
+        parent_id=parent_id,
+        kind=kind,
+        attributes=attributes,
+    )
+
+
+@contextmanager
+def span(
+    name: str,
+    kind: str = "internal",
+    attributes: Union[dict, None] = None,
+    new_trace: bool = False,
+) -> Generator[Union[Span, None], None, None]:
+    new_span = start_span(
+        name=name, kind=kind, attributes=attributes, new_trace=new_trace
+    )
+    if new_span is None:
+        yield None
+        return
+
+    token = current_span.set(new_span)
+    try:
+        yield new_span
+    except BaseException as e:
+        new_span.record_error(e)
+        raise
+    finally:
+        current_span.reset(token)
+        new_span.end()
+
+
+@contextmanager
+def detached_span(
+    name: str, kind: str = "internal", attributes: Union[dict, None] = None
+) -> Generator[Union[Span, None], None, None]:
+    """Span that never becomes the current one. Async generators have to use
+    this, they can be closed from another context where the current span
+    could not be reset."""
+    new_span = start_span(name=name, kind=kind, attributes=attributes)
+    try:
+        yield new_span
+    except BaseException as e:
+        if new_span is not None:
+            new_span.record_error(e)
+        raise
+    finally:
+        if new_span is not None:
+            new_span.end()
+
+
+def trace_operation(name: str, attributes: Union[dict, None] = None) -> Callable:
+    """Client span around every call of the decorated coroutine or async
+    generator."""
+
+    def decorator(func: Callable) -> Callable:
+        if inspect.isasyncgenfunction(func):
+
+            @functools.wraps(func)
+            async def stream_wrapper(*args, **kwargs):
+                with detached_span(name=name, kind="client", attributes=attributes):
+                    async for item in func(*args, **kwargs):
+                        yield item
+
+            return stream_wrapper
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(name=name, kind="client", attributes=attributes):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def trace_background_task(func: Callable) -> Callable:
+    """Run a function handed to BackgroundTasks in a trace of its own.
+
+    Jobs such as train log loops or evals outlive their request by hours,
+    under the request's trace every redis call of theirs would land in it.
+    The new trace keeps the request's ids as link attributes."""
+
+    def get_attributes() -> dict:
+        parent = current_span.get()
+        if parent is None:
+            return dict()
+        return {"link.trace_id": parent.trace_id, "link.span_id": parent.span_id}
+
+    if asyncio.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(
+                name=f"background {func.__name__}",
+                attributes=get_attributes(),
+                new_trace=current_span.get() is not None,
+            ):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    @functools.wraps(func)
+    def sync_wrapper(*args, **kwargs):
+        with span(
+            name=f"background {func.__name__}",
+            attributes=get_attributes(),
+            new_trace=current_span.get() is not None,
+        ):
+            return func(*args, **kwargs)
+
+    return sync_wrapper
+
+
+def create_untraced_task(coro: Coroutine[Any, Any, Any]) -> asyncio.Task:
+    """Task that does not inherit the current trace, for process wide loops
+    which are started lazily by whatever request needs them first."""
+    context = contextvars.copy_context()
+    context.run(current_span.set, None)
+    # create_task only takes a context from python 3.11 on, a task copies the
+    # context it is created in
+    return context.run(asyncio.create_task, coro)
+
+
+def inject_trace_env(env: Union[List[str], None]) -> Union[List[str], None]:
+    """Container env with the current trace appended, so work done inside the
+    container can be reported under the same trace."""
+    parent = current_span.get()
+    if parent is None:
+        return env
+    return list(env or list()) + [
+        f"TRACEPARENT={parent.traceparent}",
+        f"ACCELTUNE_TRACE_ID={parent.trace_id}",
+    ]
+
+
+class TracingTransport(httpx.AsyncBaseTransport):
+    """httpx transport that opens a client span per request and forwards the
+    trace in a traceparent header. Streamed bodies are not part of the span,
+    it ends once the response headers arrive."""
+
+    def __init__(self, transport: Union[httpx.AsyncBaseTransport, None] = None):
+        self.transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        with span(
+            name=f"HTTP {request.method} {request.url.host}{request.url.path}",
+            kind="client",
+            attributes={
+                "http.method": request.method,
+                "http.url": str(request.url.copy_with(query=None)),
+            },
+        ) as client_span:
+            if client_span is None:
+                return await self.transport.handle_async_request(request)
+
+            request.headers[TRACEPARENT_HEADER] = client_span.traceparent
+            response = await self.transport.handle_async_request(request)
+            client_span.set_attribute("http.status_code", response.status_code)
+            return response
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+class TracingMiddleware:
+    """Server span per http request, continuing the caller's trace when a
+    traceparent header comes in. The trace id is returned in X-Trace-Id.
+
+    The span ends with the last body chunk, work queued in BackgroundTasks
+    still runs under it and shows up as its children."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(UNTRACED_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or list())
+        traceparent = headers.get(TRACEPARENT_HEADER.encode(), b"").decode("latin-1")
+        server_span = start_span(
+            name=f"{scope['method']} {scope['path']}",
+            kind="server",
+            attributes={"http.method": scope["method"], "http.target": scope["path"]},
+            traceparent=traceparent,
+        )
+        if server_span is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message) -> None:
+            if message["type"] == "http.response.start":
+                server_span.set_attribute("http.status_code", message["status"])
+                endpoint = scope.get("endpoint")
+                if endpoint is not None:
+                    server_span.set_attribute(
+                        "handler", f"{endpoint.__module__}.{endpoint.__name__}"
+                    )
+                message["headers"] = list(message.get("headers", list())) + [
+                    (b"x-trace-id", server_span.trace_id.encode())
+                ]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get(
+                "more_body", False
+            ):
+                server_span.end()
+
+        token = current_span.set(server_span)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            server_span.record_error(e)
+            raise
+        finally:
+            current_span.reset(token)
+            server_span.end()
+
+
+def to_otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": f"{value}"}
+
+
+def to_otlp(spans: List[dict]) -> dict:
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [
+                        {"key": "service.name", "value": {"stringValue": "acceltune"}}
+                    ]
+                },
+                "scopeSpans": [
+                    {
+                        "scope": {"name": "acceltune"},
+                        "spans": [
+                            {
+                                "traceId": item["trace_id"],
+                                "spanId": item["span_id"],
+                                "parentSpanId": item["parent_id"] or "",
+                                "name": item["name"],
+                                "kind": OTLP_SPAN_KIND[item["kind"]],
+                                "startTimeUnixNano": str(item["start_time"]),
+                                "endTimeUnixNano": str(item["end_time"]),
+                                "attributes": [
+                                    {"key": key, "value": to_otlp_value(value)}
+                                    for key, value in item["attributes"].items()
+                                ],
+                                "status": (
+                                    {"code": 2, "message": item["error"]}
+                                    if item["error"]
+                                    else {"code": 1}
+                                ),
+                            }
+                            for item in spans
+                        ],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+class TraceExporter:
+    """Finished spans are kept per trace in memory for /debug/trace, and
+    written in batches to a rotating jsonl file and, when configured, an
+    OTLP/HTTP collector.
+
+    At most `max_traces` traces of `max_spans` spans each are kept, the
+    least recently active trace goes first."""
+
+    def __init__(
+        self,
+        folder: str,
+        file_limit: int,
+        file_count: int,
+        max_traces: int,
+        max_spans: int,
+        otlp_endpoint: Union[str, None],
+    ) -> None:
+        self.folder = folder
+        self.file_limit = file_limit
+        self.file_count = file_count
+        self.max_traces = max_traces
+        self.max_spans = max_spans
+        self.otlp_endpoint = otlp_endpoint
+        self.traces: OrderedDict[str, dict] = OrderedDict()
+        self.pending: List[dict] = list()
+        self.file_logger: Union[logging.Logger, None] = None
+        self.task: Union[asyncio.Task, None] = None
+
+    def get_entry(self, trace_id: str) -> dict:
+        entry = self.traces.get(trace_id)
+        if entry is None:
+            entry = self.traces[trace_id] = {
+                "spans": list(),
+                "started": 0,
+                "dropped": 0,
+            }
+            while len(self.traces) > self.max_traces:
+                self.traces.popitem(last=False)
+        else:
+            self.traces.move_to_end(trace_id)
+        return entry
+
+    def reserve(self, trace_id: str) -> bool:
+        """Count a span about to start, False once the trace is full."""
+        entry = self.get_entry(trace_id=trace_id)
+        if entry["started"] >= self.max_spans:
+            entry["dropped"] += 1
+            return False
+        entry["started"] += 1
+        return True
+
+    def add(self, span: dict) -> None:
+        entry = self.get_entry(trace_id=span["trace_id"])
+        if len(entry["spans"]) >= self.max_spans:
+            entry["dropped"] += 1
+            return
+        entry["spans"].append(span)
+        self.pending.append(span)
+
+    def start(self) -> None:
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+    async def aclose(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await self.flush()
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(FLUSH_SEC)
+            await self.flush()
+
+    def get_file_logger(self) -> logging.Logger:
+        if self.file_logger is None:
+            Path(self.folder).mkdir(exist_ok=True, parents=True)
+            handler = RotatingFileHandler(
+                os.path.join(self.folder, TRACE_FILE_NAME),
+                maxBytes=self.file_limit,
+                backupCount=self.file_count,
+                encoding="utf-8",
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self.file_logger = logging.getLogger("acceltune.trace")
+            self.file_logger.propagate = False
+            self.file_logger.setLevel(logging.INFO)
+            self.file_logger.addHandler(handler)
+        return self.file_logger
+
+    def write(self, spans: List[dict]) -> None:
+        file_logger = self.get_file_logger()
+        for item in spans:
+            file_logger.info(orjson.dumps(item).decode())
+
+    async def flush(self) -> None:
+        spans, self.pending = self.pending, list()
+        if not spans:
+            return
+
+        try:
+            await asyncio.to_thread(self.write, spans)
+        except Exception as e:
+            accel_logger.error(f"Trace export error: {e}")
+
+        if self.otlp_endpoint:
+            try:
+                async with httpx.AsyncClient(timeout=10) as aclient:
+                    await aclient.post(
+                        f"{self.otlp_endpoint.rstrip('/')}/v1/traces",
+                        content=orjson.dumps(to_otlp(spans=spans)),
+                        headers={"Content-Type": "application/json"},
+                    )
+            except Exception as e:
+                accel_logger.error(f"Trace export error: {e}")
+
+    def read_files(self, trace_id: str) -> List[dict]:
+        spans = list()
+        for index in range(self.file_count, -1, -1):
+            path = os.path.join(self.folder, TRACE_FILE_NAME)
+            path = f"{path}.{index}" if index else path
+            if not os.path.exists(path):
+                continue
+            with open(path, "rb") as f:
+                for line in f:
+                    if trace_id.encode() in line:
+                        spans.append(orjson.loads(line))
+        return spans
+
+    async def get_trace(self, trace_id: str) -> dict:
+        entry = self.traces.get(trace_id) or {"spans": list(), "dropped": 0}
+        spans: Dict[str, dict] = {item["span_id"]: item for item in entry["spans"]}
+        if not spans:
+            # older traces only survive in the exported files
+            for item in await asyncio.to_thread(self.read_files, trace_id):
+                spans[item["span_id"]] = item
+
+        if not spans:
+            raise KeyError("trace does not exists")
+        return {
+            "spans": sorted(spans.values(), key=lambda item: item["start_time"]),
+            "dropped_spans": entry["dropped"],
+        }
+
+
+trace_exporter = TraceExporter(
+    folder=TRACE_CONFIG.folder,
+    file_limit=TRACE_CONFIG.file_limit,
+    file_count=TRACE_CONFIG.file_count,
+    max_traces=TRACE_CONFIG.max_traces,
+    max_spans=TRACE_CONFIG.max_spans,
+    otlp_endpoint=TRACE_CONFIG.otlp_endpoint,
+)